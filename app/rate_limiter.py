@@ -7,14 +7,28 @@ Environment variables:
 - RATE_LIMIT_AUTH: Rate limit for auth endpoints (default: "10/minute")
 - RATE_LIMIT_CHAT: Rate limit for chat endpoints (default: "30/minute")
 - RATE_LIMIT_TTS: Rate limit for TTS endpoints (default: "20/minute")
+
+SlidingWindowLimiter enforces per-key limits configured at runtime (e.g.
+rate_limit_count/rate_limit_hours of a Telegram bot instance).
 """
 
+import logging
+import math
 import os
+import time
+import uuid
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
 
 from fastapi import Request
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
+from db.redis_client import CacheKey, get_redis
+
+
+logger = logging.getLogger(__name__)
+
 
 def get_real_client_ip(request: Request) -> str:
     """Get client IP, considering proxy headers."""
@@ -102,3 +116,114 @@ def get_rate_limit_status() -> dict:
             "stt": RATE_LIMIT_STT,
         },
     }
+
+
+# ============== Sliding Window Limiter ==============
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window log limiter: at most `limit` hits per `window` seconds per key.
+
+    Hit timestamps live in memory, or in a Redis sorted set when Redis is
+    connected (shared by all workers). A key seen for the first time is seeded
+    with past hits from `seed` (e.g. message timestamps from the database), so
+    a restart does not reset the window. The window length is part of the
+    key, so changing it starts a fresh, re-seeded window.
+    """
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self, name: str):
+        self.name = name
+        self._hits: Dict[Tuple[str, int], Deque[float]] = {}
+        self._calls = 0
+        self._redis_failing = False
+
+    async def hit(
+        self,
+        key: str,
+        limit: int,
+        window: float,
+        seed: Optional[Callable[[float], Awaitable[List[float]]]] = None,
+    ) -> Tuple[bool, float]:
+        """
+        Record a hit if allowed. Returns (allowed, retry_after_seconds).
+        `seed(since)` returns unix timestamps of earlier hits after `since`.
+        """
+        window_key = (key, int(window))
+        client = await get_redis()
+        if client is not None:
+            try:
+                return await self._hit_redis(client, window_key, limit, window, seed)
+            except Exception as e:
+                if not self._redis_failing:
+                    logger.warning(f"⚠️ Rate limiter {self.name}: Redis недоступен: {e}")
+                self._redis_failing = True
+        return await self._hit_memory(window_key, limit, window, seed)
+
+    async def _hit_memory(self, window_key, limit, window, seed) -> Tuple[bool, float]:
+        now = time.time()
+        hits = self._hits.get(window_key)
+        if hits is None:
+            seeded = sorted(await seed(now - window)) if seed else []
+            # Another request may have seeded the key while we were waiting
+            hits = self._hits.setdefault(window_key, deque(seeded))
+
+        self._calls += 1
+        if self._calls % self.SWEEP_EVERY == 0:
+            self._sweep(now)
+
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        if len(hits) >= limit:
+            return False, hits[len(hits) - limit] + window - now
+        hits.append(now)
+        return True, 0.0
+
+    async def _hit_redis(self, client, window_key, limit, window, seed) -> Tuple[bool, float]:
+        key, window_seconds = window_key
+        redis_key = f"{CacheKey.RATE_LIMIT}:{self.name}:{key}:{window_seconds}"
+        now = time.time()
+        ttl = math.ceil(window)
+
+        if seed is not None and not await client.exists(redis_key):
+            seeded = await seed(now - window)
+            if seeded:
+                pipe = client.pipeline(transaction=True)
+                pipe.zadd(redis_key, {f"seed:{ts}": ts for ts in seeded}, nx=True)
+                pipe.expire(redis_key, ttl)
+                await pipe.execute()
+
+        member = f"{now}:{uuid.uuid4().hex[:8]}"
+        pipe = client.pipeline(transaction=True)
+        pipe.zremrangebyscore(redis_key, 0, now - window)
+        pipe.zadd(redis_key, {member: now})
+        pipe.zcard(redis_key)
+        pipe.expire(redis_key, ttl)
+        _, _, count, _ = await pipe.execute()
+        self._redis_failing = False
+
+        if count <= limit:
+            return True, 0.0
+        # Over the limit: take the hit back
+        await client.zrem(redis_key, member)
+        blocking = await client.zrange(
+            redis_key, count - 1 - limit, count - 1 - limit, withscores=True
+        )
+        retry_after = blocking[0][1] + window - now if blocking else window
+        return False, max(0.0, retry_after)
+
+    def _sweep(self, now: float) -> None:
+        """Forget keys whose newest hit is outside their window."""
+        stale = [
+            window_key
+            for window_key, hits in self._hits.items()
+            if not hits or hits[-1] <= now - window_key[1]
+        ]
+        for window_key in stale:
+            del self._hits[window_key]
+
+
+# Per-session message limits of Telegram bot instances (rate_limit_count/rate_limit_hours)
+bot_message_limiter = SlidingWindowLimiter("bot_messages")
@@ -3,7 +3,8 @@
 
 import json
 import logging
-from datetime import datetime, timedelta
+import math
+from datetime import datetime, timezone
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request
@@ -11,9 +12,9 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.dependencies import get_container
-from app.rate_limiter import RATE_LIMIT_CHAT, limiter
+from app.rate_limiter import RATE_LIMIT_CHAT, bot_message_limiter, limiter
 from auth_manager import User, get_current_user
-from cloud_llm_service import CloudLLMService
+from cloud_llm_service import CloudLLMService, astream_from_messages, cloud_provider_pool
 from db.integration import (
     async_bot_instance_manager,
     async_chat_manager,
@@ -35,6 +36,37 @@ _DEFAULT_RAG_PROMPT = (
 )
 
 
+async def _resolve_cloud_llm(backend: Optional[str], context: str) -> Optional[CloudLLMService]:
+    """
+    Resolve an llm_backend override ("cloud:<id>" or legacy "gemini") to a pooled
+    CloudLLMService. Returns None to fall back to the default LLM service.
+    """
+    if not backend:
+        return None
+    try:
+        if backend.startswith("cloud:"):
+            provider_id = backend.split(":", 1)[1]
+            service = await cloud_provider_pool.aget(
+                provider_id, async_cloud_provider_manager.get_provider_with_key
+            )
+            if service:
+                logger.info(f"{context}: using cloud provider {provider_id}")
+            return service
+        if backend == "gemini":
+            # Legacy: auto-resolve to default Gemini cloud provider
+            service = await cloud_provider_pool.aget_by_type(
+                "gemini",
+                async_cloud_provider_manager.list_providers,
+                async_cloud_provider_manager.get_provider_with_key,
+            )
+            if service:
+                logger.info(f"{context}: resolved gemini -> cloud:{service.provider_id}")
+            return service
+    except Exception as e:
+        logger.warning(f"{context}: cloud LLM override {backend} failed: {e}")
+    return None
+
+
 # ============== Pydantic Models ==============
 
 
@@ -194,7 +226,7 @@ async def admin_send_chat_message(
     # RAG: inject relevant wiki context into system prompt
     wiki_rag = container.wiki_rag_service
     if wiki_rag and msg_request.content:
-        wiki_context = wiki_rag.retrieve(msg_request.content, top_k=3)
+        wiki_context = await wiki_rag.aretrieve(msg_request.content, top_k=3)
         if wiki_context:
             base = default_prompt or _DEFAULT_RAG_PROMPT
             default_prompt = f"{base}\n\n{wiki_context}"
@@ -237,17 +269,26 @@ async def admin_stream_chat_message(
             if ":" in session["source_id"]
             else session["source_id"]
         )
-        bot_config = await async_bot_instance_manager.get_instance(bot_id)
+        bot_config = await async_bot_instance_manager.get_cached_instance(bot_id)
         if bot_config:
             rl_count = bot_config.get("rate_limit_count")
             rl_hours = bot_config.get("rate_limit_hours")
             if rl_count and rl_hours:
-                since = datetime.utcnow() - timedelta(hours=rl_hours)
-                msg_count = await async_chat_manager.count_messages(session_id, "user", since)
-                if msg_count >= rl_count:
+
+                async def user_message_times(since: float) -> list:
+                    times = await async_chat_manager.get_message_times(
+                        session_id, "user", datetime.utcfromtimestamp(since)
+                    )
+                    return [t.replace(tzinfo=timezone.utc).timestamp() for t in times]
+
+                allowed, retry_after = await bot_message_limiter.hit(
+                    f"{bot_id}:{session_id}", rl_count, rl_hours * 3600, seed=user_message_times
+                )
+                if not allowed:
                     raise HTTPException(
                         status_code=429,
                         detail=f"Rate limit exceeded: {rl_count} messages per {rl_hours}h",
+                        headers={"Retry-After": str(math.ceil(retry_after))},
                     )
 
     # Determine which LLM service to use
@@ -256,34 +297,9 @@ async def admin_stream_chat_message(
 
     if msg_request.llm_override:
         override = msg_request.llm_override
-        backend = override.llm_backend
-
-        if backend and backend.startswith("cloud:"):
-            # Use specific cloud provider
-            provider_id = backend.split(":", 1)[1]
-            try:
-                provider_config = await async_cloud_provider_manager.get_provider_with_key(
-                    provider_id
-                )
-                if provider_config:
-                    active_llm = CloudLLMService(provider_config)
-                    logger.info(f"Using cloud provider: {provider_id}")
-            except Exception as e:
-                logger.warning(f"Failed to load cloud provider {provider_id}: {e}")
-        elif backend == "gemini":
-            # Legacy: auto-resolve to default Gemini cloud provider
-            providers = await async_cloud_provider_manager.list_providers(enabled_only=True)
-            gemini_p = next((p for p in providers if p.get("provider_type") == "gemini"), None)
-            if gemini_p:
-                try:
-                    provider_config = await async_cloud_provider_manager.get_provider_with_key(
-                        gemini_p["id"]
-                    )
-                    if provider_config:
-                        active_llm = CloudLLMService(provider_config)
-                        logger.info(f"Resolved gemini -> cloud:{gemini_p['id']}")
-                except Exception as e:
-                    logger.warning(f"Failed to load Gemini cloud provider: {e}")
+        cloud_llm = await _resolve_cloud_llm(override.llm_backend, "llm_override")
+        if cloud_llm:
+            active_llm = cloud_llm
         # else use default vllm/llm_service
 
         custom_prompt = override.system_prompt
@@ -291,37 +307,11 @@ async def admin_stream_chat_message(
     elif msg_request.widget_instance_id:
         widget = await async_widget_instance_manager.get_instance(msg_request.widget_instance_id)
         if widget:
-            backend = widget.get("llm_backend")
-            if backend and backend.startswith("cloud:"):
-                provider_id = backend.split(":", 1)[1]
-                try:
-                    provider_config = await async_cloud_provider_manager.get_provider_with_key(
-                        provider_id
-                    )
-                    if provider_config:
-                        active_llm = CloudLLMService(provider_config)
-                        logger.info(
-                            f"Widget {msg_request.widget_instance_id}: using cloud provider {provider_id}"
-                        )
-                except Exception as e:
-                    logger.warning(f"Widget LLM override failed: {e}")
-            elif backend == "gemini":
-                # Legacy: auto-resolve to default Gemini cloud provider
-                providers = await async_cloud_provider_manager.list_providers(enabled_only=True)
-                gemini_p = next((p for p in providers if p.get("provider_type") == "gemini"), None)
-                if gemini_p:
-                    try:
-                        provider_config = await async_cloud_provider_manager.get_provider_with_key(
-                            gemini_p["id"]
-                        )
-                        if provider_config:
-                            active_llm = CloudLLMService(provider_config)
-                            logger.info(
-                                f"Widget {msg_request.widget_instance_id}: "
-                                f"resolved gemini -> cloud:{gemini_p['id']}"
-                            )
-                    except Exception as e:
-                        logger.warning(f"Widget Gemini cloud override failed: {e}")
+            cloud_llm = await _resolve_cloud_llm(
+                widget.get("llm_backend"), f"Widget {msg_request.widget_instance_id}"
+            )
+            if cloud_llm:
+                active_llm = cloud_llm
             # else use default vllm/llm_service
             custom_prompt = widget.get("system_prompt")
 
@@ -339,7 +329,7 @@ async def admin_stream_chat_message(
     # RAG: inject relevant wiki context into system prompt
     wiki_rag = container.wiki_rag_service
     if wiki_rag and msg_request.content:
-        wiki_context = wiki_rag.retrieve(msg_request.content, top_k=3)
+        wiki_context = await wiki_rag.aretrieve(msg_request.content, top_k=3)
         if wiki_context:
             base = default_prompt or _DEFAULT_RAG_PROMPT
             default_prompt = f"{base}\n\n{wiki_context}"
@@ -353,7 +343,7 @@ async def admin_stream_chat_message(
             yield f"data: {json.dumps({'type': 'user_message', 'message': user_msg}, ensure_ascii=False)}\n\n"
 
             # Streaming ответ (use active_llm which may be overridden)
-            for chunk in active_llm.generate_response_from_messages(messages, stream=True):
+            async for chunk in astream_from_messages(active_llm, messages):
                 full_response.append(chunk)
                 yield f"data: {json.dumps({'type': 'chunk', 'content': chunk}, ensure_ascii=False)}\n\n"
 
@@ -420,7 +410,7 @@ async def admin_edit_chat_message(
     # RAG: inject relevant wiki context
     wiki_rag = container.wiki_rag_service
     if wiki_rag and request.content:
-        wiki_context = wiki_rag.retrieve(request.content, top_k=3)
+        wiki_context = await wiki_rag.aretrieve(request.content, top_k=3)
         if wiki_context:
             base = default_prompt or _DEFAULT_RAG_PROMPT
             default_prompt = f"{base}\n\n{wiki_context}"
@@ -507,7 +497,7 @@ async def admin_regenerate_chat_response(
     user_content = target_msg["content"] if target_msg["role"] == "user" else ""
     wiki_rag = container.wiki_rag_service
     if wiki_rag and user_content:
-        wiki_context = wiki_rag.retrieve(user_content, top_k=3)
+        wiki_context = await wiki_rag.aretrieve(user_content, top_k=3)
         if wiki_context:
             base = default_prompt or _DEFAULT_RAG_PROMPT
             default_prompt = f"{base}\n\n{wiki_context}"
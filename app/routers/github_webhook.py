@@ -48,6 +48,8 @@ async def _generate_comment(system_prompt: str, pr_data: dict) -> Optional[str]:
         async with httpx.AsyncClient(timeout=60.0) as client:
             resp = await client.post(
                 f"{vllm_url}/v1/chat/completions",
+                # Background job: yields to interactive requests in the CLI bridge queue
+                headers={"X-Priority": "batch"},
                 json={
                     "model": "default",
                     "messages": [
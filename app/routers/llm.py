@@ -13,7 +13,12 @@ from pydantic import BaseModel
 
 from app.dependencies import get_container
 from auth_manager import User, get_current_user, require_admin, require_not_guest
-from cloud_llm_service import PROVIDER_TYPES, CloudLLMService, GeminiProvider
+from cloud_llm_service import (
+    PROVIDER_TYPES,
+    CloudLLMService,
+    GeminiProvider,
+    cloud_provider_pool,
+)
 from db.integration import async_audit_logger, async_cloud_provider_manager
 from service_manager import get_service_manager
 
@@ -688,6 +693,9 @@ async def admin_create_cloud_provider(
             details={"name": data.name, "provider_type": data.provider_type},
         )
 
+        # New provider may now be the one a legacy type backend resolves to
+        cloud_provider_pool.clear_aliases()
+
         return {"status": "ok", "provider": provider}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -710,6 +718,7 @@ async def admin_update_cloud_provider(
     provider = await async_cloud_provider_manager.update_provider(provider_id, **update_data)
     if not provider:
         raise HTTPException(status_code=404, detail="Provider not found")
+    cloud_provider_pool.invalidate(provider_id)
 
     # Audit log
     await async_audit_logger.log(
@@ -729,6 +738,7 @@ async def admin_delete_cloud_provider(provider_id: str, user: User = Depends(get
     owner_id = None if user.role == "admin" else user.id
     if not await async_cloud_provider_manager.delete_provider(provider_id, owner_id=owner_id):
         raise HTTPException(status_code=404, detail="Provider not found")
+    cloud_provider_pool.invalidate(provider_id)
 
     # Audit log
     await async_audit_logger.log(
@@ -813,6 +823,7 @@ async def admin_set_default_cloud_provider(
 
     if not await async_cloud_provider_manager.set_default(provider_id):
         raise HTTPException(status_code=404, detail="Provider not found or disabled")
+    cloud_provider_pool.clear_aliases()
 
     await async_audit_logger.log(
         action="update",
@@ -10,6 +10,8 @@ from pydantic import BaseModel, Field
 from auth_manager import User, get_current_user, require_admin
 from db.database import AsyncSessionLocal
 from db.repositories.usage import UsageLimitsRepository, UsageRepository
+from db.usage_quota import PERIODS, usage_quota
+from db.usage_sink import usage_sink
 
 
 router = APIRouter(prefix="/admin/usage", tags=["usage"])
@@ -113,22 +115,27 @@ async def admin_log_usage(request: UsageLogRequest):
 
     This endpoint is called by services (TTS, STT, LLM) to track usage.
     No authentication required for internal service calls.
+    The event is buffered and written in the next batch (id is null in the response).
     """
     if request.service_type not in ("tts", "stt", "llm"):
         raise HTTPException(status_code=400, detail="Invalid service_type. Must be: tts, stt, llm")
 
-    async with AsyncSessionLocal() as session:
-        repo = UsageRepository(session)
-        log = await repo.log_usage(
-            service_type=request.service_type,
-            action=request.action,
-            units_consumed=request.units_consumed,
-            source=request.source,
-            source_id=request.source_id,
-            cost_usd=request.cost_usd,
-            details=request.details,
-        )
-        return {"log": log}
+    log = await usage_sink.log(
+        service_type=request.service_type,
+        action=request.action,
+        units_consumed=request.units_consumed,
+        source=request.source,
+        source_id=request.source_id,
+        cost_usd=request.cost_usd,
+        details=request.details,
+    )
+    return {"log": log}
+
+
+@router.get("/sink")
+async def admin_get_usage_sink_stats(user: User = Depends(get_current_user)):
+    """Get write-behind usage sink metrics (queue depth, backpressure, flushes)."""
+    return {"sink": usage_sink.get_stats()}
 
 
 @router.post("/cleanup")
@@ -200,7 +207,8 @@ async def admin_set_limit(
             hard_limit=request.hard_limit,
             warning_threshold=request.warning_threshold,
         )
-        return {"limit": limit}
+    usage_quota.invalidate_limits()
+    return {"limit": limit}
 
 
 @router.delete("/limits/{service_type}/{limit_type}")
@@ -213,9 +221,10 @@ async def admin_delete_limit(
     async with AsyncSessionLocal() as session:
         repo = UsageLimitsRepository(session)
         deleted = await repo.delete_limit(service_type, limit_type)
-        if not deleted:
-            raise HTTPException(status_code=404, detail="Limit not found")
-        return {"status": "ok"}
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Limit not found")
+    usage_quota.invalidate_limits()
+    return {"status": "ok"}
 
 
 # =============================================================================
@@ -237,6 +246,10 @@ async def admin_check_usage(
     if service_type not in ("tts", "stt", "llm"):
         raise HTTPException(status_code=400, detail="Invalid service_type")
 
+    # Daily/monthly: live counters and cached limits, no database round trip
+    if limit_type in PERIODS:
+        return await usage_quota.check(service_type, limit_type)
+
     async with AsyncSessionLocal() as session:
         usage_repo = UsageRepository(session)
         limits_repo = UsageLimitsRepository(session)
@@ -264,33 +277,29 @@ async def admin_get_usage_summary(
 
     Includes current usage vs limits for quick dashboard display.
     """
-    async with AsyncSessionLocal() as session:
-        usage_repo = UsageRepository(session)
-        limits_repo = UsageLimitsRepository(session)
+    summary = {}
+    for service in ("tts", "stt", "llm"):
+        daily_usage = await usage_quota.usage(service, "daily")
+        monthly_usage = await usage_quota.usage(service, "monthly")
+
+        daily_limit = await usage_quota.get_limit(service, "daily")
+        monthly_limit = await usage_quota.get_limit(service, "monthly")
+
+        summary[service] = {
+            "daily": {
+                "used": daily_usage,
+                "limit": daily_limit["limit_value"] if daily_limit else None,
+                "percent": round(daily_usage / daily_limit["limit_value"] * 100, 1)
+                if daily_limit and daily_limit["limit_value"] > 0
+                else 0,
+            },
+            "monthly": {
+                "used": monthly_usage,
+                "limit": monthly_limit["limit_value"] if monthly_limit else None,
+                "percent": round(monthly_usage / monthly_limit["limit_value"] * 100, 1)
+                if monthly_limit and monthly_limit["limit_value"] > 0
+                else 0,
+            },
+        }
 
-        summary = {}
-        for service in ("tts", "stt", "llm"):
-            daily_usage = await usage_repo.get_period_usage(service, "daily")
-            monthly_usage = await usage_repo.get_period_usage(service, "monthly")
-
-            daily_limit = await limits_repo.get_limit(service, "daily")
-            monthly_limit = await limits_repo.get_limit(service, "monthly")
-
-            summary[service] = {
-                "daily": {
-                    "used": daily_usage,
-                    "limit": daily_limit["limit_value"] if daily_limit else None,
-                    "percent": round(daily_usage / daily_limit["limit_value"] * 100, 1)
-                    if daily_limit and daily_limit["limit_value"] > 0
-                    else 0,
-                },
-                "monthly": {
-                    "used": monthly_usage,
-                    "limit": monthly_limit["limit_value"] if monthly_limit else None,
-                    "percent": round(monthly_usage / monthly_limit["limit_value"] * 100, 1)
-                    if monthly_limit and monthly_limit["limit_value"] > 0
-                    else 0,
-                },
-            }
-
-        return {"summary": summary}
+    return {"summary": summary}
@@ -1,6 +1,7 @@
 # app/routers/wiki_rag.py
 """Wiki RAG management router — stats, search, knowledge base CRUD."""
 
+import asyncio
 import logging
 from pathlib import Path
 
@@ -118,7 +119,7 @@ async def wiki_rag_reload(user: User = Depends(require_not_guest)):
     if not wiki_rag:
         raise HTTPException(status_code=503, detail="Wiki RAG сервис не инициализирован")
 
-    result = wiki_rag.reload(WIKI_DIR)
+    result = await asyncio.to_thread(wiki_rag.reload, WIKI_DIR)
 
     await async_audit_logger.log(
         action="reload",
@@ -137,7 +138,7 @@ async def wiki_rag_reindex_embeddings(user: User = Depends(require_not_guest)):
     if not wiki_rag:
         raise HTTPException(status_code=503, detail="Wiki RAG сервис не инициализирован")
 
-    result = wiki_rag.reindex_embeddings()
+    result = await asyncio.to_thread(wiki_rag.reindex_embeddings)
 
     await async_audit_logger.log(
         action="reindex_embeddings",
@@ -159,7 +160,7 @@ async def wiki_rag_search(
     if not wiki_rag:
         return {"results": [], "query": request.query}
 
-    results = wiki_rag.search(request.query, top_k=request.top_k)
+    results = await wiki_rag.asearch(request.query, top_k=request.top_k)
     return {"results": results, "query": request.query}
 
 
@@ -224,10 +225,10 @@ async def upload_document(
         owner_id=owner_id,
     )
 
-    # Re-index
+    # Index only the new document
     wiki_rag = _get_wiki_rag()
     if wiki_rag:
-        wiki_rag.reload(WIKI_DIR)
+        await wiki_rag.aindex_file(target)
 
     await async_audit_logger.log(
         action="upload",
@@ -286,10 +287,10 @@ async def update_document(
             section_count=sections,
         )
 
-        # Re-index after content change
+        # Re-index this document after content change
         wiki_rag = _get_wiki_rag()
         if wiki_rag:
-            wiki_rag.reload(WIKI_DIR)
+            await wiki_rag.aindex_file(file_path)
     elif request.title is not None:
         await async_knowledge_doc_manager.update(doc_id, title=request.title)
 
@@ -307,7 +308,7 @@ async def update_document(
 
 @router.delete("/documents/{doc_id}")
 async def delete_document(doc_id: int, user: User = Depends(require_not_guest)):
-    """Delete document from disk and DB, re-index."""
+    """Delete document from disk and DB, drop it from the index."""
     doc = await async_knowledge_doc_manager.get_by_id(doc_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Документ не найден")
@@ -320,10 +321,10 @@ async def delete_document(doc_id: int, user: User = Depends(require_not_guest)):
     # Delete DB record
     await async_knowledge_doc_manager.delete(doc_id)
 
-    # Re-index
+    # Drop the document from the index
     wiki_rag = _get_wiki_rag()
     if wiki_rag:
-        wiki_rag.reload(WIKI_DIR)
+        await wiki_rag.aremove_file(doc["filename"])
 
     await async_audit_logger.log(
         action="delete",
@@ -9,6 +9,99 @@ from typing import Generator, Optional
 
 import numpy as np
 
+from app.services import g711_codec
+
+
+class StreamingDecimator:
+    """
+    Потоковый ресэмплер с целым коэффициентом децимации (24kHz → 8kHz = 3:1).
+
+    FIR фильтр нижних частот (windowed sinc, окно Кайзера) в полифазной
+    форме: считаются только выходные отсчёты (каждый factor-й), а хвост входа
+    (taps - 1 отсчётов) и фаза децимации переносятся между чанками. Поэтому
+    результат по чанкам совпадает с обработкой всего сигнала целиком — без
+    щелчков на границах чанков и без FFT на каждый чанк.
+    """
+
+    def __init__(
+        self,
+        source_rate: int = 24000,
+        target_rate: int = 8000,
+        taps_per_phase: int = 32,
+        cutoff: float = 0.9,
+        kaiser_beta: float = 8.0,
+    ):
+        """
+        Args:
+            source_rate: исходная частота
+            target_rate: целевая частота (source_rate должна делиться на неё нацело)
+            taps_per_phase: длина фильтра на одну фазу (всего factor * taps_per_phase)
+            cutoff: частота среза относительно новой частоты Найквиста
+            kaiser_beta: параметр окна Кайзера (подавление в полосе задерживания)
+        """
+        if source_rate % target_rate:
+            raise ValueError(f"{source_rate} Hz не делится нацело на {target_rate} Hz")
+
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.factor = source_rate // target_rate
+
+        taps = self.factor * taps_per_phase
+        n = np.arange(taps) - (taps - 1) / 2
+        fc = cutoff / self.factor  # относительно исходной частоты Найквиста
+        h = fc * np.sinc(fc * n) * np.kaiser(taps, kaiser_beta)
+        # Развёрнутый фильтр (выход = окно входа · _kernel), разложенный на фазы
+        self._kernel = (h / h.sum())[::-1].astype(np.float32)
+        self._phases = [self._kernel[r :: self.factor].copy() for r in range(self.factor)]
+        self.taps = taps
+
+        self.reset()
+
+    @property
+    def delay(self) -> float:
+        """Групповая задержка фильтра в выходных отсчётах"""
+        return (self.taps - 1) / 2 / self.factor
+
+    def reset(self):
+        """Сброс состояния фильтра."""
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._phase = 0  # индекс первого окна в следующем чанке, дающего выходной отсчёт
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Децимирует очередной чанк.
+
+        Args:
+            audio: float32 чанк на source_rate
+
+        Returns:
+            float32 отсчёты на target_rate (≈ len(audio) / factor)
+        """
+        audio = np.asarray(audio, dtype=np.float32)
+        if audio.size == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        buf = np.concatenate([self._history, audio])
+        phase = self._phase
+
+        # Выходной отсчёт m — окно buf[phase + factor*m : ... + taps]; по фазам
+        # r это корреляция прореженного входа buf[phase + r :: factor] с
+        # прореженным фильтром _kernel[r :: factor]
+        count = len(range(phase, len(buf) - self.taps + 1, self.factor))
+        out = np.zeros(count, dtype=np.float32)
+        for r, kernel in enumerate(self._phases):
+            out += np.correlate(buf[phase + r :: self.factor], kernel, "valid")[:count]
+
+        self._phase = (self._phase - len(audio)) % self.factor
+        self._history = buf[len(buf) - (self.taps - 1) :]
+        return out
+
+    def flush(self) -> np.ndarray:
+        """Выталкивает хвост фильтра (задержку) в конце потока."""
+        tail = self.process(np.zeros(self.taps - 1, dtype=np.float32))
+        self.reset()
+        return tail[: int(np.ceil(self.delay))]
+
 
 class TelephonyAudioPipeline:
     """
@@ -44,8 +137,35 @@ class TelephonyAudioPipeline:
         self.target_rate = target_sample_rate
         self.frame_samples = int(target_sample_rate * frame_duration_ms / 1000)
 
-        # Буфер для накопления неполных фреймов
-        self._buffer = np.array([], dtype=np.float32)
+        # Кольцевой буфер для накопления неполных фреймов (без realloc на фрейм)
+        self._ring = StreamingAudioBuffer(max_duration_ms=500, sample_rate=target_sample_rate)
+        self._frame = np.zeros(self.frame_samples, dtype=np.float32)
+        self._scratch = np.zeros(self._ring.max_samples, dtype=np.float32)
+
+        # Потоковый ресэмплер (состояние фильтра между чанками)
+        self._resampler: Optional[StreamingDecimator] = None
+
+    def _get_resampler(self, source_rate: int) -> Optional[StreamingDecimator]:
+        """Потоковый ресэмплер для source_rate, если коэффициент целый"""
+        if source_rate % self.target_rate:
+            return None
+        if self._resampler is None or self._resampler.source_rate != source_rate:
+            self._resampler = StreamingDecimator(source_rate, self.target_rate)
+        return self._resampler
+
+    def resample_stream(self, audio: np.ndarray, source_rate: int) -> np.ndarray:
+        """
+        Resample очередного чанка потока с сохранением состояния фильтра.
+
+        Для целых коэффициентов (24k→8k, 16k→8k) — полифазный FIR без
+        артефактов на границах чанков, иначе — resample() по чанку.
+        """
+        if source_rate == self.target_rate:
+            return audio
+        resampler = self._get_resampler(source_rate)
+        if resampler is None:
+            return self.resample(audio, source_rate)
+        return resampler.process(audio)
 
     def resample(self, audio: np.ndarray, source_rate: int) -> np.ndarray:
         """
@@ -119,7 +239,7 @@ class TelephonyAudioPipeline:
         Args:
             audio: float32 аудио
             source_rate: исходная частота
-            output_format: "pcm16" или "float32"
+            output_format: "pcm16", "float32", "alaw" или "ulaw"
 
         Returns:
             bytes готовые для отправки
@@ -128,11 +248,21 @@ class TelephonyAudioPipeline:
         if source_rate != self.target_rate:
             audio = self.resample(audio, source_rate)
 
-        # Конвертируем в нужный формат
+        return self.encode_frame(audio, output_format)
+
+    def encode_frame(self, audio: np.ndarray, output_format: str = "pcm16") -> bytes:
+        """
+        Кодирует float32 аудио в выходной формат.
+
+        Args:
+            audio: float32 аудио
+            output_format: "pcm16", "float32", "alaw" или "ulaw" (G.711)
+        """
         if output_format == "pcm16":
             return self.float_to_pcm16(audio)
-        else:
-            return audio.tobytes()
+        if output_format in g711_codec.CODECS:
+            return g711_codec.encode(audio, output_format).tobytes()
+        return audio.tobytes()
 
     def generate_gsm_frames(
         self,
@@ -147,40 +277,53 @@ class TelephonyAudioPipeline:
 
         Args:
             audio_chunks: генератор (audio, sample_rate) от XTTS
-            output_format: "pcm16" или "float32"
+            output_format: "pcm16", "float32", "alaw" или "ulaw" (G.711)
 
         Yields:
-            bytes фреймы по 320 байт (160 samples * 2 bytes)
+            bytes фреймы по 320 байт (160 samples * 2 bytes), для G.711 — 160 байт
         """
+        # Поток начинается с чистого буфера и фильтра: остатки прерванного
+        # предыдущего потока не должны попасть в этот
+        self.reset()
+        used_resampler = False
+
         for audio_chunk, source_rate in audio_chunks:
-            # Resample к 8kHz
+            # Resample к 8kHz (состояние фильтра переносится между чанками)
             if source_rate != self.target_rate:
-                audio_chunk = self.resample(audio_chunk, source_rate)
+                audio_chunk = self.resample_stream(audio_chunk, source_rate)
+                used_resampler = used_resampler or self._get_resampler(source_rate) is not None
 
-            # Добавляем в буфер
-            self._buffer = np.concatenate([self._buffer, audio_chunk])
+            yield from self._emit_frames(audio_chunk, output_format)
 
-            # Выдаём полные фреймы
-            while len(self._buffer) >= self.frame_samples:
-                frame = self._buffer[: self.frame_samples]
-                self._buffer = self._buffer[self.frame_samples :]
-
-                if output_format == "pcm16":
-                    yield self.float_to_pcm16(frame)
-                else:
-                    yield frame.tobytes()
+        # Хвост ресэмплера (задержка фильтра) — только если поток шёл через него
+        if used_resampler:
+            yield from self._emit_frames(self._resampler.flush(), output_format)
 
         # Выдаём последний неполный фрейм с padding
-        if len(self._buffer) > 0:
-            # Pad до полного фрейма
-            padding = np.zeros(self.frame_samples - len(self._buffer), dtype=np.float32)
-            frame = np.concatenate([self._buffer, padding])
-            self._buffer = np.array([], dtype=np.float32)
+        available = self._ring.available_samples
+        if available > 0:
+            self._frame[available:] = 0.0
+            self._ring.read(available, out=self._frame[:available])
+            yield self.encode_frame(self._frame, output_format)
 
-            if output_format == "pcm16":
-                yield self.float_to_pcm16(frame)
-            else:
-                yield frame.tobytes()
+    def _emit_frames(self, audio: np.ndarray, output_format: str) -> Generator[bytes, None, None]:
+        """
+        Пишет аудио в кольцевой буфер и выдаёт все полные фреймы.
+        Полные фреймы читаются и кодируются одним блоком, затем режутся на фреймы.
+        """
+        written = 0
+        while written < len(audio):
+            written += self._ring.write(audio[written:])
+            frames = self._ring.available_samples // self.frame_samples
+            if not frames:
+                continue
+            block = self._ring.read(
+                frames * self.frame_samples, out=self._scratch[: frames * self.frame_samples]
+            )
+            data = self.encode_frame(block, output_format)
+            frame_bytes = len(data) // frames
+            for i in range(frames):
+                yield data[i * frame_bytes : (i + 1) * frame_bytes]
 
     def encode_g711_alaw(self, audio: np.ndarray) -> bytes:
         """
@@ -195,36 +338,25 @@ class TelephonyAudioPipeline:
         Returns:
             bytes в формате A-law (1 byte per sample)
         """
-        # Сначала в int16
-        audio_int16 = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+        return g711_codec.encode(audio, "alaw").tobytes()
 
-        # A-law lookup table
-        def alaw_encode_sample(sample: int) -> int:
-            """Encode single sample to A-law"""
-            sign = 0x80 if sample >= 0 else 0x00
-            sample = min(abs(sample), 32635)
-
-            if sample < 256:
-                encoded = sample >> 4
-            else:
-                # Найти сегмент
-                segment = 1
-                tmp = sample >> 8
-                while tmp > 0:
-                    segment += 1
-                    tmp >>= 1
-
-                encoded = (segment << 4) | ((sample >> (segment + 3)) & 0x0F)
+    def encode_g711_ulaw(self, audio: np.ndarray) -> bytes:
+        """
+        Кодирование в G.711 µ-law (Северная Америка, Япония).
 
-            return (encoded | sign) ^ 0x55
+        Args:
+            audio: float32 массив
 
-        # Кодируем все samples
-        encoded = bytes([alaw_encode_sample(s) for s in audio_int16])
-        return encoded
+        Returns:
+            bytes в формате µ-law (1 byte per sample)
+        """
+        return g711_codec.encode(audio, "ulaw").tobytes()
 
     def reset(self):
-        """Сброс внутреннего буфера."""
-        self._buffer = np.array([], dtype=np.float32)
+        """Сброс внутреннего буфера и состояния ресэмплера."""
+        self._ring.clear()
+        if self._resampler is not None:
+            self._resampler.reset()
 
 
 class StreamingAudioBuffer:
@@ -275,12 +407,13 @@ class StreamingAudioBuffer:
         self._available += samples_to_write
         return samples_to_write
 
-    def read(self, num_samples: int) -> Optional[np.ndarray]:
+    def read(self, num_samples: int, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
         """
         Прочитать аудио из буфера.
 
         Args:
             num_samples: количество samples для чтения
+            out: готовый float32 массив длины num_samples (без выделения памяти)
 
         Returns:
             float32 массив или None если недостаточно данных
@@ -288,7 +421,7 @@ class StreamingAudioBuffer:
         if self._available < num_samples:
             return None
 
-        result = np.zeros(num_samples, dtype=np.float32)
+        result = np.zeros(num_samples, dtype=np.float32) if out is None else out
         end_pos = (self._read_pos + num_samples) % self.max_samples
 
         if end_pos > self._read_pos:
@@ -0,0 +1,160 @@
+# app/services/g711_codec.py
+"""
+G.711 кодек (A-law / µ-law) на таблицах NumPy для телефонного тракта.
+
+Кодирование — один np.take по таблице на 65536 значений int16, декодирование —
+по таблице на 256 кодов. Таблицы строятся один раз при импорте по эталонному
+алгоритму ITU-T G.711 (Sun g711.c, он же audioop.lin2alaw/lin2ulaw), так что
+результат побитово совпадает с эталоном.
+
+Вход: int16 ndarray, bytes/bytearray/memoryview с PCM16 (без копирования —
+np.frombuffer + view) или float32 [-1, 1]. Выход можно писать в готовый буфер
+через out=.
+"""
+
+from typing import Optional, Union
+
+import numpy as np
+
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+CODECS = ("alaw", "ulaw")
+
+# Верхние границы сегментов (Sun g711.c)
+_SEG_AEND = np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF], dtype=np.int32)
+_SEG_UEND = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF], dtype=np.int32)
+
+_ULAW_BIAS = 0x84
+_ULAW_CLIP = 8159
+
+
+def _build_alaw_encode_table() -> np.ndarray:
+    """Таблица int16 -> A-law, индекс — int16 как uint16"""
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32)
+    pcm_val = pcm >> 3
+    mask = np.where(pcm_val >= 0, 0xD5, 0x55)
+    pcm_val = np.where(pcm_val >= 0, pcm_val, -pcm_val - 1)
+
+    seg = np.searchsorted(_SEG_AEND, pcm_val, side="left")
+    shift = np.where(seg < 2, 1, seg)
+    aval = (np.minimum(seg, 7) << 4) | ((pcm_val >> shift) & 0x0F)
+    aval = np.where(seg >= 8, 0x7F, aval)
+    return (aval ^ mask).astype(np.uint8)
+
+
+def _build_ulaw_encode_table() -> np.ndarray:
+    """Таблица int16 -> µ-law, индекс — int16 как uint16"""
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32)
+    pcm_val = pcm >> 2
+    mask = np.where(pcm_val < 0, 0x7F, 0xFF)
+    pcm_val = np.minimum(np.abs(pcm_val), _ULAW_CLIP) + (_ULAW_BIAS >> 2)
+
+    seg = np.searchsorted(_SEG_UEND, pcm_val, side="left")
+    uval = (np.minimum(seg, 7) << 4) | ((pcm_val >> (np.minimum(seg, 7) + 1)) & 0x0F)
+    uval = np.where(seg >= 8, 0x7F, uval)
+    return (uval ^ mask).astype(np.uint8)
+
+
+def _build_alaw_decode_table() -> np.ndarray:
+    """Таблица A-law -> int16 (256 кодов)"""
+    a_val = np.arange(256, dtype=np.int32) ^ 0x55
+    t = (a_val & 0x0F) << 4
+    seg = (a_val & 0x70) >> 4
+    t = np.where(seg == 0, t + 8, (t + 0x108) << np.maximum(seg - 1, 0))
+    return np.where(a_val & 0x80, t, -t).astype(np.int16)
+
+
+def _build_ulaw_decode_table() -> np.ndarray:
+    """Таблица µ-law -> int16 (256 кодов)"""
+    u_val = ~np.arange(256, dtype=np.int32) & 0xFF
+    t = (((u_val & 0x0F) << 3) + _ULAW_BIAS) << ((u_val & 0x70) >> 4)
+    return np.where(u_val & 0x80, _ULAW_BIAS - t, t - _ULAW_BIAS).astype(np.int16)
+
+
+_ALAW_ENCODE = _build_alaw_encode_table()
+_ULAW_ENCODE = _build_ulaw_encode_table()
+_ALAW_DECODE = _build_alaw_decode_table()
+_ULAW_DECODE = _build_ulaw_decode_table()
+
+_ENCODE_TABLES = {"alaw": _ALAW_ENCODE, "ulaw": _ULAW_ENCODE}
+_DECODE_TABLES = {"alaw": _ALAW_DECODE, "ulaw": _ULAW_DECODE}
+
+
+def as_pcm16(samples: Union[np.ndarray, BytesLike]) -> np.ndarray:
+    """
+    Приводит вход к int16 ndarray.
+
+    bytes-подобные и int16 массивы — без копирования (view); float —
+    клиппинг [-1, 1] и масштаб 32767, как в TelephonyAudioPipeline.float_to_pcm16.
+    """
+    if isinstance(samples, (bytes, bytearray, memoryview)):
+        return np.frombuffer(samples, dtype=np.int16)
+    samples = np.asarray(samples)
+    if samples.dtype == np.int16:
+        return samples
+    if samples.dtype.kind == "f":
+        return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    return samples.astype(np.int16)
+
+
+def _codec_table(tables: dict, codec: str) -> np.ndarray:
+    try:
+        return tables[codec]
+    except KeyError:
+        raise ValueError(f"Неизвестный кодек: {codec}. Доступны: {', '.join(CODECS)}")
+
+
+def encode(
+    samples: Union[np.ndarray, BytesLike], codec: str = "alaw", out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    PCM16 / float32 -> G.711 коды (uint8, 1 байт на сэмпл).
+
+    Args:
+        samples: int16 / float32 массив или PCM16 bytes
+        codec: "alaw" или "ulaw"
+        out: готовый uint8 буфер той же длины (без выделения памяти)
+    """
+    table = _codec_table(_ENCODE_TABLES, codec)
+    pcm = as_pcm16(samples)
+    return np.take(table, pcm.view(np.uint16), out=out)
+
+
+def decode(
+    data: Union[np.ndarray, BytesLike], codec: str = "alaw", out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    G.711 коды -> int16 PCM.
+
+    Args:
+        data: uint8 массив или bytes с кодами
+        codec: "alaw" или "ulaw"
+        out: готовый int16 буфер той же длины
+    """
+    table = _codec_table(_DECODE_TABLES, codec)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        codes = np.frombuffer(data, dtype=np.uint8)
+    else:
+        codes = np.asarray(data).view(np.uint8)
+    return np.take(table, codes, out=out)
+
+
+def lin2alaw(samples: Union[np.ndarray, BytesLike]) -> bytes:
+    """PCM16 -> A-law bytes"""
+    return encode(samples, "alaw").tobytes()
+
+
+def alaw2lin(data: Union[np.ndarray, BytesLike]) -> bytes:
+    """A-law -> PCM16 bytes"""
+    return decode(data, "alaw").tobytes()
+
+
+def lin2ulaw(samples: Union[np.ndarray, BytesLike]) -> bytes:
+    """PCM16 -> µ-law bytes"""
+    return encode(samples, "ulaw").tobytes()
+
+
+def ulaw2lin(data: Union[np.ndarray, BytesLike]) -> bytes:
+    """µ-law -> PCM16 bytes"""
+    return decode(data, "ulaw").tobytes()
@@ -0,0 +1,148 @@
+"""
+Query embedding cache for Wiki RAG.
+
+Two tiers in front of the embedding provider:
+1. bounded in-memory LRU (OrderedDict);
+2. persistent SQLite table (data/wiki_query_embeddings.db), survives restarts.
+
+Keys are (provider, model, normalized query), so switching the provider or
+model never returns a vector from a different embedding space. Vectors are
+stored as float32 blobs. Thread-safe: used from worker threads.
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: lowercase, collapsed whitespace."""
+    return " ".join(query.lower().split())
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU + SQLite cache of query embeddings."""
+
+    def __init__(
+        self,
+        path: Optional[Path] = Path("data/wiki_query_embeddings.db"),
+        max_memory: int = 2048,
+        max_rows: int = 100_000,
+    ):
+        self.max_memory = max_memory
+        self.max_rows = max_rows
+        self._memory: OrderedDict[tuple[str, str, str], np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._inserts = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(str(path), check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    "provider TEXT NOT NULL, model TEXT NOT NULL, query TEXT NOT NULL, "
+                    "vector BLOB NOT NULL, created_at REAL NOT NULL, "
+                    "PRIMARY KEY (provider, model, query))"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Wiki RAG: кэш эмбеддингов запросов только в памяти: {e}")
+                self._db = None
+
+    def get(self, provider: str, model: str, query: str) -> Optional[np.ndarray]:
+        """Memory, then SQLite lookup. Disk hits are promoted to memory."""
+        key = (provider, model, normalize_query(query))
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT vector FROM query_embeddings "
+                        "WHERE provider=? AND model=? AND query=?",
+                        key,
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"Wiki RAG: ошибка чтения кэша эмбеддингов запросов: {e}")
+                    row = None
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+            self.misses += 1
+        return None
+
+    def put(self, provider: str, model: str, query: str, vector) -> np.ndarray:
+        """Store a vector in both tiers. Returns it as float32 ndarray."""
+        key = (provider, model, normalize_query(query))
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is None:
+                return vector
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?, ?)",
+                    (*key, vector.tobytes(), time.time()),
+                )
+                self._inserts += 1
+                if self._inserts % 256 == 0:
+                    self._prune()
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Wiki RAG: ошибка записи кэша эмбеддингов запросов: {e}")
+        return vector
+
+    def _remember(self, key: tuple[str, str, str], vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def _prune(self) -> None:
+        """Keep the newest max_rows rows on disk."""
+        self._db.execute(
+            "DELETE FROM query_embeddings WHERE rowid NOT IN ("
+            "SELECT rowid FROM query_embeddings ORDER BY created_at DESC LIMIT ?)",
+            (self.max_rows,),
+        )
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            disk_rows = None
+            if self._db is not None:
+                disk_rows = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+            return {
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_rows,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,594 @@
+"""
+Vector index for Wiki RAG embeddings.
+
+Rows are L2-normalized float32 vectors in one matrix, so cosine similarity is
+a single matmul and top-k is an argpartition over the scores.
+
+Persistence: `<name>.npy` (the matrix, memory-mapped copy-on-write on load)
+plus a JSON manifest (ids, content hashes, provider/model, partition layout)
+and a manifest journal. A save writes only what changed: rewritten rows go into
+the existing .npy in place, new rows are appended (the file grows in chunks),
+removed rows stay as tombstones, and the id/hash changes are appended to the
+journal. The matrix and manifest are rewritten only after compaction or a
+partition rebuild, and the journal is folded into the manifest once it covers
+10% of the rows, so saving after a small change costs O(change), not O(corpus).
+
+Search is exact by default. The coarse partition is opt-in (ivf_min_rows):
+indexes at least that large are k-means clustered and stored cluster by
+cluster, and a query scans only the nprobe nearest clusters (contiguous
+slices, no gathers) plus the rows added or rewritten since the partition was
+built. This trades recall for latency: on embeddings that form topics recall
+stays close to exact, on embeddings without cluster structure most true
+neighbours fall outside the probed clusters. After each build, recall@k is
+measured on sampled rows against exact search; a partition below min_recall
+is discarded and search stays exact.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import logging
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+# Manifest fields written by VectorIndex itself; the rest is caller meta
+_MANIFEST_KEYS = frozenset(
+    ("version", "generation", "dim", "count", "ids", "hashes", "ivf_end", "offsets", "rewritten")
+)
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class VectorIndex:
+    """Pre-normalized float32 matrix with id → row mapping and top-k search."""
+
+    def __init__(
+        self,
+        dim: int = 0,
+        nprobe: int = 8,
+        ivf_min_rows: Optional[int] = None,
+        min_recall: float = 0.95,
+    ):
+        """
+        Args:
+            dim: Vector dimension (0 = taken from the first upsert)
+            nprobe: Clusters scanned per query when partitioned
+            ivf_min_rows: Partition indexes with at least this many rows
+                (None or 0 = always exact search)
+            min_recall: Minimum measured recall@10 for a partition to be kept
+        """
+        self.dim = dim
+        self.nprobe = nprobe
+        self.ivf_min_rows = ivf_min_rows or 0
+        self.min_recall = min_recall
+        self.partition_recall: Optional[float] = None  # measured at the last build
+        self._rejected_rows = 0  # size at which a partition was last discarded
+        self.clear()
+
+    def clear(self) -> None:
+        """Drop all rows and the partition."""
+        self._data = np.zeros((0, self.dim), dtype=np.float32)
+        self._size = 0
+        self._ids: list[Optional[str]] = []  # None = removed row (tombstone)
+        self._hashes: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._tombstones = 0
+
+        # Coarse partition: rows [0, _ivf_end) are ordered by cluster
+        self._centroids: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+        self._ivf_end = 0
+        self._rewritten: set[int] = set()  # rows inside the ordered region changed since build
+
+        # Persistence bookkeeping
+        self._dirty_rows: set[int] = set()  # saved rows whose vector changed
+        self._changed_rows: set[int] = set()  # saved rows whose id/hash changed
+        self._saved_size = 0  # rows in the .npy/manifest as of the last save
+        self._journal_rows = 0  # row entries in the manifest journal
+        self._generation = ""  # ties journal lines to the manifest they extend
+        self._meta: dict = {}
+        self._layout_changed = True
+
+    def __len__(self) -> int:
+        return self._size - self._tombstones
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._rows
+
+    def content_hash(self, item_id: str) -> Optional[str]:
+        """Hash of the content the row was embedded from (None if absent)."""
+        row = self._rows.get(item_id)
+        return self._hashes[row] if row is not None else None
+
+    def ids(self) -> list[str]:
+        return [i for i in self._ids[: self._size] if i is not None]
+
+    def vectors(self) -> np.ndarray:
+        """Normalized rows in ids() order."""
+        return np.asarray(self._data[: self._size][self._alive[: self._size]])
+
+    # ---- Mutation ----
+
+    def _reserve(self, rows: int) -> None:
+        """Grow capacity (amortized doubling); a loaded memmap is copied into RAM here."""
+        if rows <= len(self._data):
+            return
+        capacity = max(rows, 2 * len(self._data), 64)
+        data = np.zeros((capacity, self.dim), dtype=np.float32)
+        data[: self._size] = self._data[: self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self._size] = self._alive[: self._size]
+        self._data, self._alive = data, alive
+
+    def upsert(self, ids: list[str], vectors, hashes: Optional[list[str]] = None) -> None:
+        """Insert or replace rows. Replaced rows are updated in place."""
+        if not ids:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or len(matrix) != len(ids):
+            raise ValueError("vectors must be a 2-D array with one row per id")
+        if self.dim == 0:
+            self.dim = matrix.shape[1]
+            self._data = np.zeros((0, self.dim), dtype=np.float32)
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"dimension mismatch: index={self.dim}, vectors={matrix.shape[1]}")
+
+        matrix = _normalize_rows(matrix)
+        hashes = hashes or [""] * len(ids)
+        new = [i for i, item_id in enumerate(ids) if item_id not in self._rows]
+        self._reserve(self._size + len(new))
+
+        for i, item_id in enumerate(ids):
+            row = self._rows.get(item_id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._ids.append(item_id)
+                self._hashes.append(hashes[i])
+                self._rows[item_id] = row
+            else:
+                self._hashes[row] = hashes[i]
+                self._dirty_rows.add(row)
+                self._changed_rows.add(row)
+                if row < self._ivf_end:
+                    self._rewritten.add(row)
+            self._data[row] = matrix[i]
+            self._alive[row] = True
+
+    def remove(self, ids) -> int:
+        """Remove rows by id (tombstoned until compaction). Returns count removed."""
+        removed = 0
+        for item_id in ids:
+            row = self._rows.pop(item_id, None)
+            if row is None:
+                continue
+            self._ids[row] = None
+            self._alive[row] = False
+            self._tombstones += 1
+            self._changed_rows.add(row)
+            removed += 1
+        return removed
+
+    def retain(self, ids) -> int:
+        """Remove every row whose id is not in ids. Returns count removed."""
+        keep = set(ids)
+        return self.remove([i for i in self._rows if i not in keep])
+
+    def optimize(self) -> None:
+        """
+        Compact tombstones and (re)build the partition when it is missing or
+        too many rows are outside it. Call after a batch of changes.
+        """
+        pending = (self._size - self._ivf_end) + len(self._rewritten)
+        needs_ivf = (
+            self.partition_enabled
+            and len(self) >= self.ivf_min_rows
+            # A discarded partition is retried once the index has doubled
+            and len(self) >= 2 * self._rejected_rows
+            and (self._centroids is None or pending > 0.1 * len(self))
+        )
+        if needs_ivf:
+            self._build_partition()
+            self.partition_recall = self._measure_recall()
+            if self.partition_recall < self.min_recall:
+                logger.warning(
+                    f"⚠️ VectorIndex: partition recall@10 {self.partition_recall:.3f} < "
+                    f"{self.min_recall}, using exact search"
+                )
+                self._rejected_rows = len(self)
+                self._drop_partition()
+        elif self._tombstones > 0.1 * max(self._size, 1):
+            self._compact()
+        if self._centroids is not None and (
+            not self.partition_enabled or len(self) < self.ivf_min_rows
+        ):
+            self._drop_partition()
+
+    @property
+    def partition_enabled(self) -> bool:
+        return self.ivf_min_rows > 0
+
+    @property
+    def partitioned(self) -> bool:
+        """True when searches scan only the probed clusters."""
+        return self._centroids is not None
+
+    def _drop_partition(self) -> None:
+        self._centroids = None
+        self._offsets = None
+        self._ivf_end = 0
+        self._rewritten.clear()
+        self._layout_changed = True
+
+    def _reorder(self, order: np.ndarray) -> None:
+        """Keep only rows in `order`, in that order."""
+        self._data = np.ascontiguousarray(self._data[order])
+        self._alive = np.ones(len(order), dtype=bool)
+        self._ids = [self._ids[r] for r in order]
+        self._hashes = [self._hashes[r] for r in order]
+        self._rows = {item_id: row for row, item_id in enumerate(self._ids)}
+        self._size = len(order)
+        self._tombstones = 0
+        self._dirty_rows.clear()
+        self._changed_rows.clear()
+        self._layout_changed = True
+
+    def _compact(self) -> None:
+        alive = np.flatnonzero(self._alive[: self._size])
+        if self._centroids is not None:
+            # Dropping rows keeps the cluster order; shift the slice boundaries
+            ordered = alive[alive < self._ivf_end]
+            removed_before = np.cumsum(~self._alive[: self._ivf_end])
+            bounds = np.minimum(self._offsets, self._ivf_end)
+            shift = np.concatenate([[0], removed_before])[bounds]
+            self._offsets = self._offsets - shift
+            self._ivf_end = len(ordered)
+            self._rewritten = {
+                r - int(removed_before[r - 1] if r else 0)
+                for r in self._rewritten
+                if self._alive[r]
+            }
+        self._reorder(alive)
+
+    def _build_partition(self, iterations: int = 8, seed: int = 0) -> None:
+        """Spherical k-means over alive rows; rows are then stored cluster by cluster."""
+        alive = np.flatnonzero(self._alive[: self._size])
+        vectors = self._data[alive]
+        nlist = max(16, int(np.sqrt(len(alive))))
+
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(vectors), min(len(vectors), 32 * nlist), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = ~np.bincount(labels, minlength=nlist).astype(bool)
+            sums[empty] = centroids[empty]
+            centroids = _normalize_rows(sums)
+
+        # Assign every row in blocks (bounded temporary memory)
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), 8192):
+            block = vectors[start : start + 8192]
+            labels[start : start + 8192] = np.argmax(block @ centroids.T, axis=1)
+
+        order = np.argsort(labels, kind="stable")
+        self._reorder(alive[order])
+        self._centroids = centroids
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=nlist))])
+        self._ivf_end = self._size
+        self._rewritten.clear()
+        logger.info(f"🗂️ VectorIndex: partition built ({len(self)} rows, {nlist} clusters)")
+
+    def _measure_recall(self, samples: int = 64, k: int = 10, seed: int = 0) -> float:
+        """
+        Recall@k of partitioned vs exact search, with sampled rows as queries
+        (the query row itself is not counted as a neighbour).
+        """
+        rng = np.random.default_rng(seed)
+        queries = rng.choice(self._size, min(samples, self._size), replace=False)
+        k = min(k, self._size - 1)
+        if k <= 0:
+            return 1.0
+
+        hits = 0
+        for row in queries:
+            q = self._data[row]
+            scores = self._data[: self._size] @ q
+            scores[row] = -np.inf
+            expected = np.argpartition(-scores, k - 1)[:k]
+
+            rows, scores = self._search_partition(q)
+            scores = np.where(rows == row, -np.inf, scores)
+            top = min(k, len(scores))
+            found = rows[np.argpartition(-scores, top - 1)[:top]]
+            hits += len(np.intersect1d(expected, found))
+        return hits / (len(queries) * k)
+
+    # ---- Search ----
+
+    def search(
+        self, query, top_k: int = 3, min_score: Optional[float] = None
+    ) -> list[tuple[float, str]]:
+        """Top-k (cosine similarity, id) pairs, best first."""
+        if len(self) == 0 or top_k <= 0:
+            return []
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        if q.shape[0] != self.dim:
+            raise ValueError(f"query dimension {q.shape[0]} != index dimension {self.dim}")
+        norm = float(np.linalg.norm(q))
+        if norm == 0:
+            return []
+        q = q / norm
+
+        if self._centroids is None:
+            rows = None
+            scores = self._data[: self._size] @ q
+        else:
+            rows, scores = self._search_partition(q)
+
+        alive = self._alive[: self._size] if rows is None else self._alive[rows]
+        scores = np.where(alive, scores, -np.inf)
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        results = []
+        for i in top:
+            score = float(scores[i])
+            if score == -np.inf or (min_score is not None and score <= min_score):
+                break
+            row = int(i) if rows is None else int(rows[i])
+            results.append((score, self._ids[row]))
+        return results
+
+    def _search_partition(self, q: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        nprobe = min(self.nprobe, len(self._centroids))
+        probe = np.argpartition(-(self._centroids @ q), nprobe - 1)[:nprobe]
+
+        row_parts, score_parts = [], []
+        for c in probe:
+            start, end = int(self._offsets[c]), int(self._offsets[c + 1])
+            if end > start:
+                row_parts.append(np.arange(start, end))
+                score_parts.append(self._data[start:end] @ q)
+
+        # Rows added or rewritten since the partition was built: exact scan
+        extra = np.arange(self._ivf_end, self._size)
+        if self._rewritten:
+            extra = np.concatenate([np.fromiter(self._rewritten, dtype=np.int64), extra])
+        if len(extra):
+            row_parts.append(extra)
+            score_parts.append(self._data[extra] @ q)
+
+        rows = np.concatenate(row_parts)
+        scores = np.concatenate(score_parts)
+        if self._rewritten:
+            # A rewritten row can also sit in a probed slice; keep one copy
+            rows, first = np.unique(rows, return_index=True)
+            scores = scores[first]
+        return rows, scores
+
+    # ---- Persistence ----
+
+    @staticmethod
+    def manifest_path(path: Path) -> Path:
+        return path.with_suffix(".manifest.json")
+
+    @staticmethod
+    def centroids_path(path: Path) -> Path:
+        return path.with_suffix(".centroids.npy")
+
+    @staticmethod
+    def journal_path(path: Path) -> Path:
+        return path.with_suffix(".manifest.log")
+
+    def save(self, path: Path, meta: Optional[dict] = None) -> None:
+        """
+        Persist the index. After compaction or a partition rebuild the matrix
+        and manifest are rewritten; otherwise changed rows are written into
+        the existing .npy in place, new rows appended, and the id/hash changes
+        appended to the manifest journal.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = dict(meta or {})
+
+        full = (
+            self._layout_changed
+            or meta != self._meta
+            or not path.exists()
+            or not self.manifest_path(path).exists()
+            or not self._write_rows(path)
+        )
+        if full:
+            tmp = path.with_suffix(".tmp.npy")
+            np.save(tmp, np.ascontiguousarray(self._data[: self._size]))
+            tmp.replace(path)
+            centroids_file = self.centroids_path(path)
+            if self._centroids is not None:
+                np.save(centroids_file, self._centroids)
+            else:
+                centroids_file.unlink(missing_ok=True)
+
+        changed = sorted(self._changed_rows | set(range(self._saved_size, self._size)))
+        if full or self._journal_rows + len(changed) > max(64, 0.1 * self._size):
+            self._write_manifest(path, meta)
+        elif changed:
+            self._append_journal(path, changed)
+
+        self._dirty_rows.clear()
+        self._changed_rows.clear()
+        self._saved_size = self._size
+        self._layout_changed = False
+
+    def _write_rows(self, path: Path) -> bool:
+        """
+        Write rewritten and appended rows into the existing .npy, growing the
+        file when needed. Returns False if the file can't be updated in place.
+        """
+        with open(path, "r+b") as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+            if (
+                fortran
+                or dtype != np.float32
+                or len(shape) != 2
+                or shape[1] != self.dim
+                or shape[0] < self._saved_size
+            ):
+                return False
+
+            row_bytes = self.dim * dtype.itemsize
+            capacity = shape[0]
+            if capacity < self._size:
+                # Grow in chunks; the header keeps its length (numpy pads it for this)
+                capacity = max(self._size, 2 * capacity, 64)
+                header = io.BytesIO()
+                header_data = {
+                    "descr": np.lib.format.dtype_to_descr(dtype),
+                    "fortran_order": False,
+                    "shape": (capacity, self.dim),
+                }
+                if version == (1, 0):
+                    np.lib.format.write_array_header_1_0(header, header_data)
+                else:
+                    np.lib.format.write_array_header_2_0(header, header_data)
+                if len(header.getvalue()) != offset:
+                    return False
+                f.seek(0)
+                f.write(header.getvalue())
+                f.truncate(offset + capacity * row_bytes)
+
+            for row in sorted(r for r in self._dirty_rows if r < self._saved_size):
+                f.seek(offset + row * row_bytes)
+                f.write(np.ascontiguousarray(self._data[row]).tobytes())
+            if self._size > self._saved_size:
+                f.seek(offset + self._saved_size * row_bytes)
+                f.write(np.ascontiguousarray(self._data[self._saved_size : self._size]).tobytes())
+        return True
+
+    def _write_manifest(self, path: Path, meta: dict) -> None:
+        self._generation = uuid.uuid4().hex[:12]
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "generation": self._generation,
+            "dim": self.dim,
+            "count": self._size,
+            "ids": self._ids[: self._size],
+            "hashes": self._hashes[: self._size],
+            "ivf_end": self._ivf_end,
+            "offsets": self._offsets.tolist() if self._offsets is not None else None,
+            "rewritten": sorted(self._rewritten),
+            **meta,
+        }
+        manifest_file = self.manifest_path(path)
+        tmp_manifest = manifest_file.with_suffix(".tmp")
+        tmp_manifest.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+        tmp_manifest.replace(manifest_file)
+        self.journal_path(path).unlink(missing_ok=True)
+        self._journal_rows = 0
+        self._meta = meta
+
+    def _append_journal(self, path: Path, rows: list[int]) -> None:
+        entry = {
+            "generation": self._generation,
+            "count": self._size,
+            "rows": [[row, self._ids[row], self._hashes[row]] for row in rows],
+            "rewritten": sorted(self._rewritten),
+        }
+        with open(self.journal_path(path), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._journal_rows += len(rows)
+
+    def _replay_journal(self, path: Path, manifest: dict) -> int:
+        """Apply journal lines of this manifest generation. Returns row entries applied."""
+        journal_file = self.journal_path(path)
+        if not journal_file.exists():
+            return 0
+        applied = 0
+        for line in journal_file.read_text(encoding="utf-8").splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break  # torn last line of an interrupted save
+            if entry.get("generation") != manifest.get("generation"):
+                continue
+            count = entry["count"]
+            manifest["ids"].extend([None] * (count - len(manifest["ids"])))
+            manifest["hashes"].extend([""] * (count - len(manifest["hashes"])))
+            for row, item_id, text_hash in entry["rows"]:
+                manifest["ids"][row] = item_id
+                manifest["hashes"][row] = text_hash
+            manifest["count"] = count
+            manifest["rewritten"] = entry.get("rewritten", [])
+            applied += len(entry["rows"])
+        return applied
+
+    def load(self, path: Path) -> Optional[dict]:
+        """
+        Load a saved index (matrix memory-mapped copy-on-write).
+        Returns the manifest, or None if there is nothing valid to load.
+        """
+        path = Path(path)
+        manifest_file = self.manifest_path(path)
+        if not path.exists() or not manifest_file.exists():
+            return None
+
+        manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+        if manifest.get("version") != MANIFEST_VERSION:
+            return None
+        journal_rows = self._replay_journal(path, manifest)
+        data = np.load(path, mmap_mode="c")
+        # The file may have room for more rows than are in use
+        if data.ndim != 2 or data.shape[1] != manifest["dim"] or len(data) < manifest["count"]:
+            logger.warning(f"VectorIndex: {path} does not match its manifest, ignoring")
+            return None
+
+        self.dim = manifest["dim"]
+        self.clear()
+        self._data = data
+        self._size = manifest["count"]
+        self._ids = list(manifest["ids"])
+        self._hashes = list(manifest["hashes"])
+        self._rows = {item_id: row for row, item_id in enumerate(self._ids) if item_id is not None}
+        self._alive = np.zeros(len(data), dtype=bool)
+        self._alive[: self._size] = [item_id is not None for item_id in self._ids]
+        self._tombstones = self._size - len(self._rows)
+
+        centroids_file = self.centroids_path(path)
+        if (
+            self.partition_enabled
+            and manifest.get("offsets") is not None
+            and centroids_file.exists()
+        ):
+            self._centroids = np.load(centroids_file)
+            self._offsets = np.asarray(manifest["offsets"], dtype=np.int64)
+            self._ivf_end = manifest["ivf_end"]
+            self._rewritten = set(manifest.get("rewritten", []))
+
+        self._saved_size = self._size
+        self._journal_rows = journal_rows
+        self._generation = manifest.get("generation", "")
+        self._meta = {k: v for k, v in manifest.items() if k not in _MANIFEST_KEYS}
+        self._layout_changed = False
+        return manifest
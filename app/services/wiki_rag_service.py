@@ -5,24 +5,42 @@ Tiered search:
 1. Semantic embeddings (if provider available) — best for "сколько стоит" → "тарифы"
 2. BM25 Okapi with Russian/English stemming — always available as fallback
 
+BM25 runs over an inverted index (token → postings of (section_idx, tf)) with
+IDF and per-section length normalization precomputed at index time, so a
+query only touches sections that contain its terms.
+
 Parses wiki-pages/*.md on startup, builds inverted index and optional
 embedding vectors. Returns top-k relevant sections for LLM system prompt injection.
+
+Embeddings live in a VectorIndex (normalized float32 matrix, one matmul per
+query) persisted as data/wiki_embeddings.npy + manifest; sections are
+re-embedded only when their text changes. Query embeddings go through a
+QueryEmbeddingCache (LRU + SQLite); aretrieve/asearch keep provider calls off
+the event loop.
 """
 
 from __future__ import annotations
 
+import asyncio
 import hashlib
+import heapq
 import json
 import logging
 import math
 import re
+import threading
 from collections import Counter
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 from typing import TYPE_CHECKING, Optional
 
 import snowballstemmer
 
+from app.services.query_embedding_cache import QueryEmbeddingCache
+from app.services.vector_index import VectorIndex
+from app.services.wiki_watcher import WikiWatcher, is_wiki_file
+
 
 if TYPE_CHECKING:
     from app.services.embedding_provider import BaseEmbeddingProvider
@@ -130,8 +148,9 @@ def _is_cyrillic(word: str) -> bool:
     return any("\u0400" <= ch <= "\u04ff" for ch in word)
 
 
+@lru_cache(maxsize=100_000)
 def _stem(word: str) -> str:
-    """Stem a single word using the appropriate language stemmer."""
+    """Stem a single word using the appropriate language stemmer (memoized)."""
     if _is_cyrillic(word):
         return _ru_stemmer.stemWord(word)
     return _en_stemmer.stemWord(word)
@@ -145,26 +164,62 @@ class WikiSection:
     body: str
     source_file: str
     tokens: Counter = field(default_factory=Counter)
+    section_id: str = ""
 
 
 class WikiRAGService:
     """Retrieves relevant wiki sections via embeddings (primary) or BM25 (fallback)."""
 
-    def __init__(self, wiki_dir: Optional[Path] = None):
-        self.sections: list[WikiSection] = []
+    def __init__(self, wiki_dir: Optional[Path] = None, ivf_min_rows: int = 0, ivf_nprobe: int = 8):
+        self.wiki_dir = wiki_dir
         self.doc_freqs: Counter = Counter()
         self.avg_dl: float = 0.0
         self.total_docs: int = 0
-        self._files_indexed: int = 0
+        self._total_tokens: int = 0
+
+        # BM25 inverted index, updated per source file (add/replace/remove).
+        # Sections live in slots; a removed section leaves a None slot until compaction.
+        self._slots: list[Optional[WikiSection]] = []
+        self._doc_lens: list[int] = []  # token count per slot
+        self._free_slots: int = 0
+        self._postings: dict[str, dict[int, int]] = {}  # token → {slot: tf}
+        self._idf: dict[str, float] = {}  # memoized per token until the next index change
+        self._file_slots: dict[str, list[int]] = {}  # source_file → its section slots
+        self._file_signatures: dict[str, tuple[int, int]] = {}  # source_file → (mtime_ns, size)
+        self._watcher: Optional[WikiWatcher] = None
+        self._sections_view: Optional[list[WikiSection]] = None
+
+        # Guards index state against concurrent file updates (worker threads) and searches
+        self._index_lock = threading.RLock()
 
         # Embedding search state
         self._embedding_provider: Optional[BaseEmbeddingProvider] = None
-        self._embeddings: dict[str, list[float]] = {}  # section_id → vector
-        self._embedding_cache_path = Path("data/wiki_embeddings.json")
+        # Approximate (partitioned) vector search is opt-in: 0 = always exact
+        self._ivf_min_rows = ivf_min_rows
+        self._ivf_nprobe = ivf_nprobe
+        self._vector_index = self._new_vector_index()  # section_id → normalized vector
+        self._sections_by_id: dict[str, list[WikiSection]] = {}
+        self._embedding_cache_path = Path("data/wiki_embeddings.npy")
+        self._legacy_embedding_cache_path = Path("data/wiki_embeddings.json")
+        self._query_cache: Optional[QueryEmbeddingCache] = None  # created with the provider
 
         if wiki_dir and wiki_dir.exists():
             self._load_and_index(wiki_dir)
 
+    @property
+    def sections(self) -> list[WikiSection]:
+        """Indexed sections in index order."""
+        view = self._sections_view
+        if view is None:
+            with self._index_lock:
+                view = [s for s in self._slots if s is not None]
+                self._sections_view = view
+        return view
+
+    @property
+    def _files_indexed(self) -> int:
+        return len(self._file_slots)
+
     def _tokenize(self, text: str) -> list[str]:
         """Unicode-aware tokenization with stemming — works with Cyrillic."""
         tokens = re.findall(r"\w+", text.lower())
@@ -192,84 +247,280 @@ class WikiRAGService:
 
         return sections
 
-    def _load_and_index(self, wiki_dir: Path) -> None:
-        """Parse all .md files in wiki_dir, build BM25 index."""
-        self.sections = []
-        self.doc_freqs = Counter()
-        total_tokens = 0
-
-        md_files = sorted(wiki_dir.glob("*.md"))
-        files_processed = 0
-
-        for md_file in md_files:
-            if md_file.name.startswith("_"):
-                continue
+    def _parse_file(
+        self, md_file: Path
+    ) -> tuple[Optional[list[WikiSection]], Optional[tuple[int, int]]]:
+        """
+        Read and tokenize one markdown file.
+        Returns (sections, (mtime_ns, size) before reading); sections is None on read error.
+        """
+        try:
+            st = md_file.stat()
+            signature = (st.st_mtime_ns, st.st_size)
+            content = md_file.read_text(encoding="utf-8")
+        except Exception as e:
+            logger.warning(f"Wiki RAG: не удалось прочитать {md_file.name}: {e}")
+            return None, None
 
-            try:
-                content = md_file.read_text(encoding="utf-8")
-            except Exception as e:
-                logger.warning(f"Wiki RAG: не удалось прочитать {md_file.name}: {e}")
+        sections: list[WikiSection] = []
+        for title, body in self._split_md_by_headers(content):
+            body_stripped = body.strip()
+            if len(body_stripped) < 50:
                 continue
 
-            raw_sections = self._split_md_by_headers(content)
-            files_processed += 1
-
-            for title, body in raw_sections:
-                body_stripped = body.strip()
-                if len(body_stripped) < 50:
-                    continue
-
-                # Токенизируем заголовок + тело (заголовок весомее — 4x boost)
-                text = f"{title} {title} {title} {title} {body_stripped}"
-                tokens = Counter(self._tokenize(text))
-
-                section = WikiSection(
-                    title=title,
-                    body=body_stripped,
-                    source_file=md_file.stem,
-                    tokens=tokens,
-                )
-                self.sections.append(section)
-
-                # Обновляем document frequency
-                for token in tokens:
-                    self.doc_freqs[token] += 1
-
-                total_tokens += sum(tokens.values())
+            # Токенизируем заголовок + тело (заголовок весомее — 4x boost)
+            text = f"{title} {title} {title} {title} {body_stripped}"
+            section = WikiSection(
+                title=title,
+                body=body_stripped,
+                source_file=md_file.stem,
+                tokens=Counter(self._tokenize(text)),
+            )
+            section.section_id = self._section_id(section)
+            sections.append(section)
+        return sections, signature
 
-        # BM25 stats
-        self.total_docs = len(self.sections)
-        self.avg_dl = total_tokens / self.total_docs if self.total_docs > 0 else 1.0
+    def _load_and_index(self, wiki_dir: Path) -> None:
+        """Parse all .md files in wiki_dir, build BM25 index."""
+        parsed: list[tuple[str, list[WikiSection], tuple[int, int]]] = []
+        for md_file in sorted(wiki_dir.glob("*.md")):
+            if not is_wiki_file(md_file.name):
+                continue
+            sections, signature = self._parse_file(md_file)
+            if sections is not None:
+                parsed.append((md_file.stem, sections, signature))
+
+        with self._index_lock:
+            self.doc_freqs = Counter()
+            self._total_tokens = 0
+            self._slots = []
+            self._doc_lens = []
+            self._free_slots = 0
+            self._postings = {}
+            self._file_slots = {}
+            self._file_signatures = {}
+            self._sections_by_id = {}
+            for source_file, sections, signature in parsed:
+                self._apply_file(source_file, sections)
+                self._file_signatures[source_file] = signature
+            self._index_changed()
 
-        self._files_indexed = files_processed
         logger.info(
             f"📚 Wiki RAG (BM25): проиндексировано {self.total_docs} секций "
-            f"из {files_processed} файлов, "
+            f"из {self._files_indexed} файлов, "
             f"{len(self.doc_freqs)} уникальных стемов, "
             f"avg_dl={self.avg_dl:.1f}"
         )
 
-    def _bm25_score(self, query_tokens: list[str], section: WikiSection) -> float:
-        """Compute BM25 Okapi score for a section against query tokens."""
-        score = 0.0
-        doc_len = sum(section.tokens.values())
-        for token in query_tokens:
-            if token not in section.tokens:
-                continue
-            tf = section.tokens[token]
+    def _apply_file(
+        self, source_file: str, sections: Optional[list[WikiSection]]
+    ) -> list[WikiSection]:
+        """
+        Replace one file's sections in the BM25 index (sections=None removes the file).
+        Caller holds _index_lock and calls _index_changed() afterwards.
+        Returns the sections that were removed.
+        """
+        removed: list[WikiSection] = []
+        for slot in self._file_slots.pop(source_file, []):
+            section = self._slots[slot]
+            removed.append(section)
+            for token in section.tokens:
+                postings = self._postings[token]
+                del postings[slot]
+                if not postings:
+                    del self._postings[token]
+                self.doc_freqs[token] -= 1
+                if not self.doc_freqs[token]:
+                    del self.doc_freqs[token]
+            self._total_tokens -= self._doc_lens[slot]
+            self._slots[slot] = None
+            self._free_slots += 1
+
+            same_id = self._sections_by_id.get(section.section_id, [])
+            same_id = [s for s in same_id if s is not section]
+            if same_id:
+                self._sections_by_id[section.section_id] = same_id
+            else:
+                self._sections_by_id.pop(section.section_id, None)
+
+        if sections is None:
+            return removed
+
+        slots: list[int] = []
+        for section in sections:
+            slot = len(self._slots)
+            doc_len = sum(section.tokens.values())
+            self._slots.append(section)
+            self._doc_lens.append(doc_len)
+            self._total_tokens += doc_len
+            for token, tf in section.tokens.items():
+                self._postings.setdefault(token, {})[slot] = tf
+                self.doc_freqs[token] += 1
+            self._sections_by_id.setdefault(section.section_id, []).append(section)
+            slots.append(slot)
+        self._file_slots[source_file] = slots
+        return removed
+
+    def _index_changed(self) -> None:
+        """Refresh BM25 corpus stats after _apply_file calls. Caller holds _index_lock."""
+        if self._free_slots > max(64, len(self._slots) // 2):
+            self._compact_slots()
+        self.total_docs = len(self._slots) - self._free_slots
+        self.avg_dl = self._total_tokens / self.total_docs if self.total_docs > 0 else 1.0
+        self._idf = {}
+        self._sections_view = None
+
+    def _compact_slots(self) -> None:
+        """Renumber slots without gaps (rebuilds postings; amortized over many updates)."""
+        remap = {}
+        slots: list[Optional[WikiSection]] = []
+        doc_lens: list[int] = []
+        for old, section in enumerate(self._slots):
+            if section is not None:
+                remap[old] = len(slots)
+                slots.append(section)
+                doc_lens.append(self._doc_lens[old])
+        self._postings = {
+            token: {remap[slot]: tf for slot, tf in postings.items()}
+            for token, postings in self._postings.items()
+        }
+        self._file_slots = {
+            name: [remap[slot] for slot in file_slots]
+            for name, file_slots in self._file_slots.items()
+        }
+        self._slots = slots
+        self._doc_lens = doc_lens
+        self._free_slots = 0
+
+    def _token_idf(self, token: str) -> float:
+        idf = self._idf.get(token)
+        if idf is None:
             df = self.doc_freqs.get(token, 0)
             idf = math.log((self.total_docs - df + 0.5) / (df + 0.5) + 1.0)
-            tf_norm = (tf * (BM25_K1 + 1)) / (
-                tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_len / self.avg_dl)
+            self._idf[token] = idf
+        return idf
+
+    def _bm25_search(self, query_tokens: list[str], top_k: int) -> list[tuple[float, WikiSection]]:
+        """BM25 Okapi top-k over the postings of the query tokens (score >= MIN_SCORE)."""
+        scores: dict[int, float] = {}
+        with self._index_lock:
+            # Length normalization K1 * (1 - B + B * dl / avg_dl) = norm_base + norm_scale * dl
+            norm_base = BM25_K1 * (1 - BM25_B)
+            norm_scale = BM25_K1 * BM25_B / self.avg_dl
+            doc_lens = self._doc_lens
+            for token in query_tokens:
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+                idf = self._token_idf(token)
+                for slot, tf in postings.items():
+                    norm = norm_base + norm_scale * doc_lens[slot]
+                    scores[slot] = scores.get(slot, 0.0) + idf * (tf * (BM25_K1 + 1)) / (tf + norm)
+
+            # Ties keep index order, as the former stable sort did
+            top = heapq.nlargest(
+                top_k,
+                ((score, -slot) for slot, score in scores.items() if score >= MIN_SCORE),
             )
-            score += idf * tf_norm
-        return score
+            return [(score, self._slots[-neg_slot]) for score, neg_slot in top]
+
+    # ---- Incremental per-file updates ----
+
+    def index_file(self, path: Path) -> dict:
+        """
+        Add or replace one source file: updates its postings, document
+        frequencies and corpus stats, then embeds only its new/changed sections.
+        Files a full reload would skip (see is_wiki_file) are not indexed.
+        Blocking — use aindex_file() from request handlers.
+        """
+        path = Path(path)
+        if not is_wiki_file(path.name):
+            logger.info(f"📚 Wiki RAG: {path.name} пропущен (не страница вики)")
+            return {"status": "skipped", "file": path.name, "reason": "not a wiki page"}
+        sections, signature = self._parse_file(path)
+        if sections is None:
+            return {"status": "error", "file": path.name, "error": "read failed"}
+
+        with self._index_lock:
+            removed = self._apply_file(path.stem, sections)
+            self._file_signatures[path.stem] = signature
+            self._index_changed()
+        logger.info(
+            f"📚 Wiki RAG: {path.name} переиндексирован "
+            f"(-{len(removed)} +{len(sections)} секций, всего {self.total_docs})"
+        )
+
+        result = {
+            "status": "ok",
+            "file": path.name,
+            "sections_removed": len(removed),
+            "sections_added": len(sections),
+            "current_sections": self.total_docs,
+        }
+        if self._embedding_provider:
+            result["embeddings"] = self._update_file_embeddings(sections, removed)
+        return result
+
+    def remove_file(self, name: str) -> dict:
+        """Drop one source file (file name or stem) and its embedding rows."""
+        source_file = Path(name).stem
+        with self._index_lock:
+            removed = self._apply_file(source_file, None)
+            self._file_signatures.pop(source_file, None)
+            self._index_changed()
+        if removed:
+            logger.info(f"📚 Wiki RAG: {name} удалён из индекса (-{len(removed)} секций)")
+
+        result = {
+            "status": "ok",
+            "file": name,
+            "sections_removed": len(removed),
+            "current_sections": self.total_docs,
+        }
+        if self._embedding_provider and removed:
+            result["embeddings"] = self._update_file_embeddings([], removed)
+        return result
+
+    def is_file_current(self, path: Path) -> bool:
+        """True if the file on disk is exactly the version in the index (mtime and size)."""
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+        return self._file_signatures.get(path.stem) == (st.st_mtime_ns, st.st_size)
+
+    async def aindex_file(self, path: Path) -> dict:
+        """index_file() in a worker thread (file read, tokenizing, embedding API calls)."""
+        return await asyncio.to_thread(self.index_file, path)
+
+    async def aremove_file(self, name: str) -> dict:
+        """remove_file() in a worker thread."""
+        return await asyncio.to_thread(self.remove_file, name)
+
+    # ---- Filesystem watcher ----
+
+    def start_watcher(self, debounce: float = 1.0, poll_interval: float = 2.0) -> bool:
+        """Start the background watcher of wiki_dir (inotify, polling fallback)."""
+        if self.wiki_dir is None or not self.wiki_dir.exists():
+            return False
+        if self._watcher is None:
+            self._watcher = WikiWatcher(
+                self, self.wiki_dir, debounce=debounce, poll_interval=poll_interval
+            )
+        self._watcher.start()
+        return True
+
+    def stop_watcher(self) -> None:
+        if self._watcher is not None:
+            self._watcher.stop()
 
     # ---- Embedding methods ----
 
     def set_embedding_provider(self, provider: BaseEmbeddingProvider) -> None:
         """Set the embedding provider and try to load cached embeddings."""
         self._embedding_provider = provider
+        if self._query_cache is None:
+            self._query_cache = QueryEmbeddingCache()
         self._load_embedding_cache()
 
     def _section_id(self, section: WikiSection) -> str:
@@ -277,31 +528,42 @@ class WikiRAGService:
         raw = f"{section.source_file}::{section.title}"
         return hashlib.md5(raw.encode()).hexdigest()
 
-    def _cosine_similarity(self, a: list[float], b: list[float]) -> float:
-        """Pure Python cosine similarity — fine for ~600 vectors."""
-        dot = sum(x * y for x, y in zip(a, b, strict=False))
-        norm_a = math.sqrt(sum(x * x for x in a))
-        norm_b = math.sqrt(sum(x * x for x in b))
-        if norm_a == 0 or norm_b == 0:
-            return 0.0
-        return dot / (norm_a * norm_b)
+    @staticmethod
+    def _embedding_text(section: WikiSection) -> str:
+        """Text that gets embedded for a section."""
+        return f"{section.title}\n{section.body[:1000]}"
+
+    @staticmethod
+    def _text_hash(text: str) -> str:
+        return hashlib.md5(text.encode()).hexdigest()
+
+    def _provider_matches(self, provider: str, model: str) -> bool:
+        return bool(
+            self._embedding_provider
+            and provider == self._embedding_provider.provider_name()
+            and model == self._embedding_provider.model_name
+        )
+
+    def _new_vector_index(self) -> VectorIndex:
+        return VectorIndex(nprobe=self._ivf_nprobe, ivf_min_rows=self._ivf_min_rows)
 
     def _load_embedding_cache(self) -> None:
-        """Load cached embeddings from JSON if provider matches."""
-        if not self._embedding_cache_path.exists():
-            return
+        """Load the cached vector index if provider matches (migrates the legacy JSON cache)."""
+        with self._index_lock:
+            self._vector_index.clear()
         try:
-            data = json.loads(self._embedding_cache_path.read_text(encoding="utf-8"))
-            cached_provider = data.get("provider", "")
-            cached_model = data.get("model", "")
-            if (
-                self._embedding_provider
-                and cached_provider == self._embedding_provider.provider_name()
-                and cached_model == self._embedding_provider.model_name
-            ):
-                self._embeddings = data.get("embeddings", {})
+            cached = self._new_vector_index()
+            manifest = cached.load(self._embedding_cache_path)
+            if manifest is None:
+                self._load_legacy_embedding_cache()
+                return
+            cached_provider = manifest.get("provider", "")
+            cached_model = manifest.get("model", "")
+            if self._provider_matches(cached_provider, cached_model):
+                with self._index_lock:
+                    self._vector_index = cached
                 logger.info(
-                    f"📦 Wiki RAG: загружено {len(self._embeddings)} эмбеддингов из кэша "
+                    f"📦 Wiki RAG: загружено {len(self._vector_index)} эмбеддингов из кэша "
                     f"({cached_provider}/{cached_model})"
                 )
             else:
@@ -309,115 +571,189 @@ class WikiRAGService:
                     "📦 Wiki RAG: кэш эмбеддингов устарел "
                     f"(cached={cached_provider}/{cached_model}), будет перестроен"
                 )
-                self._embeddings = {}
         except Exception as e:
             logger.warning(f"Wiki RAG: ошибка загрузки кэша эмбеддингов: {e}")
-            self._embeddings = {}
+            self._vector_index.clear()
+
+    def _load_legacy_embedding_cache(self) -> None:
+        """One-time import of data/wiki_embeddings.json into the vector index."""
+        if not self._legacy_embedding_cache_path.exists():
+            return
+        data = json.loads(self._legacy_embedding_cache_path.read_text(encoding="utf-8"))
+        if not self._provider_matches(data.get("provider", ""), data.get("model", "")):
+            return
+        embeddings: dict[str, list[float]] = data.get("embeddings", {})
+        if not embeddings:
+            return
+        # Legacy entries carry no content hash: kept until the section changes id
+        with self._index_lock:
+            self._vector_index.upsert(list(embeddings), list(embeddings.values()))
+            self._vector_index.optimize()
+            self._save_embedding_cache()
+        logger.info(
+            f"📦 Wiki RAG: {len(embeddings)} эмбеддингов перенесено из "
+            f"{self._legacy_embedding_cache_path.name} в {self._embedding_cache_path.name}"
+        )
 
     def _save_embedding_cache(self) -> None:
-        """Save embeddings to JSON cache."""
-        if not self._embedding_provider or not self._embeddings:
+        """Save the vector index (.npy + manifest)."""
+        if not self._embedding_provider or not len(self._vector_index):
             return
         try:
-            self._embedding_cache_path.parent.mkdir(parents=True, exist_ok=True)
-            data = {
-                "provider": self._embedding_provider.provider_name(),
-                "model": self._embedding_provider.model_name,
-                "sections_count": len(self._embeddings),
-                "embeddings": self._embeddings,
-            }
-            self._embedding_cache_path.write_text(
-                json.dumps(data, ensure_ascii=False), encoding="utf-8"
+            self._vector_index.save(
+                self._embedding_cache_path,
+                meta={
+                    "provider": self._embedding_provider.provider_name(),
+                    "model": self._embedding_provider.model_name,
+                },
             )
-            logger.info(f"💾 Wiki RAG: сохранено {len(self._embeddings)} эмбеддингов в кэш")
+            logger.info(f"💾 Wiki RAG: сохранено {len(self._vector_index)} эмбеддингов в кэш")
         except Exception as e:
             logger.warning(f"Wiki RAG: ошибка сохранения кэша эмбеддингов: {e}")
 
+    def _sections_to_embed(self, ids=None) -> tuple[list[str], list[str], list[str]]:
+        """
+        (ids, texts, hashes) of sections that are missing or whose text changed.
+        Checks all sections, or only the given section ids. Caller holds _index_lock.
+        """
+        result: tuple[list[str], list[str], list[str]] = ([], [], [])
+        for sid in self._sections_by_id if ids is None else dict.fromkeys(ids):
+            sections = self._sections_by_id.get(sid)
+            if not sections:
+                continue
+            text = self._embedding_text(sections[0])
+            text_hash = self._text_hash(text)
+            cached_hash = self._vector_index.content_hash(sid)
+            if cached_hash is None or (cached_hash and cached_hash != text_hash):
+                result[0].append(sid)
+                result[1].append(text)
+                result[2].append(text_hash)
+        return result
+
+    def _store_embeddings(self, ids: list[str], vectors, hashes: list[str]) -> int:
+        """
+        Upsert embedded rows whose sections still exist, optimize, save (only changes are written).
+        Caller holds _index_lock. Returns the number of rows written.
+        """
+        keep = [i for i, sid in enumerate(ids) if sid in self._sections_by_id]
+        if keep:
+            self._vector_index.upsert(
+                [ids[i] for i in keep], [vectors[i] for i in keep], [hashes[i] for i in keep]
+            )
+        self._vector_index.optimize()
+        self._save_embedding_cache()
+        return len(keep)
+
     def build_embeddings(self) -> dict:
-        """Batch embed all indexed sections. Returns stats."""
+        """Batch embed new and changed sections. Returns stats."""
         if not self._embedding_provider:
             return {"status": "no_provider"}
         if not self.sections:
             return {"status": "no_sections"}
 
-        # Identify sections that need embedding
-        section_ids = [self._section_id(s) for s in self.sections]
-        missing_ids = [sid for sid in section_ids if sid not in self._embeddings]
+        index = self._vector_index
+        with self._index_lock:
+            ids, texts, hashes = self._sections_to_embed()
+            stale = index.retain(self._sections_by_id)
+
+            if not ids:
+                if stale:
+                    index.optimize()
+                    self._save_embedding_cache()
+                return {
+                    "status": "ok",
+                    "cached": len(index),
+                    "new": 0,
+                    "stale_removed": stale,
+                    "provider": self._embedding_provider.provider_name(),
+                }
+
+        # The embedding API call runs without the lock: searches keep going
+        try:
+            vectors = self._embedding_provider.embed_texts(texts)
+        except Exception as e:
+            logger.error(f"Wiki RAG: ошибка эмбеддинга: {e}")
+            return {"status": "error", "error": str(e)}
 
-        if not missing_ids:
+        # Only the new/changed rows are written
+        with self._index_lock:
+            new = self._store_embeddings(ids, vectors, hashes)
             return {
                 "status": "ok",
-                "cached": len(self._embeddings),
-                "new": 0,
+                "cached": len(index) - new,
+                "new": new,
+                "stale_removed": stale,
+                "total": len(index),
                 "provider": self._embedding_provider.provider_name(),
             }
 
-        # Prepare texts for missing sections
-        missing_indices = [i for i, sid in enumerate(section_ids) if sid in missing_ids]
-        texts = [
-            f"{self.sections[i].title}\n{self.sections[i].body[:1000]}" for i in missing_indices
-        ]
+    def _update_file_embeddings(self, added: list[WikiSection], removed: list[WikiSection]) -> dict:
+        """Embedding rows for one file: drop rows of vanished sections, embed new/changed ones."""
+        index = self._vector_index
+        with self._index_lock:
+            stale = index.remove(
+                {s.section_id for s in removed if s.section_id not in self._sections_by_id}
+            )
+            ids, texts, hashes = self._sections_to_embed(s.section_id for s in added)
+            if not ids:
+                if stale:
+                    index.optimize()
+                    self._save_embedding_cache()
+                return {"status": "ok", "new": 0, "stale_removed": stale, "total": len(index)}
 
         try:
             vectors = self._embedding_provider.embed_texts(texts)
         except Exception as e:
             logger.error(f"Wiki RAG: ошибка эмбеддинга: {e}")
-            return {"status": "error", "error": str(e)}
-
-        # Store new embeddings
-        for idx, vec in zip(missing_indices, vectors, strict=True):
-            sid = section_ids[idx]
-            self._embeddings[sid] = vec
-
-        # Remove stale embeddings (sections no longer in index)
-        current_ids = set(section_ids)
-        stale = [k for k in self._embeddings if k not in current_ids]
-        for k in stale:
-            del self._embeddings[k]
+            return {"status": "error", "error": str(e), "stale_removed": stale}
 
-        self._save_embedding_cache()
-
-        return {
-            "status": "ok",
-            "cached": len(self._embeddings) - len(vectors),
-            "new": len(vectors),
-            "stale_removed": len(stale),
-            "total": len(self._embeddings),
-            "provider": self._embedding_provider.provider_name(),
-        }
+        with self._index_lock:
+            new = self._store_embeddings(ids, vectors, hashes)
+            return {"status": "ok", "new": new, "stale_removed": stale, "total": len(index)}
 
     def reindex_embeddings(self) -> dict:
         """Force rebuild all embeddings from scratch."""
-        self._embeddings = {}
+        with self._index_lock:
+            self._vector_index.clear()
         return self.build_embeddings()
 
     def _embedding_search(self, query: str, top_k: int) -> list[tuple[float, WikiSection]]:
         """Semantic search via embeddings. Returns scored sections."""
-        if not self._embedding_provider or not self._embeddings:
+        if not self._embedding_provider or not len(self._vector_index):
             return []
 
-        try:
-            query_vec = self._embedding_provider.embed_query(query)
-        except Exception as e:
-            logger.warning(f"Wiki RAG: ошибка эмбеддинга запроса: {e}")
+        query_vec = self._query_embedding(query)
+        if query_vec is None:
             return []
 
+        # 0.3 — minimum similarity threshold
         scored: list[tuple[float, WikiSection]] = []
-        for section in self.sections:
-            sid = self._section_id(section)
-            if sid not in self._embeddings:
-                continue
-            sim = self._cosine_similarity(query_vec, self._embeddings[sid])
-            if sim > 0.3:  # minimum similarity threshold
-                scored.append((sim, section))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
+        with self._index_lock:
+            for sim, sid in self._vector_index.search(query_vec, top_k, min_score=0.3):
+                scored.extend((sim, section) for section in self._sections_by_id.get(sid, []))
         return scored[:top_k]
 
+    def _query_embedding(self, query: str):
+        """Query vector from the cache, or from the provider (then cached). None on error."""
+        provider = self._embedding_provider
+        name, model = provider.provider_name(), provider.model_name
+        cache = self._query_cache
+        if cache is not None:
+            cached = cache.get(name, model, query)
+            if cached is not None:
+                return cached
+
+        try:
+            vector = provider.embed_query(query.strip())
+        except Exception as e:
+            logger.warning(f"Wiki RAG: ошибка эмбеддинга запроса: {e}")
+            return None
+        return cache.put(name, model, query, vector) if cache is not None else vector
+
     @property
     def embeddings_available(self) -> bool:
         """True if we have both a provider and cached embeddings."""
-        return bool(self._embedding_provider and self._embeddings)
+        return bool(self._embedding_provider and len(self._vector_index))
 
     def retrieve(self, query: str, top_k: int = 3, max_chars: int = 2500) -> str:
         """
@@ -438,18 +774,10 @@ class WikiRAGService:
             if not query_tokens:
                 return ""
 
-            scored: list[tuple[float, WikiSection]] = []
-            for section in self.sections:
-                score = self._bm25_score(query_tokens, section)
-                if score >= MIN_SCORE:
-                    scored.append((score, section))
-
-            if not scored:
+            top_sections = self._bm25_search(query_tokens, top_k)
+            if not top_sections:
                 return ""
 
-            scored.sort(key=lambda x: x[0], reverse=True)
-            top_sections = scored[:top_k]
-
         # Format context, respect max_chars
         parts: list[str] = ["[Документация по теме:]"]
         total_chars = len(parts[0])
@@ -473,9 +801,24 @@ class WikiRAGService:
 
         return "".join(parts) if len(parts) > 1 else ""
 
+    async def aretrieve(self, query: str, top_k: int = 3, max_chars: int = 2500) -> str:
+        """
+        Async retrieve() for request handlers.
+
+        Always runs in a worker thread: besides the embedding API call, its
+        retry backoff and the SQLite lookup, a search waits on _index_lock,
+        which the indexing worker holds while re-indexing and saving the .npy.
+        """
+        return await asyncio.to_thread(self.retrieve, query, top_k, max_chars)
+
+    async def asearch(self, query: str, top_k: int = 3) -> list[dict]:
+        """Async search(), runs in a worker thread like aretrieve()."""
+        return await asyncio.to_thread(self.search, query, top_k)
+
     def reload(self, wiki_dir: Path) -> dict:
         """Re-index wiki from disk. Also rebuilds embeddings if provider is set."""
         old_count = len(self.sections)
+        self.wiki_dir = wiki_dir
         self._load_and_index(wiki_dir)
         result = {
             "previous_sections": old_count,
@@ -506,16 +849,10 @@ class WikiRAGService:
             if not query_tokens:
                 return []
 
-            for section in self.sections:
-                score = self._bm25_score(query_tokens, section)
-                if score >= MIN_SCORE:
-                    scored.append((score, section))
-
+            scored = self._bm25_search(query_tokens, top_k)
             if not scored:
                 return []
 
-            scored.sort(key=lambda x: x[0], reverse=True)
-
         results = []
         for score, section in scored[:top_k]:
             results.append(
@@ -540,12 +877,16 @@ class WikiRAGService:
         if self._embedding_provider:
             embedding_engine = self._embedding_provider.provider_name()
         return {
-            "engine": "embeddings+bm25" if self._embeddings else "bm25",
+            "engine": "embeddings+bm25" if len(self._vector_index) else "bm25",
             "embedding_engine": embedding_engine,
-            "embedding_sections": len(self._embeddings),
+            "embedding_sections": len(self._vector_index),
+            "vector_search": "partitioned" if self._vector_index.partitioned else "exact",
+            "partition_recall": self._vector_index.partition_recall,
             "sections_indexed": len(self.sections),
             "files_indexed": self._files_indexed,
             "unique_tokens": len(self.doc_freqs),
             "avg_doc_length": round(self.avg_dl, 1),
             "available": len(self.sections) > 0,
+            "query_cache": self._query_cache.get_stats() if self._query_cache else None,
+            "watcher": self._watcher.get_stats() if self._watcher else None,
         }
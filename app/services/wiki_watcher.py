@@ -0,0 +1,284 @@
+"""
+Filesystem watcher that keeps the Wiki RAG index in sync with wiki-pages/.
+
+Edits made outside the admin API (git pull, sync scripts, a text editor) are
+picked up and applied through WikiRAGService.index_file/remove_file, so only
+the changed file is re-tokenized and re-embedded.
+
+Backends:
+1. inotify (Linux, via ctypes — no extra dependency);
+2. polling of (mtime, size) snapshots — everywhere else, or if inotify fails.
+
+Events are debounced per file: a burst of writes (editor save, git checkout)
+results in one update once the file has been quiet for `debounce` seconds.
+The watcher runs in its own daemon thread; index updates happen there, off
+the event loop.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+
+if TYPE_CHECKING:
+    from app.services.wiki_rag_service import WikiRAGService
+
+
+logger = logging.getLogger(__name__)
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def is_wiki_file(name: str) -> bool:
+    """Files the index cares about (WikiRAGService full reload and index_file)."""
+    return name.endswith(".md") and not name.startswith(("_", "."))
+
+
+class _Inotify:
+    """Minimal inotify wrapper for one directory."""
+
+    def __init__(self, directory: Path):
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc not found")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify not supported")
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def read(self, timeout: float) -> Optional[list[tuple[int, str]]]:
+        """(mask, name) events within timeout; None if the watch is gone."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0").decode("utf-8", "replace")
+            offset += length
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                return None
+            events.append((mask, name))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class WikiWatcher:
+    """Debounced watcher of one wiki directory feeding incremental index updates."""
+
+    def __init__(
+        self,
+        wiki_rag: WikiRAGService,
+        wiki_dir: Path,
+        debounce: float = 1.0,
+        poll_interval: float = 2.0,
+        use_inotify: bool = True,
+    ):
+        self.wiki_rag = wiki_rag
+        self.wiki_dir = Path(wiki_dir)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+
+        self.backend: Optional[str] = None
+        self._pending: dict[str, float] = {}  # file name → monotonic deadline
+        self._pending_lock = threading.Lock()
+        self._snapshot: dict[str, tuple[int, int]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Stats
+        self.last_update: Optional[datetime] = None
+        self.last_update_file: Optional[str] = None
+        self.last_rebuild_ms: Optional[float] = None
+        self.updates_applied = 0
+        self.updates_skipped = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._snapshot = self._scan()
+        self._thread = threading.Thread(target=self._run, name="wiki-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ---- Event sources ----
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        """(mtime_ns, size) of every wiki file in the directory."""
+        snapshot = {}
+        try:
+            with os.scandir(self.wiki_dir) as entries:
+                for entry in entries:
+                    if is_wiki_file(entry.name) and entry.is_file():
+                        st = entry.stat()
+                        snapshot[entry.name] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            pass
+        return snapshot
+
+    def _rescan(self) -> None:
+        """Queue files whose snapshot changed since the previous scan."""
+        snapshot = self._scan()
+        changed = {
+            name
+            for name in snapshot.keys() | self._snapshot.keys()
+            if snapshot.get(name) != self._snapshot.get(name)
+        }
+        self._snapshot = snapshot
+        for name in changed:
+            self._schedule(name)
+
+    def _schedule(self, name: str) -> None:
+        with self._pending_lock:
+            self._pending[name] = time.monotonic() + self.debounce
+
+    def _run(self) -> None:
+        inotify = None
+        if self.use_inotify:
+            try:
+                inotify = _Inotify(self.wiki_dir)
+            except OSError as e:
+                logger.info(f"📂 Wiki watcher: inotify недоступен ({e}), используется опрос")
+
+        self.backend = "inotify" if inotify else "polling"
+        logger.info(f"📂 Wiki watcher запущен: {self.wiki_dir} ({self.backend})")
+        try:
+            while not self._stop.is_set():
+                if inotify is not None:
+                    events = inotify.read(self._wait_timeout())
+                    if events is None:
+                        # Directory replaced/removed: switch to polling
+                        inotify.close()
+                        inotify = None
+                        self.backend = "polling"
+                        logger.warning("📂 Wiki watcher: каталог пересоздан, переход на опрос")
+                        self._rescan()
+                        continue
+                    for mask, name in events:
+                        if mask & IN_Q_OVERFLOW:
+                            self._rescan()
+                        elif is_wiki_file(name):
+                            self._schedule(name)
+                else:
+                    self._stop.wait(min(self.poll_interval, self._wait_timeout()))
+                    self._rescan()
+                self._flush_due()
+        except Exception as e:
+            logger.error(f"❌ Wiki watcher остановлен из-за ошибки: {e}")
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def _wait_timeout(self) -> float:
+        """Sleep until the next pending deadline (bounded)."""
+        with self._pending_lock:
+            if not self._pending:
+                return self.poll_interval
+            return max(0.0, min(self._pending.values()) - time.monotonic())
+
+    # ---- Applying changes ----
+
+    def _flush_due(self) -> None:
+        now = time.monotonic()
+        with self._pending_lock:
+            due = [name for name, deadline in self._pending.items() if deadline <= now]
+            for name in due:
+                del self._pending[name]
+        for name in sorted(due):
+            self._apply(name)
+
+    def _apply(self, name: str) -> None:
+        path = self.wiki_dir / name
+        start = time.perf_counter()
+        try:
+            if path.is_file():
+                if self.wiki_rag.is_file_current(path):
+                    # Already indexed (e.g. by the upload/update endpoint)
+                    self.updates_skipped += 1
+                    return
+                result = self.wiki_rag.index_file(path)
+            else:
+                result = self.wiki_rag.remove_file(name)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Wiki watcher: ошибка обновления {name}: {e}")
+            return
+
+        if result.get("status") != "ok":
+            self.errors += 1
+            return
+        self.last_rebuild_ms = round((time.perf_counter() - start) * 1000, 1)
+        self.last_update = datetime.now()
+        self.last_update_file = name
+        self.updates_applied += 1
+
+    def get_stats(self) -> dict:
+        with self._pending_lock:
+            pending = sorted(self._pending)
+        return {
+            "running": self.running,
+            "backend": self.backend,
+            "directory": str(self.wiki_dir),
+            "debounce_s": self.debounce,
+            "pending": pending,
+            "last_update": self.last_update.isoformat() if self.last_update else None,
+            "last_update_file": self.last_update_file,
+            "last_rebuild_ms": self.last_rebuild_ms,
+            "updates_applied": self.updates_applied,
+            "updates_skipped": self.updates_skipped,
+            "errors": self.errors,
+        }
@@ -12,12 +12,28 @@ Supports:
 - Custom OpenAI-compatible endpoints
 """
 
+import asyncio
+import hashlib
 import json
 import logging
 import os
+import threading
 from abc import ABC, abstractmethod
-from datetime import datetime
-from typing import TYPE_CHECKING, Dict, Generator, List, Optional, Union
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 
 if TYPE_CHECKING:
@@ -25,6 +41,8 @@ if TYPE_CHECKING:
 
 import httpx
 
+from faq_matcher import FAQMatcher, apply_faq_templates
+
 
 # Gemini SDK (optional)
 try:
@@ -121,6 +139,55 @@ PROVIDER_TYPES = {
 }
 
 
+_STREAM_END = object()
+
+
+async def iterate_in_thread(iterator: Iterator[str]) -> AsyncGenerator[str, None]:
+    """Drain a blocking iterator from a worker thread, one item per await."""
+    while True:
+        item = await asyncio.to_thread(next, iterator, _STREAM_END)
+        if item is _STREAM_END:
+            break
+        yield item
+
+
+async def astream_from_messages(
+    llm_service, messages: List[Dict[str, str]]
+) -> AsyncGenerator[str, None]:
+    """
+    Stream a response from any LLM service without blocking the event loop.
+
+    Uses the service's native ``agenerate_response_from_messages`` when it has one,
+    otherwise pulls the sync generator from a worker thread.
+    """
+    if hasattr(llm_service, "agenerate_response_from_messages"):
+        async for chunk in llm_service.agenerate_response_from_messages(messages):
+            yield chunk
+        return
+
+    stream = llm_service.generate_response_from_messages(messages, stream=True)
+    if isinstance(stream, str):
+        yield stream
+        return
+    async for chunk in iterate_in_thread(iter(stream)):
+        yield chunk
+
+
+def parse_sse_line(line: str) -> Tuple[bool, str]:
+    """Parse one OpenAI SSE line. Returns (done, content)."""
+    if not line.startswith("data: "):
+        return False, ""
+    data = line[6:]
+    if data == "[DONE]":
+        return True, ""
+    try:
+        chunk = json.loads(data)
+        delta = chunk["choices"][0].get("delta", {})
+        return False, delta.get("content", "") or ""
+    except (json.JSONDecodeError, KeyError, IndexError):
+        return False, ""
+
+
 class BaseLLMProvider(ABC):
     """Abstract base class for LLM providers."""
 
@@ -162,6 +229,28 @@ class BaseLLMProvider(ABC):
         """Generate response from OpenAI-format messages."""
         pass
 
+    async def agenerate_response_from_messages(
+        self, messages: List[Dict[str, str]]
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream response from OpenAI-format messages without blocking the event loop.
+
+        Default implementation drives the sync stream from a worker thread;
+        providers with an async HTTP client override it.
+        """
+        async for chunk in iterate_in_thread(
+            iter(self.generate_response_from_messages(messages, stream=True))
+        ):
+            yield chunk
+
+    async def aclose(self):
+        """Release async resources held by the provider."""
+        return None
+
+    def close(self):
+        """Release sync resources held by the provider."""
+        return None
+
     @abstractmethod
     def is_available(self) -> bool:
         """Check if provider is available."""
@@ -190,6 +279,7 @@ class OpenAICompatibleProvider(BaseLLMProvider):
     def __init__(self, config: dict):
         super().__init__(config)
         self.client = httpx.Client(timeout=60.0)
+        self.async_client: Optional[httpx.AsyncClient] = None
 
         # Validate required fields (bridge uses CLI auth, no API key needed)
         if not self.api_key and self.provider_type != "claude_bridge":
@@ -253,19 +343,22 @@ class OpenAICompatibleProvider(BaseLLMProvider):
             return self._generate_stream(messages)
         return self._generate_non_stream(messages)
 
+    def _chat_payload(self, messages: List[Dict[str, str]], stream: bool) -> dict:
+        return {
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": self.runtime_params.get("temperature", 0.7),
+            "max_tokens": self.runtime_params.get("max_tokens", 512),
+            "top_p": self.runtime_params.get("top_p", 0.9),
+            "stream": stream,
+        }
+
     def _generate_non_stream(self, messages: List[Dict[str, str]]) -> str:
         try:
             response = self.client.post(
                 f"{self.base_url}/chat/completions",
                 headers=self._get_headers(),
-                json={
-                    "model": self.model_name,
-                    "messages": messages,
-                    "temperature": self.runtime_params.get("temperature", 0.7),
-                    "max_tokens": self.runtime_params.get("max_tokens", 512),
-                    "top_p": self.runtime_params.get("top_p", 0.9),
-                    "stream": False,
-                },
+                json=self._chat_payload(messages, stream=False),
             )
             response.raise_for_status()
             result = response.json()
@@ -295,33 +388,57 @@ class OpenAICompatibleProvider(BaseLLMProvider):
                 "POST",
                 f"{self.base_url}/chat/completions",
                 headers=self._get_headers(),
-                json={
-                    "model": self.model_name,
-                    "messages": messages,
-                    "temperature": self.runtime_params.get("temperature", 0.7),
-                    "max_tokens": self.runtime_params.get("max_tokens", 512),
-                    "top_p": self.runtime_params.get("top_p", 0.9),
-                    "stream": True,
-                },
+                json=self._chat_payload(messages, stream=True),
             ) as response:
                 response.raise_for_status()
                 for line in response.iter_lines():
-                    if line.startswith("data: "):
-                        data = line[6:]
-                        if data == "[DONE]":
-                            break
-                        try:
-                            chunk = json.loads(data)
-                            delta = chunk["choices"][0].get("delta", {})
-                            content = delta.get("content", "")
-                            if content:
-                                yield content
-                        except json.JSONDecodeError:
-                            continue
+                    done, content = parse_sse_line(line)
+                    if done:
+                        break
+                    if content:
+                        yield content
         except Exception as e:
             logger.error(f"[{self.provider_id}] Stream error: {e}")
             yield "Извините, произошла техническая ошибка."
 
+    def _get_async_client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the event loop that actually uses it
+        if self.async_client is None or self.async_client.is_closed:
+            self.async_client = httpx.AsyncClient(timeout=60.0)
+        return self.async_client
+
+    async def agenerate_response_from_messages(
+        self, messages: List[Dict[str, str]]
+    ) -> AsyncGenerator[str, None]:
+        try:
+            async with self._get_async_client().stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers=self._get_headers(),
+                json=self._chat_payload(messages, stream=True),
+            ) as response:
+                response.raise_for_status()
+                finished = False
+                async for line in response.aiter_lines():
+                    # Read past [DONE] instead of breaking: a fully consumed
+                    # response returns its connection to the keep-alive pool
+                    if finished:
+                        continue
+                    finished, content = parse_sse_line(line)
+                    if content:
+                        yield content
+        except Exception as e:
+            logger.error(f"[{self.provider_id}] Async stream error: {e}")
+            yield "Извините, произошла техническая ошибка."
+
+    async def aclose(self):
+        if self.async_client is not None:
+            await self.async_client.aclose()
+            self.async_client = None
+
+    def close(self):
+        self.client.close()
+
 
 class GeminiProvider(BaseLLMProvider):
     """
@@ -589,7 +706,8 @@ class CloudLLMService:
         self.backend_type = "cloud"  # Отличает от vLLM
 
         # FAQ (загружается через reload_faq из БД)
-        self.faq: Dict[str, str] = {}
+        self._faq_matcher = FAQMatcher()
+        self.faq: Dict[str, str] = self._faq_matcher.faq
 
         # Conversation history
         self.conversation_history: List[Dict[str, str]] = []
@@ -599,39 +717,11 @@ class CloudLLMService:
 
         logger.info(f"CloudLLMService initialized: {self.provider_id} ({self.provider_type})")
 
-    def _normalize_faq(self, faq_dict: Dict[str, str]) -> Dict[str, str]:
-        """Нормализует ключи FAQ (lowercase, strip)"""
-        return {k.lower().strip(): v for k, v in faq_dict.items()}
-
     def _check_faq(self, user_message: str) -> Optional[str]:
-        if not self.faq:
+        match = self._faq_matcher.match(user_message)
+        if not match:
             return None
-        normalized = user_message.lower().strip().rstrip("?!.,")
-        if normalized in self.faq:
-            return self._apply_faq_templates(self.faq[normalized])
-        for key, response in self.faq.items():
-            if key in normalized or normalized in key:
-                return self._apply_faq_templates(response)
-        return None
-
-    def _apply_faq_templates(self, response: str) -> str:
-        now = datetime.now()
-        replacements = {
-            "{current_time}": now.strftime("%H:%M"),
-            "{current_date}": now.strftime("%d.%m.%Y"),
-            "{day_of_week}": [
-                "понедельник",
-                "вторник",
-                "среда",
-                "четверг",
-                "пятница",
-                "суббота",
-                "воскресенье",
-            ][now.weekday()],
-        }
-        for placeholder, value in replacements.items():
-            response = response.replace(placeholder, value)
-        return response
+        return apply_faq_templates(match[1])
 
     def reload_faq(self, faq_dict: Dict[str, str] = None):
         """
@@ -640,10 +730,8 @@ class CloudLLMService:
         Args:
             faq_dict: FAQ словарь из БД. Если не передан, FAQ очищается.
         """
-        if faq_dict:
-            self.faq = self._normalize_faq(faq_dict)
-        else:
-            self.faq = {}
+        self._faq_matcher = FAQMatcher(faq_dict)
+        self.faq = self._faq_matcher.faq
         logger.info(f"🔄 FAQ перезагружен: {len(self.faq)} записей")
 
     def get_system_prompt(self) -> str:
@@ -718,6 +806,28 @@ class CloudLLMService:
 
         return self.provider.generate_response_from_messages(messages, stream)
 
+    async def agenerate_response_from_messages(
+        self, messages: List[Dict[str, str]]
+    ) -> AsyncGenerator[str, None]:
+        """Async streaming counterpart of generate_response_from_messages(stream=True)."""
+        user_messages = [m for m in messages if m.get("role") == "user"]
+        if len(user_messages) == 1:
+            faq_response = self._check_faq(user_messages[0]["content"])
+            if faq_response:
+                yield faq_response
+                return
+
+        async for chunk in self.provider.agenerate_response_from_messages(messages):
+            yield chunk
+
+    async def aclose(self):
+        """Release async resources held by the provider."""
+        await self.provider.aclose()
+
+    def close(self):
+        """Release sync resources held by the provider."""
+        self.provider.close()
+
     def reset_conversation(self):
         """Clear conversation history."""
         self.conversation_history = []
@@ -738,3 +848,177 @@ class CloudLLMService:
     @property
     def runtime_params(self) -> Dict:
         return self.provider.runtime_params
+
+
+class CloudProviderPool:
+    """
+    Process-wide pool of constructed CloudLLMService instances.
+
+    Building a provider is not free: OpenAI-compatible providers open a new
+    httpx client (TCP/TLS handshake on first request), Gemini reconfigures the
+    SDK and may start a VLESS proxy. The pool keeps one instance per provider id,
+    so keep-alive connections survive between messages, and rebuilds it only when
+    the provider config version changes or the provider is invalidated by
+    the /admin/llm/providers endpoints.
+    """
+
+    def __init__(self, max_size: int = 32):
+        self.max_size = max_size
+        # provider_id -> (config version, service)
+        self._services: "OrderedDict[str, tuple[str, CloudLLMService]]" = OrderedDict()
+        # provider_type -> provider_id (legacy "gemini" backend resolution)
+        self._type_aliases: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def config_version(provider_config: dict) -> str:
+        """Version of a provider config: changes whenever anything affecting the client does."""
+        material = {
+            key: provider_config.get(key)
+            for key in (
+                "provider_type",
+                "api_key",
+                "base_url",
+                "model_name",
+                "config",
+                "system_prompt",
+                "updated",
+            )
+        }
+        raw = json.dumps(material, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+    def get(self, provider_config: dict) -> CloudLLMService:
+        """Return the pooled service for this config, building it on first use or version change."""
+        provider_id = provider_config.get("id", "unknown")
+        version = self.config_version(provider_config)
+
+        with self._lock:
+            cached = self._services.get(provider_id)
+            if cached and cached[0] == version:
+                self._services.move_to_end(provider_id)
+                self._hits += 1
+                return cached[1]
+
+        service = CloudLLMService(provider_config)
+
+        with self._lock:
+            self._misses += 1
+            stale = self._services.pop(provider_id, None)
+            self._services[provider_id] = (version, service)
+            evicted = []
+            while len(self._services) > self.max_size:
+                evicted.append(self._services.popitem(last=False)[1])
+            if stale:
+                evicted.append(stale)
+
+        for _, old in evicted:
+            self._dispose(old)
+        return service
+
+    def peek(self, provider_id: str) -> Optional[CloudLLMService]:
+        """Return a pooled service without touching the database or building one."""
+        with self._lock:
+            cached = self._services.get(provider_id)
+            if cached:
+                self._services.move_to_end(provider_id)
+                self._hits += 1
+                return cached[1]
+        return None
+
+    async def aget(
+        self,
+        provider_id: str,
+        loader: Callable[[str], Awaitable[Optional[dict]]],
+    ) -> Optional[CloudLLMService]:
+        """
+        Get a pooled service by provider id.
+
+        The loader (e.g. ``async_cloud_provider_manager.get_provider_with_key``) is
+        only awaited on a pool miss, so warm providers cost no DB round-trip.
+        """
+        service = self.peek(provider_id)
+        if service is not None:
+            return service
+
+        provider_config = await loader(provider_id)
+        if not provider_config:
+            return None
+        return self.get(provider_config)
+
+    async def aget_by_type(
+        self,
+        provider_type: str,
+        lister: Callable[..., Awaitable[List[dict]]],
+        loader: Callable[[str], Awaitable[Optional[dict]]],
+    ) -> Optional[CloudLLMService]:
+        """Resolve the first enabled provider of a type (legacy "gemini" backend) via the pool."""
+        provider_id = self._type_aliases.get(provider_type)
+        if provider_id is None:
+            providers = await lister(enabled_only=True)
+            match = next((p for p in providers if p.get("provider_type") == provider_type), None)
+            if not match:
+                return None
+            provider_id = match["id"]
+            self._type_aliases[provider_type] = provider_id
+        return await self.aget(provider_id, loader)
+
+    def invalidate(self, provider_id: str) -> bool:
+        """Drop a provider from the pool (call after it is updated or deleted)."""
+        with self._lock:
+            cached = self._services.pop(provider_id, None)
+            # Type resolution may now point elsewhere (provider disabled/deleted)
+            self._type_aliases.clear()
+        if cached:
+            self._dispose(cached[1])
+            logger.info(f"♻️ Cloud provider pool: invalidated {provider_id}")
+        return cached is not None
+
+    def clear_aliases(self):
+        """Forget type resolution (call after a provider is created or made default)."""
+        with self._lock:
+            self._type_aliases.clear()
+
+    def clear(self):
+        """Drop every pooled provider."""
+        with self._lock:
+            services = [svc for _, svc in self._services.values()]
+            self._services.clear()
+            self._type_aliases.clear()
+        for service in services:
+            self._dispose(service)
+
+    # In-flight streams may still hold a replaced instance; close it after this delay
+    DISPOSE_GRACE_SECONDS = 120.0
+
+    def _dispose(self, service: CloudLLMService):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop (sync caller): clients are released with the instance
+
+        async def _close_later():
+            await asyncio.sleep(self.DISPOSE_GRACE_SECONDS)
+            try:
+                service.close()
+                await service.aclose()
+            except Exception as e:
+                logger.debug(f"Cloud provider pool: close failed: {e}")
+
+        loop.create_task(_close_later())
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._services),
+                "max_size": self.max_size,
+                "providers": list(self._services.keys()),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+# Global pool shared by routers (widget / llm_override / chat streams)
+cloud_provider_pool = CloudProviderPool()
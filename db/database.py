@@ -1,20 +1,33 @@
 """
 SQLite database connection and session management.
 Uses async SQLAlchemy with aiosqlite driver.
+
+Modes (SQLITE_MODE):
+- "wal" (default): WAL journal, synchronous=NORMAL, mmap/cache pragmas.
+  Reads go to a pool of read-only connections; all writes go through a
+  single writer connection (pool of one, callers queue on checkout), so
+  writers never fight over the database lock.
+- "static": one shared connection for everything (previous behavior).
 """
 
 import logging
+import os
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 
-from sqlalchemy import text
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import TextClause
 
 
 logger = logging.getLogger(__name__)
@@ -24,22 +37,130 @@ DB_DIR = Path(__file__).parent.parent / "data"
 DB_PATH = DB_DIR / "secretary.db"
 DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
 
-# Create async engine
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,  # Set to True for SQL query logging
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,  # Use StaticPool for SQLite
-)
+# Concurrency settings
+SQLITE_MODE = os.getenv("SQLITE_MODE", "wal").lower()
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "4"))
+SQLITE_WRITE_TIMEOUT = float(os.getenv("SQLITE_WRITE_TIMEOUT", "30"))
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "32"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+
+
+def _set_pragmas(dbapi_connection, read_only: bool) -> None:
+    cursor = dbapi_connection.cursor()
+    if not read_only:
+        # Persistent for the database file; only the writer needs to set it
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_WRITE_TIMEOUT * 1000)}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def create_engines(url: str = DATABASE_URL, mode: str = SQLITE_MODE) -> tuple:
+    """
+    Create (write_engine, read_engine) for the given mode.
+    In "static" mode both are the same single-connection engine.
+    """
+    if mode == "static":
+        static = create_async_engine(
+            url,
+            echo=False,  # Set to True for SQL query logging
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,  # Use StaticPool for SQLite
+        )
+        return static, static
+
+    if mode != "wal":
+        raise ValueError(f"Unknown SQLITE_MODE: {mode!r} (expected 'wal' or 'static')")
+
+    write_engine = create_async_engine(
+        url,
+        echo=False,
+        connect_args={"check_same_thread": False},
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=SQLITE_WRITE_TIMEOUT,
+    )
+    read_engine = create_async_engine(
+        url,
+        echo=False,
+        connect_args={"check_same_thread": False},
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=SQLITE_READ_POOL_SIZE,
+        max_overflow=0,
+        pool_timeout=SQLITE_WRITE_TIMEOUT,
+    )
+    event.listen(
+        write_engine.sync_engine, "connect", lambda conn, _: _set_pragmas(conn, read_only=False)
+    )
+    event.listen(
+        read_engine.sync_engine, "connect", lambda conn, _: _set_pragmas(conn, read_only=True)
+    )
+    return write_engine, read_engine
+
+
+def _is_read(clause) -> bool:
+    if isinstance(clause, Select):
+        return True
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip().upper().startswith("SELECT")
+    # CompoundSelect (UNION) and similar
+    return bool(getattr(clause, "is_select", False))
+
+
+class RoutingSession(Session):
+    """
+    Session that reads from the read pool until its transaction writes.
+
+    From the first flush/INSERT/UPDATE/DELETE until commit or rollback every
+    statement uses the writer, so the transaction sees its own changes.
+    """
+
+    write_bind: Optional[Engine] = None
+    read_bind: Optional[Engine] = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.read_bind is None or self.read_bind is self.write_bind:
+            return self.write_bind
+        if self.info.get("db_writer") or self._flushing or not _is_read(clause):
+            self.info["db_writer"] = True
+            return self.write_bind
+        return self.read_bind
+
+
+def create_session_factory(write_engine: AsyncEngine, read_engine: AsyncEngine):
+    """async_sessionmaker whose sessions route reads and writes between the engines."""
+    session_class = type(
+        "BoundRoutingSession",
+        (RoutingSession,),
+        {"write_bind": write_engine.sync_engine, "read_bind": read_engine.sync_engine},
+    )
+    event.listen(session_class, "after_transaction_end", _release_writer)
+    return async_sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=session_class,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+
+
+def _release_writer(session: Session, transaction) -> None:
+    # Commit, rollback or close of the outermost transaction ends write routing
+    if transaction.parent is None:
+        session.info.pop("db_writer", None)
+
+
+# Create async engines
+engine, read_engine = create_engines()
 
 # Session factory
-AsyncSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autocommit=False,
-    autoflush=False,
-)
+AsyncSessionLocal = create_session_factory(engine, read_engine)
 
 
 async def init_db() -> None:
@@ -55,7 +176,7 @@ async def init_db() -> None:
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
-    logger.info(f"📦 Database initialized at {DB_PATH}")
+    logger.info(f"📦 Database initialized at {DB_PATH} (mode: {SQLITE_MODE})")
 
 
 async def close_db() -> None:
@@ -64,6 +185,8 @@ async def close_db() -> None:
     Call this on application shutdown.
     """
     await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
     logger.info("📦 Database connections closed")
 
 
@@ -110,6 +233,9 @@ async def get_db_status() -> dict:
             "path": str(DB_PATH),
             "size_bytes": db_size,
             "size_mb": round(db_size / (1024 * 1024), 2),
+            "mode": SQLITE_MODE,
+            "write_pool": engine.pool.status(),
+            "read_pool": read_engine.pool.status(),
         }
     except Exception as e:
         logger.error(f"Database health check failed: {e}")
@@ -32,6 +32,8 @@ from db.repositories import (
     WhatsAppInstanceRepository,
     WidgetInstanceRepository,
 )
+from db.usage_quota import usage_quota
+from db.usage_sink import usage_sink
 
 
 logger = logging.getLogger(__name__)
@@ -67,11 +69,17 @@ class DatabaseManager:
         if not redis_ok:
             logger.warning("⚠️ Redis not available, caching disabled")
 
+        await usage_sink.start()
+        await usage_quota.start()
+
         self._initialized = True
         logger.info("✅ Database ready")
 
     async def shutdown(self) -> None:
         """Close all connections."""
+        # Pending usage events must reach the database before it is closed
+        await usage_quota.stop()
+        await usage_sink.stop()
         await close_db()
         await close_redis()
         self._initialized = False
@@ -85,6 +93,8 @@ class DatabaseManager:
             "database": {
                 "sqlite": db_status,
                 "redis": redis_status,
+                "usage_sink": usage_sink.get_stats(),
+                "usage_quota": usage_quota.get_stats(),
             }
         }
 
@@ -251,15 +261,37 @@ class AsyncChatManager:
             )
             return result.scalar() or 0
 
+    async def get_message_times(
+        self,
+        session_id: str,
+        role: str,
+        since: datetime,
+    ) -> List[datetime]:
+        """Creation times of messages in a session by role since a given time."""
+        from sqlalchemy import select
+
+        from db.models import ChatMessage
+
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(ChatMessage.created).where(
+                    ChatMessage.session_id == session_id,
+                    ChatMessage.role == role,
+                    ChatMessage.created >= since,
+                )
+            )
+            return list(result.scalars().all())
+
     async def get_messages_for_llm(
         self,
         session_id: str,
         system_prompt: Optional[str] = None,
+        token_budget: Optional[int] = None,
     ) -> List[dict]:
-        """Get messages in LLM format."""
+        """Get messages in LLM format (newest history within the token budget)."""
         async with AsyncSessionLocal() as session:
             repo = ChatRepository(session)
-            return await repo.get_messages_for_llm(session_id, system_prompt)
+            return await repo.get_messages_for_llm(session_id, system_prompt, token_budget)
 
 
 # ============== FAQ Manager ==============
@@ -483,6 +515,28 @@ class AsyncTelegramSessionManager:
 class AsyncBotInstanceManager:
     """Async manager for Telegram bot instances."""
 
+    CONFIG_CACHE_TTL = 300  # 5 minutes; every write through this manager invalidates
+
+    def __init__(self) -> None:
+        # instance_id -> (expires_at, instance or None)
+        self._config_cache: Dict[str, tuple] = {}
+
+    async def get_cached_instance(self, instance_id: str) -> Optional[dict]:
+        """Bot instance config (no owner filter) served from memory, for per-message checks."""
+        cached = self._config_cache.get(instance_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        instance = await self.get_instance(instance_id)
+        self._config_cache[instance_id] = (time.monotonic() + self.CONFIG_CACHE_TTL, instance)
+        return instance
+
+    def invalidate_config(self, instance_id: Optional[str] = None) -> None:
+        """Drop cached config of one instance (or all)."""
+        if instance_id is None:
+            self._config_cache.clear()
+        else:
+            self._config_cache.pop(instance_id, None)
+
     async def list_instances(
         self, enabled_only: bool = False, owner_id: Optional[int] = None
     ) -> List[dict]:
@@ -509,31 +563,41 @@ class AsyncBotInstanceManager:
         """Create new bot instance."""
         async with AsyncSessionLocal() as session:
             repo = BotInstanceRepository(session)
-            return await repo.create_instance(name, **kwargs)
+            instance = await repo.create_instance(name, **kwargs)
+        self.invalidate_config(instance["id"])
+        return instance
 
     async def update_instance(self, instance_id: str, **kwargs: Any) -> Optional[dict]:
         """Update bot instance."""
         async with AsyncSessionLocal() as session:
             repo = BotInstanceRepository(session)
-            return await repo.update_instance(instance_id, **kwargs)
+            instance = await repo.update_instance(instance_id, **kwargs)
+        self.invalidate_config(instance_id)
+        return instance
 
     async def delete_instance(self, instance_id: str, owner_id: Optional[int] = None) -> bool:
         """Delete bot instance."""
         async with AsyncSessionLocal() as session:
             repo = BotInstanceRepository(session)
-            return await repo.delete_instance(instance_id, owner_id=owner_id)
+            deleted = await repo.delete_instance(instance_id, owner_id=owner_id)
+        self.invalidate_config(instance_id)
+        return deleted
 
     async def set_enabled(self, instance_id: str, enabled: bool) -> bool:
         """Enable or disable bot instance."""
         async with AsyncSessionLocal() as session:
             repo = BotInstanceRepository(session)
-            return await repo.set_enabled(instance_id, enabled)
+            updated = await repo.set_enabled(instance_id, enabled)
+        self.invalidate_config(instance_id)
+        return updated
 
     async def set_auto_start(self, instance_id: str, auto_start: bool) -> bool:
         """Set auto-start flag for bot instance."""
         async with AsyncSessionLocal() as session:
             repo = BotInstanceRepository(session)
-            return await repo.set_auto_start(instance_id, auto_start)
+            updated = await repo.set_auto_start(instance_id, auto_start)
+        self.invalidate_config(instance_id)
+        return updated
 
     async def get_auto_start_instances(self) -> List[dict]:
         """Get all bot instances that should auto-start."""
@@ -563,7 +627,9 @@ class AsyncBotInstanceManager:
         """Import from legacy telegram_config format."""
         async with AsyncSessionLocal() as session:
             repo = BotInstanceRepository(session)
-            return await repo.import_from_legacy_config(config, instance_id)
+            instance = await repo.import_from_legacy_config(config, instance_id)
+        self.invalidate_config(instance_id)
+        return instance
 
 
 # ============== Widget Instance Manager ==============
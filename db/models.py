@@ -190,6 +190,8 @@ class ChatMessage(Base):
         index=True,
     )
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    # Approximate LLM token count, filled on insert or lazily by the history loader
+    token_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
     # Relationships
     session: Mapped["ChatSession"] = relationship("ChatSession", back_populates="messages")
@@ -205,7 +207,11 @@ class ChatMessage(Base):
         remote_side=[id],
     )
 
-    __table_args__ = (Index("ix_chat_messages_session_created", "session_id", "created"),)
+    __table_args__ = (
+        Index("ix_chat_messages_session_created", "session_id", "created"),
+        # Branch tree walks: children of a message within a session
+        Index("ix_chat_messages_session_parent", "session_id", "parent_id"),
+    )
 
     def to_dict(self) -> dict:
         return {
@@ -1813,6 +1819,48 @@ class UsageLog(Base):
         }
 
 
+class UsageRollupHourly(Base):
+    """Hourly usage totals by service/source/action, maintained on insert."""
+
+    __tablename__ = "usage_rollup_hourly"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime)  # start of the hour (UTC)
+    service_type: Mapped[str] = mapped_column(String(20))
+    source: Mapped[str] = mapped_column(String(20), default="")  # "" = no source
+    action: Mapped[str] = mapped_column(String(50))
+    units: Mapped[int] = mapped_column(Integer, default=0)
+    requests: Mapped[int] = mapped_column(Integer, default=0)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0.0)
+
+    __table_args__ = (
+        Index(
+            "ix_usage_rollup_hourly_key", "bucket", "service_type", "source", "action", unique=True
+        ),
+    )
+
+
+class UsageRollupDaily(Base):
+    """Daily usage totals by service/source/action, maintained on insert."""
+
+    __tablename__ = "usage_rollup_daily"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime)  # start of the day (UTC)
+    service_type: Mapped[str] = mapped_column(String(20))
+    source: Mapped[str] = mapped_column(String(20), default="")  # "" = no source
+    action: Mapped[str] = mapped_column(String(50))
+    units: Mapped[int] = mapped_column(Integer, default=0)
+    requests: Mapped[int] = mapped_column(Integer, default=0)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0.0)
+
+    __table_args__ = (
+        Index(
+            "ix_usage_rollup_daily_key", "bucket", "service_type", "source", "action", unique=True
+        ),
+    )
+
+
 class UsageLimits(Base):
     """Usage limits and quotas configuration."""
 
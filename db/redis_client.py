@@ -101,9 +101,12 @@ class CacheKey:
 
     SESSION = "session"
     CHAT_SESSION = "chat:session"
+    CHAT_LLM_HISTORY = "chat:llm"
+    CHAT_LLM_VERSION = "chat:llmver"
     FAQ = "faq:cache"
     METRICS = "metrics"
     RATE_LIMIT = "ratelimit"
+    USAGE_QUOTA = "usage:quota"
     TTS_PRESET = "tts:preset"
     CONFIG = "config"
 
@@ -212,10 +215,86 @@ async def get_cached_session(session_id: str) -> Optional[dict]:
     return await cache_get(key)
 
 
+# Outlives cached histories; refreshed on every invalidation
+LLM_HISTORY_VERSION_TTL = 7 * 24 * 3600
+
+# SET history only while the session's history version is still ARGV[1]
+_CAS_SET_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') == tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
 async def invalidate_session_cache(session_id: str) -> bool:
-    """Invalidate chat session cache."""
-    key = f"{CacheKey.CHAT_SESSION}:{session_id}"
-    return await cache_delete(key)
+    """
+    Invalidate chat session cache (session data and LLM history) and bump the
+    LLM history version, so histories read before this call can't be cached.
+    """
+    if not redis_client:
+        return False
+    version_key = f"{CacheKey.CHAT_LLM_VERSION}:{session_id}"
+    try:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(
+            f"{CacheKey.CHAT_SESSION}:{session_id}",
+            f"{CacheKey.CHAT_LLM_HISTORY}:{session_id}",
+        )
+        pipe.incr(version_key)
+        pipe.expire(version_key, LLM_HISTORY_VERSION_TTL)
+        await pipe.execute()
+        return True
+    except Exception as e:
+        logger.debug(f"Cache delete error for session {session_id}: {e}")
+        return False
+
+
+async def get_llm_history_version(session_id: str) -> Optional[int]:
+    """Current LLM history version of a chat session (None if Redis unavailable)."""
+    if not redis_client:
+        return None
+    try:
+        value = await redis_client.get(f"{CacheKey.CHAT_LLM_VERSION}:{session_id}")
+        return int(value or 0)
+    except Exception as e:
+        logger.debug(f"Cache version error for session {session_id}: {e}")
+        return None
+
+
+async def cache_llm_history(
+    session_id: str, data: dict, version: int, ttl_seconds: int = 1800
+) -> bool:
+    """
+    Cache LLM-formatted active history of a chat session, built at `version`.
+
+    Compare-and-set: nothing is written if the session was invalidated since
+    `version` was read, so a history loaded before a concurrent write never
+    replaces the fresh state. Returns True if cached.
+    """
+    if not redis_client:
+        return False
+    try:
+        stored = await redis_client.eval(
+            _CAS_SET_SCRIPT,
+            2,
+            f"{CacheKey.CHAT_LLM_VERSION}:{session_id}",
+            f"{CacheKey.CHAT_LLM_HISTORY}:{session_id}",
+            version,
+            json.dumps({**data, "version": version}, ensure_ascii=False),
+            ttl_seconds,
+        )
+        return bool(stored)
+    except Exception as e:
+        logger.debug(f"Cache set error for session {session_id}: {e}")
+        return False
+
+
+async def get_cached_llm_history(session_id: str) -> Optional[dict]:
+    """Get cached LLM-formatted active history of a chat session."""
+    key = f"{CacheKey.CHAT_LLM_HISTORY}:{session_id}"
+    return await cache_get(key)
 
 
 # ============== FAQ Cache ==============
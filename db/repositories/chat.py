@@ -1,25 +1,49 @@
 """
 Chat repository for managing chat sessions and messages.
+
+Branch operations (edit, regenerate, switch) are single recursive-CTE UPDATE
+statements, so their cost is one round-trip regardless of subtree size.
+
+LLM history (get_messages_for_llm) is the active path read newest-first up to
+a token budget, with per-message token counts memoized in chat_messages and
+the formatted list cached in Redis and extended in place by add_message.
 """
 
 import hashlib
+import math
+import os
 import time
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from sqlalchemy import delete, select, update
+from sqlalchemy import and_, delete, func, literal, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload
 
 from db.models import ChatMessage, ChatSession
 from db.redis_client import (
+    cache_llm_history,
     cache_session,
+    get_cached_llm_history,
     get_cached_session,
+    get_llm_history_version,
     invalidate_session_cache,
 )
 from db.repositories.base import BaseRepository
 
 
+# Token budget for history sent to the LLM (0 = unlimited)
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "8000"))
+
+# First keyset page of the history loader; doubles on each further page
+_HISTORY_PAGE = 32
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count: ~3 chars per token (Cyrillic-heavy) + message overhead."""
+    return math.ceil(len(text) / 3) + 4
+
+
 class ChatRepository(BaseRepository[ChatSession]):
     """Repository for chat sessions and messages."""
 
@@ -219,21 +243,24 @@ class ChatRepository(BaseRepository[ChatSession]):
         parent_id: Optional[str] = None,
     ) -> Optional[dict]:
         """Add message to session. Auto-detects parent if not provided."""
-        result = await self.session.execute(
-            select(ChatSession)
-            .options(selectinload(ChatSession.messages))
-            .where(ChatSession.id == session_id)
-        )
-        session = result.scalar_one_or_none()
+        session = await self.session.get(ChatSession, session_id)
 
         if not session:
             return None
 
+        # Last active message in the session: default parent, and "is this the first one"
+        result = await self.session.execute(
+            select(ChatMessage.id)
+            .where(ChatMessage.session_id == session_id)
+            .where(ChatMessage.is_active.is_(True))
+            .order_by(ChatMessage.created.desc(), ChatMessage.id.desc())
+            .limit(1)
+        )
+        last_active_id = result.scalar_one_or_none()
+
         # Auto-detect parent: last active message in the session
         if parent_id is None:
-            active_msgs = [m for m in session.messages if m.is_active]
-            if active_msgs:
-                parent_id = active_msgs[-1].id
+            parent_id = last_active_id
 
         message = ChatMessage(
             id=self._generate_message_id(),
@@ -244,21 +271,32 @@ class ChatRepository(BaseRepository[ChatSession]):
             created=datetime.utcnow(),
             parent_id=parent_id,
             is_active=True,
+            token_count=estimate_tokens(content),
         )
 
         self.session.add(message)
 
         # Auto-generate title from first message
-        active_msgs = [m for m in session.messages if m.is_active]
-        if len(active_msgs) == 0 and session.title == "Новый чат":
+        if last_active_id is None and session.title == "Новый чат":
             session.title = content[:50] + ("..." if len(content) > 50 else "")
 
         session.updated = datetime.utcnow()
 
+        history = await get_cached_llm_history(session_id)
+
         await self.session.commit()
         await self.session.refresh(message)
         await invalidate_session_cache(session_id)
 
+        # Extend the cached LLM history when the message continues its path and
+        # our invalidation is the only one since the snapshot (an edit, branch
+        # switch or another message in between means rebuilding lazily)
+        if history is not None and history.get("leaf_id") == parent_id:
+            version = await get_llm_history_version(session_id)
+            if version is not None and version == history.get("version", -1) + 1:
+                self._append_history(history, message)
+                await cache_llm_history(session_id, history, version)
+
         return message.to_dict()
 
     async def edit_message(
@@ -291,6 +329,7 @@ class ChatRepository(BaseRepository[ChatSession]):
             created=datetime.utcnow(),
             parent_id=message.parent_id,
             is_active=True,
+            token_count=estimate_tokens(content),
         )
 
         self.session.add(new_message)
@@ -345,22 +384,26 @@ class ChatRepository(BaseRepository[ChatSession]):
         return message.to_dict()
 
     async def _deactivate_branch(self, session_id: str, message_id: str) -> None:
-        """Deactivate a message and all its active descendants recursively."""
-        # Deactivate the message itself
-        await self.session.execute(
-            update(ChatMessage).where(ChatMessage.id == message_id).values(is_active=False)
-        )
-
-        # Find active children
-        children_result = await self.session.execute(
+        """Deactivate a message and all its active descendants (one recursive UPDATE)."""
+        child = aliased(ChatMessage)
+        branch = (
             select(ChatMessage.id)
-            .where(ChatMessage.parent_id == message_id)
-            .where(ChatMessage.is_active.is_(True))
+            .where(ChatMessage.id == message_id)
+            .where(ChatMessage.session_id == session_id)
+            .cte("branch", recursive=True)
+        )
+        branch = branch.union_all(
+            select(child.id)
+            .join(branch, child.parent_id == branch.c.id)
+            .where(child.session_id == session_id)
+            .where(child.is_active.is_(True))
+        )
+        await self.session.execute(
+            update(ChatMessage)
+            .where(ChatMessage.id.in_(select(branch.c.id)))
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
         )
-        child_ids = [row[0] for row in children_result.all()]
-
-        for child_id in child_ids:
-            await self._deactivate_branch(session_id, child_id)
 
     async def get_active_messages(self, session_id: str) -> List[dict]:
         """Get ordered list of active messages for display."""
@@ -375,61 +418,76 @@ class ChatRepository(BaseRepository[ChatSession]):
 
     async def get_branch_tree(self, session_id: str) -> List[dict]:
         """Get full branch tree structure for a session."""
+        # Only the columns the tree needs: no full message bodies
         result = await self.session.execute(
-            select(ChatMessage)
+            select(
+                ChatMessage.id,
+                ChatMessage.parent_id,
+                ChatMessage.role,
+                func.substr(ChatMessage.content, 1, 50),
+                func.length(ChatMessage.content) > 50,
+                ChatMessage.is_active,
+            )
             .where(ChatMessage.session_id == session_id)
             .order_by(ChatMessage.created.asc())
         )
-        all_messages = result.scalars().all()
+        rows = result.all()
 
-        if not all_messages:
+        if not rows:
             return []
 
-        # Build lookup maps
-        children_map: Dict[Optional[str], List[ChatMessage]] = {}
-        for m in all_messages:
-            children_map.setdefault(m.parent_id, []).append(m)
-
-        def build_node(msg: ChatMessage) -> dict:
-            kids = children_map.get(msg.id, [])
-            return {
-                "id": msg.id,
-                "role": msg.role,
-                "content_preview": msg.content[:50] + ("..." if len(msg.content) > 50 else ""),
-                "is_active": msg.is_active,
-                "children": [build_node(c) for c in kids],
+        # Nodes are linked in creation order; iterative, so deep chains don't hit
+        # the recursion limit
+        nodes: Dict[str, dict] = {}
+        for msg_id, _parent_id, role, preview, truncated, is_active in rows:
+            nodes[msg_id] = {
+                "id": msg_id,
+                "role": role,
+                "content_preview": preview + ("..." if truncated else ""),
+                "is_active": is_active,
+                "children": [],
             }
 
-        # Root nodes are messages with no parent
-        roots = children_map.get(None, [])
-        return [build_node(r) for r in roots]
+        # Root nodes are messages with no parent (or whose parent is gone)
+        roots: List[dict] = []
+        for msg_id, parent_id, *_ in rows:
+            parent = nodes.get(parent_id) if parent_id is not None else None
+            if parent is not None:
+                parent["children"].append(nodes[msg_id])
+            elif parent_id is None:
+                roots.append(nodes[msg_id])
+        return roots
 
     async def get_sibling_info(self, session_id: str) -> Dict[str, dict]:
         """Get sibling info for messages that have alternatives.
 
         Returns dict mapping message_id to {index, total, siblings: [id, ...]}.
         """
-        result = await self.session.execute(
-            select(ChatMessage)
+        # One pass over (session_id, parent_id): only groups with alternatives come back
+        siblings_count = (
+            func.count().over(partition_by=ChatMessage.parent_id).label("siblings_count")
+        )
+        ranked = (
+            select(ChatMessage.id, ChatMessage.parent_id, ChatMessage.created, siblings_count)
             .where(ChatMessage.session_id == session_id)
-            .order_by(ChatMessage.created.asc())
+            .subquery()
+        )
+        result = await self.session.execute(
+            select(ranked.c.id, ranked.c.parent_id)
+            .where(ranked.c.siblings_count > 1)
+            .order_by(ranked.c.parent_id, ranked.c.created.asc())
         )
-        all_messages = result.scalars().all()
 
-        # Group by parent_id
-        by_parent: Dict[Optional[str], List[ChatMessage]] = {}
-        for m in all_messages:
-            by_parent.setdefault(m.parent_id, []).append(m)
+        by_parent: Dict[Optional[str], List[str]] = {}
+        for msg_id, parent_id in result.all():
+            by_parent.setdefault(parent_id, []).append(msg_id)
 
         sibling_info: Dict[str, dict] = {}
-        for parent_id, siblings in by_parent.items():
-            if len(siblings) <= 1:
-                continue
-            sibling_ids = [s.id for s in siblings]
-            for i, s in enumerate(siblings):
-                sibling_info[s.id] = {
+        for sibling_ids in by_parent.values():
+            for i, msg_id in enumerate(sibling_ids):
+                sibling_info[msg_id] = {
                     "index": i,
-                    "total": len(siblings),
+                    "total": len(sibling_ids),
                     "siblings": sibling_ids,
                 }
 
@@ -438,50 +496,26 @@ class ChatRepository(BaseRepository[ChatSession]):
     async def switch_branch(self, session_id: str, message_id: str) -> bool:
         """Switch active branch to the given message.
 
-        Deactivates siblings and their descendants, activates this message
-        and its ancestors up to root.
+        The active path becomes: ancestors up to root, this message, and the
+        most recent child chain below it. Every other message in the session
+        is deactivated. Done as one recursive-CTE UPDATE.
         """
         result = await self.session.execute(
-            select(ChatMessage)
+            select(ChatMessage.id)
             .where(ChatMessage.id == message_id)
             .where(ChatMessage.session_id == session_id)
         )
-        message = result.scalar_one_or_none()
-
-        if not message:
+        if result.scalar_one_or_none() is None:
             return False
 
-        # Find siblings (messages with same parent_id in same session)
-        siblings_result = await self.session.execute(
-            select(ChatMessage)
+        on_path = ChatMessage.id.in_(self._active_path(session_id, message_id))
+        await self.session.execute(
+            update(ChatMessage)
             .where(ChatMessage.session_id == session_id)
-            .where(ChatMessage.parent_id == message.parent_id)
-            .where(ChatMessage.id != message_id)
+            .where(ChatMessage.is_active.is_not(on_path))
+            .values(is_active=on_path)
+            .execution_options(synchronize_session=False)
         )
-        siblings = siblings_result.scalars().all()
-
-        # Deactivate siblings and their descendants
-        for sibling in siblings:
-            if sibling.is_active:
-                await self._deactivate_branch(session_id, sibling.id)
-
-        # Activate this message
-        message.is_active = True
-
-        # Activate the active path from this message downward (first active child chain)
-        await self._activate_default_path(session_id, message_id)
-
-        # Activate all ancestors up to root
-        current_parent_id = message.parent_id
-        while current_parent_id:
-            parent_result = await self.session.execute(
-                select(ChatMessage).where(ChatMessage.id == current_parent_id)
-            )
-            parent = parent_result.scalar_one_or_none()
-            if not parent:
-                break
-            parent.is_active = True
-            current_parent_id = parent.parent_id
 
         # Update session timestamp
         session = await self.session.get(ChatSession, session_id)
@@ -493,30 +527,41 @@ class ChatRepository(BaseRepository[ChatSession]):
 
         return True
 
-    async def _activate_default_path(self, session_id: str, message_id: str) -> None:
-        """Activate the first child chain from a message (default path forward)."""
-        children_result = await self.session.execute(
-            select(ChatMessage)
-            .where(ChatMessage.parent_id == message_id)
+    def _active_path(self, session_id: str, message_id: str):
+        """
+        SELECT of message ids on the path through message_id: ancestors to root
+        (recursive CTE upward) plus the most-recent-child chain downward.
+        """
+        parent = aliased(ChatMessage)
+        up = (
+            select(ChatMessage.id, ChatMessage.parent_id)
+            .where(ChatMessage.id == message_id)
             .where(ChatMessage.session_id == session_id)
-            .order_by(ChatMessage.created.desc())
+            .cte("path_up", recursive=True)
+        )
+        up = up.union_all(
+            select(parent.id, parent.parent_id)
+            .join(up, parent.id == up.c.parent_id)
+            .where(parent.session_id == session_id)
         )
-        children = children_result.scalars().all()
-
-        if not children:
-            return
-
-        # Pick the most recent child as the active one
-        active_child = children[0]
-        active_child.is_active = True
-
-        # Deactivate other children
-        for child in children[1:]:
-            if child.is_active:
-                await self._deactivate_branch(session_id, child.id)
 
-        # Continue down the chain
-        await self._activate_default_path(session_id, active_child.id)
+        child = aliased(ChatMessage)
+        newest = aliased(ChatMessage)
+        down = select(literal(message_id).label("id")).cte("path_down", recursive=True)
+        newest_child = (
+            select(newest.id)
+            .where(newest.parent_id == child.parent_id)
+            .where(newest.session_id == session_id)
+            .order_by(newest.created.desc(), newest.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        down = down.union_all(
+            select(child.id).join(
+                down, and_(child.parent_id == down.c.id, child.id == newest_child)
+            )
+        )
+        return select(up.c.id).union(select(down.c.id))
 
     async def delete_message(
         self,
@@ -556,32 +601,127 @@ class ChatRepository(BaseRepository[ChatSession]):
         self,
         session_id: str,
         system_prompt: Optional[str] = None,
+        token_budget: Optional[int] = None,
     ) -> List[dict]:
-        """Get active messages in LLM format (role, content)."""
-        result = await self.session.execute(
-            select(ChatSession)
-            .options(selectinload(ChatSession.messages))
-            .where(ChatSession.id == session_id)
-        )
-        session = result.scalar_one_or_none()
+        """Get active messages in LLM format (role, content).
 
-        if not session:
-            return []
+        Only the newest active messages that fit into token_budget are returned
+        (default CHAT_HISTORY_TOKEN_BUDGET, 0 = unlimited); the newest message
+        is always included.
+        """
+        budget = CHAT_HISTORY_TOKEN_BUDGET if token_budget is None else token_budget
+
+        history = await get_cached_llm_history(session_id)
+        if history is None or history.get("budget") != budget:
+            # Version read before loading: a write during the load makes the
+            # compare-and-set skip caching what may already be stale
+            version = await get_llm_history_version(session_id)
+            history = await self._load_history(session_id, budget)
+            if history is None:
+                return []
+            if version is not None:
+                await cache_llm_history(session_id, history, version)
 
         messages = []
 
         # Add system prompt
-        prompt = session.system_prompt or system_prompt
+        prompt = history["system_prompt"] or system_prompt
         if prompt:
             messages.append({"role": "system", "content": prompt})
 
         # Add active message history only
-        for msg in session.messages:
-            if msg.is_active:
-                messages.append({"role": msg.role, "content": msg.content})
+        messages.extend({"role": m["role"], "content": m["content"]} for m in history["messages"])
 
         return messages
 
+    async def _load_history(self, session_id: str, budget: int) -> Optional[dict]:
+        """Read the active path newest-first until the token budget is spent.
+
+        Token counts missing in the DB (rows written before the column existed)
+        are computed once and stored back.
+        """
+        result = await self.session.execute(
+            select(ChatSession.system_prompt).where(ChatSession.id == session_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+
+        newest_first: List[dict] = []
+        total = 0
+        truncated = False
+        missing: List[dict] = []
+        cursor = None
+        page = _HISTORY_PAGE
+
+        while not truncated:
+            query = (
+                select(
+                    ChatMessage.id,
+                    ChatMessage.created,
+                    ChatMessage.role,
+                    ChatMessage.content,
+                    ChatMessage.token_count,
+                )
+                .where(ChatMessage.session_id == session_id)
+                .where(ChatMessage.is_active.is_(True))
+                .order_by(ChatMessage.created.desc(), ChatMessage.id.desc())
+                .limit(page)
+            )
+            if cursor is not None:
+                query = query.where(tuple_(ChatMessage.created, ChatMessage.id) < tuple_(*cursor))
+            rows = (await self.session.execute(query)).all()
+
+            for msg_id, created, role, content, tokens in rows:
+                if tokens is None:
+                    tokens = estimate_tokens(content)
+                    missing.append({"id": msg_id, "token_count": tokens})
+                if budget and newest_first and total + tokens > budget:
+                    truncated = True
+                    break
+                total += tokens
+                newest_first.append(
+                    {"id": msg_id, "role": role, "content": content, "tokens": tokens}
+                )
+                cursor = (created, msg_id)
+
+            if len(rows) < page:
+                break
+            page *= 2
+
+        if missing:
+            await self.session.execute(update(ChatMessage), missing)
+            await self.session.commit()
+
+        newest_first.reverse()
+        return {
+            "system_prompt": row[0],
+            "budget": budget,
+            "leaf_id": newest_first[-1]["id"] if newest_first else None,
+            "tokens": total,
+            "truncated": truncated,
+            "messages": [
+                {"role": m["role"], "content": m["content"], "tokens": m["tokens"]}
+                for m in newest_first
+            ],
+        }
+
+    @staticmethod
+    def _append_history(history: dict, message: ChatMessage) -> None:
+        """Append a new leaf to a cached history and drop the oldest messages over budget."""
+        tokens = message.token_count or estimate_tokens(message.content)
+        history["messages"].append(
+            {"role": message.role, "content": message.content, "tokens": tokens}
+        )
+        history["tokens"] += tokens
+        history["leaf_id"] = message.id
+
+        budget = history["budget"]
+        messages = history["messages"]
+        while budget and history["tokens"] > budget and len(messages) > 1:
+            history["tokens"] -= messages.pop(0)["tokens"]
+            history["truncated"] = True
+
     async def get_session_count(self) -> int:
         """Get total number of sessions."""
         return await self.count()
@@ -1,16 +1,36 @@
-"""Usage tracking repository for TTS/STT/LLM services."""
+"""Usage tracking repository for TTS/STT/LLM services.
+
+Every insert into usage_log also upserts hourly and daily rollups
+(usage_rollup_hourly/daily) in the same transaction; statistics and limit
+checks read the rollups instead of scanning usage_log.
+"""
 
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
-from sqlalchemy import and_, delete, func, select
+from sqlalchemy import and_, delete, func, insert, literal, select, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.models import UsageLimits, UsageLog
+from db.models import UsageLimits, UsageLog, UsageRollupDaily, UsageRollupHourly
 from db.repositories.base import BaseRepository
 
 
+# Rows per multi-row INSERT (8 columns each; stays under SQLite's 999 variables)
+_INSERT_CHUNK = 100
+
+_ROLLUP_KEY = ("bucket", "service_type", "source", "action")
+
+
+def _hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _day(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
 class UsageRepository(BaseRepository[UsageLog]):
     """Repository for usage tracking and analytics."""
 
@@ -39,10 +59,70 @@ class UsageRepository(BaseRepository[UsageLog]):
             details=json.dumps(details, ensure_ascii=False) if details else None,
         )
         self.session.add(entry)
+        await self._update_rollups(
+            [
+                {
+                    "timestamp": entry.timestamp,
+                    "service_type": service_type,
+                    "source": source,
+                    "action": action,
+                    "units_consumed": units_consumed,
+                    "cost_usd": cost_usd,
+                }
+            ]
+        )
         await self.session.commit()
         await self.session.refresh(entry)
         return entry.to_dict()
 
+    async def log_usage_batch(self, events: List[dict]) -> int:
+        """Insert buffered usage events with multi-row INSERTs in one transaction.
+
+        Events are dicts with UsageLog column names (details already JSON text).
+        """
+        for i in range(0, len(events), _INSERT_CHUNK):
+            await self.session.execute(insert(UsageLog).values(events[i : i + _INSERT_CHUNK]))
+        await self._update_rollups(events)
+        await self.session.commit()
+        return len(events)
+
+    async def _update_rollups(self, events: List[dict]) -> None:
+        """Add events to hourly and daily rollups (aggregated in memory, then upserted)."""
+        for model, truncate in ((UsageRollupHourly, _hour), (UsageRollupDaily, _day)):
+            totals: Dict[tuple, list] = {}
+            for event in events:
+                key = (
+                    truncate(event["timestamp"]),
+                    event["service_type"],
+                    event.get("source") or "",
+                    event["action"],
+                )
+                total = totals.setdefault(key, [0, 0, 0.0])
+                total[0] += event.get("units_consumed") or 0
+                total[1] += 1
+                total[2] += event.get("cost_usd") or 0.0
+
+            rows = [
+                {
+                    **dict(zip(_ROLLUP_KEY, key, strict=True)),
+                    "units": units,
+                    "requests": requests,
+                    "cost_usd": cost,
+                }
+                for key, (units, requests, cost) in totals.items()
+            ]
+            for i in range(0, len(rows), _INSERT_CHUNK):
+                stmt = sqlite_insert(model).values(rows[i : i + _INSERT_CHUNK])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=list(_ROLLUP_KEY),
+                    set_={
+                        "units": model.units + stmt.excluded.units,
+                        "requests": model.requests + stmt.excluded.requests,
+                        "cost_usd": model.cost_usd + stmt.excluded.cost_usd,
+                    },
+                )
+                await self.session.execute(stmt)
+
     async def get_usage(
         self,
         service_type: Optional[str] = None,
@@ -77,33 +157,79 @@ class UsageRepository(BaseRepository[UsageLog]):
         logs = result.scalars().all()
         return [log.to_dict() for log in logs]
 
+    async def _aggregate(
+        self,
+        group_by: str,
+        from_date: datetime,
+        service_type: Optional[str] = None,
+    ) -> List[tuple]:
+        """(group value, units, requests, cost) since from_date, grouped by a rollup column.
+
+        One UNION ALL query over three exact segments: usage_log for the partial
+        first hour, hourly rollups up to the first day boundary, daily rollups after.
+        """
+        first_hour = _hour(from_date)
+        if first_hour < from_date:
+            first_hour += timedelta(hours=1)
+        first_day = _day(first_hour)
+        if first_day < first_hour:
+            first_day += timedelta(days=1)
+
+        raw_group = (
+            func.coalesce(UsageLog.source, "")
+            if group_by == "source"
+            else getattr(UsageLog, group_by)
+        )
+        raw = select(
+            raw_group.label("key"),
+            UsageLog.units_consumed.label("units"),
+            literal(1).label("requests"),
+            func.coalesce(UsageLog.cost_usd, 0).label("cost_usd"),
+        ).where(UsageLog.timestamp >= from_date, UsageLog.timestamp < first_hour)
+        if service_type:
+            raw = raw.where(UsageLog.service_type == service_type)
+
+        segments = [raw]
+        for model, start, end in (
+            (UsageRollupHourly, first_hour, first_day),
+            (UsageRollupDaily, first_day, None),
+        ):
+            segment = select(
+                getattr(model, group_by).label("key"),
+                model.units,
+                model.requests,
+                model.cost_usd,
+            ).where(model.bucket >= start)
+            if end is not None:
+                segment = segment.where(model.bucket < end)
+            if service_type:
+                segment = segment.where(model.service_type == service_type)
+            segments.append(segment)
+
+        combined = union_all(*segments).subquery()
+        result = await self.session.execute(
+            select(
+                combined.c.key,
+                func.sum(combined.c.units),
+                func.sum(combined.c.requests),
+                func.sum(combined.c.cost_usd),
+            ).group_by(combined.c.key)
+        )
+        return list(result.all())
+
     async def get_usage_stats(
         self,
         service_type: Optional[str] = None,
         period_days: int = 30,
     ) -> Dict:
-        """Get usage statistics for a period."""
+        """Get usage statistics for a period (from rollups)."""
         from_date = datetime.utcnow() - timedelta(days=period_days)
 
-        # Build base condition
-        base_condition = UsageLog.timestamp >= from_date
-        if service_type:
-            base_condition = and_(base_condition, UsageLog.service_type == service_type)
-
         # Total usage by service
-        result = await self.session.execute(
-            select(
-                UsageLog.service_type,
-                func.sum(UsageLog.units_consumed),
-                func.count(UsageLog.id),
-                func.coalesce(func.sum(UsageLog.cost_usd), 0),
-            )
-            .where(UsageLog.timestamp >= from_date)
-            .group_by(UsageLog.service_type)
-        )
-
         by_service = {}
-        for service, total_units, count, total_cost in result.all():
+        for service, total_units, count, total_cost in await self._aggregate(
+            "service_type", from_date, service_type
+        ):
             by_service[service] = {
                 "units": int(total_units or 0),
                 "requests": int(count),
@@ -111,45 +237,41 @@ class UsageRepository(BaseRepository[UsageLog]):
             }
 
         # Usage by source (admin, telegram, widget)
-        result = await self.session.execute(
-            select(
-                UsageLog.source,
-                func.sum(UsageLog.units_consumed),
-                func.count(UsageLog.id),
-            )
-            .where(UsageLog.timestamp >= from_date)
-            .group_by(UsageLog.source)
-        )
-
         by_source = {}
-        for source, total_units, count in result.all():
+        for source, total_units, count, _cost in await self._aggregate(
+            "source", from_date, service_type
+        ):
             by_source[source or "unknown"] = {
                 "units": int(total_units or 0),
                 "requests": int(count),
             }
 
         # Daily breakdown for charts (last 7 days)
-        daily_breakdown = []
-        for i in range(min(7, period_days)):
-            day_start = datetime.utcnow().replace(
-                hour=0, minute=0, second=0, microsecond=0
-            ) - timedelta(days=i)
-            day_end = day_start + timedelta(days=1)
-
-            result = await self.session.execute(
-                select(
-                    func.sum(UsageLog.units_consumed),
-                    func.count(UsageLog.id),
-                    func.coalesce(func.sum(UsageLog.cost_usd), 0),
-                ).where(and_(UsageLog.timestamp >= day_start, UsageLog.timestamp < day_end))
+        today = _day(datetime.utcnow())
+        days = [today - timedelta(days=i) for i in range(min(7, period_days))]
+        query = (
+            select(
+                UsageRollupDaily.bucket,
+                func.sum(UsageRollupDaily.units),
+                func.sum(UsageRollupDaily.requests),
+                func.sum(UsageRollupDaily.cost_usd),
             )
-            row = result.one()
+            .where(UsageRollupDaily.bucket >= days[-1])
+            .group_by(UsageRollupDaily.bucket)
+        )
+        if service_type:
+            query = query.where(UsageRollupDaily.service_type == service_type)
+        per_day = {bucket: row for bucket, *row in (await self.session.execute(query)).all()}
+
+        daily_breakdown = []
+        for day_start in days:
+            units, count, cost = per_day.get(day_start, (0, 0, 0))
             daily_breakdown.append(
                 {
                     "date": day_start.strftime("%Y-%m-%d"),
-                    "units": int(row[0] or 0),
-                    "requests": int(row[1]),
-                    "cost_usd": float(row[2] or 0),
+                    "units": int(units or 0),
+                    "requests": int(count or 0),
+                    "cost_usd": float(cost or 0),
                 }
             )
 
@@ -176,15 +298,8 @@ class UsageRepository(BaseRepository[UsageLog]):
         else:
             period_start = now - timedelta(days=30)
 
-        result = await self.session.execute(
-            select(func.coalesce(func.sum(UsageLog.units_consumed), 0)).where(
-                and_(
-                    UsageLog.service_type == service_type,
-                    UsageLog.timestamp >= period_start,
-                )
-            )
-        )
-        return int(result.scalar() or 0)
+        rows = await self._aggregate("service_type", period_start, service_type)
+        return int(rows[0][1] or 0) if rows else 0
 
     async def cleanup_old_logs(self, days: int = 90) -> int:
         """Delete logs older than specified days."""
@@ -278,45 +393,51 @@ class UsageLimitsRepository(BaseRepository[UsageLimits]):
     ) -> Dict:
         """Check if usage is within limits and return status."""
         limits = await self.get_all_limits(enabled_only=True)
-        service_limits = [lim for lim in limits if lim["service_type"] == service_type]
-
-        warnings: List[str] = []
-        limit_statuses: List[dict] = []
-        result: Dict = {
-            "within_limits": True,
-            "warnings": warnings,
-            "blocked": False,
-            "limits": limit_statuses,
+        return evaluate_limits(service_type, limits, lambda _limit_type: current_usage)
+
+
+def evaluate_limits(
+    service_type: str,
+    limits: List[dict],
+    usage_for: Callable[[str], int],
+) -> Dict:
+    """Evaluate enabled limits of a service; usage_for(limit_type) gives usage for that period."""
+    warnings: List[str] = []
+    limit_statuses: List[dict] = []
+    result: Dict = {
+        "within_limits": True,
+        "warnings": warnings,
+        "blocked": False,
+        "limits": limit_statuses,
+    }
+
+    for lim in limits:
+        if lim["service_type"] != service_type:
+            continue
+        current_usage = usage_for(lim["limit_type"])
+        limit_value = lim["limit_value"]
+        warning_threshold = lim.get("warning_threshold", 80)
+        usage_percent = (current_usage / limit_value * 100) if limit_value > 0 else 0
+
+        limit_status = {
+            "limit_type": lim["limit_type"],
+            "limit_value": limit_value,
+            "current_usage": current_usage,
+            "usage_percent": round(usage_percent, 1),
+            "hard_limit": lim["hard_limit"],
         }
+        limit_statuses.append(limit_status)
 
-        for lim in service_limits:
-            limit_value = lim["limit_value"]
-            warning_threshold = lim.get("warning_threshold", 80)
-            usage_percent = (current_usage / limit_value * 100) if limit_value > 0 else 0
-
-            limit_status = {
-                "limit_type": lim["limit_type"],
-                "limit_value": limit_value,
-                "current_usage": current_usage,
-                "usage_percent": round(usage_percent, 1),
-                "hard_limit": lim["hard_limit"],
-            }
-            limit_statuses.append(limit_status)
-
-            if usage_percent >= 100:
-                if lim["hard_limit"]:
-                    result["within_limits"] = False
-                    result["blocked"] = True
-                    warnings.append(
-                        f"{service_type} {lim['limit_type']} лимит превышен ({current_usage}/{limit_value})"
-                    )
-                else:
-                    warnings.append(
-                        f"{service_type} {lim['limit_type']} лимит превышен (soft limit)"
-                    )
-            elif usage_percent >= warning_threshold:
+        if usage_percent >= 100:
+            if lim["hard_limit"]:
+                result["within_limits"] = False
+                result["blocked"] = True
                 warnings.append(
-                    f"{service_type} {lim['limit_type']} использовано {usage_percent:.0f}%"
+                    f"{service_type} {lim['limit_type']} лимит превышен ({current_usage}/{limit_value})"
                 )
+            else:
+                warnings.append(f"{service_type} {lim['limit_type']} лимит превышен (soft limit)")
+        elif usage_percent >= warning_threshold:
+            warnings.append(f"{service_type} {lim['limit_type']} использовано {usage_percent:.0f}%")
 
-        return result
+    return result
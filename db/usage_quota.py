@@ -0,0 +1,263 @@
+"""
+Live quota counters for usage limit checks.
+
+Every event queued through usage_sink.log() is added to per-service daily
+and monthly counters right away, so limit checks are O(1) lookups and
+already include events that are still waiting to be flushed. Counters are
+keyed by the UTC period ("2026-10-16", "2026-10"), so they roll over at
+day/month boundaries without a reset job.
+
+When Redis is connected the counters live there as well (INCRBY, shared by
+all workers; keys expire after the period). The in-memory copy is always
+kept and used when Redis is unavailable.
+
+Every USAGE_QUOTA_RECONCILE_SECONDS the counters are reset to the database
+totals (rollup tables) plus events still pending in the sink, which also
+reloads the cached limits configuration.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from db.database import AsyncSessionLocal
+from db.redis_client import CacheKey, get_redis
+from db.repositories.usage import UsageLimitsRepository, UsageRepository, evaluate_limits
+
+
+logger = logging.getLogger(__name__)
+
+USAGE_QUOTA_RECONCILE_SECONDS = int(os.getenv("USAGE_QUOTA_RECONCILE_SECONDS", "300"))
+
+SERVICES = ("tts", "stt", "llm")
+PERIODS = ("daily", "monthly")
+
+# Redis keys outlive their period a little so late readers still find them
+_PERIOD_TTL = {"daily": 2 * 86400, "monthly": 32 * 86400}
+
+
+def period_key(period_type: str, moment: datetime) -> str:
+    if period_type == "daily":
+        return moment.strftime("%Y-%m-%d")
+    if period_type == "monthly":
+        return moment.strftime("%Y-%m")
+    raise ValueError(f"Unknown period type: {period_type!r}")
+
+
+def period_start(period_type: str, moment: datetime) -> datetime:
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start.replace(day=1) if period_type == "monthly" else start
+
+
+class UsageQuotaCounters:
+    """Per-service daily/monthly usage counters plus a cached limits config."""
+
+    def __init__(self, reconcile_seconds: int = USAGE_QUOTA_RECONCILE_SECONDS):
+        self.reconcile_interval = reconcile_seconds
+
+        # (service_type, period_key) -> units
+        self._counters: Dict[Tuple[str, str], int] = {}
+        self._limits: Optional[List[dict]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._redis_failing = False
+
+        # Stats
+        self.reconciles = 0
+        self.last_reconcile: Optional[datetime] = None
+        self.last_reconcile_ms: Optional[float] = None
+        self.last_drift = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        await self.reconcile()
+        self._task = asyncio.create_task(self._run(), name="usage-quota")
+        logger.info(f"📊 Счётчики квот запущены (сверка с БД каждые {self.reconcile_interval} с)")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"⚠️ Сверка счётчиков квот не удалась: {e}")
+
+    # ============== Counting ==============
+
+    async def add(self, service_type: str, units: int, timestamp: datetime) -> None:
+        """Count units of a logged event in its daily and monthly periods."""
+        keys = [period_key(period, timestamp) for period in PERIODS]
+        for key in keys:
+            counter = (service_type, key)
+            self._counters[counter] = self._counters.get(counter, 0) + units
+
+        client = await get_redis()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=True)
+            for period, key in zip(PERIODS, keys, strict=True):
+                redis_key = self._redis_key(service_type, key)
+                pipe.incrby(redis_key, units)
+                pipe.expire(redis_key, _PERIOD_TTL[period])
+            await pipe.execute()
+            self._redis_failing = False
+        except Exception as e:
+            self._redis_warning(e)
+
+    async def usage(self, service_type: str, period_type: str) -> int:
+        """Units used by the service in the current period."""
+        return (await self._current(service_type, (period_type,)))[period_type]
+
+    async def _current(self, service_type: str, periods: Tuple[str, ...]) -> Dict[str, int]:
+        now = datetime.utcnow()
+        keys = [period_key(period, now) for period in periods]
+        values = [self._counters.get((service_type, key), 0) for key in keys]
+
+        client = await get_redis()
+        if client is not None:
+            try:
+                shared = await client.mget([self._redis_key(service_type, key) for key in keys])
+                # A missing key (Redis restarted/flushed) falls back to the local counter
+                values = [
+                    int(value) if value is not None else local
+                    for value, local in zip(shared, values, strict=True)
+                ]
+            except Exception as e:
+                self._redis_warning(e)
+        return dict(zip(periods, values, strict=True))
+
+    # ============== Limits ==============
+
+    async def get_limits(self) -> List[dict]:
+        """All configured limits (cached until invalidated or reconciled)."""
+        if self._limits is None:
+            async with AsyncSessionLocal() as session:
+                self._limits = await UsageLimitsRepository(session).get_all_limits(
+                    enabled_only=False
+                )
+        return self._limits
+
+    def invalidate_limits(self) -> None:
+        self._limits = None
+
+    async def get_limit(self, service_type: str, limit_type: str) -> Optional[dict]:
+        for lim in await self.get_limits():
+            if lim["service_type"] == service_type and lim["limit_type"] == limit_type:
+                return lim
+        return None
+
+    async def check(self, service_type: str, limit_type: str = "daily") -> dict:
+        """Same result as /admin/usage/check, without touching the database."""
+        usage = await self._current(service_type, PERIODS)
+        enabled = [lim for lim in await self.get_limits() if lim["enabled"]]
+        result = evaluate_limits(service_type, enabled, lambda period: usage.get(period, 0))
+        return {
+            "service_type": service_type,
+            "limit_type": limit_type,
+            "current_usage": usage[limit_type],
+            **result,
+        }
+
+    # ============== Reconciliation ==============
+
+    async def reconcile(self) -> None:
+        """Reset the current-period counters to database totals plus unflushed events."""
+        from db.usage_sink import usage_sink
+
+        start = time.perf_counter()
+        now = datetime.utcnow()
+        totals: Dict[Tuple[str, str], int] = {}
+
+        # No flush may move events from the buffer into the database meanwhile
+        async with usage_sink.paused():
+            async with AsyncSessionLocal() as session:
+                repo = UsageRepository(session)
+                for service in SERVICES:
+                    for period in PERIODS:
+                        totals[(service, period)] = await repo.get_period_usage(service, period)
+            for (service, period), total in totals.items():
+                totals[(service, period)] = total + usage_sink.pending_units(
+                    service, period_start(period, now)
+                )
+
+        drift = 0
+        counters: Dict[Tuple[str, str], int] = {}
+        for (service, period), total in totals.items():
+            key = (service, period_key(period, now))
+            drift += abs(self._counters.get(key, 0) - total)
+            counters[key] = total
+        # Drops counters of past periods as well
+        self._counters = counters
+        self._limits = None
+
+        client = await get_redis()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=True)
+                for (service, period), total in totals.items():
+                    redis_key = self._redis_key(service, period_key(period, now))
+                    pipe.set(redis_key, total, ex=_PERIOD_TTL[period])
+                await pipe.execute()
+            except Exception as e:
+                self._redis_warning(e)
+
+        self.reconciles += 1
+        self.last_reconcile = now
+        self.last_drift = drift
+        self.last_reconcile_ms = round((time.perf_counter() - start) * 1000, 2)
+        if drift:
+            logger.info(f"📊 Счётчики квот сверены с БД, расхождение: {drift}")
+
+    # ============== Helpers ==============
+
+    @staticmethod
+    def _redis_key(service_type: str, key: str) -> str:
+        return f"{CacheKey.USAGE_QUOTA}:{service_type}:{key}"
+
+    def _redis_warning(self, error: Exception) -> None:
+        self.last_error = str(error)
+        if not self._redis_failing:
+            logger.warning(f"⚠️ Счётчики квот: Redis недоступен, используются локальные: {error}")
+        self._redis_failing = True
+
+    def get_stats(self) -> dict:
+        now = datetime.utcnow()
+        return {
+            "running": self.running,
+            "reconcile_interval_s": self.reconcile_interval,
+            "reconciles": self.reconciles,
+            "last_reconcile": self.last_reconcile.isoformat() if self.last_reconcile else None,
+            "last_reconcile_ms": self.last_reconcile_ms,
+            "last_drift": self.last_drift,
+            "last_error": self.last_error,
+            "counters": {
+                service: {
+                    period: self._counters.get((service, period_key(period, now)), 0)
+                    for period in PERIODS
+                }
+                for service in SERVICES
+            },
+        }
+
+
+# Global quota counters (started/stopped by DatabaseManager)
+usage_quota = UsageQuotaCounters()
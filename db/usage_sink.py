@@ -0,0 +1,233 @@
+"""
+Write-behind sink for usage events (TTS/STT/LLM).
+
+log() only appends the event to an in-memory buffer; a background task
+writes the buffer with multi-row INSERTs (UsageRepository.log_usage_batch)
+every USAGE_FLUSH_INTERVAL_MS or as soon as USAGE_FLUSH_BATCH events are
+pending. stop() flushes whatever is left, so no events are lost on a clean
+shutdown.
+
+Backpressure: when USAGE_MAX_PENDING events are waiting, log() waits for
+the next flush. If the database keeps failing, the oldest events are
+dropped instead (counted in stats) so callers never block forever.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from db.database import AsyncSessionLocal
+from db.repositories.usage import UsageRepository
+from db.usage_quota import usage_quota
+
+
+logger = logging.getLogger(__name__)
+
+USAGE_FLUSH_INTERVAL_MS = int(os.getenv("USAGE_FLUSH_INTERVAL_MS", "500"))
+USAGE_FLUSH_BATCH = int(os.getenv("USAGE_FLUSH_BATCH", "200"))
+USAGE_MAX_PENDING = int(os.getenv("USAGE_MAX_PENDING", "10000"))
+
+
+class UsageEventSink:
+    """Buffered, batched usage logger."""
+
+    def __init__(
+        self,
+        flush_interval_ms: int = USAGE_FLUSH_INTERVAL_MS,
+        batch_size: int = USAGE_FLUSH_BATCH,
+        max_pending: int = USAGE_MAX_PENDING,
+    ):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+
+        self._buffer: List[dict] = []
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._failing = False
+
+        # Stats
+        self.events_logged = 0
+        self.events_flushed = 0
+        self.events_dropped = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.backpressure_waits = 0
+        self.max_depth = 0
+        self.last_flush_ms: Optional[float] = None
+        self.last_batch_size = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="usage-sink")
+        logger.info(
+            f"📊 Usage sink запущен (flush каждые {int(self.flush_interval * 1000)} мс "
+            f"или {self.batch_size} событий)"
+        )
+
+    async def stop(self) -> None:
+        """Stop the background task and flush all pending events."""
+        if self._task is not None:
+            # Let the loop finish its current flush instead of cancelling it mid-write
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._buffer:
+            logger.error(f"❌ Usage sink: {len(self._buffer)} событий не записано при остановке")
+        else:
+            logger.info(f"📊 Usage sink остановлен, записано событий: {self.events_flushed}")
+
+    async def log(
+        self,
+        service_type: str,
+        action: str,
+        units_consumed: int = 1,
+        *,
+        source: Optional[str] = None,
+        source_id: Optional[str] = None,
+        cost_usd: Optional[float] = None,
+        details: Optional[dict] = None,
+    ) -> dict:
+        """Queue a usage event. Returns it in UsageLog.to_dict() form (id is None until flushed)."""
+        timestamp = datetime.utcnow()
+        event = {
+            "timestamp": timestamp,
+            "service_type": service_type,
+            "action": action,
+            "source": source,
+            "source_id": source_id,
+            "units_consumed": units_consumed,
+            "cost_usd": cost_usd,
+            "details": json.dumps(details, ensure_ascii=False) if details else None,
+        }
+
+        await self._wait_for_space()
+        self._buffer.append(event)
+        self.events_logged += 1
+        await usage_quota.add(service_type, units_consumed, timestamp)
+        self.max_depth = max(self.max_depth, len(self._buffer))
+
+        if not self.running:
+            # Not started (scripts, tests): behave like a direct write
+            await self.flush()
+        elif len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+        return {
+            "id": None,
+            **event,
+            "timestamp": timestamp.isoformat(),
+            "details": details,
+        }
+
+    async def _wait_for_space(self) -> None:
+        waited = False
+        while len(self._buffer) >= self.max_pending:
+            if self._failing or not self.running:
+                # Database is failing: drop the oldest event rather than block callers
+                self._buffer.pop(0)
+                self.events_dropped += 1
+                return
+            if not waited:
+                self.backpressure_waits += 1
+                waited = True
+            self._drained.clear()
+            self._wakeup.set()
+            await self._drained.wait()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write all buffered events now. Returns the number written."""
+        async with self._flush_lock:
+            if not self._buffer:
+                self._drained.set()
+                return 0
+
+            batch, self._buffer = self._buffer, []
+            start = time.perf_counter()
+            try:
+                async with AsyncSessionLocal() as session:
+                    await UsageRepository(session).log_usage_batch(batch)
+            except asyncio.CancelledError:
+                self._buffer = batch + self._buffer
+                raise
+            except Exception as e:
+                # Put the batch back in front of newer events; retried on the next tick
+                self._buffer = batch + self._buffer
+                self.flush_errors += 1
+                self.last_error = str(e)
+                if not self._failing:
+                    logger.warning(f"⚠️ Usage sink: ошибка записи {len(batch)} событий: {e}")
+                self._failing = True
+                return 0
+            finally:
+                self._drained.set()
+
+            self._failing = False
+            self.flushes += 1
+            self.events_flushed += len(batch)
+            self.last_batch_size = len(batch)
+            self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+            return len(batch)
+
+    @asynccontextmanager
+    async def paused(self) -> AsyncIterator[None]:
+        """Hold back flushes, so buffer and database can be read consistently."""
+        async with self._flush_lock:
+            yield
+
+    def pending_units(self, service_type: str, since: datetime) -> int:
+        """Units of buffered (not yet written) events of a service since the given time."""
+        return sum(
+            event["units_consumed"]
+            for event in self._buffer
+            if event["service_type"] == service_type and event["timestamp"] >= since
+        )
+
+    def get_stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": len(self._buffer),
+            "max_depth": self.max_depth,
+            "max_pending": self.max_pending,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": int(self.flush_interval * 1000),
+            "events_logged": self.events_logged,
+            "events_flushed": self.events_flushed,
+            "events_dropped": self.events_dropped,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "backpressure_waits": self.backpressure_waits,
+            "last_flush_ms": self.last_flush_ms,
+            "last_batch_size": self.last_batch_size,
+            "last_error": self.last_error,
+        }
+
+
+# Global usage sink (started/stopped by DatabaseManager)
+usage_sink = UsageEventSink()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Compiled FAQ matcher shared by VLLMLLMService and CloudLLMService.
+
+Matching rules (same as the former linear scan):
+1. exact match of the normalized message against a key;
+2. otherwise the first key (in FAQ order) such that
+   ``key in message`` or ``message in key``.
+
+"key in message" is answered by an Aho-Corasick automaton over all keys
+(one pass over the message). "message in key" is answered by a single
+``str.find`` over all keys joined with a separator plus a bisect over the
+key start offsets: keys are joined in FAQ order, so the first occurrence
+belongs to the first matching key. Both are rebuilt on reload_faq, so a
+chat turn no longer runs a Python-level loop over every FAQ entry.
+"""
+
+import bisect
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Separator for the joined key index; cannot occur in a normalized key
+_SEP = "\x00"
+
+# n-gram size of the key index and the posting size up to which candidates
+# are verified one by one instead of scanning the joined keys
+_NGRAM = 3
+_MAX_CANDIDATES = 64
+
+_WEEKDAYS = [
+    "понедельник",
+    "вторник",
+    "среда",
+    "четверг",
+    "пятница",
+    "суббота",
+    "воскресенье",
+]
+
+
+def normalize_faq_key(key: str) -> str:
+    """Нормализует ключ FAQ (lowercase, strip)"""
+    return key.lower().strip()
+
+
+def normalize_faq_query(message: str) -> str:
+    """Нормализует сообщение пользователя для поиска в FAQ"""
+    return message.lower().strip().rstrip("?!.,")
+
+
+def apply_faq_templates(response: str) -> str:
+    """Подставляет переменные шаблона в ответ"""
+    now = datetime.now()
+    replacements = {
+        "{current_time}": now.strftime("%H:%M"),
+        "{current_date}": now.strftime("%d.%m.%Y"),
+        "{day_of_week}": _WEEKDAYS[now.weekday()],
+    }
+    for placeholder, value in replacements.items():
+        response = response.replace(placeholder, value)
+    return response
+
+
+class _AhoCorasick:
+    """Aho-Corasick automaton returning the indices of all patterns found in a text."""
+
+    def __init__(self, patterns: List[str]):
+        # Trie as parallel arrays: goto transitions, failure links, output sets
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        for idx, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(idx)
+
+        # BFS to compute failure links; outputs are merged along them
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def first_match(self, text: str) -> Optional[int]:
+        """Smallest pattern index occurring in text, or None."""
+        goto, fail, out = self._goto, self._fail, self._out
+        best: Optional[int] = None
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                candidate = min(out[node])
+                if best is None or candidate < best:
+                    best = candidate
+                    if best == 0:
+                        break
+        return best
+
+
+class FAQMatcher:
+    """
+    Immutable compiled FAQ. Build once per reload_faq, query on every chat turn.
+    """
+
+    def __init__(self, faq: Optional[Dict[str, str]] = None):
+        faq = faq or {}
+        # Normalized key -> response, in original order (later duplicates win, as with dict)
+        self.faq: Dict[str, str] = {normalize_faq_key(k): v for k, v in faq.items()}
+        self._keys: List[str] = list(self.faq.keys())
+        self._responses: List[str] = [self.faq[k] for k in self._keys]
+
+        # Empty keys are contained in every message
+        self._empty_key: Optional[int] = next((i for i, k in enumerate(self._keys) if not k), None)
+        self._automaton = _AhoCorasick([k for k in self._keys if k]) if self._keys else None
+        self._ac_index = [i for i, k in enumerate(self._keys) if k]
+
+        # "message in key" is impossible for messages longer than every key
+        self._max_key_len = max((len(k) for k in self._keys), default=0)
+
+        # Joined keys + start offset of each key for the "message in key" lookup
+        self._joined = _SEP.join(k.replace(_SEP, " ") for k in self._keys)
+        self._offsets: List[int] = []
+        pos = 0
+        for key in self._keys:
+            self._offsets.append(pos)
+            pos += len(key) + len(_SEP)
+
+        # Trigram -> sorted key indices containing it (postings)
+        postings: Dict[str, List[int]] = {}
+        for idx, key in enumerate(self._keys):
+            for gram in {key[i : i + _NGRAM] for i in range(len(key) - _NGRAM + 1)}:
+                postings.setdefault(gram, []).append(idx)
+        self._ngrams = postings
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __bool__(self) -> bool:
+        return bool(self._keys)
+
+    def _contained_key(self, normalized: str) -> Optional[int]:
+        """First key index such that key in normalized."""
+        best = self._empty_key
+        if self._automaton is not None:
+            found = self._automaton.first_match(normalized)
+            if found is not None:
+                found = self._ac_index[found]
+                if best is None or found < best:
+                    best = found
+        return best
+
+    def _containing_key(self, normalized: str, limit: int) -> Optional[int]:
+        """First key index below limit such that normalized in key."""
+        if not normalized:
+            return 0 if limit > 0 else None
+        if len(normalized) > self._max_key_len:
+            return None
+        if _SEP in normalized:
+            # Would match across key boundaries; fall back to a plain scan
+            return next((i for i, k in enumerate(self._keys[:limit]) if normalized in k), None)
+
+        if len(normalized) >= _NGRAM:
+            # Every trigram of the message must occur in the key: pick the rarest
+            rarest: Optional[List[int]] = None
+            for i in range(len(normalized) - _NGRAM + 1):
+                posting = self._ngrams.get(normalized[i : i + _NGRAM])
+                if posting is None:
+                    return None
+                if rarest is None or len(posting) < len(rarest):
+                    rarest = posting
+            if rarest is not None and len(rarest) <= _MAX_CANDIDATES:
+                keys = self._keys
+                for idx in rarest:
+                    if idx >= limit:
+                        return None
+                    if normalized in keys[idx]:
+                        return idx
+                return None
+
+        end = self._offsets[limit] if limit < len(self._offsets) else len(self._joined)
+        pos = self._joined.find(normalized, 0, end)
+        if pos < 0:
+            return None
+        return bisect.bisect_right(self._offsets, pos) - 1
+
+    def match(self, user_message: str) -> Optional[Tuple[str, str, str]]:
+        """
+        Ищет ответ в FAQ.
+
+        Returns:
+            (key, response, kind) где kind — "exact" или "partial", либо None.
+            Ответ возвращается без подстановки шаблонов.
+        """
+        if not self._keys:
+            return None
+
+        normalized = normalize_faq_query(user_message)
+
+        response = self.faq.get(normalized)
+        if response is not None:
+            return normalized, response, "exact"
+
+        # Earliest key wins; the reverse lookup only needs keys before the forward hit
+        idx = self._contained_key(normalized)
+        limit = len(self._keys) if idx is None else idx
+        reverse = self._containing_key(normalized, limit) if limit > 0 else None
+        if reverse is not None:
+            idx = reverse
+        if idx is None:
+            return None
+        return self._keys[idx], self._responses[idx], "partial"
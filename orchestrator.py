@@ -10,8 +10,10 @@ import json
 import logging
 import os
 import re
+import struct
 import threading
 import time
+import uuid
 from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
@@ -74,7 +76,12 @@ from auth_manager import (
 )
 
 # Cloud LLM service for multi-provider support
-from cloud_llm_service import PROVIDER_TYPES, CloudLLMService
+from cloud_llm_service import (
+    PROVIDER_TYPES,
+    CloudLLMService,
+    astream_from_messages,
+    cloud_provider_pool,
+)
 
 # Database integration
 from db.integration import (
@@ -126,12 +133,13 @@ except ImportError:
 
 # Импорты наших сервисов
 try:
-    from voice_clone_service import VoiceCloneService
+    from voice_clone_service import VoiceCloneService, load_xtts_registry
 
     XTTS_AVAILABLE = True
 except ImportError:
     XTTS_AVAILABLE = False
     VoiceCloneService = None
+    load_xtts_registry = None
 
 
 # vLLM импорт (опциональный - локальная Llama через vLLM)
@@ -165,6 +173,31 @@ logger = logging.getLogger(__name__)
 
 
 # ============== Streaming TTS Manager ==============
+def streaming_wav_header(sample_rate: int, channels: int = 1, bits_per_sample: int = 16) -> bytes:
+    """
+    WAV заголовок для потоковой отдачи, когда длина аудио заранее неизвестна.
+    Размеры RIFF/data выставлены в максимум — плееры читают до конца потока.
+    """
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    return (
+        b"RIFF"
+        + struct.pack("<I", 0xFFFFFFFF)
+        + b"WAVEfmt "
+        + struct.pack(
+            "<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, block_align, bits_per_sample
+        )
+        + b"data"
+        + struct.pack("<I", 0xFFFFFFFF)
+    )
+
+
+def float_to_pcm16(wav) -> bytes:
+    """float32 [-1, 1] -> little-endian PCM16"""
+    audio = np.asarray(wav, dtype=np.float32)
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
 class StreamingTTSManager:
     """
     Менеджер для параллельного синтеза TTS во время streaming LLM.
@@ -172,21 +205,31 @@ class StreamingTTSManager:
     Архитектура:
     1. Во время streaming chat/completions - накапливаем текст и при завершении
        предложения запускаем синтез в фоновом потоке
-    2. Храним синтезированные сегменты в кэше по хэшу полного текста
-    3. При запросе /v1/audio/speech - склеиваем готовые сегменты
+    2. Сессия регистрируется по response id (id chat.completion), поэтому
+       /v1/audio/speech может подключиться к ней ещё до конца ответа LLM и
+       отдавать сегменты по мере готовности, в порядке предложений
+    3. После завершения сессии полное аудио кэшируется по response id и по
+       хэшу полного текста (для клиентов, которые присылают только текст)
     """
 
+    # Сколько ждать следующий сегмент / окончания синтеза сегмента
+    SEGMENT_TIMEOUT = 60
+
     def __init__(self, max_cache_size: int = 50, cache_ttl: int = 300):
         self.max_cache_size = max_cache_size
         self.cache_ttl = cache_ttl  # секунд
 
-        # Кэш: response_hash -> {"segments": [...], "full_audio": np.array, "timestamp": float}
+        # Кэш: response_hash -> {"full_audio": np.array, "sample_rate": int, "timestamp": float}
         self._cache: OrderedDict[str, Dict] = OrderedDict()
+        # response_id -> response_hash для завершённых сессий
+        self._response_index: Dict[str, str] = {}
         self._cache_lock = threading.Lock()
 
-        # Текущие сессии синтеза: session_id -> {"text": str, "segments": [...], "futures": [...]}
+        # Текущие сессии синтеза: session_id (response id) -> {"text_buffer", "pending_futures", ...}
         self._active_sessions: Dict[str, Dict] = {}
         self._session_lock = threading.Lock()
+        # Будит слушателей сессии при появлении нового сегмента или её закрытии
+        self._session_cond = threading.Condition(self._session_lock)
 
         # Thread pool для фонового синтеза
         self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tts_")
@@ -217,18 +260,29 @@ class StreamingTTSManager:
             while len(self._cache) > self.max_cache_size:
                 self._cache.popitem(last=False)
 
+            self._response_index = {
+                rid: key for rid, key in self._response_index.items() if key in self._cache
+            }
+
     def start_session(self, session_id: str) -> None:
-        """Начинает новую сессию streaming синтеза"""
+        """Начинает новую сессию streaming синтеза (session_id = response id)"""
         with self._session_lock:
             self._active_sessions[session_id] = {
                 "text_buffer": "",
                 "full_text": "",
                 "segments": [],  # [(text, audio_data, sample_rate), ...]
-                "pending_futures": [],
+                "pending_futures": [],  # [(text, future), ...] в порядке предложений
+                "closed": False,  # остаток текста отправлен в синтез, новых сегментов не будет
                 "start_time": time.time(),
             }
         logger.info(f"🎬 Начата сессия TTS: {session_id}")
 
+    def _submit_segment(self, session: Dict, text: str, voice_service, session_id: str) -> None:
+        """Ставит сегмент в очередь синтеза (вызывается под _session_lock)"""
+        future = self._executor.submit(self._synthesize_segment, text, voice_service, session_id)
+        session["pending_futures"].append((text, future))
+        self._session_cond.notify_all()
+
     def add_text_chunk(self, session_id: str, chunk: str, voice_service) -> None:
         """
         Добавляет chunk текста и запускает синтез при завершении предложения.
@@ -251,10 +305,7 @@ class StreamingTTSManager:
                 for sentence in sentences:
                     sentence = sentence.strip()
                     if len(sentence) > 3:  # Игнорируем слишком короткие
-                        future = self._executor.submit(
-                            self._synthesize_segment, sentence, voice_service, session_id
-                        )
-                        session["pending_futures"].append((sentence, future))
+                        self._submit_segment(session, sentence, voice_service, session_id)
                         logger.info(f"🔄 Запущен синтез: '{sentence[:40]}...'")
 
                 # Удаляем обработанные предложения из буфера
@@ -280,6 +331,7 @@ class StreamingTTSManager:
     def finish_session(self, session_id: str, voice_service) -> None:
         """
         Завершает сессию: синтезирует оставшийся текст и кэширует результат.
+        Ожидание синтеза идёт без _session_lock, чтобы не блокировать другие сессии.
         """
         with self._session_lock:
             if session_id not in self._active_sessions:
@@ -290,36 +342,40 @@ class StreamingTTSManager:
             # Синтезируем остаток буфера если есть
             remaining = session["text_buffer"].strip()
             if remaining and len(remaining) > 3:
-                future = self._executor.submit(
-                    self._synthesize_segment, remaining, voice_service, session_id
-                )
-                session["pending_futures"].append((remaining, future))
+                self._submit_segment(session, remaining, voice_service, session_id)
                 logger.info(f"🔄 Запущен синтез остатка: '{remaining[:40]}...'")
 
-            # Ждём завершения всех futures
-            for text, future in session["pending_futures"]:
-                try:
-                    result = future.result(timeout=60)
-                    if result[1] is not None:
-                        session["segments"].append(result)
-                except Exception as e:
-                    logger.error(f"❌ Ошибка получения результата синтеза: {e}")
+            session["closed"] = True
+            self._session_cond.notify_all()
+            pending = list(session["pending_futures"])
+
+        # Ждём завершения всех futures
+        for text, future in pending:
+            try:
+                result = future.result(timeout=self.SEGMENT_TIMEOUT)
+                if result[1] is not None:
+                    session["segments"].append(result)
+            except Exception as e:
+                logger.error(f"❌ Ошибка получения результата синтеза: {e}")
 
-            # Склеиваем сегменты
-            full_text = session["full_text"]
-            if session["segments"]:
-                self._cache_full_audio(full_text, session["segments"])
+        # Склеиваем сегменты
+        full_text = session["full_text"]
+        if session["segments"]:
+            self._cache_full_audio(full_text, session["segments"], response_id=session_id)
 
-            elapsed = time.time() - session["start_time"]
-            logger.info(
-                f"✅ Сессия {session_id} завершена за {elapsed:.2f}s, "
-                f"сегментов: {len(session['segments'])}"
-            )
+        elapsed = time.time() - session["start_time"]
+        logger.info(
+            f"✅ Сессия {session_id} завершена за {elapsed:.2f}s, "
+            f"сегментов: {len(session['segments'])}"
+        )
 
-            # Удаляем сессию
-            del self._active_sessions[session_id]
+        # Удаляем сессию (подключённые слушатели держат ссылку на неё и дочитают сегменты)
+        with self._session_lock:
+            self._active_sessions.pop(session_id, None)
 
-    def _cache_full_audio(self, full_text: str, segments: list) -> None:
+    def _cache_full_audio(
+        self, full_text: str, segments: list, response_id: Optional[str] = None
+    ) -> None:
         """Склеивает сегменты и кэширует полное аудио"""
         if not segments:
             return
@@ -351,6 +407,8 @@ class StreamingTTSManager:
                     "timestamp": time.time(),
                     "segments_count": len(segments),
                 }
+                if response_id:
+                    self._response_index[response_id] = text_hash
                 logger.info(
                     f"💾 Закэшировано аудио: {text_hash} ({len(full_audio) / sample_rate:.2f}s)"
                 )
@@ -373,6 +431,73 @@ class StreamingTTSManager:
         logger.info(f"❌ Cache MISS: {text_hash}")
         return None
 
+    def get_cached_audio_by_response(self, response_id: str) -> Optional[tuple]:
+        """
+        Получает закэшированное аудио завершённой сессии по response id.
+        Returns: (audio_data, sample_rate) или None
+        """
+        with self._cache_lock:
+            text_hash = self._response_index.get(response_id)
+            cached = self._cache.get(text_hash) if text_hash else None
+            if cached is not None:
+                logger.info(f"⚡ Cache HIT (response {response_id})")
+                return (cached["full_audio"], cached["sample_rate"])
+        return None
+
+    def attach_session(self, response_id: str) -> Optional[Dict]:
+        """
+        Возвращает сессию, синтез которой ещё идёт, для потоковой отдачи через
+        iter_session_audio. None — сессии нет (не было или уже закэширована).
+        """
+        with self._session_lock:
+            return self._active_sessions.get(response_id)
+
+    def _next_segment_future(self, session: Dict, index: int):
+        """Блокирующе ждёт index-й сегмент сессии. None — сегментов больше не будет."""
+        with self._session_cond:
+            deadline = time.monotonic() + self.SEGMENT_TIMEOUT
+            while index >= len(session["pending_futures"]) and not session["closed"]:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning("⏱️ Таймаут ожидания следующего сегмента TTS")
+                    return None
+                self._session_cond.wait(remaining)
+            if index < len(session["pending_futures"]):
+                return session["pending_futures"][index][1]
+            return None
+
+    async def iter_session_audio(self, session: Dict):
+        """
+        Асинхронно отдаёт (audio_data, sample_rate) сегментов сессии в порядке
+        предложений, каждый — как только он синтезирован.
+        """
+        index = 0
+        while True:
+            with self._session_lock:
+                future = (
+                    session["pending_futures"][index][1]
+                    if index < len(session["pending_futures"])
+                    else None
+                )
+                closed = session["closed"]
+            if future is None and not closed:
+                future = await asyncio.to_thread(self._next_segment_future, session, index)
+            if future is None:
+                return
+            index += 1
+
+            try:
+                # shield: таймаут или отключение слушателя не должны отменять общий синтез,
+                # иначе finish_session выкинет сегмент из кэша сессии
+                _text, wav, sr = await asyncio.wait_for(
+                    asyncio.shield(asyncio.wrap_future(future)), timeout=self.SEGMENT_TIMEOUT
+                )
+            except Exception as e:
+                logger.error(f"❌ Ошибка получения результата синтеза: {e}")
+                continue
+            if wav is not None:
+                yield wav, sr
+
     def get_stats(self) -> dict:
         """Возвращает статистику менеджера"""
         with self._cache_lock:
@@ -444,6 +569,7 @@ if DEPLOYMENT_MODE != "cloud":
         app.include_router(tts.router)
 
 # Глобальные сервисы
+xtts_registry = None  # VoiceRegistry: одна модель XTTS на все голоса (Анна, Марина)
 voice_service: Optional["VoiceCloneService"] = None  # XTTS (Марина) - GPU CC >= 7.0
 anna_voice_service: Optional["VoiceCloneService"] = None  # XTTS (Анна) - GPU CC >= 7.0
 piper_service: Optional["PiperTTSService"] = None  # Piper (Dmitri, Irina) - CPU
@@ -635,6 +761,8 @@ class OpenAISpeechRequest(BaseModel):
     voice: str = "marina"
     response_format: str = "wav"
     speed: float = 1.0
+    # id ответа /v1/chat/completions: подключение к идущему streaming TTS синтезу
+    response_id: Optional[str] = None
 
 
 class ChatMessage(BaseModel):
@@ -656,6 +784,7 @@ class ChatCompletionRequest(BaseModel):
 async def startup_event():
     """Инициализация всех сервисов при старте"""
     global \
+        xtts_registry, \
         voice_service, \
         anna_voice_service, \
         piper_service, \
@@ -707,30 +836,36 @@ async def startup_event():
                 logger.info("⏭️ OpenVoice не установлен (пропускаем)")
                 openvoice_service = None
 
-            # Инициализация XTTS (Анна) - GPU CC >= 7.0, по умолчанию
+            # Модель XTTS v2 - GPU CC >= 7.0, загружается один раз на все голоса
+            xtts_registry = None
             if XTTS_AVAILABLE:
-                logger.info("📦 Загрузка Voice Clone Service (XTTS - Анна)...")
+                logger.info("📦 Загрузка модели XTTS v2 (общая для всех голосов)...")
                 try:
-                    anna_voice_service = VoiceCloneService(voice_samples_dir="./Анна")
-                    logger.info(f"✅ XTTS (Анна): {len(anna_voice_service.voice_samples)} образцов")
+                    xtts_registry = load_xtts_registry()
                 except Exception as e:
-                    logger.warning(f"⚠️ XTTS (Анна) недоступен: {e}")
-                    anna_voice_service = None
+                    logger.warning(f"⚠️ XTTS недоступен: {e}")
             else:
                 logger.info("⏭️ XTTS не установлен (пропускаем)")
-                anna_voice_service = None
 
-            # Инициализация XTTS (Марина) - GPU CC >= 7.0, опционально
-            if XTTS_AVAILABLE:
-                logger.info("📦 Загрузка Voice Clone Service (XTTS - Марина)...")
+            # Голоса XTTS: только вычисление speaker latents, без загрузки модели
+            anna_voice_service = None
+            voice_service = None
+            if xtts_registry is not None:
+                try:
+                    anna_voice_service = VoiceCloneService(
+                        voice_samples_dir="./Анна", registry=xtts_registry
+                    )
+                    logger.info(f"✅ XTTS (Анна): {len(anna_voice_service.voice_samples)} образцов")
+                except Exception as e:
+                    logger.warning(f"⚠️ XTTS (Анна) недоступен: {e}")
+
                 try:
-                    voice_service = VoiceCloneService(voice_samples_dir="./Марина")
+                    voice_service = VoiceCloneService(
+                        voice_samples_dir="./Марина", registry=xtts_registry
+                    )
                     logger.info(f"✅ XTTS (Марина): {len(voice_service.voice_samples)} образцов")
                 except Exception as e:
                     logger.warning(f"⚠️ XTTS (Марина) недоступен: {e}")
-                    voice_service = None
-            else:
-                voice_service = None
 
             # Устанавливаем голос по умолчанию
             if anna_voice_service:
@@ -887,9 +1022,17 @@ async def startup_event():
         try:
             from app.services.wiki_rag_service import WikiRAGService
 
-            wiki_rag = WikiRAGService(Path("wiki-pages"))
+            wiki_rag = WikiRAGService(
+                Path("wiki-pages"),
+                ivf_min_rows=int(os.getenv("WIKI_RAG_IVF_MIN_ROWS", "0")),
+                ivf_nprobe=int(os.getenv("WIKI_RAG_IVF_NPROBE", "8")),
+            )
             container.wiki_rag_service = wiki_rag
 
+            # Keep the index in sync with edits to wiki-pages/ (git pull, sync scripts)
+            if os.getenv("WIKI_RAG_WATCH", "true").lower() in ("1", "true", "yes"):
+                wiki_rag.start_watcher(debounce=float(os.getenv("WIKI_RAG_WATCH_DEBOUNCE", "1.0")))
+
             # Initialize embedding provider for Wiki RAG (tiered: local > cloud > none)
             embedding_provider = None
 
@@ -962,6 +1105,11 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("🛑 Shutting down AI Secretary Orchestrator")
+    from app.dependencies import get_container
+
+    wiki_rag = get_container().wiki_rag_service
+    if wiki_rag:
+        wiki_rag.stop_watcher()
     await shutdown_database()
     logger.info("✅ Shutdown complete")
 
@@ -1042,6 +1190,14 @@ async def health_check():
     if streaming_tts_manager is not None:
         result["streaming_tts_stats"] = streaming_tts_manager.get_stats()
 
+    if xtts_registry is not None:
+        result["xtts_registry"] = xtts_registry.get_stats()
+
+    if piper_service is not None:
+        result["piper_workers"] = piper_service.get_stats()
+
+    result["cloud_provider_pool"] = cloud_provider_pool.get_stats()
+
     return result
 
 
@@ -1315,26 +1471,84 @@ async def list_voices():
     return {"voices": voices}
 
 
+# Форматы потоковой отдачи streaming TTS сессии -> media type (без перекодирования)
+SESSION_AUDIO_FORMATS = {"wav": "audio/wav", "pcm": "audio/pcm"}
+
+
+async def stream_session_audio(session: Dict, response_format: str = "wav"):
+    """
+    Потоковая отдача сегментов streaming TTS сессии: WAV заголовок с первым
+    сегментом (для pcm — без заголовка), дальше PCM16 сегменты с паузой 100ms
+    между ними.
+    """
+    start_time = time.time()
+    first = True
+    async for wav, sample_rate in streaming_tts_manager.iter_session_audio(session):
+        if first:
+            logger.info(f"⚡ Первый сегмент TTS через {time.time() - start_time:.3f}s")
+            if response_format == "wav":
+                yield streaming_wav_header(sample_rate)
+            first = False
+        else:
+            yield bytes(int(0.1 * sample_rate) * 2)  # 100ms тишины (PCM16)
+        yield float_to_pcm16(wav)
+
+
 @app.post("/v1/audio/speech")
 async def openai_speech(request: OpenAISpeechRequest):
     """
     OpenAI-compatible TTS endpoint for OpenWebUI integration
     POST /v1/audio/speech
 
-    Оптимизация: сначала проверяет кэш streaming TTS manager.
-    Если аудио уже было предсинтезировано во время streaming LLM - возвращает мгновенно.
+    Оптимизация: сначала проверяет streaming TTS manager.
+    - response_id указывает на ответ, синтез которого ещё идёт — сегменты
+      отдаются потоком по мере готовности (первый звук через ~одно предложение)
+    - аудио уже было предсинтезировано во время streaming LLM - возвращает мгновенно
     """
     if not voice_service and not piper_service:
         raise HTTPException(status_code=503, detail="No TTS service initialized")
 
+    use_streaming_tts = (
+        current_voice_config["engine"] == "xtts" and streaming_tts_manager is not None
+    )
+
+    if use_streaming_tts and request.response_id:
+        session = streaming_tts_manager.attach_session(request.response_id)
+        if session is not None:
+            # Сегменты уже синтезируются с обычной скоростью в PCM16 — другой
+            # формат или скорость вернули бы аудио не того типа
+            if request.response_format not in SESSION_AUDIO_FORMATS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=(
+                        f"response_format '{request.response_format}' is not supported for "
+                        f"streaming TTS sessions, use one of: {', '.join(SESSION_AUDIO_FORMATS)}"
+                    ),
+                )
+            if request.speed != 1.0:
+                raise HTTPException(
+                    status_code=400,
+                    detail="speed is not supported for streaming TTS sessions, use 1.0",
+                )
+            logger.info(f"🔗 /v1/audio/speech подключён к сессии TTS {request.response_id}")
+            return StreamingResponse(
+                stream_session_audio(session, request.response_format),
+                media_type=SESSION_AUDIO_FORMATS[request.response_format],
+            )
+
     try:
         output_file = TEMP_DIR / f"speech_{datetime.now().timestamp()}.wav"
         start_time = time.time()
 
         # Проверяем кэш streaming TTS (только для XTTS)
         cached_audio = None
-        if current_voice_config["engine"] == "xtts" and streaming_tts_manager is not None:
-            cached_audio = streaming_tts_manager.get_cached_audio(request.input)
+        if use_streaming_tts:
+            if request.response_id:
+                cached_audio = streaming_tts_manager.get_cached_audio_by_response(
+                    request.response_id
+                )
+            if cached_audio is None:
+                cached_audio = streaming_tts_manager.get_cached_audio(request.input)
 
         if cached_audio is not None:
             # Cache HIT - используем предсинтезированное аудио
@@ -1378,8 +1592,10 @@ async def chat_completions(request: ChatCompletionRequest):
         # Streaming response (SSE) с фоновым синтезом TTS
         async def generate_stream():
             created = int(time.time())
-            chunk_id = f"chatcmpl-{created}"
-            session_id = f"tts-{created}"
+            chunk_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+            # Сессия TTS регистрируется под id ответа: по нему /v1/audio/speech
+            # подключается к синтезу, не дожидаясь конца ответа
+            session_id = chunk_id
 
             # Начинаем сессию streaming TTS если сервисы доступны
             use_streaming_tts = streaming_tts_manager is not None and voice_service is not None
@@ -1389,9 +1605,7 @@ async def chat_completions(request: ChatCompletionRequest):
                 logger.info(f"🎬 Streaming TTS активирован для сессии {session_id}")
 
             try:
-                for text_chunk in llm_service.generate_response_from_messages(
-                    messages, stream=True
-                ):
+                async for text_chunk in astream_from_messages(llm_service, messages):
                     # Отправляем chunk клиенту
                     chunk_data = {
                         "id": chunk_id,
@@ -1419,7 +1633,15 @@ async def chat_completions(request: ChatCompletionRequest):
                 yield f"data: {json.dumps(final_chunk)}\n\n"
                 yield "data: [DONE]\n\n"
 
-                # Завершаем сессию TTS (склеивает и кэширует аудио)
+            except Exception as e:
+                logger.error(f"❌ Streaming error: {e}")
+                error_chunk = {"error": {"message": str(e), "type": "server_error"}}
+                yield f"data: {json.dumps(error_chunk)}\n\n"
+
+            finally:
+                # Завершаем сессию TTS (склеивает и кэширует аудио) и при ошибке или
+                # отключении клиента — иначе слушатели /v1/audio/speech ждут сегменты
+                # до таймаута, а сессия остаётся в памяти
                 if use_streaming_tts:
                     # Запускаем в отдельном потоке чтобы не блокировать response
                     threading.Thread(
@@ -1428,11 +1650,6 @@ async def chat_completions(request: ChatCompletionRequest):
                         daemon=True,
                     ).start()
 
-            except Exception as e:
-                logger.error(f"❌ Streaming error: {e}")
-                error_chunk = {"error": {"message": str(e), "type": "server_error"}}
-                yield f"data: {json.dumps(error_chunk)}\n\n"
-
         return StreamingResponse(
             generate_stream(),
             media_type="text/event-stream",
@@ -2455,6 +2672,9 @@ async def admin_create_cloud_provider(
             details={"name": data.name, "provider_type": data.provider_type},
         )
 
+        # New provider may now be the one a legacy type backend resolves to
+        cloud_provider_pool.clear_aliases()
+
         return {"status": "ok", "provider": provider}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -2471,6 +2691,7 @@ async def admin_update_cloud_provider(
     provider = await async_cloud_provider_manager.update_provider(provider_id, **update_data)
     if not provider:
         raise HTTPException(status_code=404, detail="Provider not found")
+    cloud_provider_pool.invalidate(provider_id)
 
     # Audit log
     await async_audit_logger.log(
@@ -2489,6 +2710,7 @@ async def admin_delete_cloud_provider(provider_id: str, user: User = Depends(get
     """Delete cloud LLM provider"""
     if not await async_cloud_provider_manager.delete_provider(provider_id):
         raise HTTPException(status_code=404, detail="Provider not found")
+    cloud_provider_pool.invalidate(provider_id)
 
     # Audit log
     await async_audit_logger.log(
@@ -2548,6 +2770,7 @@ async def admin_set_default_cloud_provider(
     """Set cloud provider as default"""
     if not await async_cloud_provider_manager.set_default(provider_id):
         raise HTTPException(status_code=404, detail="Provider not found or disabled")
+    cloud_provider_pool.clear_aliases()
 
     await async_audit_logger.log(
         action="update",
@@ -3555,11 +3778,11 @@ async def widget_stream_message(request: Request, session_id: str):
         if backend and backend.startswith("cloud:"):
             provider_id = backend.split(":", 1)[1]
             try:
-                provider_config = await async_cloud_provider_manager.get_provider_with_key(
-                    provider_id
+                pooled = await cloud_provider_pool.aget(
+                    provider_id, async_cloud_provider_manager.get_provider_with_key
                 )
-                if provider_config:
-                    active_llm = CloudLLMService(provider_config)
+                if pooled:
+                    active_llm = pooled
             except Exception as e:
                 logger.warning(f"Widget LLM override failed: {e}")
         custom_prompt = widget.get("system_prompt")
@@ -3577,7 +3800,7 @@ async def widget_stream_message(request: Request, session_id: str):
         full_response = []
         try:
             yield f"data: {json.dumps({'type': 'user_message', 'message': user_msg}, ensure_ascii=False)}\n\n"
-            for chunk in active_llm.generate_response_from_messages(messages, stream=True):
+            async for chunk in astream_from_messages(active_llm, messages):
                 full_response.append(chunk)
                 yield f"data: {json.dumps({'type': 'chunk', 'content': chunk}, ensure_ascii=False)}\n\n"
             response_text = "".join(full_response)
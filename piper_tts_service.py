@@ -2,22 +2,110 @@
 """
 Сервис TTS на базе Piper (ONNX модели)
 Поддерживает модели: dmitri, irina
+
+Если установлен piper-tts (Python, onnxruntime), синтез идёт в резидентных
+воркерах: модель голоса загружается один раз на воркер и живёт в процессе
+оркестратора. Без него — прежний путь через piper binary (процесс на фразу).
 """
 
+import json
 import logging
+import os
+import queue
 import shutil
 import subprocess
 import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, Generator, Optional, Tuple
 
 import numpy as np
 import soundfile as sf
 
 
+try:
+    from piper import PiperVoice
+
+    PIPER_PYTHON_AVAILABLE = True
+except ImportError:
+    PiperVoice = None
+    PIPER_PYTHON_AVAILABLE = False
+
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Размер чанка при чтении raw PCM из piper binary (байт, int16)
+_RAW_READ_SIZE = 8192
+
+
+def _pcm16_to_float(data: bytes) -> np.ndarray:
+    """int16 PCM -> float32 [-1, 1]"""
+    return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+class PiperWorkerPool:
+    """
+    Пул резидентных Piper воркеров одного голоса (in-process onnxruntime).
+
+    Каждый воркер — загруженный PiperVoice; воркеры создаются лениво до
+    max_workers и переиспользуются, так что модель не перечитывается на фразу.
+    """
+
+    def __init__(self, model_path: Path, max_workers: int = 2):
+        self.model_path = model_path
+        self.max_workers = max(1, max_workers)
+        self._idle: "queue.Queue" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.sample_rate: Optional[int] = None
+
+    def _load(self):
+        voice = PiperVoice.load(str(self.model_path))
+        self.sample_rate = voice.config.sample_rate
+        logger.info(f"📦 Piper воркер загружен: {self.model_path.name} ({self.sample_rate} Hz)")
+        return voice
+
+    @contextmanager
+    def acquire(self):
+        """Берёт свободный воркер (или создаёт новый, пока не достигнут max_workers)"""
+        try:
+            voice = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.max_workers
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    voice = self._load()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                voice = self._idle.get()
+        try:
+            yield voice
+        finally:
+            self._idle.put(voice)
+
+    @staticmethod
+    def iter_pcm(voice, text: str, length_scale: Optional[float]) -> Generator[bytes, None, None]:
+        """raw int16 PCM по предложениям (piper-tts 1.2 и 1.3+)"""
+        if hasattr(voice, "synthesize_stream_raw"):
+            yield from voice.synthesize_stream_raw(text, length_scale=length_scale)
+            return
+
+        from piper import SynthesisConfig
+
+        for chunk in voice.synthesize(text, syn_config=SynthesisConfig(length_scale=length_scale)):
+            yield chunk.audio_int16_bytes
+
+    def get_stats(self) -> dict:
+        return {"workers": self._created, "idle": self._idle.qsize(), "max": self.max_workers}
+
 
 class PiperTTSService:
     """
@@ -44,14 +132,22 @@ class PiperTTSService:
         models_dir: str = None,
         piper_path: Optional[str] = None,
         default_voice: str = "dmitri",
+        workers: Optional[int] = None,
+        resident: bool = True,
     ):
         # Find models directory (Docker or local)
         self.models_dir = self._find_models_dir(models_dir)
         self.default_voice = default_voice
 
-        # Ищем piper binary
+        # Резидентные воркеры (piper-tts в процессе) — по пулу на голос
+        self.resident = resident and PIPER_PYTHON_AVAILABLE
+        self.workers = workers or int(os.getenv("PIPER_WORKERS", "2"))
+        self._pools: Dict[str, PiperWorkerPool] = {}
+        self._pools_lock = threading.Lock()
+
+        # Ищем piper binary (fallback без piper-tts)
         self.piper_path = self._find_piper(piper_path)
-        if not self.piper_path:
+        if not self.piper_path and not self.resident:
             raise RuntimeError("Piper binary не найден. Укажите путь через piper_path")
 
         # Проверяем наличие моделей
@@ -59,6 +155,8 @@ class PiperTTSService:
 
         logger.info("🎤 PiperTTSService инициализирован")
         logger.info(f"   Piper: {self.piper_path}")
+        if self.resident:
+            logger.info(f"   Резидентные воркеры: {self.workers} на голос (onnxruntime)")
         logger.info(f"   Модели: {self.models_dir}")
         logger.info(f"   Голос по умолчанию: {default_voice}")
 
@@ -125,6 +223,87 @@ class PiperTTSService:
             available[voice_id] = {**info, "available": model_path.exists(), "engine": "piper"}
         return available
 
+    def _model_path(self, voice: Optional[str]) -> Tuple[str, Path]:
+        """Проверяет голос и возвращает (voice_id, путь к ONNX модели)"""
+        voice = voice or self.default_voice
+        if voice not in self.VOICES:
+            raise ValueError(f"Неизвестный голос: {voice}. Доступны: {list(self.VOICES.keys())}")
+
+        model_path = self.models_dir / self.VOICES[voice]["model"]
+        if not model_path.exists():
+            raise FileNotFoundError(f"Модель не найдена: {model_path}")
+        return voice, model_path
+
+    def _get_pool(self, voice: str, model_path: Path) -> PiperWorkerPool:
+        with self._pools_lock:
+            pool = self._pools.get(voice)
+            if pool is None:
+                pool = PiperWorkerPool(model_path, self.workers)
+                self._pools[voice] = pool
+            return pool
+
+    @staticmethod
+    def _model_sample_rate(model_path: Path) -> int:
+        """Sample rate из конфига модели (<model>.onnx.json)"""
+        config_path = model_path.with_suffix(".onnx.json")
+        try:
+            with open(config_path, encoding="utf-8") as f:
+                return int(json.load(f)["audio"]["sample_rate"])
+        except Exception:
+            return 22050
+
+    def synthesize_stream(
+        self, text: str, voice: Optional[str] = None, speed: float = 1.0
+    ) -> Generator[Tuple[np.ndarray, int], None, None]:
+        """
+        Потоковый синтез без временных файлов: выдаёт PCM чанки по мере готовности.
+
+        Резидентный воркер отдаёт аудио по предложениям; без piper-tts —
+        raw PCM из stdout piper binary (--output_raw).
+
+        Yields:
+            (чанк float32, sample_rate)
+        """
+        voice, model_path = self._model_path(voice)
+        length_scale = 1.0 / speed if speed != 1.0 else None
+
+        if self.resident:
+            pool = self._get_pool(voice, model_path)
+            with pool.acquire() as piper_voice:
+                for pcm in pool.iter_pcm(piper_voice, text, length_scale):
+                    if pcm:
+                        yield _pcm16_to_float(pcm), pool.sample_rate
+            return
+
+        cmd = [self.piper_path, "--model", str(model_path), "--output_raw"]
+        if length_scale is not None:
+            cmd.extend(["--length_scale", str(length_scale)])
+        sample_rate = self._model_sample_rate(model_path)
+
+        proc = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        try:
+            proc.stdin.write(text.replace("\n", " ").encode("utf-8") + b"\n")
+            proc.stdin.close()
+            leftover = b""
+            while True:
+                data = proc.stdout.read1(_RAW_READ_SIZE)
+                if not data:
+                    break
+                data = leftover + data
+                # int16: не режем сэмпл пополам
+                cut = len(data) - len(data) % 2
+                leftover = data[cut:]
+                if cut:
+                    yield _pcm16_to_float(data[:cut]), sample_rate
+            if proc.wait(timeout=30) != 0:
+                raise RuntimeError(f"Piper failed: exit code {proc.returncode}")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
     def synthesize(
         self, text: str, voice: Optional[str] = None, speed: float = 1.0
     ) -> Tuple[np.ndarray, int]:
@@ -139,13 +318,26 @@ class PiperTTSService:
         Returns:
             (wav_array, sample_rate)
         """
-        voice = voice or self.default_voice
-        if voice not in self.VOICES:
-            raise ValueError(f"Неизвестный голос: {voice}. Доступны: {list(self.VOICES.keys())}")
-
-        model_path = self.models_dir / self.VOICES[voice]["model"]
-        if not model_path.exists():
-            raise FileNotFoundError(f"Модель не найдена: {model_path}")
+        if not self.resident:
+            return self._synthesize_subprocess(text, voice, speed)
+
+        logger.info(f"🎙️ Piper синтез: голос={voice or self.default_voice}, текст='{text[:50]}...'")
+        parts = []
+        sample_rate = None
+        for chunk, sample_rate in self.synthesize_stream(text, voice, speed):
+            parts.append(chunk)
+        if sample_rate is None:
+            _voice, model_path = self._model_path(voice)
+            sample_rate = self._model_sample_rate(model_path)
+        wav = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+        logger.info(f"✅ Синтезировано: {len(wav) / sample_rate:.2f} сек")
+        return wav, sample_rate
+
+    def _synthesize_subprocess(
+        self, text: str, voice: Optional[str] = None, speed: float = 1.0
+    ) -> Tuple[np.ndarray, int]:
+        """Синтез через отдельный процесс piper на фразу (без piper-tts)"""
+        voice, model_path = self._model_path(voice)
 
         logger.info(f"🎙️ Piper синтез: голос={voice}, текст='{text[:50]}...'")
 
@@ -195,6 +387,12 @@ class PiperTTSService:
         logger.info(f"💾 Сохранено: {output_path}")
         return output_path
 
+    def get_stats(self) -> dict:
+        """Статистика резидентных воркеров"""
+        with self._pools_lock:
+            pools = {voice: pool.get_stats() for voice, pool in self._pools.items()}
+        return {"resident": self.resident, "workers_per_voice": self.workers, "pools": pools}
+
 
 # Тестирование
 if __name__ == "__main__":
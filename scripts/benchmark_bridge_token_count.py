@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Benchmark: подсчёт токенов bridge на 50-ходовых диалогах.
+
+Клиенты OpenAI API присылают всю историю в каждом запросе, поэтому без
+мемоизации bridge на каждом ходу заново кодирует системный промпт,
+инструкции инструментов и все предыдущие реплики.
+
+Сравнивается:
+- prompt: count_messages() без кэша vs с LRU по хэшу содержимого
+  (для каждого хода 1..--turns считается вся история, как в stream_generator)
+- completion: кодирование всего ответа после конца стрима vs
+  IncrementalTokenCounter, который считает по мере поступления чанков;
+  печатается работа, оставшаяся после последнего чанка
+
+Результаты обоих вариантов обязаны совпадать (иначе exit 1).
+
+Запуск:
+    python scripts/benchmark_bridge_token_count.py [--turns 50] [--conversations 5]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+# Добавляем bridge в path
+sys.path.insert(0, str(Path(__file__).parent.parent / "services" / "bridge"))
+
+from src.utils.tokens import IncrementalTokenCounter, TokenCounter
+
+
+MODEL = "sonnet"
+
+WORDS = [
+    "бот",
+    "канал",
+    "новость",
+    "релиз",
+    "пользователь",
+    "запрос",
+    "ответ",
+    "модель",
+    "сервис",
+    "сообщение",
+    "настройка",
+    "интеграция",
+    "голос",
+    "синтез",
+    "очередь",
+    "кэш",
+    "токен",
+    "лимит",
+    "отчёт",
+    "задача",
+    "the",
+    "release",
+    "notes",
+    "model",
+    "request",
+    "response",
+    "queue",
+    "cache",
+    "token",
+    "limit",
+    "report",
+    "deploy",
+    "server",
+    "client",
+    "stream",
+    "chunk",
+    "latency",
+    "update",
+    "config",
+    "api",
+    "user",
+]
+
+SYSTEM_PROMPT = (
+    "Ты — ассистент компании, отвечаешь кратко и по делу. " * 20
+    + "\n\nYou have access to the following tools:\n"
+    + "\n".join(
+        f'- {name}: {{"type": "object", "properties": {{"query": {{"type": "string"}}}}}}'
+        for name in ("search", "read_file", "write_file", "create_post", "schedule_post")
+    )
+    + "\n\nTo call a tool, respond with a ```tool_call block containing JSON. " * 5
+)
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    parts = []
+    for i in range(words):
+        word = rng.choice(WORDS)
+        parts.append(word.capitalize() if i == 0 or parts[-1].endswith(".") else word)
+        if rng.random() < 0.08:
+            parts[-1] += rng.choice((".", ",", ":", "!"))
+        if rng.random() < 0.02:
+            parts[-1] += "\n\n"
+    return " ".join(parts) + "."
+
+
+def make_conversation(rng: random.Random, turns: int) -> list[dict]:
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    for _ in range(turns):
+        messages.append({"role": "user", "content": make_text(rng, rng.randint(10, 80))})
+        messages.append({"role": "assistant", "content": make_text(rng, rng.randint(60, 400))})
+    return messages
+
+
+def split_chunks(text: str, rng: random.Random) -> list[str]:
+    chunks, pos = [], 0
+    while pos < len(text):
+        size = rng.randint(1, 24)
+        chunks.append(text[pos : pos + size])
+        pos += size
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bridge token counting")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--conversations", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    baseline = TokenCounter(cache_size=0)
+    memoized = TokenCounter()
+    baseline.preload(["cl100k_base"], wait=120)
+    memoized.preload(["cl100k_base"], wait=120)
+    if not memoized.get_stats()["encodings_loaded"]:
+        print("tiktoken encoding cl100k_base is not available — timings would be meaningless")
+        sys.exit(1)
+
+    print(f"\n{'=' * 72}")
+    print(
+        f"Bridge token counting — {args.conversations} conversations × {args.turns} turns "
+        f"(system prompt {len(SYSTEM_PROMPT)} chars)"
+    )
+    print(f"{'=' * 72}")
+
+    mismatches = 0
+    prompt_base, prompt_memo = [], []
+    finish_base, finish_incr, total_base, total_incr = [], [], [], []
+
+    for _ in range(args.conversations):
+        conversation = make_conversation(rng, args.turns)
+
+        for turn in range(1, args.turns + 1):
+            # История до текущего вопроса пользователя включительно
+            history = conversation[: 2 * turn]
+
+            start = time.perf_counter()
+            expected = baseline.count_messages(history, MODEL)
+            prompt_base.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            got = memoized.count_messages(history, MODEL)
+            prompt_memo.append(time.perf_counter() - start)
+            mismatches += got != expected
+
+            # Ответ ассистента приходит стримом
+            reply = conversation[2 * turn]["content"]
+            chunks = split_chunks(reply, rng)
+
+            start = time.perf_counter()
+            text = "".join(chunks)
+            finish = time.perf_counter()
+            expected = baseline.count_text(text, MODEL)
+            finish_base.append(time.perf_counter() - finish)
+            total_base.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            counter = IncrementalTokenCounter(MODEL, memoized)
+            for chunk in chunks:
+                counter.feed(chunk)
+            finish = time.perf_counter()
+            got = counter.total
+            finish_incr.append(time.perf_counter() - finish)
+            total_incr.append(time.perf_counter() - start)
+            mismatches += got != expected
+
+    def row(label: str, base: list[float], new: list[float]) -> None:
+        base_ms, new_ms = np.array(base) * 1000, np.array(new) * 1000
+        print(
+            f"  {label:<28} p50 {np.percentile(base_ms, 50):7.3f} → {np.percentile(new_ms, 50):7.3f} ms"
+            f"   total {base_ms.sum():8.1f} → {new_ms.sum():8.1f} ms"
+        )
+
+    row("prompt (count_messages)", prompt_base, prompt_memo)
+    row("completion: after last chunk", finish_base, finish_incr)
+    row("completion: whole stream", total_base, total_incr)
+    stats = memoized.get_stats()
+    print(f"  message cache: {stats['cache_size']} entries, hit rate {stats['cache_hit_rate']:.1%}")
+    print(f"  mismatches: {mismatches}")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark: потоковый парсер tool_call блоков bridge против пакетного.
+
+Для каждого ответа корпуса StreamingToolCallParser получает текст кусками
+случайной длины (--chunkings разбиений на ответ) и сравнивается с
+parse_tool_calls() на полном тексте: склеенный текст и список вызовов
+(имя + аргументы) должны совпасть. Печатает, через сколько символов ответа
+клиент получает первый текст (раньше — только после конца ответа), и
+скорость парсера.
+
+Корпус: встроенные примеры или JSONL с записанными ответами CLI
+(одна строка — {"text": "...", "tools": ["name", ...]}; tools необязателен).
+
+Запуск:
+    python scripts/benchmark_bridge_tool_stream.py [--corpus responses.jsonl] [--chunkings 200]
+"""
+
+import argparse
+import json
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+# Добавляем bridge в path
+sys.path.insert(0, str(Path(__file__).parent.parent / "services" / "bridge"))
+
+from src.utils.tools import StreamingToolCallParser, parse_tool_calls
+
+
+TOOLS = ["read_file", "write_file", "search"]
+
+BUILTIN_CORPUS = [
+    "Просто текстовый ответ без инструментов.",
+    'Сейчас прочитаю файл.\n\n```tool_call\n{"name": "read_file", "arguments": {"path": "main.py"}}\n```',
+    '```tool_call\n{"name": "search", "arguments": {"query": "TODO"}}\n```\n\n'
+    '```tool_call\n{"name": "read_file", "arguments": {"path": "a.py"}}\n```\nГотово.',
+    'Текст до.\n```tool_call\n{"name": "write_file", "arguments": {"path": "x", "content": "}\\n```"}}\n```\nТекст после.',
+    'Битый JSON:\n```tool_call\n{"name": "read_file", "arguments": {path: 1}}\n```\nконец',
+    'Выдуманный инструмент:\n```tool_call\n{"name": "todo", "arguments": {}}\n```',
+    'Незакрытый блок:\n```tool_call\n{"name": "read_file", "arguments": {"path": "a"}}',
+    "Упоминание ```tool_call в тексте без блока и ``` обычные кавычки.",
+    "Код:\n```python\nprint('hi')\n```\nи ещё ```tool_call``` в прозе.",
+    '   \n\n  Пробелы вокруг  \n```tool_call\n  {"name": "search", "arguments": "raw"}  \n```\n\n   ',
+    '```tool_call {"name": "search", "arguments": {"q": 1}}```хвост',
+    '```tool_call\n{"name": "read_file", "arguments": {"path": "a"}}\n``` ```tool_call\n{"name": "search"',
+    "Смешанный ` одиночный и `` двойной бэктик, а в конце ```tool_",
+    "",
+]
+
+
+def load_corpus(path: Path | None) -> list[tuple[str, set[str] | None]]:
+    if path is None:
+        return [(text, set(TOOLS)) for text in BUILTIN_CORPUS]
+    corpus = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            item = json.loads(line)
+            tools = item.get("tools")
+            corpus.append((item["text"], set(tools) if tools else None))
+    return corpus
+
+
+def calls_key(tool_calls: list[dict]) -> list[tuple[str, str]]:
+    # id генерируется случайно — сравниваем имя и аргументы
+    return [(c["function"]["name"], c["function"]["arguments"]) for c in tool_calls]
+
+
+def split(text: str, rng: random.Random) -> list[str]:
+    chunks, pos = [], 0
+    while pos < len(text):
+        size = rng.choice((1, 2, 3, 5, 8, 13, 40))
+        chunks.append(text[pos : pos + size])
+        pos += size
+    return chunks
+
+
+def stream_parse(chunks: list[str], valid: set[str] | None) -> tuple[str, list[dict], int | None]:
+    parser = StreamingToolCallParser(valid)
+    out, consumed, first_text_at = [], 0, None
+    for chunk in chunks:
+        consumed += len(chunk)
+        text, _ = parser.feed(chunk)
+        if text and first_text_at is None:
+            first_text_at = consumed
+        out.append(text)
+    text, _ = parser.finish()
+    out.append(text)
+    if text and first_text_at is None:
+        first_text_at = consumed
+    return "".join(out), parser.tool_calls, first_text_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check/benchmark streaming tool_call parser")
+    parser.add_argument("--corpus", type=Path, default=None)
+    parser.add_argument("--chunkings", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Битые и выдуманные вызовы в корпусе ожидаемы — не засоряем вывод
+    logging.getLogger("src.utils.tools").setLevel(logging.ERROR)
+
+    corpus = load_corpus(args.corpus)
+    rng = random.Random(args.seed)
+
+    print(f"\n{'=' * 72}")
+    print(f"Streaming tool_call parser — {len(corpus)} responses × {args.chunkings} chunkings")
+    print(f"{'=' * 72}")
+
+    mismatches = 0
+    first_text_ratio = []
+    for text, valid in corpus:
+        expected_calls, expected_text = parse_tool_calls(text, valid)
+        for _ in range(args.chunkings):
+            got_text, got_calls, first_at = stream_parse(split(text, rng), valid)
+            if got_text != expected_text or calls_key(got_calls) != calls_key(expected_calls):
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"  MISMATCH: {text[:60]!r}\n    text {got_text!r} != {expected_text!r}")
+            if first_at is not None and text:
+                first_text_ratio.append(first_at / len(text))
+
+    print(f"  mismatches: {mismatches}")
+    if first_text_ratio:
+        ratios = np.array(first_text_ratio) * 100
+        print(
+            f"  first text after {np.percentile(ratios, 50):.0f}% of the response (p50), "
+            f"{np.percentile(ratios, 95):.0f}% (p95); batch parser: 100%"
+        )
+
+    # Скорость: длинный ответ, мелкие куски
+    long_text = (BUILTIN_CORPUS[2] + "\n" + "Обычный текст ответа. " * 50) * 20
+    chunks = split(long_text, random.Random(0))
+    start = time.perf_counter()
+    stream_parse(chunks, set(TOOLS))
+    elapsed = time.perf_counter() - start
+    print(
+        f"  throughput: {len(long_text) / elapsed / 1e6:.1f} M chars/s "
+        f"({len(chunks)} chunks, {len(long_text)} chars)"
+    )
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
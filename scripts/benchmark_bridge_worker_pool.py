@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark: TTFT bridge-провайдера с прогретым пулом CLI-процессов и без него.
+
+Вместо настоящего CLI используется фейковый скрипт в формате Claude Code
+stream-json: он «стартует» --startup секунд (имитация загрузки Node, auth,
+конфига), затем читает промпт из stdin и выдаёт ответ по словам.
+
+Режимы:
+- cold: каждый запрос запускает новый процесс (прежнее поведение)
+- warm: CLIWorkerPool держит заранее запущенные процессы
+
+Запросы идут волнами по --concurrency штук с паузой --gap между волнами
+(время, за которое пул успевает подготовить замену). Печатает p50/p95
+TTFT и общего времени ответа, а также статистику пула.
+
+Запуск:
+    python scripts/benchmark_bridge_worker_pool.py [--requests 20] [--startup 0.8]
+"""
+
+import argparse
+import asyncio
+import os
+import stat
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+# Добавляем bridge в path
+sys.path.insert(0, str(Path(__file__).parent.parent / "services" / "bridge"))
+
+from src.providers.claude.provider import ClaudeProvider
+from src.utils.worker_pool import get_worker_pools, init_worker_pools, shutdown_worker_pools
+
+
+FAKE_CLI = """#!{python}
+import json, sys, time
+time.sleep({startup})  # cold start: runtime, auth, config
+prompt = sys.stdin.read()
+words = ("Ответ на запрос длиной " + str(len(prompt)) + " символов " + "слово " * 20).split()
+for word in words:
+    print(json.dumps({{"type": "assistant", "message": {{"content": [{{"type": "text", "text": word + " "}}]}}}}), flush=True)
+    time.sleep({token_delay})
+print(json.dumps({{"type": "result", "result": " ".join(words)}}), flush=True)
+"""
+
+
+def write_fake_cli(directory: Path, startup: float, token_delay: float) -> str:
+    path = directory / "fake-claude"
+    path.write_text(
+        FAKE_CLI.format(python=sys.executable, startup=startup, token_delay=token_delay)
+    )
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+async def one_request(provider: ClaudeProvider) -> tuple[float, float]:
+    messages = [
+        {"role": "system", "content": "Ты — помощник, пишущий посты для новостного канала."},
+        {"role": "user", "content": "Напиши короткий пост о новом релизе."},
+    ]
+    start = time.perf_counter()
+    ttft = None
+    stream = await provider.complete(messages, "sonnet", stream=True)
+    async for chunk in stream:
+        if ttft is None and chunk.get("content"):
+            ttft = time.perf_counter() - start
+    return ttft or 0.0, time.perf_counter() - start
+
+
+async def run_mode(mode: str, cli_path: str, args) -> None:
+    provider = ClaudeProvider(cli_path)
+    if mode == "warm":
+        init_worker_pools(["claude"], size=args.concurrency, max_idle=300)
+        # Первый запрос — холодный; пул начинает держать процессы для этой команды
+        await one_request(provider)
+        await asyncio.sleep(args.gap)
+
+    ttfts, totals = [], []
+    done = 0
+    while done < args.requests:
+        wave = min(args.concurrency, args.requests - done)
+        results = await asyncio.gather(*(one_request(provider) for _ in range(wave)))
+        for ttft, total in results:
+            ttfts.append(ttft)
+            totals.append(total)
+        done += wave
+        await asyncio.sleep(args.gap)
+
+    ttft_ms = np.array(ttfts) * 1000
+    total_ms = np.array(totals) * 1000
+    print(f"\n[{mode}] {len(ttfts)} requests")
+    print(
+        f"  TTFT   p50 {np.percentile(ttft_ms, 50):8.1f} ms   p95 {np.percentile(ttft_ms, 95):8.1f} ms"
+    )
+    print(
+        f"  total  p50 {np.percentile(total_ms, 50):8.1f} ms   p95 {np.percentile(total_ms, 95):8.1f} ms"
+    )
+    for name, pool in get_worker_pools().items():
+        stats = pool.get_stats()
+        print(
+            f"  pool {name}: hits {stats['hits']}, misses {stats['misses']}, "
+            f"spawned {stats['spawned']}, idle {stats['idle']}"
+        )
+    await shutdown_worker_pools()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bridge CLI worker pool")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--startup", type=float, default=0.8, help="fake CLI cold start, s")
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--gap", type=float, default=1.5, help="pause between waves, s")
+    args = parser.parse_args()
+
+    print(f"\n{'=' * 72}")
+    print(
+        f"Bridge CLI worker pool — fake CLI start {args.startup:.2f} s, "
+        f"{args.requests} requests × {args.concurrency} concurrent"
+    )
+    print(f"{'=' * 72}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cli_path = write_fake_cli(Path(tmp), args.startup, args.token_delay)
+        os.environ.setdefault("CLAUDE_PERMISSION_LEVEL", "chat")
+        for mode in ("cold", "warm"):
+            asyncio.run(run_mode(mode, cli_path, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: операции с ветками чата в ChatRepository.
+
+Сравнивает прежнюю реализацию (рекурсия в Python, запрос на каждое сообщение,
+загрузка всех ORM-объектов сессии) с текущей (recursive CTE, один UPDATE на
+операцию, выборка только нужных колонок):
+- deactivate: _deactivate_branch у сообщения в начале активной ветки
+- switch:     switch_branch на альтернативную ветку у корня и обратно
+- tree:       get_branch_tree
+- siblings:   get_sibling_info
+
+Сессия синтетическая: основная цепочка + альтернативные ветки (правки и
+перегенерации) через каждые --fork-every сообщений. БД — временный SQLite-файл.
+Перед замерами проверяется, что обе реализации дают одинаковое состояние.
+
+Запуск:
+    python scripts/benchmark_chat_branches.py [--messages 5000] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+
+# Добавляем корень проекта в path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db.models import Base, ChatMessage, ChatSession
+from db.repositories.chat import ChatRepository
+
+
+# Прежний get_branch_tree рекурсивен по глубине дерева
+sys.setrecursionlimit(100_000)
+
+SESSION_ID = "chat_bench"
+
+
+class LegacyChatRepository(ChatRepository):
+    """Прежние реализации ветвления (до перехода на recursive CTE)."""
+
+    async def _deactivate_branch(self, session_id: str, message_id: str) -> None:
+        await self.session.execute(
+            update(ChatMessage).where(ChatMessage.id == message_id).values(is_active=False)
+        )
+        children_result = await self.session.execute(
+            select(ChatMessage.id)
+            .where(ChatMessage.parent_id == message_id)
+            .where(ChatMessage.is_active.is_(True))
+        )
+        for child_id in [row[0] for row in children_result.all()]:
+            await self._deactivate_branch(session_id, child_id)
+
+    async def get_branch_tree(self, session_id: str) -> List[dict]:
+        result = await self.session.execute(
+            select(ChatMessage)
+            .where(ChatMessage.session_id == session_id)
+            .order_by(ChatMessage.created.asc())
+        )
+        all_messages = result.scalars().all()
+        children_map: Dict[Optional[str], List[ChatMessage]] = {}
+        for m in all_messages:
+            children_map.setdefault(m.parent_id, []).append(m)
+
+        def build_node(msg: ChatMessage) -> dict:
+            return {
+                "id": msg.id,
+                "role": msg.role,
+                "content_preview": msg.content[:50] + ("..." if len(msg.content) > 50 else ""),
+                "is_active": msg.is_active,
+                "children": [build_node(c) for c in children_map.get(msg.id, [])],
+            }
+
+        return [build_node(r) for r in children_map.get(None, [])]
+
+    async def get_sibling_info(self, session_id: str) -> Dict[str, dict]:
+        result = await self.session.execute(
+            select(ChatMessage)
+            .where(ChatMessage.session_id == session_id)
+            .order_by(ChatMessage.created.asc())
+        )
+        by_parent: Dict[Optional[str], List[ChatMessage]] = {}
+        for m in result.scalars().all():
+            by_parent.setdefault(m.parent_id, []).append(m)
+
+        sibling_info: Dict[str, dict] = {}
+        for siblings in by_parent.values():
+            if len(siblings) <= 1:
+                continue
+            sibling_ids = [s.id for s in siblings]
+            for i, s in enumerate(siblings):
+                sibling_info[s.id] = {"index": i, "total": len(siblings), "siblings": sibling_ids}
+        return sibling_info
+
+    async def switch_branch(self, session_id: str, message_id: str) -> bool:
+        result = await self.session.execute(
+            select(ChatMessage)
+            .where(ChatMessage.id == message_id)
+            .where(ChatMessage.session_id == session_id)
+        )
+        message = result.scalar_one_or_none()
+        if not message:
+            return False
+
+        siblings_result = await self.session.execute(
+            select(ChatMessage)
+            .where(ChatMessage.session_id == session_id)
+            .where(ChatMessage.parent_id == message.parent_id)
+            .where(ChatMessage.id != message_id)
+        )
+        for sibling in siblings_result.scalars().all():
+            if sibling.is_active:
+                await self._deactivate_branch(session_id, sibling.id)
+
+        message.is_active = True
+        await self._activate_default_path(session_id, message_id)
+
+        current_parent_id = message.parent_id
+        while current_parent_id:
+            parent_result = await self.session.execute(
+                select(ChatMessage).where(ChatMessage.id == current_parent_id)
+            )
+            parent = parent_result.scalar_one_or_none()
+            if not parent:
+                break
+            parent.is_active = True
+            current_parent_id = parent.parent_id
+
+        await self.session.commit()
+        return True
+
+    async def _activate_default_path(self, session_id: str, message_id: str) -> None:
+        children_result = await self.session.execute(
+            select(ChatMessage)
+            .where(ChatMessage.parent_id == message_id)
+            .where(ChatMessage.session_id == session_id)
+            .order_by(ChatMessage.created.desc())
+        )
+        children = children_result.scalars().all()
+        if not children:
+            return
+        children[0].is_active = True
+        for child in children[1:]:
+            if child.is_active:
+                await self._deactivate_branch(session_id, child.id)
+        await self._activate_default_path(session_id, children[0].id)
+
+
+def build_session(messages: int, fork_every: int, forks: int, fork_depth: int) -> tuple:
+    """Строки chat_messages: (rows, id листа основной цепочки, id корня первой альтернативы)."""
+    base = datetime(2026, 1, 1)
+    rows: List[dict] = []
+    main: List[str] = []
+
+    def add(parent_id: Optional[str], active: bool) -> str:
+        msg_id = f"msg_{len(rows):05d}"
+        rows.append(
+            {
+                "id": msg_id,
+                "session_id": SESSION_ID,
+                "role": "user" if len(rows) % 2 == 0 else "assistant",
+                "content": f"Сообщение {len(rows)} " + "текст " * 20,
+                "edited": False,
+                "created": base + timedelta(seconds=len(rows)),
+                "parent_id": parent_id,
+                "is_active": active,
+            }
+        )
+        return msg_id
+
+    per_fork_point = forks * fork_depth
+    main_len = max(2, messages * fork_every // (fork_every + per_fork_point))
+    for _ in range(main_len):
+        main.append(add(main[-1] if main else None, True))
+
+    # Альтернативы создаются после основной цепочки: это «более свежие» ответы
+    first_fork = None
+    for depth in range(fork_every, main_len, fork_every):
+        for _ in range(forks):
+            if len(rows) + fork_depth > messages:
+                break
+            parent_id = main[depth - 1]
+            for _ in range(fork_depth):
+                parent_id = add(parent_id, False)
+                first_fork = first_fork or parent_id
+    return rows, main, first_fork
+
+
+async def active_ids(session: AsyncSession) -> frozenset:
+    result = await session.execute(
+        select(ChatMessage.id)
+        .where(ChatMessage.session_id == SESSION_ID)
+        .where(ChatMessage.is_active.is_(True))
+    )
+    return frozenset(result.scalars().all())
+
+
+async def reset(session_factory, main: List[str]) -> None:
+    """Исходное состояние: активна только основная цепочка."""
+    async with session_factory() as session:
+        await session.execute(
+            update(ChatMessage)
+            .where(ChatMessage.session_id == SESSION_ID)
+            .values(is_active=ChatMessage.id.in_(main))
+        )
+        await session.commit()
+
+
+async def run(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        rows, main, fork_root = build_session(
+            args.messages, args.fork_every, args.forks, args.fork_depth
+        )
+        async with engine.begin() as conn:
+            now = datetime(2026, 1, 1)
+            await conn.execute(
+                insert(ChatSession).values(id=SESSION_ID, title="bench", created=now, updated=now)
+            )
+            await conn.execute(insert(ChatMessage), rows)
+
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        deactivate_at = main[len(main) // 20]
+
+        print(f"\n{'=' * 72}")
+        print(
+            f"Chat branches — {len(rows)} messages, main chain {len(main)}, "
+            f"forks every {args.fork_every} × {args.forks}"
+        )
+        print(f"{'=' * 72}")
+
+        # Проверка эквивалентности на одном и том же исходном состоянии.
+        # Обратное переключение на основную ветку не сравнивается: прежний
+        # switch_branch не деактивировал соседей предков, и ветка-альтернатива
+        # оставалась активной вместе с основной.
+        states = {}
+        for name, repo_cls in (("legacy", LegacyChatRepository), ("cte", ChatRepository)):
+            await reset(session_factory, main)
+            async with session_factory() as session:
+                repo = repo_cls(session)
+                await repo._deactivate_branch(SESSION_ID, deactivate_at)
+                deactivated = await active_ids(session)
+                await session.rollback()
+                await repo.switch_branch(SESSION_ID, fork_root)
+                switched = await active_ids(session)
+                tree = await repo.get_branch_tree(SESSION_ID)
+                siblings = await repo.get_sibling_info(SESSION_ID)
+                states[name] = (deactivated, switched, tree, siblings)
+        match = states["legacy"] == states["cte"]
+
+        async with session_factory() as session:
+            await ChatRepository(session).switch_branch(SESSION_ID, main[-1])
+            assert await active_ids(session) == frozenset(main), "main chain must be active again"
+
+        print(f"{'operation':14} {'legacy, ms':>12} {'cte, ms':>12} {'speedup':>9}")
+        for label, op in (
+            ("deactivate", "_deactivate_branch"),
+            ("switch", "switch_branch"),
+            ("tree", "get_branch_tree"),
+            ("siblings", "get_sibling_info"),
+        ):
+            results = []
+            for repo_cls in (LegacyChatRepository, ChatRepository):
+                samples = []
+                for _ in range(args.repeat):
+                    await reset(session_factory, main)
+                    async with session_factory() as session:
+                        repo = repo_cls(session)
+                        start = time.perf_counter()
+                        if op == "_deactivate_branch":
+                            await repo._deactivate_branch(SESSION_ID, deactivate_at)
+                            await session.commit()
+                        elif op == "switch_branch":
+                            await repo.switch_branch(SESSION_ID, fork_root)
+                        else:
+                            await getattr(repo, op)(SESSION_ID)
+                        samples.append(time.perf_counter() - start)
+                results.append(sorted(samples)[len(samples) // 2] * 1000)
+            legacy_ms, cte_ms = results
+            print(f"{label:14} {legacy_ms:12.1f} {cte_ms:12.1f} {legacy_ms / cte_ms:8.1f}x")
+
+        print(
+            f"\nstates identical (deactivate, switch, tree, siblings): {'yes' if match else 'NO'}"
+        )
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat branch operations")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--fork-every", type=int, default=20)
+    parser.add_argument("--forks", type=int, default=3)
+    parser.add_argument("--fork-depth", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark: TTFT виджет-трафика с пулом CloudLLMService и без него.
+
+Виджет/llm_override сообщения раньше создавали новый CloudLLMService на каждое
+сообщение (новый httpx клиент -> новое соединение + handshake) и делали
+DB lookup провайдера. Скрипт поднимает локальный stub OpenAI сервер, который
+имитирует стоимость установки соединения (--handshake-ms), и сравнивает:
+- fresh:  lookup + CloudLLMService(config) на каждое сообщение (старый путь)
+- pooled: cloud_provider_pool.aget(provider_id, loader) (keep-alive, без lookup)
+
+Запуск:
+    python scripts/benchmark_cloud_provider_pool.py [--messages 50] [--handshake-ms 60]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+
+# Добавляем корень проекта в path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmark_llm_streaming import start_fake_server
+
+
+MESSAGES = [{"role": "user", "content": "Какие у вас тарифы?"}]
+
+
+async def measure_ttft(service) -> float:
+    from cloud_llm_service import astream_from_messages
+
+    start = time.perf_counter()
+    first = None
+    async for _chunk in astream_from_messages(service, MESSAGES):
+        if first is None:
+            first = time.perf_counter() - start
+    return (first or 0.0) * 1000
+
+
+async def run(args):
+    from cloud_llm_service import CloudLLMService, CloudProviderPool
+
+    server = start_fake_server(args.tokens, args.delay_ms / 1000, args.handshake_ms / 1000)
+    port = server.server_address[1]
+    config = {
+        "id": "widget-provider",
+        "provider_type": "custom",
+        "api_key": "sk-bench",
+        "base_url": f"http://127.0.0.1:{port}/v1",
+        "model_name": "fake-model",
+        "updated": "2026-01-01T00:00:00",
+    }
+    lookups = 0
+
+    async def loader(provider_id: str):
+        # Имитация async_cloud_provider_manager.get_provider_with_key (SQLite round-trip)
+        nonlocal lookups
+        lookups += 1
+        await asyncio.sleep(args.lookup_ms / 1000)
+        return dict(config)
+
+    print(f"\n{'=' * 64}")
+    print("Cloud provider pool benchmark (widget traffic)")
+    print(f"{'=' * 64}")
+    print(
+        f"messages={args.messages}, handshake={args.handshake_ms}ms, "
+        f"lookup={args.lookup_ms}ms, tokens={args.tokens}"
+    )
+
+    results = {}
+
+    # fresh: как раньше — lookup + новый сервис на каждое сообщение
+    lookups = 0
+    fresh = []
+    for _ in range(args.messages):
+        start = time.perf_counter()
+        service = CloudLLMService(await loader(config["id"]))
+        setup_ms = (time.perf_counter() - start) * 1000
+        fresh.append(setup_ms + await measure_ttft(service))
+        await service.aclose()
+        service.close()
+    results["fresh"] = (fresh, lookups)
+
+    # pooled: cloud_provider_pool
+    pool = CloudProviderPool()
+    lookups = 0
+    pooled = []
+    for _ in range(args.messages):
+        start = time.perf_counter()
+        service = await pool.aget(config["id"], loader)
+        setup_ms = (time.perf_counter() - start) * 1000
+        pooled.append(setup_ms + await measure_ttft(service))
+    results["pooled"] = (pooled, lookups)
+
+    for label, (values, n_lookups) in results.items():
+        ordered = sorted(values)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        print(
+            f"{label:7} TTFT mean={statistics.mean(values):7.1f}ms  "
+            f"p50={statistics.median(values):7.1f}ms  p95={p95:7.1f}ms  "
+            f"db_lookups={n_lookups}"
+        )
+
+    improvement = statistics.median(results["fresh"][0]) - statistics.median(results["pooled"][0])
+    print(f"\nMedian TTFT improvement: {improvement:.1f}ms per message")
+    print(f"Pool stats: {pool.get_stats()}")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cloud provider pool")
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=10)
+    parser.add_argument("--delay-ms", type=float, default=5.0, help="Delay per token")
+    parser.add_argument("--handshake-ms", type=float, default=60.0, help="New connection cost")
+    parser.add_argument("--lookup-ms", type=float, default=2.0, help="Provider DB lookup cost")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
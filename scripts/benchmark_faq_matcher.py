@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark: компилированный FAQMatcher против линейного поиска по FAQ.
+
+Генерирует FAQ на N записей (по умолчанию 10k, как после
+FAQRepository.import_from_dict), прогоняет набор сообщений через старый
+линейный _check_faq и через FAQMatcher, проверяет что результаты совпадают
+и печатает время на сообщение.
+
+Запуск:
+    python scripts/benchmark_faq_matcher.py [--entries 10000] [--queries 2000]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+
+# Добавляем корень проекта в path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from faq_matcher import FAQMatcher
+
+
+WORDS = [
+    "как",
+    "где",
+    "когда",
+    "сколько",
+    "стоит",
+    "время",
+    "работы",
+    "адрес",
+    "офис",
+    "доставка",
+    "оплата",
+    "тариф",
+    "заказ",
+    "возврат",
+    "гарантия",
+    "скидка",
+    "менеджер",
+    "телефон",
+    "договор",
+    "счёт",
+    "подключение",
+    "интеграция",
+    "виджет",
+    "бот",
+    "голос",
+    "звонок",
+    "секретарь",
+    "запись",
+]
+
+
+def linear_check(faq: dict, user_message: str):
+    """Старая реализация _check_faq (без шаблонов) — эталон для сравнения."""
+    if not faq:
+        return None
+    normalized = user_message.lower().strip().rstrip("?!.,")
+    if normalized in faq:
+        return normalized
+    for key in faq:
+        if key in normalized or normalized in key:
+            return key
+    return None
+
+
+def make_faq(entries: int, rng: random.Random) -> dict:
+    faq = {}
+    while len(faq) < entries:
+        key = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 6)))
+        faq[f"{key} {len(faq)}"] = f"ответ {len(faq)}"
+    return faq
+
+
+def make_queries(faq: dict, count: int, rng: random.Random) -> list:
+    keys = list(faq.keys())
+    queries = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:  # точное совпадение
+            queries.append(rng.choice(keys).capitalize() + "?")
+        elif kind == 1:  # ключ внутри сообщения
+            queries.append(f"подскажите пожалуйста {rng.choice(keys)} спасибо")
+        elif kind == 2:  # сообщение внутри ключа
+            key = rng.choice(keys)
+            start = rng.randint(0, len(key) // 2)
+            queries.append(key[start : start + rng.randint(4, 12)])
+        else:  # промах
+            queries.append(" ".join(rng.choice(WORDS) for _ in range(8)) + " ?")
+    return queries
+
+
+def timed(fn, queries: list) -> tuple:
+    results = []
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(fn(q))
+        times.append((time.perf_counter() - start) * 1e6)
+    return results, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FAQ matcher")
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    faq = make_faq(args.entries, rng)
+    queries = make_queries(faq, args.queries, rng)
+
+    start = time.perf_counter()
+    matcher = FAQMatcher(faq)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    normalized_faq = {k.lower().strip(): v for k, v in faq.items()}
+    linear_results, linear_times = timed(lambda q: linear_check(normalized_faq, q), queries)
+
+    def compiled(q):
+        match = matcher.match(q)
+        return match[0] if match else None
+
+    compiled_results, compiled_times = timed(compiled, queries)
+
+    mismatches = sum(1 for a, b in zip(linear_results, compiled_results, strict=True) if a != b)
+
+    print(f"\n{'=' * 60}")
+    print(f"FAQ matcher benchmark: {args.entries} entries, {args.queries} queries")
+    print(f"{'=' * 60}")
+    print(f"Build (reload_faq):  {build_ms:8.1f}ms")
+    for label, times in (("linear", linear_times), ("compiled", compiled_times)):
+        ordered = sorted(times)
+        p99 = ordered[int(len(ordered) * 0.99)]
+        print(
+            f"{label:9} mean={statistics.mean(times):9.1f}µs  "
+            f"p50={statistics.median(times):9.1f}µs  p99={p99:9.1f}µs"
+        )
+    speedup = statistics.mean(linear_times) / statistics.mean(compiled_times)
+    print(f"Speedup: {speedup:.0f}x")
+    print(f"Mismatches vs linear scan: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: G.711 кодирование для GSM тракта.
+
+Сравнивает:
+- scalar: прежний TelephonyAudioPipeline.encode_g711_alaw (Python функция на
+          каждый сэмпл внутри list comprehension)
+- lut:    app/services/g711_codec (np.take по таблице 65536 значений)
+
+Измеряет время на секунду аудио 8 kHz и на 20ms фрейм (160 сэмплов).
+
+Запуск:
+    python scripts/benchmark_g711_codec.py [--seconds 10] [--repeat 5]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+# Добавляем корень проекта в path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import g711_codec
+
+
+def scalar_alaw(audio: np.ndarray) -> bytes:
+    """Прежняя реализация (посэмпловый Python)"""
+    audio_int16 = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+
+    def alaw_encode_sample(sample: int) -> int:
+        sign = 0x80 if sample >= 0 else 0x00
+        sample = min(abs(sample), 32635)
+        if sample < 256:
+            encoded = sample >> 4
+        else:
+            segment = 1
+            tmp = sample >> 8
+            while tmp > 0:
+                segment += 1
+                tmp >>= 1
+            encoded = (segment << 4) | ((sample >> (segment + 3)) & 0x0F)
+        return (encoded | sign) ^ 0x55
+
+    return bytes([alaw_encode_sample(s) for s in audio_int16])
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark G.711 codec")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Audio length, 8 kHz")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    samples = int(8000 * args.seconds)
+    audio = (rng.standard_normal(samples) * 0.3).astype(np.float32)
+    frame = audio[:160]
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    out = np.empty(samples, dtype=np.uint8)
+
+    print(f"\n{'=' * 72}")
+    print(f"G.711 benchmark — {args.seconds:.0f}s audio @ 8 kHz ({samples} samples)")
+    print(f"{'=' * 72}")
+
+    cases = [
+        ("scalar alaw (float32)", lambda: scalar_alaw(audio)),
+        ("lut alaw (float32)", lambda: g711_codec.encode(audio, "alaw").tobytes()),
+        ("lut ulaw (float32)", lambda: g711_codec.encode(audio, "ulaw").tobytes()),
+        ("lut alaw (int16, out=)", lambda: g711_codec.encode(pcm, "alaw", out=out)),
+        ("lut alaw decode", lambda: g711_codec.decode(out, "alaw")),
+    ]
+    baseline = None
+    for name, fn in cases:
+        elapsed = best_of(fn, args.repeat)
+        per_second = elapsed / args.seconds * 1e6
+        baseline = baseline or per_second
+        print(f"{name:26} {per_second:10.1f} µs / s audio   x{baseline / per_second:7.1f}")
+
+    print("\n20ms frame (160 samples):")
+    for name, fn in (
+        ("scalar alaw", lambda: scalar_alaw(frame)),
+        ("lut alaw", lambda: g711_codec.encode(frame, "alaw").tobytes()),
+    ):
+        elapsed = best_of(lambda fn=fn: [fn() for _ in range(1000)], args.repeat) / 1000
+        print(f"{name:26} {elapsed * 1e6:10.2f} µs / frame")
+
+
+if __name__ == "__main__":
+    main()
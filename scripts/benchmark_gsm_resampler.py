@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ресэмплинг XTTS чанков 24kHz → 8kHz для GSM тракта.
+
+Сравнивает:
+- per-chunk: прежний путь generate_gsm_frames — resample() каждого чанка
+             отдельно (scipy.signal.resample / np.interp) + np.concatenate
+             буфера на каждый чанк и пересрез на каждый фрейм
+- streaming: StreamingDecimator (полифазный FIR 3:1, состояние между чанками)
+             + кольцевой буфер фреймов (текущий generate_gsm_frames)
+
+Измеряет время на секунду аудио и "щелчки" на границах чанков: отклонение
+результата по чанкам от обработки того же сигнала целиком.
+
+Запуск:
+    python scripts/benchmark_gsm_resampler.py [--seconds 30] [--chunk-ms 250]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+# Добавляем корень проекта в path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.audio_pipeline import StreamingDecimator, TelephonyAudioPipeline
+
+
+SOURCE_RATE = 24000
+
+
+def per_chunk_frames(pipeline: TelephonyAudioPipeline, chunks: list) -> list:
+    """Прежний generate_gsm_frames: resample по чанку + растущий буфер"""
+    frames = []
+    buffer = np.array([], dtype=np.float32)
+    for chunk in chunks:
+        buffer = np.concatenate([buffer, pipeline.resample(chunk, SOURCE_RATE)])
+        while len(buffer) >= pipeline.frame_samples:
+            frames.append(pipeline.float_to_pcm16(buffer[: pipeline.frame_samples]))
+            buffer = buffer[pipeline.frame_samples :]
+    return frames
+
+
+def streaming_frames(pipeline: TelephonyAudioPipeline, chunks: list) -> list:
+    pipeline.reset()
+    return list(pipeline.generate_gsm_frames((c, SOURCE_RATE) for c in chunks))
+
+
+def boundary_error(resample_chunked, resample_whole, signal: np.ndarray, chunks: list) -> float:
+    """Максимальное отклонение результата по чанкам от результата целиком"""
+    chunked = np.concatenate([resample_chunked(c) for c in chunks])
+    whole = resample_whole(signal)
+    n = min(len(chunked), len(whole))
+    return float(np.max(np.abs(chunked[:n] - whole[:n])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GSM 24k→8k resampling")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--chunk-ms", type=float, default=250.0, help="XTTS chunk length")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    t = np.arange(int(SOURCE_RATE * args.seconds)) / SOURCE_RATE
+    # Речевой диапазон: несколько тонов 200..3000 Hz
+    signal = sum(0.15 * np.sin(2 * np.pi * f * t) for f in (233, 447, 1210, 2903))
+    signal = signal.astype(np.float32)
+
+    # XTTS отдаёт чанки переменной длины (stream_chunk_size в токенах)
+    rng = np.random.default_rng(0)
+    mean_chunk = int(SOURCE_RATE * args.chunk_ms / 1000)
+    chunks, pos = [], 0
+    while pos < len(signal):
+        size = int(rng.integers(mean_chunk // 2, mean_chunk * 3 // 2))
+        chunks.append(signal[pos : pos + size])
+        pos += size
+
+    pipeline = TelephonyAudioPipeline()
+
+    print(f"\n{'=' * 72}")
+    print(f"GSM resampler benchmark — {args.seconds:.0f}s audio, chunks {args.chunk_ms:.0f}ms")
+    print(f"{'=' * 72}")
+
+    for name, fn in (
+        ("per-chunk", lambda: per_chunk_frames(pipeline, chunks)),
+        ("streaming", lambda: streaming_frames(pipeline, chunks)),
+    ):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            frames = fn()
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:10} {best / args.seconds * 1000:8.3f} ms / s audio  ({len(frames)} frames)")
+
+    def old_resample(audio):
+        return pipeline.resample(audio, SOURCE_RATE)
+
+    def new_whole(audio):
+        return StreamingDecimator(SOURCE_RATE, 8000).process(audio)
+
+    decimator = StreamingDecimator(SOURCE_RATE, 8000)
+    print("\nChunk boundary error (max |chunked - whole|):")
+    print(f"per-chunk  {boundary_error(old_resample, old_resample, signal, chunks):.6f}")
+    print(f"streaming  {boundary_error(decimator.process, new_whole, signal, chunks):.6f}")
+
+
+if __name__ == "__main__":
+    main()
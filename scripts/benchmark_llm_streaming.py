@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Benchmark: N параллельных LLM стримов внутри одного event loop.
+
+Поднимает локальный fake OpenAI-compatible сервер (SSE, задержка на токен)
+и сравнивает два пути, которыми оркестратор читает поток:
+- sync:  `for chunk in generate_response_from_messages(stream=True)` внутри async def
+         (старый путь — каждое чтение токена блокирует event loop)
+- async: `async for chunk in astream_from_messages(...)` (httpx.AsyncClient)
+
+Измеряет time-to-first-token (TTFT) для каждого стрима: p50/p99/max.
+При async пути p99 TTFT должен оставаться ~равным задержке первого токена
+независимо от N.
+
+Запуск:
+    python scripts/benchmark_llm_streaming.py [--streams 32] [--tokens 40] [--delay-ms 20]
+    python scripts/benchmark_llm_streaming.py --backend vllm
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+# Добавляем корень проекта в path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def make_fake_openai_handler(tokens: int, delay: float, connect_delay: float = 0.0):
+    """
+    Создаёт handler fake OpenAI сервера с заданной длиной ответа и задержкой.
+
+    connect_delay имитирует стоимость установки нового соединения (TLS handshake):
+    платится один раз на TCP соединение, keep-alive запросы её не платят.
+    """
+
+    class FakeOpenAIHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # Без TCP_NODELAY мелкие SSE чанки ловят Nagle + delayed ACK (~40ms)
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if connect_delay:
+                time.sleep(connect_delay)
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            body = json.dumps({"data": [{"id": "fake-model"}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send(data: str):
+                payload = f"data: {data}\n\n".encode()
+                self.wfile.write(f"{len(payload):X}\r\n".encode() + payload + b"\r\n")
+                self.wfile.flush()
+
+            for i in range(tokens):
+                time.sleep(delay)
+                chunk = {"choices": [{"index": 0, "delta": {"content": f"t{i} "}}]}
+                send(json.dumps(chunk))
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return FakeOpenAIHandler
+
+
+class _FakeServer(ThreadingHTTPServer):
+    # Дефолтный backlog (5) даёт 1s SYN-ретраи при всплеске соединений
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def start_fake_server(tokens: int, delay: float, connect_delay: float = 0.0) -> ThreadingHTTPServer:
+    server = _FakeServer(("127.0.0.1", 0), make_fake_openai_handler(tokens, delay, connect_delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def build_service(backend: str, port: int):
+    if backend == "vllm":
+        from vllm_llm_service import VLLMLLMService
+
+        return VLLMLLMService(api_url=f"http://127.0.0.1:{port}", model_name="fake-model")
+
+    from cloud_llm_service import CloudLLMService
+
+    return CloudLLMService(
+        {
+            "id": "bench",
+            "provider_type": "custom",
+            "api_key": "sk-bench",
+            "base_url": f"http://127.0.0.1:{port}/v1",
+            "model_name": "fake-model",
+        }
+    )
+
+
+async def run_streams(service, streams: int, mode: str) -> list:
+    """
+    Запускает N стримов одновременно, возвращает TTFT каждого (мс).
+
+    TTFT считается от общего момента "прихода" всех запросов — как если бы
+    N клиентов обратились к оркестратору одновременно.
+    """
+    from cloud_llm_service import astream_from_messages
+
+    messages = [
+        {"role": "system", "content": "bench"},
+        {"role": "user", "content": "привет"},
+        {"role": "assistant", "content": "..."},
+        {"role": "user", "content": "расскажи что-нибудь"},
+    ]
+    ttfts: list = []
+
+    start = time.perf_counter()
+
+    async def one_stream():
+        first = None
+        if mode == "sync":
+            for _chunk in service.generate_response_from_messages(messages, stream=True):
+                if first is None:
+                    first = time.perf_counter() - start
+                await asyncio.sleep(0)
+        else:
+            async for _chunk in astream_from_messages(service, messages):
+                if first is None:
+                    first = time.perf_counter() - start
+        ttfts.append((first or 0.0) * 1000)
+
+    await asyncio.gather(*(one_stream() for _ in range(streams)))
+    return ttfts
+
+
+def print_stats(label: str, values: list, wall: float):
+    ordered = sorted(values)
+    p50 = statistics.median(ordered)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{label:8} TTFT p50={p50:8.1f}ms  p99={p99:8.1f}ms  max={ordered[-1]:8.1f}ms  "
+        f"wall={wall:6.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent LLM streaming")
+    parser.add_argument("--backend", choices=["cloud", "vllm"], default="cloud")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--tokens", type=int, default=40, help="Tokens per response")
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="Delay per token")
+    parser.add_argument("--skip-sync", action="store_true", help="Only run the async path")
+    args = parser.parse_args()
+
+    server = start_fake_server(args.tokens, args.delay_ms / 1000)
+    port = server.server_address[1]
+    service = build_service(args.backend, port)
+
+    print(f"\n{'=' * 72}")
+    print(f"LLM streaming benchmark ({args.backend}) — fake server :{port}")
+    print(f"tokens={args.tokens}, delay={args.delay_ms}ms/token")
+    print(f"{'=' * 72}")
+
+    async def run_all():
+        # Один event loop на все прогоны: async клиент привязывается к нему
+        await run_streams(service, 1, "async")  # прогрев (создание клиентов, SSL context)
+        for n in args.streams:
+            print(f"\n--- {n} concurrent streams ---")
+            modes = ["async"] if args.skip_sync else ["sync", "async"]
+            for mode in modes:
+                start = time.perf_counter()
+                ttfts = await run_streams(service, n, mode)
+                print_stats(mode, ttfts, time.perf_counter() - start)
+
+    asyncio.run(run_all())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Piper TTS — процесс на фразу vs резидентные воркеры.
+
+Сравнивает:
+- subprocess: прежний путь (новый процесс piper на каждую фразу, загрузка
+              ONNX модели, временный WAV файл)
+- resident:   PiperWorkerPool (piper-tts в процессе, модель загружена один раз)
+- stream:     synthesize_stream — время до первого PCM чанка
+
+Измеряет ms на фразу (p50/p95) последовательно и throughput (фраз/с) при
+параллельных запросах.
+
+Запуск:
+    python scripts/benchmark_piper_tts.py [--voice dmitri] [--iterations 20] [--concurrency 4]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+# Добавляем корень проекта в path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+SENTENCES = [
+    "Здравствуйте! Чем могу помочь?",
+    "Сейчас уточню информацию и перезвоню вам.",
+    "Артём Юрьевич сейчас на встрече, оставьте, пожалуйста, сообщение.",
+    "Спасибо за звонок, хорошего дня!",
+]
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run_sequential(synthesize, iterations: int) -> list:
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        synthesize(SENTENCES[i % len(SENTENCES)])
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run_concurrent(synthesize, iterations: int, concurrency: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(synthesize, (SENTENCES[i % len(SENTENCES)] for i in range(iterations))))
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Piper TTS worker pool")
+    parser.add_argument("--voice", default="dmitri", choices=["dmitri", "irina"])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4, help="Resident workers per voice")
+    args = parser.parse_args()
+
+    from piper_tts_service import PIPER_PYTHON_AVAILABLE, PiperTTSService
+
+    service = PiperTTSService(workers=args.workers)
+
+    print(f"\n{'=' * 72}")
+    print(f"Piper TTS benchmark — voice={args.voice}, iterations={args.iterations}")
+    print(f"{'=' * 72}")
+
+    modes = {}
+    if service.piper_path:
+        modes["subprocess"] = lambda text: service._synthesize_subprocess(text, args.voice)
+    else:
+        print("⚠️ piper binary не найден — пропускаем subprocess путь")
+    if PIPER_PYTHON_AVAILABLE:
+        modes["resident"] = lambda text: service.synthesize(text, args.voice)
+        # Прогрев: загрузка воркеров
+        run_concurrent(modes["resident"], args.workers, args.workers)
+    else:
+        print("⚠️ piper-tts не установлен — пропускаем resident путь")
+
+    for name, synthesize in modes.items():
+        timings = run_sequential(synthesize, args.iterations)
+        throughput = run_concurrent(synthesize, args.iterations, args.concurrency)
+        print(
+            f"{name:10} p50={statistics.median(timings):7.1f}ms  "
+            f"p95={percentile(timings, 0.95):7.1f}ms  "
+            f"throughput={throughput:6.1f} фраз/с (x{args.concurrency})"
+        )
+
+    if PIPER_PYTHON_AVAILABLE or service.piper_path:
+        ttfa = []
+        for i in range(args.iterations):
+            start = time.perf_counter()
+            for _chunk, _sr in service.synthesize_stream(SENTENCES[i % len(SENTENCES)], args.voice):
+                ttfa.append((time.perf_counter() - start) * 1000)
+                break
+        print(
+            f"{'stream':10} TTFA p50={statistics.median(ttfa):7.1f}ms  "
+            f"p95={percentile(ttfa, 0.95):7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
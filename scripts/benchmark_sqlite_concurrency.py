@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Benchmark: смешанная конкурентная нагрузка чтение/запись на SQLite.
+
+Сравнивает режимы db.database (SQLITE_MODE):
+- static: одно общее соединение StaticPool (прежняя конфигурация)
+- wal:    WAL + synchronous=NORMAL, пул read-only соединений и один writer
+
+Каждый из --clients конкурентных клиентов выполняет --ops операций:
+чтения (история чата, последние записи usage) и записи (log_usage,
+add_message) в пропорции --write-ratio. Печатает пропускную способность,
+p50/p99 задержки чтений и записей и число ошибок ("database is locked" и др.).
+БД — временный SQLite-файл с предзаполненными данными, отдельный на каждый режим.
+
+Перед замером проверяется маршрутизация wal: чтения идут в пул читателей,
+а сессия после записи видит собственные изменения.
+
+Запуск:
+    python scripts/benchmark_sqlite_concurrency.py [--clients 16] [--ops 200]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import func, insert, select
+
+
+# Добавляем корень проекта в path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db.database import create_engines, create_session_factory
+from db.models import Base, ChatMessage, ChatSession, UsageLog
+from db.repositories.chat import ChatRepository
+from db.repositories.usage import UsageRepository
+
+
+SESSION_ID = "chat_bench"
+
+
+async def prepare(write_engine, usage_rows: int, chat_messages: int) -> None:
+    async with write_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        now = datetime.utcnow()
+        await conn.execute(
+            insert(ChatSession).values(id=SESSION_ID, title="bench", created=now, updated=now)
+        )
+        await conn.execute(
+            insert(ChatMessage),
+            [
+                {
+                    "id": f"msg_{i:06d}",
+                    "session_id": SESSION_ID,
+                    "role": "user" if i % 2 == 0 else "assistant",
+                    "content": f"Сообщение {i} " + "текст " * 30,
+                    "edited": False,
+                    "created": now - timedelta(seconds=chat_messages - i),
+                    "parent_id": f"msg_{i - 1:06d}" if i else None,
+                    "is_active": True,
+                }
+                for i in range(chat_messages)
+            ],
+        )
+        await conn.execute(
+            insert(UsageLog),
+            [
+                {
+                    "timestamp": now - timedelta(minutes=i),
+                    "service_type": ("llm", "tts", "stt")[i % 3],
+                    "action": "chat",
+                    "source": ("admin", "telegram", "widget")[i % 3],
+                    "units_consumed": 100 + i % 50,
+                }
+                for i in range(usage_rows)
+            ],
+        )
+
+
+async def check_routing(session_factory, read_engine) -> None:
+    """Чтения идут в пул читателей; после записи сессия видит свои изменения."""
+    async with session_factory() as session:
+        await session.execute(select(func.count()).select_from(UsageLog))
+        assert read_engine.pool.checkedout() == 1, "read must use the read pool"
+        before = (await session.execute(select(func.count()).select_from(UsageLog))).scalar()
+        session.add(UsageLog(service_type="llm", action="check", units_consumed=1))
+        await session.flush()
+        after = (await session.execute(select(func.count()).select_from(UsageLog))).scalar()
+        assert after == before + 1, "transaction must see its own writes"
+        await session.rollback()
+
+
+async def client(session_factory, rng: random.Random, ops: int, write_ratio: float, stats: dict):
+    for _ in range(ops):
+        write = rng.random() < write_ratio
+        start = time.perf_counter()
+        try:
+            async with session_factory() as session:
+                if write and rng.random() < 0.5:
+                    await UsageRepository(session).log_usage("llm", "chat", 120, source="admin")
+                elif write:
+                    await ChatRepository(session).add_message(SESSION_ID, "user", "Новое сообщение")
+                elif rng.random() < 0.5:
+                    await ChatRepository(session).get_active_messages(SESSION_ID)
+                else:
+                    await UsageRepository(session).get_usage(limit=50)
+        except Exception as e:
+            stats["errors"].append(f"{type(e).__name__}: {str(e).splitlines()[0][:60]}")
+            continue
+        stats["write" if write else "read"].append(time.perf_counter() - start)
+
+
+async def run_mode(mode: str, args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}"
+        write_engine, read_engine = create_engines(url, mode)
+        session_factory = create_session_factory(write_engine, read_engine)
+        await prepare(write_engine, args.usage_rows, args.chat_messages)
+        if mode == "wal":
+            await check_routing(session_factory, read_engine)
+
+        stats: dict = {"read": [], "write": [], "errors": []}
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                client(session_factory, random.Random(i), args.ops, args.write_ratio, stats)
+                for i in range(args.clients)
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+        await write_engine.dispose()
+        if read_engine is not write_engine:
+            await read_engine.dispose()
+
+    done = len(stats["read"]) + len(stats["write"])
+    print(f"\n[{mode}] {done} ops in {elapsed:.2f} s — {done / elapsed:.0f} ops/s")
+    for kind in ("read", "write"):
+        ms = np.array(stats[kind]) * 1000
+        if len(ms):
+            print(
+                f"  {kind:6} n={len(ms):5d}  p50 {np.percentile(ms, 50):8.1f} ms"
+                f"  p99 {np.percentile(ms, 99):8.1f} ms"
+            )
+    print(f"  errors: {len(stats['errors'])}")
+    kinds = Counter(error.split(" at 0x")[0] for error in stats["errors"])
+    for error, count in kinds.most_common(5):
+        print(f"    {count:5d} × {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQLite concurrency modes")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--usage-rows", type=int, default=20000)
+    parser.add_argument("--chat-messages", type=int, default=200)
+    parser.add_argument("--modes", default="static,wal")
+    args = parser.parse_args()
+
+    print(f"\n{'=' * 72}")
+    print(
+        f"SQLite mixed load — {args.clients} clients × {args.ops} ops, "
+        f"{args.write_ratio:.0%} writes"
+    )
+    print(f"{'=' * 72}")
+    for mode in args.modes.split(","):
+        asyncio.run(run_mode(mode, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: поиск по эмбеддингам Wiki RAG.
+
+Сравнивает:
+- python:    прежний WikiRAGService._embedding_search (чистый Python cosine по
+             каждой секции; меряется на подвыборке и пересчитывается на N)
+- exact:     VectorIndex без разбиения (один matmul + argpartition, по умолчанию)
+- partition: VectorIndex с разбиением на кластеры (сканируются nprobe ближайших,
+             включается WIKI_RAG_IVF_MIN_ROWS)
+
+Данные:
+- clustered: синтетические секции, сгруппированные по темам
+- uniform:   синтетические векторы без кластерной структуры (худший случай)
+- --embeddings file.npy: реальные эмбеддинги (строка = секция); --queries
+  запросов откладываются из них и в индекс не попадают
+
+Печатает p50/p99 на запрос, recall@k разбиения относительно exact, оценку
+recall@10 при построении (разбиение ниже min_recall отбрасывается и поиск
+остаётся точным) и время сохранения/загрузки .npy.
+
+Запуск:
+    python scripts/benchmark_wiki_vector_index.py [--sections 50000] [--dim 768]
+    python scripts/benchmark_wiki_vector_index.py --data uniform
+    python scripts/benchmark_wiki_vector_index.py --embeddings data/wiki_embeddings.npy
+"""
+
+import argparse
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+# Добавляем корень проекта в path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.vector_index import VectorIndex
+
+
+def python_cosine(a: list[float], b: list[float]) -> float:
+    """Прежняя реализация (WikiRAGService._cosine_similarity)"""
+    dot = sum(x * y for x, y in zip(a, b, strict=False))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(x * x for x in b))
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+def latencies(fn, queries) -> np.ndarray:
+    result = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        result.append(time.perf_counter() - start)
+    return np.array(result) * 1000
+
+
+def report(name: str, ms: np.ndarray) -> None:
+    print(f"{name:28} p50 {np.percentile(ms, 50):9.3f} ms   p99 {np.percentile(ms, 99):9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Wiki RAG vector index")
+    parser.add_argument("--sections", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--python-subset", type=int, default=500)
+    parser.add_argument("--data", choices=("clustered", "uniform"), default="clustered")
+    parser.add_argument("--embeddings", type=Path, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.embeddings is not None:
+        source = "real embeddings"
+        saved = VectorIndex()
+        if saved.load(args.embeddings) is not None:
+            # Сохранённый индекс: только живые строки (без запаса ёмкости и удалённых)
+            rows = saved.vectors()
+        else:
+            rows = np.load(args.embeddings).astype(np.float32)
+        held_out = rng.permutation(len(rows))
+        queries = rows[held_out[: args.queries]]
+        vectors = rows[held_out[args.queries :]]
+        args.sections, args.dim = vectors.shape
+    elif args.data == "uniform":
+        source = "uniform synthetic"
+        vectors = rng.standard_normal((args.sections, args.dim)).astype(np.float32)
+        queries = rng.standard_normal((args.queries, args.dim))
+    else:
+        source = "clustered synthetic"
+        topics = rng.standard_normal((args.topics, args.dim))
+        labels = rng.integers(0, args.topics, args.sections)
+        vectors = (topics[labels] + 0.5 * rng.standard_normal((args.sections, args.dim))).astype(
+            np.float32
+        )
+        picks = rng.integers(0, args.sections, args.queries)
+        queries = vectors[picks] + 0.3 * rng.standard_normal((args.queries, args.dim))
+    ids = [f"section-{i}" for i in range(args.sections)]
+
+    print(f"\n{'=' * 72}")
+    print(
+        f"Wiki vector index — {args.sections} sections × {args.dim} dims ({source}), "
+        f"top-{args.top_k}"
+    )
+    print(f"{'=' * 72}")
+
+    # Прежний путь: Python cosine по подвыборке, пересчёт на все секции
+    subset = [v.tolist() for v in vectors[: args.python_subset]]
+    few = [q.tolist() for q in queries[:5]]
+    ms = latencies(lambda q: [python_cosine(q, v) for v in subset], few)
+    ms *= args.sections / args.python_subset
+    report("python cosine (extrapolated)", ms)
+
+    exact = VectorIndex()
+    exact.upsert(ids, vectors)
+    report("exact matmul", latencies(lambda q: exact.search(q, args.top_k), queries))
+
+    # min_recall=0: разбиение сохраняется при любом recall, чтобы его измерить
+    partitioned = VectorIndex(nprobe=args.nprobe, ivf_min_rows=1, min_recall=0.0)
+    start = time.perf_counter()
+    partitioned.upsert(ids, vectors)
+    partitioned.optimize()
+    build = time.perf_counter() - start
+    report(
+        f"partition (nprobe={args.nprobe})",
+        latencies(lambda q: partitioned.search(q, args.top_k), queries),
+    )
+
+    hits = 0
+    for q in queries:
+        expected = {i for _, i in exact.search(q, args.top_k)}
+        hits += len(expected & {i for _, i in partitioned.search(q, args.top_k)})
+    print(f"\nrecall@{args.top_k} partition vs exact: {hits / (len(queries) * args.top_k):.3f}")
+    guarded = VectorIndex(nprobe=args.nprobe, ivf_min_rows=1)
+    guarded.upsert(ids, vectors)
+    guarded.optimize()
+    print(
+        f"build-time recall@10 estimate: {partitioned.partition_recall:.3f} → "
+        f"{'partition kept' if guarded.partitioned else 'falls back to exact'} "
+        f"(min_recall={guarded.min_recall})"
+    )
+    print(f"build (upsert + partition):  {build * 1000:9.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "wiki_embeddings.npy"
+        start = time.perf_counter()
+        partitioned.save(path)
+        saved = time.perf_counter() - start
+
+        partitioned.upsert(ids[:10], vectors[10:20])
+        start = time.perf_counter()
+        partitioned.save(path)
+        saved_rows = time.perf_counter() - start
+
+        # Загрузка/удаление одного документа: дописываются строки и журнал манифеста
+        partitioned.upsert(["added-0", "added-1"], vectors[:2])
+        start = time.perf_counter()
+        partitioned.save(path)
+        saved_append = time.perf_counter() - start
+
+        partitioned.remove(ids[20:22])
+        start = time.perf_counter()
+        partitioned.save(path)
+        saved_remove = time.perf_counter() - start
+
+        start = time.perf_counter()
+        VectorIndex().load(path)
+        loaded = time.perf_counter() - start
+
+    print(f"save (full):                 {saved * 1000:9.1f} ms")
+    print(f"save (10 changed rows):      {saved_rows * 1000:9.1f} ms")
+    print(f"save (2 appended rows):      {saved_append * 1000:9.1f} ms")
+    print(f"save (2 removed rows):       {saved_remove * 1000:9.1f} ms")
+    print(f"load (mmap):                 {loaded * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Migration: Add composite index for chat branch operations.
+
+Creates on chat_messages:
+  - ix_chat_messages_session_parent (session_id, parent_id)
+
+Used by the recursive-CTE branch queries (edit, regenerate, switch branch,
+branch tree, sibling info) in ChatRepository.
+
+Safe to run multiple times (CREATE INDEX IF NOT EXISTS).
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+
+DB_PATH = Path(__file__).parent.parent / "data" / "secretary.db"
+
+
+def migrate():
+    if not DB_PATH.exists():
+        print(f"Database not found: {DB_PATH}")
+        print("Run the app first to create the database.")
+        sys.exit(1)
+
+    conn = sqlite3.connect(str(DB_PATH))
+    cursor = conn.cursor()
+
+    existing = {row[1] for row in cursor.execute("PRAGMA index_list(chat_messages)")}
+    if "ix_chat_messages_session_parent" in existing:
+        print("Index already exists: ix_chat_messages_session_parent")
+    else:
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_chat_messages_session_parent "
+            "ON chat_messages(session_id, parent_id)"
+        )
+        print("Created index: ix_chat_messages_session_parent (session_id, parent_id)")
+
+    # Refresh planner statistics so the new index is picked up
+    cursor.execute("ANALYZE chat_messages")
+
+    conn.commit()
+    conn.close()
+
+    print("\nMigration complete.")
+
+
+if __name__ == "__main__":
+    print("Migrating chat_messages: branch index...\n")
+    migrate()
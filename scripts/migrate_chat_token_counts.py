@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Migration: Add memoized token counts to chat messages.
+
+Adds column to chat_messages:
+  - token_count (INTEGER, nullable) — approximate LLM token count
+
+Existing rows stay NULL and are filled lazily by the chat history loader
+(ChatRepository.get_messages_for_llm) the first time they are read.
+
+Safe to run multiple times (checks if column exists).
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+
+DB_PATH = Path(__file__).parent.parent / "data" / "secretary.db"
+
+
+def migrate():
+    if not DB_PATH.exists():
+        print(f"Database not found: {DB_PATH}")
+        print("Run the app first to create the database.")
+        sys.exit(1)
+
+    conn = sqlite3.connect(str(DB_PATH))
+    cursor = conn.cursor()
+
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(chat_messages)")}
+
+    if "token_count" not in existing:
+        cursor.execute("ALTER TABLE chat_messages ADD COLUMN token_count INTEGER")
+        print("Added column: token_count (INTEGER)")
+    else:
+        print("Column already exists: token_count")
+
+    conn.commit()
+    conn.close()
+
+    print("\nMigration complete.")
+
+
+if __name__ == "__main__":
+    print("Migrating chat_messages: token counts...\n")
+    migrate()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Migration: Usage rollup tables + backfill from usage_log.
+
+Creates (if missing):
+  - usage_rollup_hourly: totals per (hour, service_type, source, action)
+  - usage_rollup_daily:  totals per (day, service_type, source, action)
+
+Backfill: recomputes rollup buckets from usage_log. Buckets from the first
+full day covered by usage_log onward are rebuilt; older buckets are only
+filled where missing (usage_log may already be cleaned up for them, while
+the rollups still hold complete totals).
+
+Safe to run multiple times, also while the app is running (one transaction).
+
+Usage: python scripts/migrate_usage_rollups.py [--db data/secretary.db]
+"""
+
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+
+DB_PATH = Path(__file__).parent.parent / "data" / "secretary.db"
+
+# Bucket format matches SQLAlchemy's DateTime storage in SQLite
+ROLLUPS = {
+    "usage_rollup_hourly": "%Y-%m-%d %H:00:00.000000",
+    "usage_rollup_daily": "%Y-%m-%d 00:00:00.000000",
+}
+
+
+def table_ddl(table: str) -> list:
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bucket DATETIME NOT NULL,
+            service_type VARCHAR(20) NOT NULL,
+            source VARCHAR(20) NOT NULL DEFAULT '',
+            action VARCHAR(50) NOT NULL,
+            units INTEGER NOT NULL DEFAULT 0,
+            requests INTEGER NOT NULL DEFAULT 0,
+            cost_usd FLOAT NOT NULL DEFAULT 0
+        )
+        """,
+        f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS ix_{table}_key
+            ON {table} (bucket, service_type, source, action)
+        """,
+    ]
+
+
+def migrate(db_path: Path) -> None:
+    if not db_path.exists():
+        print(f"Database not found: {db_path}")
+        print("Run the app first to create the database.")
+        sys.exit(1)
+
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA busy_timeout=30000")
+
+    cursor.execute("BEGIN IMMEDIATE")
+    for table in ROLLUPS:
+        for ddl in table_ddl(table):
+            cursor.execute(ddl)
+
+    min_ts = cursor.execute("SELECT MIN(timestamp) FROM usage_log").fetchone()[0]
+    if min_ts is None:
+        cursor.execute("COMMIT")
+        conn.close()
+        print("usage_log is empty, nothing to backfill")
+        return
+
+    # First full day covered by usage_log
+    row = cursor.execute("SELECT date(?, '+1 day') || ' 00:00:00.000000'", (min_ts,))
+    cutoff = row.fetchone()[0]
+
+    for table, bucket_format in ROLLUPS.items():
+        cursor.execute(f"DELETE FROM {table} WHERE bucket >= ?", (cutoff,))
+        rebuilt = cursor.rowcount
+        cursor.execute(
+            f"""
+            INSERT OR IGNORE INTO {table}
+                (bucket, service_type, source, action, units, requests, cost_usd)
+            SELECT strftime(?, timestamp), service_type, COALESCE(source, ''), action,
+                   SUM(units_consumed), COUNT(*), COALESCE(SUM(cost_usd), 0)
+            FROM usage_log
+            GROUP BY 1, 2, 3, 4
+            """,
+            (bucket_format,),
+        )
+        print(f"{table}: replaced {rebuilt} bucket(s), wrote {cursor.rowcount} bucket(s)")
+
+    cursor.execute("COMMIT")
+    conn.close()
+
+    print(f"\nBackfill complete (rebuilt from {cutoff[:10]}, usage_log starts {min_ts[:19]})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and backfill usage rollup tables")
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    args = parser.parse_args()
+    print("Migrating usage rollups...\n")
+    migrate(args.db)
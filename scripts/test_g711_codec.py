@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Bit-exact tests for app/services/g711_codec.py.
+
+Compares the NumPy lookup-table codec against a scalar reference
+implementation of ITU-T G.711 (Sun g711.c) over every int16 sample and every
+8-bit code, and against audioop where it is still available (Python < 3.13).
+
+Usage:
+    python scripts/test_g711_codec.py
+"""
+
+import sys
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import g711_codec
+from app.services.audio_pipeline import TelephonyAudioPipeline
+
+
+SEG_AEND = [0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF]
+SEG_UEND = [0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF]
+
+
+def _search(value: int, table: list) -> int:
+    for i, end in enumerate(table):
+        if value <= end:
+            return i
+    return len(table)
+
+
+def ref_linear2alaw(pcm: int) -> int:
+    pcm_val = pcm >> 3
+    if pcm_val >= 0:
+        mask = 0xD5
+    else:
+        mask = 0x55
+        pcm_val = -pcm_val - 1
+    seg = _search(pcm_val, SEG_AEND)
+    if seg >= 8:
+        return 0x7F ^ mask
+    aval = seg << 4
+    aval |= (pcm_val >> 1) & 0x0F if seg < 2 else (pcm_val >> seg) & 0x0F
+    return aval ^ mask
+
+
+def ref_alaw2linear(a_val: int) -> int:
+    a_val ^= 0x55
+    t = (a_val & 0x0F) << 4
+    seg = (a_val & 0x70) >> 4
+    if seg == 0:
+        t += 8
+    elif seg == 1:
+        t += 0x108
+    else:
+        t += 0x108
+        t <<= seg - 1
+    return t if a_val & 0x80 else -t
+
+
+def ref_linear2ulaw(pcm: int) -> int:
+    pcm_val = pcm >> 2
+    if pcm_val < 0:
+        pcm_val = -pcm_val
+        mask = 0x7F
+    else:
+        mask = 0xFF
+    pcm_val = min(pcm_val, 8159) + (0x84 >> 2)
+    seg = _search(pcm_val, SEG_UEND)
+    if seg >= 8:
+        return 0x7F ^ mask
+    return ((seg << 4) | ((pcm_val >> (seg + 1)) & 0x0F)) ^ mask
+
+
+def ref_ulaw2linear(u_val: int) -> int:
+    u_val = ~u_val & 0xFF
+    t = ((u_val & 0x0F) << 3) + 0x84
+    t <<= (u_val & 0x70) >> 4
+    return 0x84 - t if u_val & 0x80 else t - 0x84
+
+
+def test_g711_codec() -> bool:
+    print("=== G.711 Codec Tests ===\n")
+
+    all_pcm = np.arange(65536, dtype=np.uint16).view(np.int16)
+    all_codes = np.arange(256, dtype=np.uint8)
+
+    # Test 1: encode, every int16 value
+    print("1. Encoding all 65536 int16 samples...")
+    for codec, ref in (("alaw", ref_linear2alaw), ("ulaw", ref_linear2ulaw)):
+        expected = np.array([ref(int(s)) for s in all_pcm], dtype=np.uint8)
+        got = g711_codec.encode(all_pcm, codec)
+        mismatches = int(np.count_nonzero(got != expected))
+        assert mismatches == 0, f"{codec}: {mismatches} mismatches"
+        print(f"   OK - {codec} bit-exact")
+
+    # Test 2: decode, every code
+    print("\n2. Decoding all 256 codes...")
+    for codec, ref in (("alaw", ref_alaw2linear), ("ulaw", ref_ulaw2linear)):
+        expected = np.array([ref(int(c)) for c in all_codes], dtype=np.int16)
+        got = g711_codec.decode(all_codes, codec)
+        assert np.array_equal(got, expected), f"{codec} decode mismatch"
+        print(f"   OK - {codec} bit-exact")
+
+    # Test 3: audioop cross-check (removed in Python 3.13)
+    print("\n3. audioop cross-check...")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            import audioop
+        except ImportError:
+            audioop = None
+    if audioop is None:
+        print("   SKIP - audioop not available")
+    else:
+        pcm_bytes = all_pcm.tobytes()
+        code_bytes = all_codes.tobytes()
+        assert g711_codec.lin2alaw(pcm_bytes) == audioop.lin2alaw(pcm_bytes, 2)
+        assert g711_codec.lin2ulaw(pcm_bytes) == audioop.lin2ulaw(pcm_bytes, 2)
+        assert g711_codec.alaw2lin(code_bytes) == audioop.alaw2lin(code_bytes, 2)
+        assert g711_codec.ulaw2lin(code_bytes) == audioop.ulaw2lin(code_bytes, 2)
+        print("   OK - matches audioop")
+
+    # Test 4: bytes input and out= buffer
+    print("\n4. Zero-copy input / preallocated output...")
+    out = np.empty(len(all_pcm), dtype=np.uint8)
+    result = g711_codec.encode(all_pcm.tobytes(), "alaw", out=out)
+    assert result is out and np.array_equal(out, g711_codec.encode(all_pcm, "alaw"))
+    print("   OK")
+
+    # Test 5: pipeline output_format
+    print("\n5. generate_gsm_frames(output_format=...)...")
+    pipeline = TelephonyAudioPipeline()
+    audio = np.sin(np.linspace(0, 200, 8000 * 2)).astype(np.float32) * 0.5
+    for codec in g711_codec.CODECS:
+        pipeline.reset()
+        frames = list(pipeline.generate_gsm_frames(iter([(audio, 8000)]), output_format=codec))
+        assert all(len(f) == pipeline.frame_samples for f in frames)
+        expected = g711_codec.encode(pipeline.float_to_pcm16(audio), codec).tobytes()
+        assert b"".join(frames) == expected
+        print(f"   OK - {codec}: {len(frames)} frames x {pipeline.frame_samples} bytes")
+
+    print("\n=== All tests passed ===")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_g711_codec() else 1)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test script for the XTTS voice registry.
+Runs on CPU with a stub engine instead of XTTS v2 (torch/TTS are not needed).
+
+Checks that one engine serves several voices, that adding a voice only
+computes its latents, and that latents are reused from the disk cache.
+
+Usage:
+    python scripts/test_voice_registry.py
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from xtts_voice_registry import VoiceRegistry, XTTSEngine
+
+
+class StubXTTSEngine(XTTSEngine):
+    """Deterministic stand-in for XTTS: latents derive from sample names."""
+
+    loads = 0
+
+    def __init__(self):
+        StubXTTSEngine.loads += 1
+        self.latent_calls = 0
+
+    @property
+    def output_sample_rate(self) -> int:
+        return 24000
+
+    def get_conditioning_latents(
+        self, audio_paths, gpt_cond_len, gpt_cond_chunk_len, max_ref_length
+    ):
+        self.latent_calls += 1
+        key = "|".join(Path(p).name for p in audio_paths)
+        return f"gpt:{key}", f"spk:{key}"
+
+    def inference(self, text, language, gpt_cond_latent, speaker_embedding, **params):
+        return {"wav": [0.0] * len(text), "speaker": speaker_embedding}
+
+    def inference_stream(self, text, language, gpt_cond_latent, speaker_embedding, **params):
+        for word in text.split():
+            yield {"wav": [0.0] * len(word), "speaker": speaker_embedding}
+
+
+def make_voice(root: Path, name: str, samples: int) -> list:
+    voice_dir = root / name
+    voice_dir.mkdir()
+    paths = []
+    for i in range(samples):
+        path = voice_dir / f"{name}_{i:02d}.wav"
+        path.write_bytes(b"RIFF")
+        paths.append(path)
+    return paths
+
+
+def test_voice_registry() -> bool:
+    print("=== Voice Registry Tests ===\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        cache_dir = root / "cache"
+        engine = StubXTTSEngine()
+        registry = VoiceRegistry(engine, cache_dir=str(cache_dir))
+
+        # Test 1: several voices on one engine
+        print("1. Registering voices on one engine...")
+        voices = {name: make_voice(root, name, 3) for name in ("anna", "marina", "extra")}
+        for name, samples in voices.items():
+            registry.register(name, samples)
+        assert StubXTTSEngine.loads == 1, "engine must be loaded once"
+        assert engine.latent_calls == 3, f"latents computed {engine.latent_calls} times"
+        assert sorted(registry.names()) == ["anna", "extra", "marina"]
+        print(
+            f"   OK - {len(registry)} voices, 1 engine, {engine.latent_calls} latent computations"
+        )
+
+        # Test 2: voices keep their own latents
+        print("\n2. Per-voice latents...")
+        anna, marina = registry.latents("anna"), registry.latents("marina")
+        assert anna["speaker_embedding"] != marina["speaker_embedding"]
+        out = engine.inference("привет", "ru", **anna)
+        assert out["speaker"] == anna["speaker_embedding"]
+        print("   OK - inference uses the requested voice")
+
+        # Test 3: re-registering unchanged samples is free
+        print("\n3. Re-register unchanged voice...")
+        registry.register("anna", voices["anna"])
+        assert engine.latent_calls == 3
+        print("   OK - no recomputation")
+
+        # Test 4: disk cache shared across registries (restart)
+        print("\n4. Disk cache after restart...")
+        engine2 = StubXTTSEngine()
+        registry2 = VoiceRegistry(engine2, cache_dir=str(cache_dir))
+        for name, samples in voices.items():
+            registry2.register(name, samples)
+        assert engine2.latent_calls == 0, "latents must come from the disk cache"
+        assert registry2.latents("anna") == anna
+        print(f"   OK - stats: {registry2.get_stats()}")
+
+        # Test 5: removal
+        print("\n5. Remove voice...")
+        assert registry.remove("extra") and "extra" not in registry
+        assert registry.latents("extra") is None
+        print("   OK")
+
+    print("\n=== All tests passed ===")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_voice_registry() else 1)
@@ -41,6 +41,12 @@ class Settings(BaseSettings):
     cache_enabled: bool = Field(default=False, alias="CACHE_ENABLED")
     cache_ttl: int = Field(default=3600, alias="CACHE_TTL")  # seconds
     cache_max_size: int = Field(default=1000, alias="CACHE_MAX_SIZE")
+    cache_max_mb: int = Field(default=64, alias="CACHE_MAX_MB")  # memory tier size
+    cache_disk_enabled: bool = Field(default=True, alias="CACHE_DISK_ENABLED")
+    cache_disk_path: str = Field(
+        default="", alias="CACHE_DISK_PATH"
+    )  # default: ~/.cli-openai-bridge/response_cache.db
+    cache_disk_max_mb: int = Field(default=512, alias="CACHE_DISK_MAX_MB")
 
     # Metrics
     metrics_enabled: bool = Field(default=True, alias="METRICS_ENABLED")
@@ -62,6 +68,25 @@ class Settings(BaseSettings):
     queue_claude_concurrent: int = Field(default=2, alias="QUEUE_CLAUDE_CONCURRENT")
     queue_gemini_concurrent: int = Field(default=3, alias="QUEUE_GEMINI_CONCURRENT")
     queue_gpt_concurrent: int = Field(default=2, alias="QUEUE_GPT_CONCURRENT")
+    queue_default_priority: str = Field(
+        default="interactive", alias="QUEUE_DEFAULT_PRIORITY"
+    )  # interactive | batch (requests without X-Priority)
+    queue_client_weights: str = Field(
+        default="", alias="QUEUE_CLIENT_WEIGHTS"
+    )  # fair-share weights, e.g. "admin:2,news:0.5"
+    queue_trusted_keys: str = Field(
+        default="", alias="QUEUE_TRUSTED_KEYS"
+    )  # API keys allowed to set X-Client-Id / X-Priority (comma-separated)
+
+    # Warm CLI worker pool (pre-spawned processes, skips CLI cold start)
+    worker_pool_enabled: bool = Field(default=False, alias="WORKER_POOL_ENABLED")
+    worker_pool_size: int = Field(default=2, alias="WORKER_POOL_SIZE")  # idle workers per provider
+    worker_pool_max_idle: int = Field(
+        default=300, alias="WORKER_POOL_MAX_IDLE"
+    )  # recycle idle workers after (seconds)
+    worker_pool_providers: str = Field(
+        default="claude,gemini,gpt", alias="WORKER_POOL_PROVIDERS"
+    )  # comma-separated
 
     # CLI Permission Levels (per provider)
     # Levels: chat, readonly, edit, full
@@ -8,7 +8,7 @@ from typing import Any, AsyncIterator
 
 from ...config import get_settings
 from ...utils.content import extract_content
-from ...utils.subprocess import create_subprocess
+from ...utils.worker_pool import spawn_cli_process
 from ..base import BaseProvider
 
 
@@ -62,6 +62,11 @@ class ClaudeProvider(BaseProvider):
         "claude-3-haiku-20240307",
     ]
 
+    # Arguments specific to one request: commands with them bypass the warm
+    # worker pool (a pre-spawned --resume worker would load the session before
+    # the current turn is saved; every system prompt would get its own workers)
+    PER_REQUEST_FLAGS = ("--resume", "--system-prompt")
+
     # Thinking keywords mapped to approximate token budgets
     THINKING_KEYWORDS = {
         "low": "think",  # ~4,000 tokens
@@ -274,6 +279,10 @@ class ClaudeProvider(BaseProvider):
 
         return cmd
 
+    def _poolable(self, cmd: list[str]) -> bool:
+        """Whether the command may use a warm worker (no per-request arguments)."""
+        return not any(flag in cmd for flag in self.PER_REQUEST_FLAGS)
+
     async def complete(
         self,
         messages: list[dict[str, Any]],
@@ -326,12 +335,7 @@ class ClaudeProvider(BaseProvider):
     ) -> dict[str, Any]:
         """Non-streaming completion."""
         try:
-            process = await create_subprocess(
-                cmd,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
+            process = await spawn_cli_process(self.name, cmd, poolable=self._poolable(cmd))
 
             stdout, stderr = await asyncio.wait_for(
                 process.communicate(input=prompt.encode()),
@@ -393,12 +397,7 @@ class ClaudeProvider(BaseProvider):
     ) -> AsyncIterator[dict[str, Any]]:
         """Streaming completion using stream-json format."""
         try:
-            process = await create_subprocess(
-                cmd,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
+            process = await spawn_cli_process(self.name, cmd, poolable=self._poolable(cmd))
 
             # Write prompt to stdin and close it
             process.stdin.write(prompt.encode())
@@ -457,15 +456,19 @@ class ClaudeProvider(BaseProvider):
                         # Skip malformed lines
                         logger.debug(f"Skipping non-JSON line: {line[:50]}")
 
+            # Wait for the exit code so callers can tell a failed run from a complete one
+            await process.wait()
+            if process.returncode != 0:
+                logger.warning(f"Claude CLI stream exited with code {process.returncode}")
+
             # Final chunk
             yield {
                 "content": None,
                 "thinking": None,
                 "done": True,
+                "exit_code": process.returncode,
             }
 
-            await process.wait()
-
         except asyncio.TimeoutError:
             logger.error("Claude CLI stream timeout")
             raise
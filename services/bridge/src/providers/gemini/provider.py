@@ -8,7 +8,7 @@ from typing import Any, AsyncIterator
 
 from ...config import get_settings
 from ...utils.content import extract_content
-from ...utils.subprocess import create_subprocess
+from ...utils.worker_pool import spawn_cli_process
 from ..base import BaseProvider
 
 
@@ -263,12 +263,7 @@ class GeminiProvider(BaseProvider):
     ) -> dict[str, Any]:
         """Non-streaming completion."""
         try:
-            process = await create_subprocess(
-                cmd,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
+            process = await spawn_cli_process(self.name, cmd)
 
             stdout, stderr = await asyncio.wait_for(
                 process.communicate(input=prompt.encode()),
@@ -322,12 +317,7 @@ class GeminiProvider(BaseProvider):
     ) -> AsyncIterator[dict[str, Any]]:
         """Streaming completion using stream-json format."""
         try:
-            process = await create_subprocess(
-                cmd,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
+            process = await spawn_cli_process(self.name, cmd)
 
             # Write prompt to stdin and close it
             process.stdin.write(prompt.encode())
@@ -379,15 +369,19 @@ class GeminiProvider(BaseProvider):
                         # Skip non-JSON lines (CLI startup messages, etc.)
                         logger.debug(f"Skipping non-JSON line: {line[:50]}")
 
+            # Wait for the exit code so callers can tell a failed run from a complete one
+            await process.wait()
+            if process.returncode != 0:
+                logger.warning(f"Gemini CLI stream exited with code {process.returncode}")
+
             # Final chunk
             yield {
                 "content": None,
                 "thinking": None,
                 "done": True,
+                "exit_code": process.returncode,
             }
 
-            await process.wait()
-
         except asyncio.TimeoutError:
             logger.error("Gemini CLI stream timeout")
             raise
@@ -6,7 +6,7 @@ from typing import Any, AsyncIterator
 
 from ...config import get_settings
 from ...utils.content import extract_content
-from ...utils.subprocess import create_subprocess
+from ...utils.worker_pool import spawn_cli_process
 from ..base import BaseProvider
 
 
@@ -98,7 +98,6 @@ class GPTProvider(BaseProvider):
 
     def _build_command(
         self,
-        prompt: str,
         model: str,
         stream: bool = False,
         **kwargs: Any,
@@ -113,8 +112,8 @@ class GPTProvider(BaseProvider):
         # Disable shell mode (we want chat mode)
         cmd.append("--no-shell")
 
-        # Add the prompt
-        cmd.append(prompt)
+        # Note: prompt is passed via stdin (Shell-GPT reads piped input as the prompt),
+        # which avoids command-line length limits and keeps the command reusable
 
         return cmd
 
@@ -129,30 +128,27 @@ class GPTProvider(BaseProvider):
         """Generate completion using Shell-GPT."""
 
         prompt = self._format_messages(messages)
-        cmd = self._build_command(prompt, model, stream, **kwargs)
+        cmd = self._build_command(model, stream, **kwargs)
 
-        logger.debug(f"Running command: {' '.join(cmd)}")
+        logger.debug(f"Running command: {' '.join(cmd)} (prompt via stdin, {len(prompt)} chars)")
 
         if stream:
-            return self._stream_complete(cmd, model)
+            return self._stream_complete(cmd, model, prompt)
         else:
-            return await self._sync_complete(cmd, model)
+            return await self._sync_complete(cmd, model, prompt)
 
     async def _sync_complete(
         self,
         cmd: list[str],
         model: str,
+        prompt: str,
     ) -> dict[str, Any]:
         """Non-streaming completion."""
         try:
-            process = await create_subprocess(
-                cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
+            process = await spawn_cli_process(self.name, cmd)
 
             stdout, stderr = await asyncio.wait_for(
-                process.communicate(),
+                process.communicate(input=prompt.encode()),
                 timeout=self.settings.cli_timeout,
             )
 
@@ -176,14 +172,17 @@ class GPTProvider(BaseProvider):
         self,
         cmd: list[str],
         model: str,
+        prompt: str,
     ) -> AsyncIterator[dict[str, Any]]:
         """Streaming completion."""
         try:
-            process = await create_subprocess(
-                cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
+            process = await spawn_cli_process(self.name, cmd)
+
+            # Write prompt to stdin and close it
+            process.stdin.write(prompt.encode())
+            await process.stdin.drain()
+            process.stdin.close()
+            await process.stdin.wait_closed()
 
             while True:
                 chunk = await asyncio.wait_for(
@@ -201,14 +200,19 @@ class GPTProvider(BaseProvider):
                     "done": False,
                 }
 
+            # Wait for the exit code so callers can tell a failed run from a complete one
+            await process.wait()
+            if process.returncode != 0:
+                logger.warning(f"Shell-GPT stream exited with code {process.returncode}")
+
+            # Final chunk
             yield {
                 "content": None,
                 "thinking": None,
                 "done": True,
+                "exit_code": process.returncode,
             }
 
-            await process.wait()
-
         except asyncio.TimeoutError:
             logger.error("Shell-GPT stream timeout")
             raise
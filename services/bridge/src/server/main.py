@@ -16,7 +16,11 @@ from ..utils import (
     get_metrics,
     get_request_queue,
     get_session_manager,
+    get_token_counter,
+    get_worker_pools,
+    init_worker_pools,
     log_cli_status,
+    shutdown_worker_pools,
 )
 from .middleware import (
     AuthenticationMiddleware,
@@ -42,6 +46,9 @@ async def lifespan(app: FastAPI):
     """Application lifespan handler."""
     logger.info(f"Starting CLI-OpenAI Bridge on {settings.host}:{settings.port}")
 
+    # Load tokenizer encodings in the background (tiktoken may download them)
+    get_token_counter().preload()
+
     # Health check CLIs on startup
     if settings.health_check_on_startup:
         logger.info("Checking CLI availability...")
@@ -60,7 +67,9 @@ async def lifespan(app: FastAPI):
     # Log cache status
     if settings.cache_enabled:
         logger.info(
-            f"Response caching enabled (TTL: {settings.cache_ttl}s, max: {settings.cache_max_size})"
+            f"Response caching enabled (TTL: {settings.cache_ttl}s, max: {settings.cache_max_size}, "
+            f"memory: {settings.cache_max_mb} MB, "
+            f"disk: {f'{settings.cache_disk_max_mb} MB' if settings.cache_disk_enabled else 'off'})"
         )
     else:
         logger.info("Response caching disabled")
@@ -81,6 +90,15 @@ async def lifespan(app: FastAPI):
     else:
         logger.info("Request queue disabled")
 
+    # Start warm CLI worker pools
+    if settings.worker_pool_enabled:
+        providers = [p.strip() for p in settings.worker_pool_providers.split(",") if p.strip()]
+        init_worker_pools(providers, settings.worker_pool_size, settings.worker_pool_max_idle)
+        logger.info(
+            f"CLI worker pool enabled for {', '.join(providers)} "
+            f"(size: {settings.worker_pool_size}, max idle: {settings.worker_pool_max_idle}s)"
+        )
+
     # Load persistent metrics from previous sessions
     if settings.metrics_enabled:
         metrics = get_metrics()
@@ -109,6 +127,12 @@ async def lifespan(app: FastAPI):
         request_queue = get_request_queue()
         await request_queue.shutdown(timeout=30.0)
 
+    # Kill idle CLI workers
+    await shutdown_worker_pools()
+
+    # Close the response cache disk tier
+    get_cache().close()
+
     # Save metrics for next session
     if settings.metrics_enabled:
         metrics = get_metrics()
@@ -234,12 +258,16 @@ async def health_check():
     session_manager = get_session_manager()
     session_stats = session_manager.get_stats()
 
+    # Get worker pool stats
+    worker_pools = {name: pool.get_stats() for name, pool in get_worker_pools().items()}
+
     return {
         "status": "healthy" if all_healthy else "degraded",
         "version": "0.1.0",
         "providers": providers,
         "queue": queue_stats,
         "sessions": session_stats,
+        "worker_pools": worker_pools or None,
     }
 
 
@@ -255,6 +283,7 @@ async def get_usage_metrics():
     return {
         "requests": metrics.get_stats(),
         "cache": cache.get_stats(),
+        "tokens": get_token_counter().get_stats(),
     }
 
 
@@ -269,6 +298,13 @@ async def reset_metrics():
     return {"status": "ok", "message": "Metrics reset"}
 
 
+@app.get("/v1/cache/stats")
+async def get_cache_stats():
+    """Get response cache statistics (hit rate, memory and disk bytes)."""
+    cache = get_cache()
+    return cache.get_stats()
+
+
 @app.post("/cache/clear")
 async def clear_cache():
     """Clear response cache."""
@@ -278,8 +314,9 @@ async def clear_cache():
 
 
 @app.get("/queue")
+@app.get("/v1/queue/stats")
 async def get_queue_stats():
-    """Get request queue statistics."""
+    """Get request queue statistics (positions, wait-time histograms)."""
     if not settings.queue_enabled:
         return {"enabled": False, "message": "Request queue is disabled"}
 
@@ -304,7 +341,8 @@ async def root():
             "files": "/v1/files",
             "health": "/health",
             "metrics": "/metrics",
-            "queue": "/queue",
+            "queue": "/v1/queue/stats",
+            "cache": "/v1/cache/stats",
             "dashboard": "/dashboard",
         },
         "features": {
@@ -2,13 +2,14 @@
 
 from .auth import AuthenticationMiddleware
 from .logging import RequestLoggingMiddleware
-from .rate_limit import RateLimitMiddleware, get_rate_limiter, set_rate_limiter
+from .rate_limit import RateLimitMiddleware, get_client_id, get_rate_limiter, set_rate_limiter
 
 
 __all__ = [
     "RequestLoggingMiddleware",
     "AuthenticationMiddleware",
     "RateLimitMiddleware",
+    "get_client_id",
     "get_rate_limiter",
     "set_rate_limiter",
 ]
@@ -14,6 +14,20 @@ from ...config import get_settings
 logger = logging.getLogger("cli_bridge.rate_limit")
 
 
+def get_client_id(request: Request) -> str:
+    """Get client identifier from API key or IP."""
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        # Use API key as identifier
+        return f"key:{auth_header[7:20]}..."  # Truncated for privacy
+    # Fall back to IP address
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    client = request.client
+    return f"ip:{client.host if client else 'unknown'}"
+
+
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
     Token bucket rate limiting middleware.
@@ -40,16 +54,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 
     def _get_client_id(self, request: Request) -> str:
         """Get client identifier from API key or IP."""
-        auth_header = request.headers.get("Authorization", "")
-        if auth_header.startswith("Bearer "):
-            # Use API key as identifier
-            return f"key:{auth_header[7:20]}..."  # Truncated for privacy
-        # Fall back to IP address
-        forwarded = request.headers.get("X-Forwarded-For")
-        if forwarded:
-            return f"ip:{forwarded.split(',')[0].strip()}"
-        client = request.client
-        return f"ip:{client.host if client else 'unknown'}"
+        return get_client_id(request)
 
     def _check_rate_limit(self, client_id: str) -> tuple[bool, dict]:
         """
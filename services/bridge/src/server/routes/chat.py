@@ -1,12 +1,15 @@
 """Chat completions endpoint."""
 
 import asyncio
+import json
 import logging
+import secrets
 import time
 import uuid
+from dataclasses import dataclass
 from typing import Any, AsyncIterator
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from sse_starlette.sse import EventSourceResponse
 
 from ...config import get_settings
@@ -23,6 +26,8 @@ from ...models import (
 )
 from ...providers import get_provider_for_model
 from ...utils import (
+    IncrementalTokenCounter,
+    StreamingToolCallParser,
     apply_summary_to_messages,
     count_message_tokens,
     count_tokens,
@@ -37,6 +42,7 @@ from ...utils import (
     prepare_messages_for_cli,
     retry_async,
 )
+from ..middleware import get_client_id
 
 
 router = APIRouter()
@@ -142,6 +148,9 @@ async def stream_generator(
     request: ChatCompletionRequest,
     conversation_id: str,
     cli_session_id: str | None = None,
+    *,
+    queue_client: str | None = None,
+    queue_priority: str | None = None,
 ) -> AsyncIterator[str]:
     """Generate SSE stream from provider with queue-based concurrency control."""
     provider = get_provider_for_model(request.model)
@@ -171,20 +180,42 @@ async def stream_generator(
 
     prompt_tokens = count_message_tokens(messages, request.model)
 
+    # Replay a cached stream with its original chunking
+    if settings.cache_enabled:
+        cached_chunks = get_cache().get_stream(
+            messages=messages,
+            model=request.model,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens,
+        )
+        if cached_chunks:
+            logger.debug(f"Stream cache hit for model {request.model}")
+            for chunk in cached_chunks:
+                yield chunk
+            return
+
+    outcome = _StreamOutcome()
+    chunks = _do_stream(
+        provider,
+        messages,
+        request,
+        cli_session_id,
+        metrics,
+        settings,
+        start_time,
+        prompt_tokens,
+        outcome=outcome,
+    )
+    if settings.cache_enabled:
+        chunks = _record_stream(chunks, outcome=outcome, messages=messages, request=request)
+
     # Acquire streaming slot if queue is enabled
     if settings.queue_enabled:
         try:
-            async with request_queue.acquire_stream_slot(provider.name):
-                async for chunk in _do_stream(
-                    provider,
-                    messages,
-                    request,
-                    cli_session_id,
-                    metrics,
-                    settings,
-                    start_time,
-                    prompt_tokens,
-                ):
+            async with request_queue.acquire_stream_slot(
+                provider.name, client=queue_client, priority=queue_priority
+            ):
+                async for chunk in chunks:
                     yield chunk
         except asyncio.QueueFull:
             error = create_error(
@@ -203,19 +234,86 @@ async def stream_generator(
                 )
     else:
         # Direct streaming without queue
-        async for chunk in _do_stream(
-            provider,
-            messages,
-            request,
-            cli_session_id,
-            metrics,
-            settings,
-            start_time,
-            prompt_tokens,
-        ):
+        async for chunk in chunks:
             yield chunk
 
 
+@dataclass
+class _StreamOutcome:
+    """What a provider stream produced, filled in by _do_stream."""
+
+    exit_code: int | None = None
+    has_output: bool = False
+
+    @property
+    def cacheable(self) -> bool:
+        """The CLI exited cleanly and produced text or tool calls."""
+        return self.exit_code == 0 and self.has_output
+
+
+async def _record_stream(
+    chunks: AsyncIterator[str],
+    *,
+    outcome: _StreamOutcome,
+    messages: list,
+    request: ChatCompletionRequest,
+) -> AsyncIterator[str]:
+    """Pass stream payloads through and cache them once the stream completes."""
+    recorded = []
+    async for chunk in chunks:
+        recorded.append(chunk)
+        yield chunk
+
+    # Error paths end without [DONE]; failed or empty CLI runs end with it but
+    # must not be replayed either
+    if recorded and recorded[-1] == "[DONE]" and outcome.cacheable:
+        get_cache().set_stream(
+            messages=messages,
+            model=request.model,
+            chunks=recorded,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens,
+        )
+
+
+def _tool_stream_chunks(
+    text: str,
+    tool_calls: list[dict],
+    *,
+    tool_parser: StreamingToolCallParser,
+    request: ChatCompletionRequest,
+    provider,
+    chunk_id: str | None,
+) -> list[str]:
+    """SSE payloads for text and tool calls released by the streaming tool parser."""
+    payloads = []
+    if text:
+        chunk = create_chunk(
+            content=text,
+            model=request.model,
+            provider=provider.name,
+            finish_reason=None,
+            chunk_id=chunk_id,
+        )
+        payloads.append(chunk.model_dump_json())
+
+    # Calls are emitted one at a time, so give each its position among all calls
+    first_index = len(tool_parser.tool_calls) - len(tool_calls)
+    for offset, tool_call in enumerate(tool_calls):
+        for tc_chunk in create_tool_call_chunks(
+            [tool_call],
+            model=request.model,
+            provider=provider.name,
+            chunk_id=chunk_id,
+        ):
+            data = json.loads(tc_chunk.model_dump_json())
+            for choice in data.get("choices", []):
+                for delta_call in (choice.get("delta") or {}).get("tool_calls") or []:
+                    delta_call["index"] = first_index + offset
+            payloads.append(json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return payloads
+
+
 async def _do_stream(
     provider,
     messages: list,
@@ -225,12 +323,15 @@ async def _do_stream(
     settings,
     start_time: float,
     prompt_tokens: int,
+    *,
+    outcome: _StreamOutcome | None = None,
 ) -> AsyncIterator[str]:
     """Internal streaming implementation."""
-    completion_text = ""
+    outcome = outcome if outcome is not None else _StreamOutcome()
+    completion_counter = IncrementalTokenCounter(request.model)
     chunk_id = None
     has_tools = bool(request.tools)
-    valid_tool_names = extract_tool_names(request.tools)
+    tool_parser = StreamingToolCallParser(extract_tool_names(request.tools)) if has_tools else None
 
     try:
         stream_gen = await provider.complete(
@@ -248,15 +349,27 @@ async def _do_stream(
 
             content = chunk_data.get("content")
             if content:
-                completion_text += content
+                completion_counter.feed(content)
+                outcome.has_output = outcome.has_output or not content.isspace()
 
             is_done = chunk_data.get("done")
-
-            # When tools are provided, buffer content and emit at end
-            # This prevents raw ```tool_call``` blocks from appearing in output
-            if has_tools:
-                # Don't emit content during streaming - we'll emit cleaned content at end
-                pass
+            if is_done:
+                outcome.exit_code = chunk_data.get("exit_code")
+
+            # When tools are provided, text is streamed as it arrives but ```tool_call```
+            # blocks are held back and emitted as tool_calls deltas once they close
+            if tool_parser:
+                if content:
+                    text, tool_calls = tool_parser.feed(content)
+                    for tool_chunk in _tool_stream_chunks(
+                        text,
+                        tool_calls,
+                        tool_parser=tool_parser,
+                        request=request,
+                        provider=provider,
+                        chunk_id=chunk_id,
+                    ):
+                        yield tool_chunk
             else:
                 chunk = create_chunk(
                     content=content,
@@ -268,58 +381,32 @@ async def _do_stream(
                 )
                 yield chunk.model_dump_json()
 
-        # Process buffered content when tools were provided
-        if has_tools:
-            tool_calls = []
-            remaining_content = completion_text
-
-            if completion_text:
-                tool_calls, remaining_content = parse_tool_calls(completion_text, valid_tool_names)
-
-            # Emit cleaned content (without tool_call blocks)
-            if remaining_content:
-                chunk = create_chunk(
-                    content=remaining_content,
-                    model=request.model,
-                    provider=provider.name,
-                    finish_reason=None,
-                    chunk_id=chunk_id,
-                )
-                yield chunk.model_dump_json()
-
-            if tool_calls:
-                logger.debug(f"Streaming: parsed {len(tool_calls)} tool calls")
-                # Emit tool call chunks
-                tc_chunks = create_tool_call_chunks(
-                    tool_calls,
-                    model=request.model,
-                    provider=provider.name,
-                    chunk_id=chunk_id,
-                )
-                for tc_chunk in tc_chunks:
-                    yield tc_chunk.model_dump_json()
-
-                # Emit final chunk with finish_reason
-                final_chunk = create_chunk(
-                    model=request.model,
-                    provider=provider.name,
-                    finish_reason="tool_calls",
-                    chunk_id=chunk_id,
-                )
-                yield final_chunk.model_dump_json()
-            else:
-                # No tool calls found - emit stop finish_reason
-                final_chunk = create_chunk(
-                    model=request.model,
-                    provider=provider.name,
-                    finish_reason="stop",
-                    chunk_id=chunk_id,
-                )
-                yield final_chunk.model_dump_json()
+        # Flush held-back text and finish with the proper finish_reason
+        if tool_parser:
+            text, tool_calls = tool_parser.finish()
+            for tool_chunk in _tool_stream_chunks(
+                text,
+                tool_calls,
+                tool_parser=tool_parser,
+                request=request,
+                provider=provider,
+                chunk_id=chunk_id,
+            ):
+                yield tool_chunk
+
+            if tool_parser.tool_calls:
+                logger.debug(f"Streaming: parsed {len(tool_parser.tool_calls)} tool calls")
+            final_chunk = create_chunk(
+                model=request.model,
+                provider=provider.name,
+                finish_reason="tool_calls" if tool_parser.tool_calls else "stop",
+                chunk_id=chunk_id,
+            )
+            yield final_chunk.model_dump_json()
 
         yield "[DONE]"
 
-        completion_tokens = count_tokens(completion_text, request.model)
+        completion_tokens = completion_counter.total
 
         if settings.metrics_enabled:
             duration = time.time() - start_time
@@ -362,15 +449,41 @@ async def _do_stream(
             )
 
 
+def _queue_identity(http_request: Request) -> tuple[str, str | None]:
+    """
+    Get the fair-share client and requested priority class of a request.
+
+    The client is derived from the API key (or IP). X-Client-Id and
+    X-Priority are only honored for keys listed in QUEUE_TRUSTED_KEYS;
+    other callers may lower their own priority to "batch" but not raise it.
+    """
+    client = get_client_id(http_request)
+    priority = http_request.headers.get("X-Priority")
+
+    auth_header = http_request.headers.get("Authorization", "")
+    token = auth_header[7:] if auth_header.startswith("Bearer ") else ""
+    trusted_keys = [k.strip() for k in get_settings().queue_trusted_keys.split(",") if k.strip()]
+    if token and any(secrets.compare_digest(token, key) for key in trusted_keys):
+        return http_request.headers.get("X-Client-Id") or client, priority
+
+    if priority and priority.strip().lower() == "batch":
+        return client, "batch"
+    return client, None
+
+
 @router.post("/v1/chat/completions", response_model=None)
 async def create_chat_completion(
     request: ChatCompletionRequest,
+    http_request: Request,
 ):
     """Create a chat completion."""
     settings = get_settings()
     metrics = get_metrics()
     cache = get_cache()
 
+    # Queue scheduling: priority class and client for fair sharing
+    queue_client, queue_priority = _queue_identity(http_request)
+
     if request.stream:
         # Session management for streaming
         session_manager = get_session_manager()
@@ -403,7 +516,13 @@ async def create_chat_completion(
             logger.debug(f"Created new stream session: {conversation_id}")
 
         return EventSourceResponse(
-            stream_generator(request, conversation_id, cli_session_id),
+            stream_generator(
+                request,
+                conversation_id,
+                cli_session_id,
+                queue_client=queue_client,
+                queue_priority=queue_priority,
+            ),
             media_type="text/event-stream",
         )
 
@@ -560,6 +679,8 @@ async def create_chat_completion(
                 provider.name,
                 retry_async,
                 do_complete,
+                client=queue_client,
+                priority=queue_priority,
             )
         else:
             # Direct execution without queue
@@ -5,7 +5,7 @@ from .content import extract_content
 from .files import FileInfo, FileStorage, get_file_storage
 from .health import CLIStatus, check_all_clis, check_cli_available, log_cli_status
 from .metrics import MetricsCollector, RequestMetrics, get_metrics
-from .queue import QueueStats, RequestQueue, get_request_queue
+from .queue import DeadlineExceeded, QueueStats, RequestQueue, get_request_queue
 from .retry import RetryError, is_retryable, retry_async, with_retry
 from .sessions import Session, SessionManager, get_session_manager
 from .subprocess import create_subprocess, get_sandbox_dir, is_windows, needs_shell
@@ -15,8 +15,15 @@ from .summarize import (
     get_messages_to_summarize,
     needs_summarization,
 )
-from .tokens import TokenCounter, count_message_tokens, count_tokens, get_token_counter
+from .tokens import (
+    IncrementalTokenCounter,
+    TokenCounter,
+    count_message_tokens,
+    count_tokens,
+    get_token_counter,
+)
 from .tools import (
+    StreamingToolCallParser,
     create_tool_system_prompt,
     format_tool_calls_response,
     format_tool_results_for_prompt,
@@ -24,6 +31,13 @@ from .tools import (
     parse_tool_calls,
     prepare_messages_for_cli,
 )
+from .worker_pool import (
+    CLIWorkerPool,
+    get_worker_pools,
+    init_worker_pools,
+    shutdown_worker_pools,
+    spawn_cli_process,
+)
 
 
 __all__ = [
@@ -49,6 +63,7 @@ __all__ = [
     "count_tokens",
     "count_message_tokens",
     "TokenCounter",
+    "IncrementalTokenCounter",
     # Subprocess
     "create_subprocess",
     "is_windows",
@@ -68,9 +83,17 @@ __all__ = [
     "get_request_queue",
     "RequestQueue",
     "QueueStats",
+    "DeadlineExceeded",
+    # Worker pool
+    "init_worker_pools",
+    "get_worker_pools",
+    "shutdown_worker_pools",
+    "spawn_cli_process",
+    "CLIWorkerPool",
     # Tools
     "create_tool_system_prompt",
     "parse_tool_calls",
+    "StreamingToolCallParser",
     "format_tool_calls_response",
     "has_tool_calls",
     "format_tool_results_for_prompt",
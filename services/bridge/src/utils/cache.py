@@ -3,10 +3,12 @@
 import hashlib
 import json
 import logging
+import sqlite3
 import threading
 import time
 from collections import OrderedDict
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Any
 
 from ..config import get_settings
@@ -14,14 +16,21 @@ from ..config import get_settings
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CACHE_DB = Path.home() / ".cli-openai-bridge" / "response_cache.db"
+
+# Entry kinds: a complete response object or the SSE chunk sequence of a stream
+KIND_RESPONSE = "response"
+KIND_STREAM = "stream"
+
 
 @dataclass
 class CacheEntry:
     """Cache entry with value and metadata."""
 
-    value: dict[str, Any]
+    value: Any
     created_at: float
     ttl: int
+    size: int = 0
     hits: int = 0
 
     @property
@@ -30,39 +39,207 @@ class CacheEntry:
         return time.time() - self.created_at > self.ttl
 
 
+class _DiskStore:
+    """
+    SQLite-backed second cache tier, bounded by total payload bytes.
+
+    Hits don't write: access times are kept in memory and written in one
+    batch before eviction, on close, or every ACCESS_FLUSH_BATCH hits.
+    """
+
+    # Buffered access times that trigger a write
+    ACCESS_FLUSH_BATCH = 256
+
+    def __init__(self, path: Path, max_bytes: int):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                ttl INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+        self._db.commit()
+        self._bytes = 0
+        self._pending_access: dict[str, float] = {}
+        self.purge_expired()
+
+    def get(self, key: str) -> tuple[bytes, float, int] | None:
+        row = self._db.execute(
+            "SELECT payload, created_at, ttl FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        payload, created_at, ttl = row
+        if time.time() - created_at > ttl:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.commit()
+            self._bytes -= len(payload)
+            return None
+        self._pending_access[key] = time.time()
+        if len(self._pending_access) >= self.ACCESS_FLUSH_BATCH:
+            self.flush_access()
+        return payload, created_at, ttl
+
+    def flush_access(self, commit: bool = True) -> None:
+        """Write buffered access times (LRU order for eviction)."""
+        if not self._pending_access:
+            return
+        pending = [(accessed, key) for key, accessed in self._pending_access.items()]
+        self._pending_access.clear()
+        self._db.executemany("UPDATE entries SET last_access = ? WHERE key = ?", pending)
+        if commit:
+            self._db.commit()
+
+    def put(self, key: str, payload: bytes, created_at: float, ttl: int) -> int:
+        """Store an entry; returns the number of entries evicted to make room."""
+        if len(payload) > self.max_bytes:
+            return 0
+        row = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+            (key, payload, len(payload), created_at, ttl, time.time()),
+        )
+        self._bytes += len(payload) - (row[0] if row else 0)
+        self._pending_access.pop(key, None)
+        evicted = self._evict()
+        self._db.commit()
+        return evicted
+
+    def _evict(self) -> int:
+        if self._bytes <= self.max_bytes:
+            return 0
+        self.flush_access(commit=False)
+        self.purge_expired(commit=False)
+        evicted = 0
+        rows = self._db.execute("SELECT key, size FROM entries ORDER BY last_access")
+        for key, size in rows.fetchall():
+            if self._bytes <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._bytes -= size
+            evicted += 1
+        return evicted
+
+    def purge_expired(self, commit: bool = True) -> None:
+        self._db.execute("DELETE FROM entries WHERE created_at + ttl < ?", (time.time(),))
+        if commit:
+            self._db.commit()
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def clear(self) -> None:
+        self._db.execute("DELETE FROM entries")
+        self._db.commit()
+        self._bytes = 0
+        self._pending_access.clear()
+
+    def close(self) -> None:
+        self.flush_access()
+        self._db.close()
+
+
 class ResponseCache:
-    """LRU cache for response caching with TTL support."""
+    """
+    Two-tier response cache with TTL support.
+
+    - Memory tier: LRU bounded by entry count and total payload bytes
+    - Disk tier (optional): SQLite file that survives restarts, bounded by
+      bytes; memory misses are looked up there and promoted on hit
+
+    Non-streaming responses are cached as response objects; streaming
+    responses as the sequence of SSE payloads the client received, so a
+    replay reproduces the original chunking. Keys are built from the
+    normalized request (messages, model, generation parameters).
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        default_ttl: int = 3600,
+        *,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_path: Path | None = None,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+    ):
+        """
+        Initialize the cache.
 
-    def __init__(self, max_size: int = 1000, default_ttl: int = 3600):
+        Args:
+            max_size: Maximum number of entries in memory
+            default_ttl: Default time to live in seconds
+            max_bytes: Maximum total payload bytes in memory
+            disk_path: SQLite file for the disk tier (None = memory only)
+            disk_max_bytes: Maximum total payload bytes on disk
+        """
         self._cache: OrderedDict[str, CacheEntry] = OrderedDict()
         self._max_size = max_size
+        self._max_bytes = max_bytes
+        self._bytes = 0
         self._default_ttl = default_ttl
         self._lock = threading.Lock()
         self._stats = {
             "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "stream_hits": 0,
             "misses": 0,
             "evictions": 0,
+            "disk_evictions": 0,
+            "disk_errors": 0,
         }
 
+        self._disk: _DiskStore | None = None
+        if disk_path is not None:
+            try:
+                self._disk = _DiskStore(disk_path, disk_max_bytes)
+                logger.info(f"Response cache disk tier: {disk_path}")
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Response cache disk tier unavailable ({disk_path}): {e}")
+
+    @staticmethod
+    def _normalize_messages(messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Drop unset fields and surrounding whitespace that don't change the answer."""
+        normalized = []
+        for message in messages:
+            item = {k: v for k, v in message.items() if v is not None}
+            if isinstance(item.get("content"), str):
+                item["content"] = item["content"].strip()
+            normalized.append(item)
+        return normalized
+
     def _make_key(
         self,
         messages: list[dict[str, Any]],
         model: str,
+        kind: str = KIND_RESPONSE,
         **kwargs: Any,
     ) -> str:
-        """
-        Create a cache key from request parameters.
-
-        Note: Streaming requests are not cached.
-        """
-        # Include relevant parameters in the key
+        """Create a cache key from the normalized request parameters."""
         key_data = {
-            "messages": messages,
+            "kind": kind,
+            "messages": self._normalize_messages(messages),
             "model": model,
-            "temperature": kwargs.get("temperature"),
-            "max_tokens": kwargs.get("max_tokens"),
+            # Generation parameters; unset ones don't split the key space
+            "params": {k: v for k, v in kwargs.items() if v is not None},
         }
-        key_str = json.dumps(key_data, sort_keys=True)
+        key_str = json.dumps(key_data, sort_keys=True, ensure_ascii=False)
         return hashlib.sha256(key_str.encode()).hexdigest()
 
     def get(
@@ -77,27 +254,50 @@ class ResponseCache:
         Returns:
             Cached response or None if not found/expired
         """
+        return self._get(self._make_key(messages, model, KIND_RESPONSE, **kwargs))
+
+    def get_stream(
+        self,
+        messages: list[dict[str, Any]],
+        model: str,
+        **kwargs: Any,
+    ) -> list[str] | None:
+        """
+        Get the recorded SSE payloads of a cached streaming response.
+
+        Returns:
+            Chunk payloads in original order (ending with "[DONE]") or None
+        """
+        chunks = self._get(self._make_key(messages, model, KIND_STREAM, **kwargs))
+        if chunks is not None:
+            with self._lock:
+                self._stats["stream_hits"] += 1
+        return chunks
+
+    def _get(self, key: str) -> Any:
         settings = get_settings()
         if not settings.cache_enabled:
             return None
 
-        key = self._make_key(messages, model, **kwargs)
-
         with self._lock:
-            if key not in self._cache:
-                self._stats["misses"] += 1
-                return None
-
-            entry = self._cache[key]
-
-            if entry.is_expired:
-                del self._cache[key]
-                self._stats["misses"] += 1
+            entry = self._cache.get(key)
+            if entry is not None and entry.is_expired:
+                self._remove(key)
                 logger.debug(f"Cache entry expired: {key[:8]}...")
-                return None
+                entry = None
+
+            if entry is not None:
+                # Move to end (most recently used)
+                self._cache.move_to_end(key)
+                self._stats["memory_hits"] += 1
+            else:
+                entry = self._disk_get(key)
+                if entry is None:
+                    self._stats["misses"] += 1
+                    return None
+                self._stats["disk_hits"] += 1
+                self._store(key, entry)
 
-            # Move to end (most recently used)
-            self._cache.move_to_end(key)
             entry.hits += 1
             self._stats["hits"] += 1
             logger.debug(f"Cache hit: {key[:8]}... (hits: {entry.hits})")
@@ -122,48 +322,149 @@ class ResponseCache:
             ttl: Time to live in seconds (default from settings)
             **kwargs: Additional request parameters for key
         """
+        self._set(self._make_key(messages, model, KIND_RESPONSE, **kwargs), response, ttl)
+
+    def set_stream(
+        self,
+        messages: list[dict[str, Any]],
+        model: str,
+        chunks: list[str],
+        ttl: int | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Cache a completed streaming response.
+
+        Args:
+            messages: Request messages
+            model: Model name
+            chunks: SSE payloads as sent to the client, in order
+            ttl: Time to live in seconds (default from settings)
+            **kwargs: Additional request parameters for key
+        """
+        self._set(self._make_key(messages, model, KIND_STREAM, **kwargs), list(chunks), ttl)
+
+    def _set(self, key: str, value: Any, ttl: int | None) -> None:
         settings = get_settings()
         if not settings.cache_enabled:
             return
 
-        key = self._make_key(messages, model, **kwargs)
-        ttl = ttl or settings.cache_ttl
+        payload = json.dumps(value, ensure_ascii=False).encode()
+        entry = CacheEntry(
+            value=value,
+            created_at=time.time(),
+            ttl=ttl or settings.cache_ttl or self._default_ttl,
+            size=len(payload),
+        )
 
         with self._lock:
-            # Evict oldest if at capacity
-            while len(self._cache) >= self._max_size:
-                oldest_key = next(iter(self._cache))
-                del self._cache[oldest_key]
-                self._stats["evictions"] += 1
-                logger.debug(f"Cache eviction: {oldest_key[:8]}...")
-
-            self._cache[key] = CacheEntry(
-                value=response,
-                created_at=time.time(),
-                ttl=ttl,
-            )
-            logger.debug(f"Cache set: {key[:8]}... (ttl: {ttl}s)")
+            self._store(key, entry)
+            if self._disk is not None:
+                try:
+                    self._stats["disk_evictions"] += self._disk.put(
+                        key, payload, entry.created_at, entry.ttl
+                    )
+                except sqlite3.Error as e:
+                    self._disk_error(e)
+            logger.debug(f"Cache set: {key[:8]}... ({entry.size} bytes, ttl: {entry.ttl}s)")
+
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        """Put an entry into the memory tier, evicting least recently used ones."""
+        self._remove(key)
+        if entry.size > self._max_bytes:
+            return
+
+        while self._cache and (
+            len(self._cache) >= self._max_size or self._bytes + entry.size > self._max_bytes
+        ):
+            oldest_key = next(iter(self._cache))
+            self._remove(oldest_key)
+            self._stats["evictions"] += 1
+            logger.debug(f"Cache eviction: {oldest_key[:8]}...")
+
+        self._cache[key] = entry
+        self._bytes += entry.size
+
+    def _remove(self, key: str) -> None:
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _disk_get(self, key: str) -> CacheEntry | None:
+        if self._disk is None:
+            return None
+        try:
+            row = self._disk.get(key)
+        except sqlite3.Error as e:
+            self._disk_error(e)
+            return None
+        if row is None:
+            return None
+        payload, created_at, ttl = row
+        return CacheEntry(
+            value=json.loads(payload), created_at=created_at, ttl=ttl, size=len(payload)
+        )
+
+    def _disk_error(self, error: Exception) -> None:
+        self._stats["disk_errors"] += 1
+        logger.warning(f"Response cache disk tier error: {error}")
 
     def clear(self) -> None:
         """Clear all cached entries."""
         with self._lock:
             self._cache.clear()
+            self._bytes = 0
+            if self._disk is not None:
+                try:
+                    self._disk.clear()
+                except sqlite3.Error as e:
+                    self._disk_error(e)
             logger.info("Cache cleared")
 
+    def close(self) -> None:
+        """Close the disk tier."""
+        with self._lock:
+            if self._disk is not None:
+                try:
+                    self._disk.close()
+                except sqlite3.Error as e:
+                    self._disk_error(e)
+                self._disk = None
+
     def get_stats(self) -> dict[str, Any]:
         """Get cache statistics."""
         with self._lock:
             total = self._stats["hits"] + self._stats["misses"]
             hit_rate = (self._stats["hits"] / total * 100) if total > 0 else 0
 
+            disk = None
+            if self._disk is not None:
+                try:
+                    disk = {
+                        "path": str(self._disk.path),
+                        "size": self._disk.count(),
+                        "bytes": self._disk.total_bytes(),
+                        "max_bytes": self._disk.max_bytes,
+                        "hits": self._stats["disk_hits"],
+                        "evictions": self._stats["disk_evictions"],
+                        "errors": self._stats["disk_errors"],
+                    }
+                except sqlite3.Error as e:
+                    self._disk_error(e)
+
             return {
                 "enabled": get_settings().cache_enabled,
                 "size": len(self._cache),
                 "max_size": self._max_size,
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
                 "hits": self._stats["hits"],
+                "memory_hits": self._stats["memory_hits"],
+                "stream_hits": self._stats["stream_hits"],
                 "misses": self._stats["misses"],
                 "hit_rate_percent": hit_rate,
                 "evictions": self._stats["evictions"],
+                "disk": disk,
             }
 
 
@@ -176,8 +477,16 @@ def get_cache() -> ResponseCache:
     global _cache
     if _cache is None:
         settings = get_settings()
+        disk_path = None
+        if settings.cache_enabled and settings.cache_disk_enabled:
+            disk_path = (
+                Path(settings.cache_disk_path) if settings.cache_disk_path else DEFAULT_CACHE_DB
+            )
         _cache = ResponseCache(
             max_size=settings.cache_max_size,
             default_ttl=settings.cache_ttl,
+            max_bytes=settings.cache_max_mb * 1024 * 1024,
+            disk_path=disk_path,
+            disk_max_bytes=settings.cache_disk_max_mb * 1024 * 1024,
         )
     return _cache
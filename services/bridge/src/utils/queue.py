@@ -1,9 +1,10 @@
 """Request queue for rate limiting and scheduling."""
 
 import asyncio
+import heapq
+import itertools
 import logging
 import time
-from collections import deque
 from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
 from typing import Any, AsyncIterator, Callable, Coroutine
@@ -11,6 +12,20 @@ from typing import Any, AsyncIterator, Callable, Coroutine
 
 logger = logging.getLogger(__name__)
 
+# Priority classes in dispatch order: a class is served only when all
+# higher classes have nothing waiting
+PRIORITY_CLASSES = ("interactive", "batch")
+
+# Upper bounds (seconds) of the wait-time histogram buckets
+WAIT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Smoothing factor for the per-provider service time estimate
+_SERVICE_TIME_ALPHA = 0.2
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """A queued request was dropped because it can no longer meet its deadline."""
+
 
 @dataclass
 class QueuedRequest:
@@ -18,7 +33,14 @@ class QueuedRequest:
 
     id: str
     provider: str
+    client: str = "default"
+    priority: str = "interactive"
+    stream: bool = False
+    deadline: float = float("inf")
+    service_estimate: float = 0.0
+    start_tag: float = 0.0
     created_at: float = field(default_factory=time.time)
+    # Resolved with None when a slot is granted, or with DeadlineExceeded
     future: asyncio.Future = field(default_factory=lambda: asyncio.get_event_loop().create_future())
 
 
@@ -30,24 +52,52 @@ class QueueStats:
     processing: int = 0
     completed: int = 0
     failed: int = 0
+    timed_out: int = 0
+    dropped: int = 0
     total_wait_time: float = 0.0
     total_process_time: float = 0.0
+    # Wait time counts per priority class; last bucket is "over WAIT_BUCKETS[-1]"
+    wait_histogram: dict[str, list[int]] = field(
+        default_factory=lambda: {p: [0] * (len(WAIT_BUCKETS) + 1) for p in PRIORITY_CLASSES}
+    )
     # Streaming stats
     streaming_active: int = 0
     streaming_completed: int = 0
     streaming_failed: int = 0
 
 
+@dataclass
+class _ProviderQueue:
+    """Scheduler state of one provider."""
+
+    # Per priority class: heap of (start_tag, seq, request)
+    heaps: dict[str, list] = field(default_factory=lambda: {p: [] for p in PRIORITY_CLASSES})
+    # Per priority class: start tag of the last dispatched request
+    vclock: dict[str, float] = field(default_factory=lambda: dict.fromkeys(PRIORITY_CLASSES, 0.0))
+    # (priority, client) -> finish tag of the client's last queued request
+    finish_tags: dict[tuple[str, str], float] = field(default_factory=dict)
+    active: int = 0
+    avg_process_time: float | None = None
+
+
 class RequestQueue:
     """
     Manages request queuing and scheduling per provider.
 
+    Streaming and non-streaming requests share one scheduler per provider:
+    a request waits in the queue until one of the provider's slots is free,
+    then either runs its function (execute) or holds the slot for the
+    duration of the stream (acquire_stream_slot).
+
     Features:
     - Per-provider queues to prevent one slow provider blocking others
     - Configurable concurrency limits per provider
-    - FIFO ordering within each queue
-    - Timeout handling
-    - Queue statistics and monitoring
+    - Priority classes: interactive requests are dispatched before batch ones
+    - Weighted fair sharing between clients within a class (start-time fair
+      queueing: a client with weight 2 gets twice the slots of weight 1)
+    - Deadline-aware dropping: a request that can no longer finish within its
+      timeout (estimated from recent service times) is dropped instead of run
+    - Queue positions and wait-time histograms for monitoring
 
     Usage:
         queue = RequestQueue(max_concurrent={"claude": 2, "gemini": 3})
@@ -60,6 +110,9 @@ class RequestQueue:
         default_max_concurrent: int = 2,
         max_queue_size: int = 100,
         request_timeout: float = 300.0,  # 5 minutes
+        *,
+        client_weights: dict[str, float] | None = None,
+        default_priority: str = "interactive",
     ):
         """
         Initialize the request queue.
@@ -69,20 +122,20 @@ class RequestQueue:
             default_max_concurrent: Default limit for unlisted providers
             max_queue_size: Maximum pending requests per provider
             request_timeout: Maximum time a request can wait + execute
+            client_weights: Fair-share weights per client (default weight 1)
+            default_priority: Priority class for requests that don't set one
         """
         self.max_concurrent = max_concurrent or {}
         self.default_max_concurrent = default_max_concurrent
         self.max_queue_size = max_queue_size
         self.request_timeout = request_timeout
+        self.client_weights = client_weights or {}
+        self.default_priority = normalize_priority(default_priority, "interactive")
 
         # Per-provider state
-        self._queues: dict[str, deque[QueuedRequest]] = {}
-        self._active: dict[str, int] = {}
+        self._queues: dict[str, _ProviderQueue] = {}
         self._stats: dict[str, QueueStats] = {}
-        self._locks: dict[str, asyncio.Lock] = {}
-
-        # Semaphores for streaming requests (shared concurrency pool)
-        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._seq = itertools.count()
 
         # Global lock for initialization
         self._init_lock = asyncio.Lock()
@@ -94,91 +147,205 @@ class RequestQueue:
         """Get concurrency limit for a provider."""
         return self.max_concurrent.get(provider, self.default_max_concurrent)
 
+    def _get_weight(self, client: str) -> float:
+        """Get fair-share weight for a client."""
+        weight = self.client_weights.get(client, 1.0)
+        return weight if weight > 0 else 1.0
+
     async def _ensure_provider(self, provider: str) -> None:
         """Ensure provider queues are initialized."""
         if provider not in self._queues:
             async with self._init_lock:
                 if provider not in self._queues:
-                    self._queues[provider] = deque()
-                    self._active[provider] = 0
+                    self._queues[provider] = _ProviderQueue()
                     self._stats[provider] = QueueStats()
-                    self._locks[provider] = asyncio.Lock()
-                    # Create semaphore for streaming concurrency control
-                    max_concurrent = self._get_max_concurrent(provider)
-                    self._semaphores[provider] = asyncio.Semaphore(max_concurrent)
 
-    async def execute(
+    # ============== Scheduling ==============
+
+    def _enqueue(self, state: _ProviderQueue, request: QueuedRequest) -> None:
+        """Tag the request with its virtual start time and add it to its class heap."""
+        key = (request.priority, request.client)
+        start = max(state.vclock[request.priority], state.finish_tags.get(key, 0.0))
+        state.finish_tags[key] = start + 1.0 / self._get_weight(request.client)
+        request.start_tag = start
+        heapq.heappush(state.heaps[request.priority], (start, next(self._seq), request))
+
+    @staticmethod
+    def _pop_next(state: _ProviderQueue) -> QueuedRequest | None:
+        """Pop the next waiting request: highest class first, lowest start tag within it."""
+        for priority in PRIORITY_CLASSES:
+            heap = state.heaps[priority]
+            while heap:
+                start, _, request = heapq.heappop(heap)
+                if request.future.done():
+                    # Waiter gave up; it already left the pending count
+                    continue
+                state.vclock[priority] = start
+                if not heap:
+                    # Class is idle: no backlog to be fair against
+                    state.finish_tags = {
+                        k: v for k, v in state.finish_tags.items() if k[0] != priority
+                    }
+                return request
+        return None
+
+    def _dispatch(self, provider: str) -> None:
+        """Grant free slots to waiting requests, dropping those past saving."""
+        state = self._queues[provider]
+        stats = self._stats[provider]
+        max_concurrent = self._get_max_concurrent(provider)
+
+        while state.active < max_concurrent:
+            request = self._pop_next(state)
+            if request is None:
+                return
+            stats.pending -= 1
+
+            now = time.time()
+            if now + request.service_estimate > request.deadline:
+                stats.dropped += 1
+                logger.warning(
+                    f"Dropped request {request.id} ({request.priority}, client {request.client}): "
+                    f"cannot finish before its deadline"
+                )
+                request.future.set_exception(
+                    DeadlineExceeded(f"Request {request.id} cannot finish before its deadline")
+                )
+                continue
+
+            wait_time = now - request.created_at
+            stats.total_wait_time += wait_time
+            bucket = next(
+                (i for i, bound in enumerate(WAIT_BUCKETS) if wait_time <= bound),
+                len(WAIT_BUCKETS),
+            )
+            stats.wait_histogram[request.priority][bucket] += 1
+
+            state.active += 1
+            request.future.set_result(None)
+
+    def _release(self, provider: str) -> None:
+        """Free a slot and hand it to the next waiting request."""
+        self._queues[provider].active -= 1
+        self._dispatch(provider)
+
+    async def _acquire(
         self,
         provider: str,
-        func: Callable[..., Coroutine[Any, Any, Any]],
-        *args: Any,
-        **kwargs: Any,
-    ) -> Any:
+        *,
+        client: str | None,
+        priority: str | None,
+        stream: bool,
+    ) -> QueuedRequest:
         """
-        Execute a function through the queue.
+        Queue a request and wait until it is granted a slot.
 
-        Args:
-            provider: Provider name for queue selection
-            func: Async function to execute
-            *args, **kwargs: Arguments to pass to function
-
-        Returns:
-            Result from the function
+        The caller must call _release() once it is done with the slot.
 
         Raises:
-            asyncio.QueueFull: If queue is at capacity
-            asyncio.TimeoutError: If request times out
+            asyncio.QueueFull: If queue is at capacity or shutting down
+            asyncio.TimeoutError: If no slot was granted before the deadline
+            DeadlineExceeded: If the request was dropped by the scheduler
         """
         await self._ensure_provider(provider)
 
-        request_id = f"{provider}-{int(time.time() * 1000)}"
-        request = QueuedRequest(id=request_id, provider=provider)
+        if self._shutting_down:
+            raise asyncio.QueueFull("Server is shutting down")
+
+        state = self._queues[provider]
+        stats = self._stats[provider]
 
         # Check queue capacity
-        if len(self._queues[provider]) >= self.max_queue_size:
+        if stats.pending >= self.max_queue_size:
             logger.warning(f"Queue full for provider {provider}")
             raise asyncio.QueueFull(f"Request queue full for {provider}")
 
-        # Add to queue
-        self._queues[provider].append(request)
-        self._stats[provider].pending += 1
-        logger.debug(f"Queued request {request_id}, position: {len(self._queues[provider])}")
+        now = time.time()
+        request = QueuedRequest(
+            id=f"{provider}-{int(now * 1000)}-{next(self._seq)}",
+            provider=provider,
+            client=client or "default",
+            priority=normalize_priority(priority, self.default_priority),
+            stream=stream,
+            deadline=now + self.request_timeout,
+            # The timeout covers execution only for non-streaming requests
+            service_estimate=0.0 if stream else state.avg_process_time or 0.0,
+            created_at=now,
+        )
 
-        # Start processor if needed
-        asyncio.create_task(self._process_queue(provider, func, args, kwargs))
+        # Add to queue
+        self._enqueue(state, request)
+        stats.pending += 1
+        self._dispatch(provider)
+        if not request.future.done():
+            logger.debug(
+                f"Queued request {request.id} ({request.priority}, client {request.client}), "
+                f"position: {self.get_position(provider, request.id)}"
+            )
 
-        # Wait for result with timeout
         try:
-            result = await asyncio.wait_for(request.future, timeout=self.request_timeout)
-            return result
-        except asyncio.TimeoutError:
-            self._stats[provider].failed += 1
-            logger.error(f"Request {request_id} timed out")
+            await asyncio.wait_for(
+                asyncio.shield(request.future), timeout=request.deadline - time.time()
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if not request.future.done():
+                # Still waiting: leave the queue (the heap entry is skipped lazily)
+                request.future.cancel()
+                stats.pending -= 1
+                if isinstance(e, asyncio.TimeoutError):
+                    stats.timed_out += 1
+                    logger.warning(f"Request {request.id} timed out in queue")
+            elif not request.future.cancelled() and request.future.exception() is None:
+                # Slot was granted just as the waiter gave up
+                self._release(provider)
             raise
 
-    async def _process_queue(
+        return request
+
+    # ============== Public API ==============
+
+    async def execute(
         self,
         provider: str,
         func: Callable[..., Coroutine[Any, Any, Any]],
-        args: tuple,
-        kwargs: dict,
-    ) -> None:
-        """Process requests from the queue."""
-        async with self._locks[provider]:
-            max_concurrent = self._get_max_concurrent(provider)
+        *args: Any,
+        client: str | None = None,
+        priority: str | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Execute a function through the queue.
+
+        Args:
+            provider: Provider name for queue selection
+            func: Async function to execute
+            *args, **kwargs: Arguments to pass to function
+            client: Client identifier for fair sharing
+            priority: Priority class ("interactive" or "batch")
 
-            while self._queues[provider] and self._active[provider] < max_concurrent:
-                request = self._queues[provider].popleft()
-                self._stats[provider].pending -= 1
-                self._active[provider] += 1
-                self._stats[provider].processing += 1
+        Returns:
+            Result from the function
 
-                # Track wait time
-                wait_time = time.time() - request.created_at
-                self._stats[provider].total_wait_time += wait_time
+        Raises:
+            asyncio.QueueFull: If queue is at capacity
+            asyncio.TimeoutError: If request times out (DeadlineExceeded if dropped)
+        """
+        request = await self._acquire(provider, client=client, priority=priority, stream=False)
+        stats = self._stats[provider]
+        stats.processing += 1
 
-                # Execute in background
-                asyncio.create_task(self._execute_request(provider, request, func, args, kwargs))
+        # The function keeps its slot until it finishes, even if the caller times out
+        task = asyncio.create_task(self._execute_request(provider, request, func, args, kwargs))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(task), timeout=max(request.deadline - time.time(), 0)
+            )
+        except asyncio.TimeoutError:
+            if not task.done():
+                stats.timed_out += 1
+                logger.error(f"Request {request.id} timed out")
+            raise
 
     async def _execute_request(
         self,
@@ -187,37 +354,49 @@ class RequestQueue:
         func: Callable[..., Coroutine[Any, Any, Any]],
         args: tuple,
         kwargs: dict,
-    ) -> None:
+    ) -> Any:
         """Execute a single request and handle completion."""
+        state = self._queues[provider]
+        stats = self._stats[provider]
         start_time = time.time()
 
         try:
             result = await func(*args, **kwargs)
-            request.future.set_result(result)
-            self._stats[provider].completed += 1
+            stats.completed += 1
             logger.debug(f"Request {request.id} completed")
+            return result
         except Exception as e:
-            request.future.set_exception(e)
-            self._stats[provider].failed += 1
+            stats.failed += 1
             logger.error(f"Request {request.id} failed: {e}")
+            raise
         finally:
             # Track process time
             process_time = time.time() - start_time
-            self._stats[provider].total_process_time += process_time
+            stats.total_process_time += process_time
+            if state.avg_process_time is None:
+                state.avg_process_time = process_time
+            else:
+                state.avg_process_time += _SERVICE_TIME_ALPHA * (
+                    process_time - state.avg_process_time
+                )
 
             # Release slot
-            self._active[provider] -= 1
-            self._stats[provider].processing -= 1
-
-            # Process more if waiting
-            if self._queues[provider]:
-                asyncio.create_task(self._process_queue(provider, func, args, kwargs))
+            stats.processing -= 1
+            self._release(provider)
 
     @asynccontextmanager
-    async def acquire_stream_slot(self, provider: str) -> AsyncIterator[None]:
+    async def acquire_stream_slot(
+        self,
+        provider: str,
+        *,
+        client: str | None = None,
+        priority: str | None = None,
+    ) -> AsyncIterator[None]:
         """
         Acquire a slot for streaming request.
 
+        Streams wait in the same queue as non-streaming requests.
+
         Use as async context manager:
             async with queue.acquire_stream_slot("claude"):
                 async for chunk in stream_generator():
@@ -225,26 +404,20 @@ class RequestQueue:
 
         Args:
             provider: Provider name for concurrency control
+            client: Client identifier for fair sharing
+            priority: Priority class ("interactive" or "batch")
 
         Raises:
-            asyncio.QueueFull: If at capacity and can't acquire slot immediately
+            asyncio.QueueFull: If at capacity or no slot was granted in time
         """
-        await self._ensure_provider(provider)
-
-        if self._shutting_down:
-            raise asyncio.QueueFull("Server is shutting down")
-
-        semaphore = self._semaphores[provider]
-        stats = self._stats[provider]
-
-        # Try to acquire with timeout to prevent indefinite blocking
         try:
-            await asyncio.wait_for(semaphore.acquire(), timeout=self.request_timeout)
+            await self._acquire(provider, client=client, priority=priority, stream=True)
         except asyncio.TimeoutError:
-            stats.streaming_failed += 1
+            self._stats[provider].streaming_failed += 1
             logger.warning(f"Streaming slot acquisition timed out for {provider}")
             raise asyncio.QueueFull(f"Streaming queue timeout for {provider}")
 
+        stats = self._stats[provider]
         stats.streaming_active += 1
         logger.debug(f"Acquired streaming slot for {provider}, active: {stats.streaming_active}")
 
@@ -256,23 +429,49 @@ class RequestQueue:
             raise
         finally:
             stats.streaming_active -= 1
-            semaphore.release()
+            self._release(provider)
             logger.debug(
                 f"Released streaming slot for {provider}, active: {stats.streaming_active}"
             )
 
+    # ============== Monitoring ==============
+
+    def _waiting(self, provider: str) -> list[QueuedRequest]:
+        """Waiting requests of a provider in dispatch order."""
+        state = self._queues.get(provider)
+        if state is None:
+            return []
+        waiting = []
+        for priority in PRIORITY_CLASSES:
+            waiting.extend(
+                request
+                for _, _, request in sorted(state.heaps[priority])
+                if not request.future.done()
+            )
+        return waiting
+
     def get_stats(self, provider: str | None = None) -> dict[str, Any]:
         """Get queue statistics."""
         if provider:
             stats = self._stats.get(provider, QueueStats())
+            state = self._queues.get(provider)
             total_requests = stats.completed + stats.failed
+            granted = sum(sum(counts) for counts in stats.wait_histogram.values())
+            now = time.time()
+            waiting = self._waiting(provider)
             return {
                 "provider": provider,
                 "pending": stats.pending,
+                "pending_by_priority": {
+                    p: sum(1 for r in waiting if r.priority == p) for p in PRIORITY_CLASSES
+                },
+                "active": state.active if state else 0,
                 "processing": stats.processing,
                 "completed": stats.completed,
                 "failed": stats.failed,
-                "avg_wait_time": stats.total_wait_time / total_requests if total_requests else 0,
+                "timed_out": stats.timed_out,
+                "dropped": stats.dropped,
+                "avg_wait_time": stats.total_wait_time / granted if granted else 0,
                 "avg_process_time": stats.total_process_time / total_requests
                 if total_requests
                 else 0,
@@ -283,6 +482,22 @@ class RequestQueue:
                     "completed": stats.streaming_completed,
                     "failed": stats.streaming_failed,
                 },
+                "wait_histogram": {
+                    "buckets": [*WAIT_BUCKETS, "inf"],
+                    **{p: list(counts) for p, counts in stats.wait_histogram.items()},
+                },
+                "queue": [
+                    {
+                        "id": r.id,
+                        "position": position,
+                        "priority": r.priority,
+                        "client": r.client,
+                        "stream": r.stream,
+                        "waiting": round(now - r.created_at, 3),
+                        "deadline_in": round(r.deadline - now, 3),
+                    }
+                    for position, r in enumerate(waiting, start=1)
+                ],
             }
 
         # All providers
@@ -297,12 +512,24 @@ class RequestQueue:
             "total_streaming_active": sum(s.streaming_active for s in self._stats.values()),
             "max_queue_size": self.max_queue_size,
             "request_timeout": self.request_timeout,
+            "priority_classes": list(PRIORITY_CLASSES),
+            "client_weights": self.client_weights,
             "shutting_down": self._shutting_down,
         }
 
-    def get_position(self, provider: str) -> int:
-        """Get current queue length for a provider."""
-        return len(self._queues.get(provider, []))
+    def get_position(self, provider: str, request_id: str | None = None) -> int:
+        """
+        Get the queue position of a request (1-based), or the queue length.
+
+        Returns 0 if the request is not waiting (granted, dropped or unknown).
+        """
+        waiting = self._waiting(provider)
+        if request_id is None:
+            return len(waiting)
+        for position, request in enumerate(waiting, start=1):
+            if request.id == request_id:
+                return position
+        return 0
 
     async def shutdown(self, timeout: float = 30.0) -> bool:
         """
@@ -342,6 +569,30 @@ class RequestQueue:
         return False
 
 
+def normalize_priority(priority: str | None, default: str) -> str:
+    """Map a requested priority to a known class, falling back to the default."""
+    if priority:
+        priority = priority.strip().lower()
+        if priority in PRIORITY_CLASSES:
+            return priority
+        logger.debug(f"Unknown priority {priority!r}, using {default}")
+    return default
+
+
+def parse_client_weights(value: str) -> dict[str, float]:
+    """Parse "client:weight,client:weight" into a weights dict."""
+    weights = {}
+    for item in value.split(","):
+        client, sep, weight = item.strip().rpartition(":")
+        if not sep or not client:
+            continue
+        try:
+            weights[client] = float(weight)
+        except ValueError:
+            logger.warning(f"Invalid queue client weight: {item.strip()!r}")
+    return weights
+
+
 # Global queue instance
 _request_queue: RequestQueue | None = None
 
@@ -363,5 +614,7 @@ def get_request_queue() -> RequestQueue:
             default_max_concurrent=settings.queue_default_concurrent,
             max_queue_size=settings.queue_max_size,
             request_timeout=float(settings.queue_timeout),
+            client_weights=parse_client_weights(settings.queue_client_weights),
+            default_priority=settings.queue_default_priority,
         )
     return _request_queue
@@ -1,7 +1,11 @@
 """Token counting utilities."""
 
+import hashlib
 import logging
-from typing import Any
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable
 
 
 logger = logging.getLogger("cli_bridge.tokens")
@@ -30,6 +34,13 @@ class TokenCounter:
 
     Uses tiktoken for accurate counting when available,
     falls back to character-based approximation otherwise.
+
+    Encodings are loaded in a background thread (tiktoken may have to
+    download them), so counting never blocks the event loop; until an
+    encoding is ready, the approximation is used. Token counts of message
+    contents are memoized in an LRU keyed by content hash, so the system
+    prompt, tool instructions and earlier turns that clients resend with
+    every request are encoded once.
     """
 
     # Model family to tiktoken encoding mapping
@@ -54,36 +65,101 @@ class TokenCounter:
     # Average characters per token for approximation (when tiktoken unavailable)
     CHARS_PER_TOKEN = 4
 
-    def __init__(self):
+    # Seconds before a failed encoding load is retried
+    LOAD_RETRY_INTERVAL = 300
+
+    def __init__(self, cache_size: int = 4096):
+        """
+        Initialize the token counter.
+
+        Args:
+            cache_size: Max memoized per-message counts (0 disables memoization)
+        """
         self._encodings: dict[str, Any] = {}
+        self._loading: dict[str, threading.Thread] = {}
+        self._failed_at: dict[str, float] = {}
+        self._lock = threading.Lock()
 
-    def _get_encoding(self, model: str) -> Any | None:
-        """Get tiktoken encoding for a model."""
-        tiktoken = _get_tiktoken()
-        if not tiktoken:
-            return None
+        self._cache: OrderedDict[tuple[str, bytes], int] = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_hits = 0
+        self._cache_misses = 0
 
-        # Find encoding name for model
-        encoding_name = None
+    def _get_encoding_name(self, model: str) -> str:
+        """Get tiktoken encoding name for a model."""
         model_lower = model.lower()
         for prefix, enc in self.ENCODING_MAP.items():
             if model_lower.startswith(prefix):
-                encoding_name = enc
-                break
+                return enc
+        # Default to cl100k_base for unknown models
+        return "cl100k_base"
 
-        if not encoding_name:
-            # Default to cl100k_base for unknown models
-            encoding_name = "cl100k_base"
-
-        # Cache encodings
-        if encoding_name not in self._encodings:
-            try:
-                self._encodings[encoding_name] = tiktoken.get_encoding(encoding_name)
-            except Exception as e:
-                logger.warning(f"Failed to get encoding {encoding_name}: {e}")
+    def _get_encoding(self, model: str) -> Any | None:
+        """Get tiktoken encoding for a model, or None while it is not loaded yet."""
+        encoding_name = self._get_encoding_name(model)
+        encoding = self._encodings.get(encoding_name)
+        if encoding is None:
+            self._load_in_background(encoding_name)
+        return encoding
+
+    def _load_in_background(self, encoding_name: str) -> threading.Thread | None:
+        """Start loading an encoding in a daemon thread (no-op if loading or failed recently)."""
+        if not _get_tiktoken():
+            return None
+        with self._lock:
+            if encoding_name in self._encodings:
+                return None
+            thread = self._loading.get(encoding_name)
+            if thread is not None:
+                return thread
+            failed_at = self._failed_at.get(encoding_name)
+            if failed_at is not None and time.monotonic() - failed_at < self.LOAD_RETRY_INTERVAL:
                 return None
+            thread = threading.Thread(
+                target=self._load_encoding,
+                args=(encoding_name,),
+                name=f"tiktoken-{encoding_name}",
+                daemon=True,
+            )
+            self._loading[encoding_name] = thread
+        thread.start()
+        return thread
+
+    def _load_encoding(self, encoding_name: str) -> None:
+        start = time.perf_counter()
+        try:
+            encoding = _get_tiktoken().get_encoding(encoding_name)
+        except Exception as e:
+            logger.warning(f"Failed to get encoding {encoding_name}: {e}")
+            with self._lock:
+                self._failed_at[encoding_name] = time.monotonic()
+                del self._loading[encoding_name]
+            return
+
+        with self._lock:
+            self._encodings[encoding_name] = encoding
+            self._failed_at.pop(encoding_name, None)
+            del self._loading[encoding_name]
+        logger.debug(f"Loaded encoding {encoding_name} in {time.perf_counter() - start:.2f}s")
+
+    def preload(
+        self,
+        encodings: Iterable[str] | None = None,
+        wait: float | None = None,
+    ) -> None:
+        """
+        Start loading encodings in the background.
 
-        return self._encodings[encoding_name]
+        Args:
+            encodings: Encoding names (default: all used by ENCODING_MAP)
+            wait: Seconds to wait for loading to finish (None = don't wait)
+        """
+        names = encodings if encodings is not None else set(self.ENCODING_MAP.values())
+        threads = [t for t in (self._load_in_background(name) for name in names) if t]
+        if wait is not None:
+            deadline = time.monotonic() + wait
+            for thread in threads:
+                thread.join(max(deadline - time.monotonic(), 0))
 
     def count_text(self, text: str, model: str = "gpt-4") -> int:
         """
@@ -109,6 +185,29 @@ class TokenCounter:
         # Fallback: character-based approximation
         return len(text) // self.CHARS_PER_TOKEN
 
+    def _count_memoized(self, text: str, model: str) -> int:
+        """Count tokens in a message text, using the per-content LRU."""
+        if not text:
+            return 0
+        encoding_name = self._get_encoding_name(model)
+        if self._cache_size <= 0 or encoding_name not in self._encodings:
+            # Approximations are cheap and must not outlive the encoding load
+            return self.count_text(text, model)
+
+        key = (encoding_name, hashlib.blake2b(text.encode(), digest_size=16).digest())
+        count = self._cache.get(key)
+        if count is not None:
+            self._cache.move_to_end(key)
+            self._cache_hits += 1
+            return count
+
+        self._cache_misses += 1
+        count = self.count_text(text, model)
+        self._cache[key] = count
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return count
+
     def count_messages(
         self,
         messages: list[dict[str, Any]],
@@ -134,12 +233,12 @@ class TokenCounter:
         for msg in messages:
             content = msg.get("content", "")
             if isinstance(content, str):
-                total += self.count_text(content, model)
+                total += self._count_memoized(content, model)
             elif isinstance(content, list):
                 # Multi-part content (e.g., with images)
                 for part in content:
                     if isinstance(part, dict) and part.get("type") == "text":
-                        total += self.count_text(part.get("text", ""), model)
+                        total += self._count_memoized(part.get("text", ""), model)
             total += message_overhead
 
         # Conversation overhead
@@ -160,6 +259,79 @@ class TokenCounter:
         """
         return self.count_text(text, model)
 
+    def get_stats(self) -> dict[str, Any]:
+        """Get token counter statistics."""
+        lookups = self._cache_hits + self._cache_misses
+        return {
+            "encodings_loaded": sorted(self._encodings),
+            "encodings_loading": sorted(self._loading),
+            "cache_size": len(self._cache),
+            "cache_max_size": self._cache_size,
+            "cache_hits": self._cache_hits,
+            "cache_misses": self._cache_misses,
+            "cache_hit_rate": round(self._cache_hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class IncrementalTokenCounter:
+    """
+    Counts completion tokens as stream chunks arrive.
+
+    tiktoken splits text into pieces with a regex before applying BPE, and
+    no token spans two pieces. A single space between a non-space character
+    and a letter always starts a new piece (" word"), so text before such a
+    space can be counted on its own and dropped. Only the tail after the last
+    such boundary is re-encoded for the final total, which therefore equals
+    counting the whole completion at once.
+
+    Usage:
+        counter = IncrementalTokenCounter("sonnet")
+        for chunk in chunks:
+            counter.feed(chunk)
+        completion_tokens = counter.total
+    """
+
+    # Tail length that triggers counting the settled prefix
+    COMMIT_CHARS = 512
+
+    def __init__(self, model: str, counter: TokenCounter | None = None):
+        self.model = model
+        self._counter = counter or get_token_counter()
+        self._committed = 0
+        self._tail = ""
+        self._next_commit = self.COMMIT_CHARS
+
+    def feed(self, text: str) -> None:
+        """Add a chunk of completion text."""
+        if not text:
+            return
+        self._tail += text
+        if len(self._tail) < self._next_commit:
+            return
+
+        boundary = self._last_boundary(self._tail)
+        if boundary <= 0:
+            # No settled prefix yet (e.g. code without spaces); retry after more text
+            self._next_commit = len(self._tail) * 2
+            return
+
+        self._committed += self._counter.count_text(self._tail[:boundary], self.model)
+        self._tail = self._tail[boundary:]
+        self._next_commit = self.COMMIT_CHARS
+
+    @staticmethod
+    def _last_boundary(text: str) -> int:
+        """Index of the last space between a non-space character and a letter, or -1."""
+        pos = text.rfind(" ", 1, len(text) - 1)
+        while pos > 0 and (text[pos - 1].isspace() or not text[pos + 1].isalpha()):
+            pos = text.rfind(" ", 1, pos)
+        return pos
+
+    @property
+    def total(self) -> int:
+        """Tokens in all text fed so far."""
+        return self._committed + self._counter.count_text(self._tail, self.model)
+
 
 # Singleton instance
 _counter: TokenCounter | None = None
@@ -116,6 +116,43 @@ def create_tool_system_prompt(tools: list[dict[str, Any]], tool_choice: Any = No
     return prompt
 
 
+def _make_tool_call(
+    call_json: str,
+    valid_tool_names: set[str] | None,
+) -> dict[str, Any] | None:
+    """Build an OpenAI tool call from the JSON body of a tool_call block.
+
+    Returns None for invalid JSON, a missing name, or a tool not in
+    valid_tool_names.
+    """
+    try:
+        call_data = json.loads(call_json)
+    except json.JSONDecodeError as e:
+        logger.warning(f"Failed to parse tool call JSON: {e}")
+        return None
+
+    # Extract name and arguments
+    name = call_data.get("name", "")
+    arguments = call_data.get("arguments", {})
+
+    if not name:
+        return None
+
+    # Validate against provided tools if specified
+    if valid_tool_names is not None and name not in valid_tool_names:
+        logger.warning(f"Ignoring hallucinated tool call: {name}")
+        return None
+
+    return {
+        "id": f"call_{uuid.uuid4().hex[:12]}",
+        "type": "function",
+        "function": {
+            "name": name,
+            "arguments": json.dumps(arguments) if isinstance(arguments, dict) else str(arguments),
+        },
+    }
+
+
 def parse_tool_calls(
     response_text: str,
     valid_tool_names: set[str] | None = None,
@@ -135,38 +172,10 @@ def parse_tool_calls(
     tool_calls = []
 
     # Find all tool_call blocks
-    matches = TOOL_CALL_PATTERN.findall(response_text)
-
-    for match in matches:
-        try:
-            # Parse the JSON
-            call_data = json.loads(match)
-
-            # Extract name and arguments
-            name = call_data.get("name", "")
-            arguments = call_data.get("arguments", {})
-
-            if name:
-                # Validate against provided tools if specified
-                if valid_tool_names is not None and name not in valid_tool_names:
-                    logger.warning(f"Ignoring hallucinated tool call: {name}")
-                    continue
-
-                tool_calls.append(
-                    {
-                        "id": f"call_{uuid.uuid4().hex[:12]}",
-                        "type": "function",
-                        "function": {
-                            "name": name,
-                            "arguments": json.dumps(arguments)
-                            if isinstance(arguments, dict)
-                            else str(arguments),
-                        },
-                    }
-                )
-        except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse tool call JSON: {e}")
-            continue
+    for match in TOOL_CALL_PATTERN.findall(response_text):
+        tool_call = _make_tool_call(match, valid_tool_names)
+        if tool_call:
+            tool_calls.append(tool_call)
 
     # Remove ALL tool_call blocks from content (including invalid ones)
     remaining_text = TOOL_CALL_PATTERN.sub("", response_text).strip()
@@ -174,6 +183,102 @@ def parse_tool_calls(
     return tool_calls, remaining_text
 
 
+class StreamingToolCallParser:
+    """Incremental version of parse_tool_calls for streamed responses.
+
+    Text is released as soon as it cannot be part of a ```tool_call block;
+    only a possible block start (a partial marker, or a marker whose block
+    has not closed yet) is held back. Each block is turned into a tool call
+    as soon as it closes. Concatenated text and the tool calls are the same
+    as parse_tool_calls() on the complete response, including the strip of
+    leading/trailing whitespace.
+
+    Usage:
+        parser = StreamingToolCallParser(valid_tool_names)
+        for delta in stream:
+            text, tool_calls = parser.feed(delta)
+        text, tool_calls = parser.finish()
+    """
+
+    MARKER = "```tool_call"
+
+    def __init__(self, valid_tool_names: set[str] | None = None):
+        self.valid_tool_names = valid_tool_names
+        self.tool_calls: list[dict[str, Any]] = []
+        self._buffer = ""
+        self._started = False  # non-whitespace text has been released
+        self._whitespace = ""  # trailing whitespace held until more text follows
+
+    def feed(self, text: str) -> tuple[str, list[dict[str, Any]]]:
+        """Add a chunk of the response; returns (text to emit, closed tool calls)."""
+        self._buffer += text
+        return self._drain(final=False)
+
+    def finish(self) -> tuple[str, list[dict[str, Any]]]:
+        """Flush at the end of the response (unclosed blocks are released as text)."""
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> tuple[str, list[dict[str, Any]]]:
+        released: list[str] = []
+        closed: list[dict[str, Any]] = []
+
+        while True:
+            start = self._buffer.find(self.MARKER)
+            if start == -1:
+                keep = 0 if final else self._partial_marker_length()
+                released.append(self._buffer[: len(self._buffer) - keep])
+                self._buffer = self._buffer[len(self._buffer) - keep :]
+                break
+
+            released.append(self._buffer[:start])
+            self._buffer = self._buffer[start:]
+
+            match = TOOL_CALL_PATTERN.match(self._buffer)
+            if match:
+                tool_call = _make_tool_call(match.group(1), self.valid_tool_names)
+                if tool_call:
+                    closed.append(tool_call)
+                self._buffer = self._buffer[match.end() :]
+                continue
+
+            if final or not self._may_open_block():
+                # Not a tool_call block: the marker stays in the text
+                released.append(self.MARKER)
+                self._buffer = self._buffer[len(self.MARKER) :]
+                continue
+
+            # Block still open - wait for more text
+            break
+
+        self.tool_calls.extend(closed)
+        return self._release("".join(released), final), closed
+
+    def _partial_marker_length(self) -> int:
+        """Length of the longest buffer suffix that is a prefix of MARKER."""
+        for length in range(min(len(self.MARKER) - 1, len(self._buffer)), 0, -1):
+            if self.MARKER.startswith(self._buffer[-length:]):
+                return length
+        return 0
+
+    def _may_open_block(self) -> bool:
+        """Whether the marker at the buffer start can still become a block."""
+        rest = self._buffer[len(self.MARKER) :].lstrip()
+        return not rest or rest.startswith("{")
+
+    def _release(self, text: str, final: bool) -> str:
+        """Apply the batch parser's strip() to the streamed text."""
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+
+        text = self._whitespace + text
+        stripped = text.rstrip()
+        self._whitespace = "" if final else text[len(stripped) :]
+        return stripped
+
+
 def format_tool_calls_response(
     tool_calls: list[dict[str, Any]], content: str | None = None
 ) -> dict[str, Any]:
@@ -0,0 +1,344 @@
+"""Warm pool of pre-spawned CLI processes."""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Sequence
+
+from .subprocess import create_subprocess
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Worker:
+    """An idle CLI process waiting for its prompt on stdin."""
+
+    process: asyncio.subprocess.Process
+    spawned_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+
+@dataclass
+class WorkerPoolStats:
+    """Statistics for a provider worker pool."""
+
+    hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+    spawned: int = 0
+    spawn_errors: int = 0
+    recycled: int = 0
+    evicted: int = 0
+    dead: int = 0
+    total_spawn_time: float = 0.0
+
+
+class CLIWorkerPool:
+    """
+    Keeps pre-spawned CLI processes ready for one provider.
+
+    The supported CLIs answer a single prompt per process (read stdin until
+    EOF, print the answer, exit), so a worker is a process that has already
+    paid the CLI cold start (runtime, auth, config load) and is blocked on
+    stdin. Workers are keyed by their exact command line, since model,
+    output format and permissions are all CLI arguments.
+
+    Commands carrying per-request arguments (a session to resume, a system
+    prompt) bypass the pool: a worker pre-spawned for them would either load
+    the session before the current turn is saved or never be reused, while
+    taking a slot from commands that are.
+
+    Features:
+    - acquire() hands out a warm process for the command, or spawns one
+    - A replacement for the used command is spawned in the background
+    - At most `size` idle workers; least recently used commands are evicted
+    - Health checks drop workers that died and recycle ones idle > max_idle
+
+    Usage:
+        pool = CLIWorkerPool("claude", size=2)
+        process = await pool.acquire(["claude", "-p", "--model", "sonnet"])
+        stdout, stderr = await process.communicate(input=prompt.encode())
+    """
+
+    def __init__(
+        self,
+        name: str,
+        size: int = 2,
+        max_idle: float = 300.0,
+        health_interval: float = 30.0,
+    ):
+        """
+        Initialize the worker pool.
+
+        Args:
+            name: Provider name (for logs and stats)
+            size: Maximum number of idle workers kept warm
+            max_idle: Seconds an idle worker may wait before it is recycled
+            health_interval: Seconds between health checks
+        """
+        self.name = name
+        self.size = size
+        self.max_idle = max_idle
+        self.health_interval = health_interval
+
+        # command -> idle workers; order = least recently used first
+        self._idle: OrderedDict[tuple[str, ...], deque[_Worker]] = OrderedDict()
+        self._last_used: dict[tuple[str, ...], float] = {}
+        self._spawning = 0
+        self._spawn_tasks: set[asyncio.Task] = set()
+        self._health_task: asyncio.Task | None = None
+        self._closed = False
+        self.stats = WorkerPoolStats()
+
+    @property
+    def idle_count(self) -> int:
+        return sum(len(workers) for workers in self._idle.values())
+
+    def start(self) -> None:
+        """Start the background health check."""
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def acquire(
+        self, cmd: Sequence[str], *, poolable: bool = True
+    ) -> asyncio.subprocess.Process:
+        """
+        Get a process for the command with stdin/stdout/stderr pipes.
+
+        The caller owns the returned process: it writes the prompt, closes
+        stdin and reads the output as with a freshly spawned process.
+
+        Args:
+            cmd: Command and arguments
+            poolable: False for commands with per-request arguments; they
+                are spawned directly and never kept warm
+
+        Returns:
+            Process object
+        """
+        key = tuple(cmd)
+        if not poolable:
+            self.stats.bypassed += 1
+            return await self._spawn(key)
+
+        self._last_used[key] = time.monotonic()
+        worker = self._take(key)
+
+        if worker is not None:
+            self.stats.hits += 1
+            process = worker.process
+        else:
+            self.stats.misses += 1
+            process = await self._spawn(key)
+
+        self._replenish(key)
+        return process
+
+    def _take(self, key: tuple[str, ...]) -> _Worker | None:
+        workers = self._idle.get(key)
+        if workers is None:
+            return None
+        self._idle.move_to_end(key)
+
+        while workers:
+            worker = workers.popleft()
+            if worker.alive:
+                return worker
+            self.stats.dead += 1
+        return None
+
+    async def _spawn(self, key: tuple[str, ...]) -> asyncio.subprocess.Process:
+        start = time.perf_counter()
+        process = await create_subprocess(
+            list(key),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        self.stats.spawned += 1
+        self.stats.total_spawn_time += time.perf_counter() - start
+        return process
+
+    def _replenish(self, key: tuple[str, ...]) -> None:
+        """Spawn a warm replacement for the command, evicting colder ones if full."""
+        if self._closed or self.size <= 0:
+            return
+        if self.idle_count + self._spawning >= self.size and not self._evict_other(key):
+            return
+
+        self._spawning += 1
+        task = asyncio.create_task(self._spawn_idle(key))
+        self._spawn_tasks.add(task)
+        task.add_done_callback(self._spawn_tasks.discard)
+
+    def _evict_other(self, key: tuple[str, ...]) -> bool:
+        for other, workers in self._idle.items():
+            if other != key and workers:
+                self._kill(workers.popleft())
+                if not workers:
+                    del self._idle[other]
+                self.stats.evicted += 1
+                return True
+        return False
+
+    async def _spawn_idle(self, key: tuple[str, ...]) -> None:
+        try:
+            process = await self._spawn(key)
+        except Exception as e:
+            self.stats.spawn_errors += 1
+            logger.warning(f"Worker pool {self.name}: failed to spawn worker: {e}")
+            return
+        finally:
+            self._spawning -= 1
+
+        if self._closed:
+            self._kill(_Worker(process))
+            return
+        self._idle.setdefault(key, deque()).append(_Worker(process))
+        self._idle.move_to_end(key)
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                self.check_health()
+            except Exception as e:
+                logger.error(f"Worker pool {self.name} health check error: {e}")
+
+    def check_health(self) -> None:
+        """Drop dead workers and recycle workers idle for longer than max_idle."""
+        now = time.monotonic()
+        for key in list(self._idle):
+            workers = self._idle[key]
+            for worker in list(workers):
+                if not worker.alive:
+                    workers.remove(worker)
+                    self.stats.dead += 1
+                elif now - worker.spawned_at > self.max_idle:
+                    workers.remove(worker)
+                    self._kill(worker)
+                    self.stats.recycled += 1
+                    # Keep the command warm only while it still gets traffic
+                    if now - self._last_used.get(key, 0) < self.max_idle:
+                        self._replenish(key)
+            if not workers:
+                del self._idle[key]
+
+        for key in [k for k, used in self._last_used.items() if now - used > self.max_idle]:
+            if key not in self._idle:
+                del self._last_used[key]
+
+    @staticmethod
+    def _kill(worker: _Worker) -> None:
+        if worker.alive:
+            try:
+                worker.process.kill()
+            except ProcessLookupError:
+                pass
+        # Reap the process in the background
+        asyncio.create_task(worker.process.wait())
+
+    async def shutdown(self) -> None:
+        """Stop health checks and kill all idle workers."""
+        self._closed = True
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+        if self._spawn_tasks:
+            await asyncio.gather(*self._spawn_tasks, return_exceptions=True)
+
+        for workers in self._idle.values():
+            for worker in workers:
+                if worker.alive:
+                    try:
+                        worker.process.kill()
+                    except ProcessLookupError:
+                        pass
+                await worker.process.wait()
+        self._idle.clear()
+
+    def get_stats(self) -> dict:
+        """Get pool statistics."""
+        requests = self.stats.hits + self.stats.misses
+        return {
+            "size": self.size,
+            "idle": self.idle_count,
+            "spawning": self._spawning,
+            "commands": len(self._idle),
+            "hits": self.stats.hits,
+            "misses": self.stats.misses,
+            "bypassed": self.stats.bypassed,
+            "hit_rate": round(self.stats.hits / requests, 3) if requests else 0.0,
+            "spawned": self.stats.spawned,
+            "spawn_errors": self.stats.spawn_errors,
+            "recycled": self.stats.recycled,
+            "evicted": self.stats.evicted,
+            "dead": self.stats.dead,
+            "avg_spawn_ms": round(self.stats.total_spawn_time / self.stats.spawned * 1000, 2)
+            if self.stats.spawned
+            else 0.0,
+        }
+
+
+# Global pools (one per provider, created by init_worker_pools)
+_worker_pools: dict[str, CLIWorkerPool] = {}
+
+
+def init_worker_pools(providers: Sequence[str], size: int, max_idle: float) -> None:
+    """Create and start worker pools for the given providers."""
+    for name in providers:
+        if name not in _worker_pools:
+            pool = CLIWorkerPool(name, size=size, max_idle=max_idle)
+            pool.start()
+            _worker_pools[name] = pool
+
+
+def get_worker_pools() -> dict[str, CLIWorkerPool]:
+    """Get all active worker pools."""
+    return _worker_pools
+
+
+async def shutdown_worker_pools() -> None:
+    """Shut down all worker pools."""
+    for pool in _worker_pools.values():
+        await pool.shutdown()
+    _worker_pools.clear()
+
+
+async def spawn_cli_process(
+    provider: str, cmd: Sequence[str], *, poolable: bool = True
+) -> asyncio.subprocess.Process:
+    """
+    Start a CLI process with piped stdin/stdout/stderr.
+
+    Uses the provider's warm worker pool when one is configured.
+
+    Args:
+        provider: Provider name
+        cmd: Command and arguments
+        poolable: False for commands with per-request arguments (see CLIWorkerPool)
+
+    Returns:
+        Process object
+    """
+    pool = _worker_pools.get(provider)
+    if pool is not None:
+        return await pool.acquire(cmd, poolable=poolable)
+    return await create_subprocess(
+        cmd,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
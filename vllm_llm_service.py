@@ -8,12 +8,14 @@
 import json
 import logging
 import os
-from datetime import datetime
 from pathlib import Path
-from typing import Dict, Generator, List, Optional
+from typing import AsyncGenerator, Dict, Generator, List, Optional, Tuple
 
 import httpx
 
+from cloud_llm_service import parse_sse_line
+from faq_matcher import FAQMatcher, apply_faq_templates
+
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -252,8 +254,9 @@ class VLLMLLMService:
         self.timeout = timeout
         self.conversation_history: List[Dict[str, str]] = []
 
-        # HTTP клиент
+        # HTTP клиенты (sync для legacy путей, async для streaming в event loop)
         self.client = httpx.Client(timeout=timeout)
+        self.async_client: Optional[httpx.AsyncClient] = None
 
         # Runtime параметры генерации (могут быть изменены через API)
         self.runtime_params = {
@@ -274,7 +277,8 @@ class VLLMLLMService:
         self.system_prompt = system_prompt or self.persona["prompt"]
 
         # FAQ (загружается через reload_faq из БД)
-        self.faq: Dict[str, str] = {}
+        self._faq_matcher = FAQMatcher()
+        self.faq: Dict[str, str] = self._faq_matcher.faq
 
         logger.info(f"🤖 Инициализация vLLM Service: {self.api_url}")
         logger.info(f"👤 Персона: {self.persona['name']} ({self.persona_id})")
@@ -324,51 +328,15 @@ class VLLMLLMService:
             if not self.model_name:
                 self.model_name = "error"
 
-    def _normalize_faq(self, faq_dict: Dict[str, str]) -> Dict[str, str]:
-        """Нормализует ключи FAQ (lowercase, strip)"""
-        return {k.lower().strip(): v for k, v in faq_dict.items()}
-
     def _check_faq(self, user_message: str) -> Optional[str]:
         """Проверяет сообщение на совпадение с FAQ"""
-        if not self.faq:
+        match = self._faq_matcher.match(user_message)
+        if not match:
             return None
 
-        normalized = user_message.lower().strip().rstrip("?!.,")
-
-        if normalized in self.faq:
-            response = self.faq[normalized]
-            logger.info(f"📋 FAQ match (exact): '{normalized}'")
-            return self._apply_faq_templates(response)
-
-        for key, response in self.faq.items():
-            if key in normalized or normalized in key:
-                logger.info(f"📋 FAQ match (partial): '{key}' in '{normalized}'")
-                return self._apply_faq_templates(response)
-
-        return None
-
-    def _apply_faq_templates(self, response: str) -> str:
-        """Подставляет переменные шаблона в ответ"""
-        now = datetime.now()
-
-        replacements = {
-            "{current_time}": now.strftime("%H:%M"),
-            "{current_date}": now.strftime("%d.%m.%Y"),
-            "{day_of_week}": [
-                "понедельник",
-                "вторник",
-                "среда",
-                "четверг",
-                "пятница",
-                "суббота",
-                "воскресенье",
-            ][now.weekday()],
-        }
-
-        for placeholder, value in replacements.items():
-            response = response.replace(placeholder, value)
-
-        return response
+        key, response, kind = match
+        logger.info(f"📋 FAQ match ({kind}): '{key}'")
+        return apply_faq_templates(response)
 
     def reload_faq(self, faq_dict: Dict[str, str] = None):
         """
@@ -377,10 +345,8 @@ class VLLMLLMService:
         Args:
             faq_dict: FAQ словарь из БД. Если не передан, FAQ очищается.
         """
-        if faq_dict:
-            self.faq = self._normalize_faq(faq_dict)
-        else:
-            self.faq = {}
+        self._faq_matcher = FAQMatcher(faq_dict)
+        self.faq = self._faq_matcher.faq
         logger.info(f"🔄 FAQ перезагружен: {len(self.faq)} записей")
 
     def _default_system_prompt(self) -> str:
@@ -619,8 +585,16 @@ class VLLMLLMService:
         # Streaming режим - возвращает генератор
         return self._generate_response_stream(messages)
 
-    def _generate_response_non_stream(self, messages: List[Dict[str, str]]) -> str:
-        """Non-streaming генерация ответа"""
+    def _prepare_messages(
+        self, messages: List[Dict[str, str]]
+    ) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """
+        Готовит сообщения к отправке в vLLM.
+
+        Returns:
+            (final_messages, faq_response) — faq_response не None, если на вопрос
+            можно ответить из FAQ без обращения к модели.
+        """
         # Добавляем system prompt если его нет
         has_system = any(m.get("role") == "system" for m in messages)
 
@@ -643,20 +617,32 @@ class VLLMLLMService:
             faq_response = self._check_faq(last_user_message)
             if faq_response:
                 logger.info(f"⚡ FAQ ответ: '{faq_response[:50]}...'")
-                return faq_response
+                return final_messages, faq_response
+
+        return final_messages, None
+
+    def _chat_payload(self, messages: List[Dict[str, str]], stream: bool) -> Dict:
+        """Тело запроса /v1/chat/completions с runtime параметрами"""
+        return {
+            "model": self.model_name,
+            "messages": messages,
+            "max_tokens": self.runtime_params.get("max_tokens", 512),
+            "temperature": self.runtime_params.get("temperature", 0.7),
+            "top_p": self.runtime_params.get("top_p", 0.9),
+            "repetition_penalty": self.runtime_params.get("repetition_penalty", 1.1),
+            "stream": stream,
+        }
+
+    def _generate_response_non_stream(self, messages: List[Dict[str, str]]) -> str:
+        """Non-streaming генерация ответа"""
+        final_messages, faq_response = self._prepare_messages(messages)
+        if faq_response:
+            return faq_response
 
         try:
             response = self.client.post(
                 f"{self.api_url}/v1/chat/completions",
-                json={
-                    "model": self.model_name,
-                    "messages": final_messages,
-                    "max_tokens": self.runtime_params.get("max_tokens", 512),
-                    "temperature": self.runtime_params.get("temperature", 0.7),
-                    "top_p": self.runtime_params.get("top_p", 0.9),
-                    "repetition_penalty": self.runtime_params.get("repetition_penalty", 1.1),
-                    "stream": False,
-                },
+                json=self._chat_payload(final_messages, stream=False),
             )
             response.raise_for_status()
             result = response.json()
@@ -673,61 +659,26 @@ class VLLMLLMService:
         self, messages: List[Dict[str, str]]
     ) -> Generator[str, None, None]:
         """Streaming генерация ответа"""
-        # Добавляем system prompt если его нет
-        has_system = any(m.get("role") == "system" for m in messages)
-
-        if not has_system:
-            final_messages = [{"role": "system", "content": self.system_prompt}]
-            final_messages.extend(messages)
-        else:
-            final_messages = messages
-
-        # Получаем последнее сообщение пользователя для FAQ
-        last_user_message = ""
-        for msg in reversed(messages):
-            if msg.get("role") == "user":
-                last_user_message = msg.get("content", "")
-                break
-
-        # Проверяем FAQ (только если мало контекста)
-        user_messages_count = sum(1 for m in messages if m.get("role") == "user")
-        if last_user_message and user_messages_count <= 1:
-            faq_response = self._check_faq(last_user_message)
-            if faq_response:
-                logger.info(f"⚡ FAQ ответ: '{faq_response[:50]}...'")
-                yield faq_response
-                return
+        final_messages, faq_response = self._prepare_messages(messages)
+        if faq_response:
+            yield faq_response
+            return
 
         try:
             # Streaming с runtime параметрами
             with self.client.stream(
                 "POST",
                 f"{self.api_url}/v1/chat/completions",
-                json={
-                    "model": self.model_name,
-                    "messages": final_messages,
-                    "max_tokens": self.runtime_params.get("max_tokens", 512),
-                    "temperature": self.runtime_params.get("temperature", 0.7),
-                    "top_p": self.runtime_params.get("top_p", 0.9),
-                    "repetition_penalty": self.runtime_params.get("repetition_penalty", 1.1),
-                    "stream": True,
-                },
+                json=self._chat_payload(final_messages, stream=True),
             ) as response:
                 response.raise_for_status()
 
                 for line in response.iter_lines():
-                    if line.startswith("data: "):
-                        data = line[6:]
-                        if data == "[DONE]":
-                            break
-                        try:
-                            chunk = json.loads(data)
-                            delta = chunk["choices"][0].get("delta", {})
-                            content = delta.get("content", "")
-                            if content:
-                                yield content
-                        except json.JSONDecodeError:
-                            continue
+                    done, content = parse_sse_line(line)
+                    if done:
+                        break
+                    if content:
+                        yield content
 
         except httpx.ConnectError:
             logger.error("❌ vLLM недоступен")
@@ -736,6 +687,57 @@ class VLLMLLMService:
             logger.error(f"❌ Ошибка генерации: {e}")
             yield "Извините, возникла техническая проблема."
 
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Ленивая инициализация async клиента (привязывается к текущему event loop)"""
+        if self.async_client is None or self.async_client.is_closed:
+            self.async_client = httpx.AsyncClient(timeout=self.timeout)
+        return self.async_client
+
+    async def agenerate_response_from_messages(
+        self, messages: List[Dict[str, str]]
+    ) -> AsyncGenerator[str, None]:
+        """
+        Async streaming генерация ответа через httpx.AsyncClient.
+
+        Не блокирует event loop: чтение каждого токена — await, поэтому один
+        медленный поток не задерживает остальные запросы оркестратора.
+        """
+        final_messages, faq_response = self._prepare_messages(messages)
+        if faq_response:
+            yield faq_response
+            return
+
+        try:
+            async with self._get_async_client().stream(
+                "POST",
+                f"{self.api_url}/v1/chat/completions",
+                json=self._chat_payload(final_messages, stream=True),
+            ) as response:
+                response.raise_for_status()
+
+                finished = False
+                async for line in response.aiter_lines():
+                    # Дочитываем поток после [DONE] — полностью прочитанный ответ
+                    # возвращает соединение в keep-alive пул
+                    if finished:
+                        continue
+                    finished, content = parse_sse_line(line)
+                    if content:
+                        yield content
+
+        except httpx.ConnectError:
+            logger.error("❌ vLLM недоступен")
+            yield "Извините, сервис временно недоступен."
+        except Exception as e:
+            logger.error(f"❌ Ошибка генерации: {e}")
+            yield "Извините, возникла техническая проблема."
+
+    async def aclose(self):
+        """Закрывает async HTTP клиент"""
+        if self.async_client is not None:
+            await self.async_client.aclose()
+            self.async_client = None
+
     def reset_conversation(self):
         """Сбрасывает историю диалога"""
         self.conversation_history = []
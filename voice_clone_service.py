@@ -5,9 +5,7 @@
 GPU-ускорение на RTX 3060
 """
 
-import hashlib
 import logging
-import pickle
 import re
 import time
 from dataclasses import dataclass
@@ -19,6 +17,8 @@ import soundfile as sf
 import torch
 from TTS.api import TTS
 
+from xtts_voice_registry import CoquiXTTSEngine, VoiceRegistry
+
 
 # Monkey-patch torch.isin for compatibility with transformers + PyTorch 2.x
 # Issue: transformers passes int as test_elements, but PyTorch 2.x requires tensor
@@ -88,6 +88,57 @@ def get_optimal_gpu() -> tuple[str, Optional[int]]:
     return "cpu", None
 
 
+def load_xtts_registry(
+    model_name: str = "tts_models/multilingual/multi-dataset/xtts_v2",
+    force_cpu: bool = False,
+    cache_dir: str = "./cache",
+) -> VoiceRegistry:
+    """
+    Загружает XTTS v2 один раз и возвращает реестр голосов поверх неё.
+    Один реестр передаётся во все VoiceCloneService (registry=...).
+    """
+    # Определяем оптимальный GPU
+    if force_cpu:
+        device, gpu_index = "cpu", None
+        logger.info("⚙️ Принудительный режим CPU")
+    else:
+        device, gpu_index = get_optimal_gpu()
+
+    logger.info(f"🖥️ Устройство: {device}")
+
+    # Устанавливаем CUDA устройство по умолчанию
+    if gpu_index is not None:
+        torch.cuda.set_device(gpu_index)
+        # Оптимизации CUDA
+        torch.backends.cudnn.benchmark = True
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+        logger.info("⚡ CUDA оптимизации включены (TF32, cuDNN benchmark)")
+
+    try:
+        tts = TTS(model_name=model_name, gpu=device.startswith("cuda"), progress_bar=True)
+
+        # Перемещаем модель на нужный GPU
+        if device.startswith("cuda") and hasattr(tts, "synthesizer"):
+            if hasattr(tts.synthesizer, "tts_model"):
+                tts.synthesizer.tts_model = tts.synthesizer.tts_model.to(device)
+                logger.info(f"✅ Модель перемещена на {device}")
+
+        logger.info("✅ XTTS v2 загружена успешно")
+
+        # Показываем информацию о памяти GPU
+        if gpu_index is not None:
+            allocated = torch.cuda.memory_allocated(gpu_index) / (1024**3)
+            reserved = torch.cuda.memory_reserved(gpu_index) / (1024**3)
+            logger.info(f"📊 GPU память: {allocated:.1f} GB allocated, {reserved:.1f} GB reserved")
+
+    except Exception as e:
+        logger.error(f"❌ Ошибка загрузки модели: {e}")
+        raise
+
+    return VoiceRegistry(CoquiXTTSEngine(tts, device, gpu_index), cache_dir=cache_dir)
+
+
 # ============== Словарь замены Е → Ё ==============
 # Частые слова где обязательно нужна Ё для правильного произношения
 YO_REPLACEMENTS = {
@@ -338,6 +389,7 @@ class VoiceCloneService:
     - GPU-ускорение на RTX 3060 (или совместимых картах)
     - Использует ВСЕ образцы голоса для лучшего качества
     - Кэширование speaker latents для быстрого повторного синтеза
+    - Одна модель XTTS на все голоса: голос — это latents в VoiceRegistry
     - Поддерживает пресеты интонаций
     - Автоматическая замена Е→Ё
     - Тонкая настройка параметров синтеза
@@ -351,6 +403,9 @@ class VoiceCloneService:
         max_samples: Optional[int] = None,  # None = использовать все
         force_cpu: bool = False,  # Принудительно использовать CPU
         cache_dir: str = "./cache",  # Папка для кэша latents
+        *,
+        registry: Optional[VoiceRegistry] = None,  # Общая модель XTTS (load_xtts_registry)
+        voice_name: Optional[str] = None,  # Имя голоса в реестре (по умолчанию — имя папки)
     ):
         self.voice_samples_dir = Path(voice_samples_dir)
         self.model_name = model_name
@@ -358,56 +413,25 @@ class VoiceCloneService:
         self.max_samples = max_samples
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
-
-        # Определяем оптимальный GPU
-        if force_cpu:
-            self.device = "cpu"
-            self.gpu_index = None
-            logger.info("⚙️ Принудительный режим CPU")
-        else:
-            self.device, self.gpu_index = get_optimal_gpu()
+        self.voice_name = voice_name or self.voice_samples_dir.name
 
         # Препроцессор текста
         self.preprocessor = TextPreprocessor()
 
         logger.info("🎤 Инициализация VoiceCloneService")
-        logger.info(f"🖥️ Устройство: {self.device}")
         logger.info(f"📁 Папка образцов: {self.voice_samples_dir}")
         logger.info(f"🎭 Пресет по умолчанию: {default_preset}")
 
-        # Устанавливаем CUDA устройство по умолчанию
-        if self.gpu_index is not None:
-            torch.cuda.set_device(self.gpu_index)
-            # Оптимизации CUDA
-            torch.backends.cudnn.benchmark = True
-            torch.backends.cuda.matmul.allow_tf32 = True
-            torch.backends.cudnn.allow_tf32 = True
-            logger.info("⚡ CUDA оптимизации включены (TF32, cuDNN benchmark)")
-
-        try:
-            self.tts = TTS(
-                model_name=self.model_name, gpu=(self.device.startswith("cuda")), progress_bar=True
-            )
-
-            # Перемещаем модель на нужный GPU
-            if self.device.startswith("cuda") and hasattr(self.tts, "synthesizer"):
-                if hasattr(self.tts.synthesizer, "tts_model"):
-                    self.tts.synthesizer.tts_model = self.tts.synthesizer.tts_model.to(self.device)
-                    logger.info(f"✅ Модель перемещена на {self.device}")
-
-            logger.info("✅ XTTS v2 загружена успешно")
-
-            # Показываем информацию о памяти GPU
-            if self.gpu_index is not None:
-                allocated = torch.cuda.memory_allocated(self.gpu_index) / (1024**3)
-                reserved = torch.cuda.memory_reserved(self.gpu_index) / (1024**3)
-                logger.info(
-                    f"📊 GPU память: {allocated:.1f} GB allocated, {reserved:.1f} GB reserved"
-                )
-
-        except Exception as e:
-            logger.error(f"❌ Ошибка загрузки модели: {e}")
-            raise
+        # Модель XTTS: общая из реестра или собственная (загружается один раз)
+        if registry is None:
+            registry = load_xtts_registry(model_name, force_cpu=force_cpu, cache_dir=cache_dir)
+        else:
+            logger.info("♻️ Используется уже загруженная модель XTTS из реестра")
+        self.registry = registry
+        self.engine = registry.engine
+        self.tts = getattr(self.engine, "tts", None)
+        self.device = self.engine.device
+        self.gpu_index = getattr(self.engine, "gpu_index", None)
 
         # Пользовательские пресеты (загружаются через reload_presets из БД)
         self.custom_presets: dict = {}
@@ -423,9 +447,7 @@ class VoiceCloneService:
             if len(self.voice_samples) > 5:
                 logger.info(f"   ... и ещё {len(self.voice_samples) - 5}")
 
-        # Кэшируем speaker latents при инициализации
-        self._cached_latents = None
-        self._latents_cache_hash = None
+        # Кэшируем speaker latents при инициализации (в реестре, без загрузки модели)
         self._precompute_latents()
 
     def reload_presets(self, presets_dict: dict = None):
@@ -499,80 +521,19 @@ class VoiceCloneService:
 
         return samples
 
-    def _get_samples_hash(self) -> str:
-        """Вычисляет хэш списка образцов для кэширования"""
-        content = "".join([f"{s.name}:{s.stat().st_mtime}" for s in self.voice_samples])
-        return hashlib.md5(content.encode()).hexdigest()[:16]
+    @property
+    def _cached_latents(self) -> Optional[dict]:
+        """Speaker latents этого голоса из реестра (None — не вычислены)"""
+        return self.registry.latents(self.voice_name)
 
     def _precompute_latents(self):
         """
         Предвычисляет и кэширует speaker latents для ускорения синтеза.
-        Кэш сохраняется на диск и загружается при повторном запуске.
+        Кэш ведёт реестр: в памяти по имени голоса, на диске по хэшу образцов.
         """
         if not self.voice_samples:
             return
-
-        samples_hash = self._get_samples_hash()
-        cache_file = self.cache_dir / f"speaker_latents_{samples_hash}.pkl"
-
-        # Проверяем кэш на диске
-        if cache_file.exists():
-            try:
-                with open(cache_file, "rb") as f:
-                    cached_data = pickle.load(f)
-                    self._cached_latents = cached_data["latents"]
-                    self._latents_cache_hash = samples_hash
-                    logger.info("⚡ Speaker latents загружены из кэша")
-                    return
-            except Exception as e:
-                logger.warning(f"⚠️ Ошибка загрузки кэша: {e}")
-
-        # Вычисляем latents
-        logger.info("🔄 Предвычисление speaker latents (это ускорит последующий синтез)...")
-
-        try:
-            # Получаем доступ к внутренней модели XTTS
-            if hasattr(self.tts, "synthesizer") and hasattr(self.tts.synthesizer, "tts_model"):
-                model = self.tts.synthesizer.tts_model
-                speaker_wavs = [str(s) for s in self.voice_samples]
-
-                # Вычисляем conditioning latents
-                gpt_cond_latent, speaker_embedding = model.get_conditioning_latents(
-                    audio_path=speaker_wavs,
-                    gpt_cond_len=20,  # Используем больше для лучшего качества
-                    gpt_cond_chunk_len=5,
-                    max_ref_length=30,
-                )
-
-                self._cached_latents = {
-                    "gpt_cond_latent": gpt_cond_latent,
-                    "speaker_embedding": speaker_embedding,
-                }
-                self._latents_cache_hash = samples_hash
-
-                # Сохраняем в кэш на диск
-                with open(cache_file, "wb") as f:
-                    pickle.dump(
-                        {
-                            "latents": self._cached_latents,
-                            "samples_hash": samples_hash,
-                        },
-                        f,
-                    )
-
-                logger.info("✅ Speaker latents предвычислены и закэшированы")
-                logger.info(f"💾 Кэш сохранён: {cache_file}")
-
-                # Показываем размеры тензоров
-                logger.info(f"📊 GPT latent shape: {gpt_cond_latent.shape}")
-                logger.info(f"📊 Speaker embedding shape: {speaker_embedding.shape}")
-
-            else:
-                logger.warning("⚠️ Не удалось получить доступ к модели для предвычисления latents")
-
-        except Exception as e:
-            logger.warning(f"⚠️ Ошибка предвычисления latents: {e}")
-            logger.info("   Синтез будет работать, но медленнее")
+        self.registry.register(self.voice_name, self.voice_samples)
 
     def get_preset(self, preset_name: str) -> IntonationPreset:
         """Получает пресет по имени"""
@@ -663,16 +624,16 @@ class VoiceCloneService:
             start_time = time.time()
 
             # Используем кэшированные latents если доступны (быстрый путь)
-            if self._cached_latents is not None and hasattr(self.tts, "synthesizer"):
-                model = self.tts.synthesizer.tts_model
+            latents = self._cached_latents
+            if latents is not None:
                 logger.info("⚡ Используются кэшированные speaker latents (быстрый режим)")
 
                 # Прямой вызов модели с предвычисленными latents
-                wav = model.inference(
+                wav = self.engine.inference(
                     text=text,
                     language=language,
-                    gpt_cond_latent=self._cached_latents["gpt_cond_latent"],
-                    speaker_embedding=self._cached_latents["speaker_embedding"],
+                    gpt_cond_latent=latents["gpt_cond_latent"],
+                    speaker_embedding=latents["speaker_embedding"],
                     # Тонкие настройки
                     temperature=final_temperature,
                     repetition_penalty=final_repetition_penalty,
@@ -714,7 +675,7 @@ class VoiceCloneService:
             if hasattr(wav, "cpu"):
                 wav = wav.cpu().numpy()
 
-            sample_rate = self.tts.synthesizer.output_sample_rate
+            sample_rate = self.engine.output_sample_rate
 
             elapsed = time.time() - start_time
             audio_duration = len(wav) / sample_rate
@@ -800,7 +761,8 @@ class VoiceCloneService:
         if not self.voice_samples:
             raise ValueError("Нет образцов голоса для клонирования")
 
-        if self._cached_latents is None:
+        latents = self._cached_latents
+        if latents is None:
             raise RuntimeError(
                 "Streaming требует предвычисленных speaker latents. "
                 "Дождитесь завершения инициализации сервиса."
@@ -813,8 +775,7 @@ class VoiceCloneService:
         # Получаем параметры из пресета
         p = self.get_preset(preset or self.default_preset)
 
-        model = self.tts.synthesizer.tts_model
-        native_sample_rate = self.tts.synthesizer.output_sample_rate
+        native_sample_rate = self.engine.output_sample_rate
 
         prev_chunk_tail = None
         first_chunk_sent = False
@@ -823,11 +784,11 @@ class VoiceCloneService:
 
         try:
             # Используем XTTS streaming inference
-            for chunk_output in model.inference_stream(
+            for chunk_output in self.engine.inference_stream(
                 text=text,
                 language=language,
-                gpt_cond_latent=self._cached_latents["gpt_cond_latent"],
-                speaker_embedding=self._cached_latents["speaker_embedding"],
+                gpt_cond_latent=latents["gpt_cond_latent"],
+                speaker_embedding=latents["speaker_embedding"],
                 temperature=p.temperature,
                 repetition_penalty=p.repetition_penalty,
                 top_k=p.top_k,
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Реестр голосов XTTS: одна загруженная модель обслуживает любое число голосов.
+
+Единственное, что отличает один клонированный голос от другого, — speaker
+latents (gpt_cond_latent + speaker_embedding), вычисленные по образцам.
+Реестр хранит их по имени голоса; добавление голоса — это вычисление (или
+загрузка из дискового кэша) latents, без повторной загрузки модели.
+
+Модуль не импортирует torch/TTS: модель скрыта за XTTSEngine, поэтому реестр
+можно проверять на CPU с заглушкой вместо XTTS.
+"""
+
+import hashlib
+import logging
+import pickle
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class XTTSEngine(ABC):
+    """
+    Интерфейс модели XTTS, которым пользуются реестр и VoiceCloneService.
+
+    Реализации: CoquiXTTSEngine (реальная модель) или заглушка для проверок на CPU.
+    """
+
+    device: str = "cpu"
+
+    @property
+    @abstractmethod
+    def output_sample_rate(self) -> int:
+        """Частота дискретизации синтезированного аудио"""
+        pass
+
+    @abstractmethod
+    def get_conditioning_latents(
+        self,
+        audio_paths: List[str],
+        gpt_cond_len: int,
+        gpt_cond_chunk_len: int,
+        max_ref_length: int,
+    ) -> Tuple[Any, Any]:
+        """Возвращает (gpt_cond_latent, speaker_embedding) по образцам голоса"""
+        pass
+
+    @abstractmethod
+    def inference(
+        self, text: str, language: str, gpt_cond_latent: Any, speaker_embedding: Any, **params
+    ) -> Any:
+        """Синтез всей фразы с заданными latents"""
+        pass
+
+    @abstractmethod
+    def inference_stream(
+        self, text: str, language: str, gpt_cond_latent: Any, speaker_embedding: Any, **params
+    ) -> Iterator[Any]:
+        """Потоковый синтез с заданными latents"""
+        pass
+
+
+class CoquiXTTSEngine(XTTSEngine):
+    """XTTSEngine поверх загруженного coqui TTS API (TTS(model_name=...xtts_v2))"""
+
+    def __init__(self, tts, device: str = "cpu", gpu_index: Optional[int] = None):
+        self.tts = tts
+        self.device = device
+        self.gpu_index = gpu_index
+
+    @property
+    def model(self):
+        return self.tts.synthesizer.tts_model
+
+    @property
+    def output_sample_rate(self) -> int:
+        return self.tts.synthesizer.output_sample_rate
+
+    def get_conditioning_latents(
+        self,
+        audio_paths: List[str],
+        gpt_cond_len: int,
+        gpt_cond_chunk_len: int,
+        max_ref_length: int,
+    ) -> Tuple[Any, Any]:
+        return self.model.get_conditioning_latents(
+            audio_path=audio_paths,
+            gpt_cond_len=gpt_cond_len,
+            gpt_cond_chunk_len=gpt_cond_chunk_len,
+            max_ref_length=max_ref_length,
+        )
+
+    def inference(
+        self, text: str, language: str, gpt_cond_latent: Any, speaker_embedding: Any, **params
+    ) -> Any:
+        return self.model.inference(
+            text=text,
+            language=language,
+            gpt_cond_latent=gpt_cond_latent,
+            speaker_embedding=speaker_embedding,
+            **params,
+        )
+
+    def inference_stream(
+        self, text: str, language: str, gpt_cond_latent: Any, speaker_embedding: Any, **params
+    ) -> Iterator[Any]:
+        return self.model.inference_stream(
+            text=text,
+            language=language,
+            gpt_cond_latent=gpt_cond_latent,
+            speaker_embedding=speaker_embedding,
+            **params,
+        )
+
+
+@dataclass
+class VoiceEntry:
+    """Голос в реестре: образцы и вычисленные по ним speaker latents"""
+
+    name: str
+    samples: List[Path]
+    samples_hash: str
+    gpt_cond_latent: Any = None
+    speaker_embedding: Any = None
+
+    @property
+    def latents(self) -> Optional[Dict[str, Any]]:
+        """Latents в формате, который ждёт inference(), или None если не вычислены"""
+        if self.gpt_cond_latent is None:
+            return None
+        return {
+            "gpt_cond_latent": self.gpt_cond_latent,
+            "speaker_embedding": self.speaker_embedding,
+        }
+
+
+def samples_hash(samples: List[Path]) -> str:
+    """Хэш списка образцов (имя + mtime) — ключ дискового кэша latents"""
+    content = "".join([f"{s.name}:{s.stat().st_mtime}" for s in samples])
+    return hashlib.md5(content.encode()).hexdigest()[:16]
+
+
+class VoiceRegistry:
+    """
+    Голоса поверх одной модели XTTS.
+
+    Latents кэшируются в памяти по имени голоса и на диске по хэшу образцов
+    (cache_dir/speaker_latents_{hash}.pkl — тот же формат, что и раньше у
+    VoiceCloneService, так что существующий кэш подхватывается).
+    """
+
+    # Параметры кондиционирования при предвычислении latents
+    GPT_COND_LEN = 20
+    GPT_COND_CHUNK_LEN = 5
+    MAX_REF_LENGTH = 30
+
+    def __init__(self, engine: XTTSEngine, cache_dir: str = "./cache"):
+        self.engine = engine
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True)
+
+        self._voices: Dict[str, VoiceEntry] = {}
+        self._lock = threading.Lock()
+
+        # Статистика: сколько раз latents считались моделью / брались с диска
+        self._computed = 0
+        self._disk_hits = 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._voices
+
+    def __len__(self) -> int:
+        return len(self._voices)
+
+    def names(self) -> List[str]:
+        return list(self._voices.keys())
+
+    def get(self, name: str) -> Optional[VoiceEntry]:
+        return self._voices.get(name)
+
+    def latents(self, name: str) -> Optional[Dict[str, Any]]:
+        entry = self._voices.get(name)
+        return entry.latents if entry else None
+
+    def register(self, name: str, samples: List[Path]) -> VoiceEntry:
+        """
+        Добавляет (или обновляет) голос: загружает latents из кэша или вычисляет их.
+        Модель не перезагружается. Если образцы не изменились — ничего не делает.
+        """
+        samples = list(samples)
+        entry = VoiceEntry(
+            name=name, samples=samples, samples_hash=samples_hash(samples) if samples else ""
+        )
+
+        with self._lock:
+            current = self._voices.get(name)
+            if (
+                current is not None
+                and current.samples_hash == entry.samples_hash
+                and current.latents is not None
+            ):
+                return current
+
+            if samples:
+                self._load_or_compute_latents(entry)
+            self._voices[name] = entry
+
+        logger.info(f"🎭 Голос '{name}' в реестре XTTS ({len(samples)} образцов)")
+        return entry
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            return self._voices.pop(name, None) is not None
+
+    def _load_or_compute_latents(self, entry: VoiceEntry) -> None:
+        """Заполняет latents голоса: дисковый кэш, иначе вычисление моделью"""
+        cache_file = self.cache_dir / f"speaker_latents_{entry.samples_hash}.pkl"
+
+        # Проверяем кэш на диске
+        if cache_file.exists():
+            try:
+                with open(cache_file, "rb") as f:
+                    cached = pickle.load(f)["latents"]
+                entry.gpt_cond_latent = cached["gpt_cond_latent"]
+                entry.speaker_embedding = cached["speaker_embedding"]
+                self._disk_hits += 1
+                logger.info(f"⚡ Speaker latents '{entry.name}' загружены из кэша")
+                return
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка загрузки кэша: {e}")
+
+        logger.info(f"🔄 Предвычисление speaker latents '{entry.name}'...")
+        try:
+            gpt_cond_latent, speaker_embedding = self.engine.get_conditioning_latents(
+                [str(s) for s in entry.samples],
+                gpt_cond_len=self.GPT_COND_LEN,
+                gpt_cond_chunk_len=self.GPT_COND_CHUNK_LEN,
+                max_ref_length=self.MAX_REF_LENGTH,
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка предвычисления latents '{entry.name}': {e}")
+            logger.info("   Синтез будет работать, но медленнее")
+            return
+
+        entry.gpt_cond_latent = gpt_cond_latent
+        entry.speaker_embedding = speaker_embedding
+        self._computed += 1
+
+        try:
+            with open(cache_file, "wb") as f:
+                pickle.dump({"latents": entry.latents, "samples_hash": entry.samples_hash}, f)
+            logger.info(f"💾 Кэш сохранён: {cache_file}")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить кэш latents: {e}")
+
+        shape = getattr(gpt_cond_latent, "shape", None)
+        if shape is not None:
+            logger.info(f"📊 GPT latent shape: {shape}")
+
+    def get_stats(self) -> dict:
+        return {
+            "voices": self.names(),
+            "latents_computed": self._computed,
+            "latents_disk_hits": self._disk_hits,
+            "device": self.engine.device,
+        }